@@ -167,7 +167,139 @@ class AuroraDebugTool:
             # Controllo modello corrente
             current_model = getattr(self.aurora, 'current_llm_in_memory', 'Nessuno')
             report += f"• Modello in memoria: {current_model}\n"
-            
+
+            # Controllo residenza modelli (budget RAM, caricamenti, scaricamenti)
+            model_manager = getattr(self.aurora, 'model_manager', None)
+            if model_manager:
+                stats = model_manager.get_stats()
+                budget = f"{stats['budget_mb']:.0f} MB" if stats['budget_mb'] else "illimitato"
+                report += f"• Modelli residenti: {', '.join(stats['resident']) or 'nessuno'} ({stats['used_mb']:.0f} MB / {budget})\n"
+                for model_type, model_stats in stats['models'].items():
+                    report += (f"  - {model_type}: {model_stats['loads']} caricamenti, {model_stats['evictions']} scaricamenti, "
+                               f"{model_stats['hits']} riusi, caricamento medio {model_stats['avg_load_s']:.2f}s\n")
+                    if model_stats['evictions'] > 2:
+                        self.warnings.append(f"Modello {model_type} scaricato {model_stats['evictions']} volte: budget RAM insufficiente")
+
+            # Controllo avvio: risorse ancora in caricamento in background
+            resources = getattr(self.aurora, 'resources', None)
+            if resources:
+                pending = [resource.name for resource in resources.values() if not resource.ready.is_set()]
+                report += f"• Risorse in warm-up: {', '.join(pending) or 'nessuna'}\n"
+
+            # Controllo worker LLM fuori processo (se attivi)
+            llm_workers = getattr(self.aurora, 'llm_workers', None)
+            if llm_workers:
+                for model_type, worker_stats in llm_workers.get_stats().items():
+                    state = f"attivo (pid {worker_stats['pid']})" if worker_stats['alive'] else "non attivo"
+                    report += f"• Worker {model_type}: {state}, {worker_stats['restarts']} riavvii, {worker_stats['failures']} avvii falliti\n"
+                    if worker_stats['restarts'] > 0:
+                        self.warnings.append(f"Worker LLM {model_type} riavviato {worker_stats['restarts']} volte")
+
+            # Controllo cache del prefisso del prompt (KV cache riutilizzata)
+            prefix_cache = getattr(self.aurora, 'prefix_cache', None)
+            if prefix_cache:
+                cache_stats = prefix_cache.get_stats()
+                report += (f"• Cache prefisso prompt: hit rate {cache_stats['hit_rate']:.0%} "
+                           f"({cache_stats['hits']} hit, {cache_stats['restores']} ripristini, {cache_stats['misses']} miss), "
+                           f"{cache_stats['prefill_tokens_saved']} token di prefill risparmiati, "
+                           f"{cache_stats['cached_states']} stati salvati ({cache_stats['cached_mb']:.0f} MB)\n")
+
+            # Controllo cache delle risposte LLM deterministiche
+            llm_cache = getattr(self.aurora, 'llm_cache', None)
+            if llm_cache:
+                response_stats = llm_cache.get_stats()
+                report += (f"• Cache risposte LLM: hit rate {response_stats['hit_rate']:.0%} "
+                           f"({response_stats['hits']} hit, {response_stats['misses']} miss), "
+                           f"{response_stats['entries']} voci, {response_stats['evictions']} scartate\n")
+
+            # Controllo budget di token del prompt del pensatore
+            context_packer = getattr(self.aurora, 'context_packer', None)
+            if context_packer and context_packer.last_usage:
+                report += f"• Ultimo prompt pensatore: {context_packer.format_usage()}\n"
+
+            # Controllo router veloce (embedding)
+            fast_router = getattr(self.aurora, 'fast_router', None)
+            if fast_router:
+                router_stats = fast_router.get_stats()
+                report += (f"• Router veloce: {router_stats['llm_skip_rate']:.0%} decisioni senza router LLM "
+                           f"({router_stats['trivial']} banali, {router_stats['thinker']} al pensatore, {router_stats['uncertain']} incerte), "
+                           f"latenza media {router_stats['avg_latency_ms']:.1f} ms\n")
+
+            # Controllo cache degli embedding (testi mai ricalcolati)
+            embedding_cache = getattr(self.aurora, 'embedding_cache', None)
+            if embedding_cache:
+                embedding_stats = embedding_cache.get_stats()
+                report += (f"• Cache embedding: hit rate {embedding_stats['hit_rate']:.0%} "
+                           f"({embedding_stats['hits']} hit, {embedding_stats['misses']} testi calcolati in {embedding_stats['encode_calls']} chiamate), "
+                           f"{embedding_stats['entries']} vettori, {embedding_stats['evictions']} scartati\n")
+            embedding_service = getattr(self.aurora, 'embedding_model', None)
+            if embedding_service and hasattr(embedding_service, 'get_stats'):
+                service_stats = embedding_service.get_stats()
+                report += (f"• Servizio embedding: {service_stats['requests']} richieste in {service_stats['batches']} micro-lotti "
+                           f"(media {service_stats['avg_batch']:.1f} testi, massimo {service_stats['largest_batch']})\n")
+
+            # Controllo coda di apprendimento write-behind
+            ingestion_queue = getattr(self.aurora, 'ingestion_queue', None)
+            if ingestion_queue is not None:
+                queue_stats = ingestion_queue.get_stats()
+                report += (f"• Coda di apprendimento: {queue_stats['pending']} in attesa, {queue_stats['completed']} scritti, "
+                           f"{queue_stats['coalesced']} quasi duplicati fusi, {queue_stats['retried']} ritentati\n")
+                if ingestion_queue.pressure() != "ok":
+                    self.warnings.append(f"Coda di apprendimento sotto pressione ({queue_stats['pending']} elementi)")
+
+            # Controllo indice del recupero ibrido (BM25 + vettori)
+            retriever = getattr(self.aurora, 'retriever', None)
+            if retriever:
+                retriever_stats = retriever.get_stats()
+                by_source = retriever_stats['by_source']
+                report += (f"• Indice di recupero: {retriever_stats['documents']} documenti, {retriever_stats['terms']} termini "
+                           f"(ricordi {by_source['memory_box']}, chat {by_source['chat_history']}, ChromaDB {by_source['chroma']})\n")
+
+            memory_index = getattr(self.aurora, 'memory_index', None)
+            if memory_index:
+                index_stats = memory_index.get_stats()
+                report += (f"• Indice vettoriale dei ricordi: {index_stats['memories']} ricordi, dimensione {index_stats['dim']}, "
+                           f"{index_stats['matrix_mb']:.1f} MB\n")
+
+            memory_store = getattr(self.aurora, 'memory_store', None)
+            if memory_store:
+                tier_stats = memory_store.get_stats()
+                report += (f"• Livelli della memoria: {len(getattr(self.aurora, 'memory_box', []))} caldi, {tier_stats['warm']} tiepidi, "
+                           f"{tier_stats['cold']} freddi in {tier_stats['cold_segments']} segmenti "
+                           f"({tier_stats['demoted']} scesi, {tier_stats['promoted']} risaliti, {tier_stats['cold_page_ins']} segmenti ripaginati)\n")
+
+            document_vividness = getattr(self.aurora, 'document_vividness', None)
+            if document_vividness:
+                vividness_stats = document_vividness.get_stats()
+                report += (f"• Vividezza documenti: {vividness_stats['documents']} documenti, {vividness_stats['consulted']} consultazioni, "
+                           f"{vividness_stats['pushed']} aggiornamenti a ChromaDB in {vividness_stats['flushes']} lotti\n")
+
+            # Controllo cache delle direttive strategiche (deliberazione fusa)
+            directive_cache = getattr(self.aurora, 'directive_cache', None)
+            if directive_cache:
+                directive_stats = directive_cache.get_stats()
+                report += (f"• Cache direttive: hit rate {directive_stats['hit_rate']:.0%} "
+                           f"({directive_stats['hits']} hit, {directive_stats['misses']} miss), "
+                           f"{directive_stats['entries']} direttive in {directive_stats['clusters']} cluster di richieste\n")
+
+            # Controllo auto-correzione adattiva: quante bozze REFLECT richiedono critica e riscrittura
+            self_verifier = getattr(self.aurora, 'self_verifier', None)
+            if self_verifier:
+                verifier_stats = self_verifier.get_stats()
+                report += (f"• Auto-correzione: {verifier_stats['expensive_rate']:.0%} critiche complete su {verifier_stats['total']} bozze "
+                           f"({verifier_stats['grounded']} coerenti con le fonti, {verifier_stats['verdict_ok']} approvate dal critico breve)\n")
+
+            # Controllo output JSON strutturato: tasso di output non parsabile, libero vs vincolato
+            grammar_registry = getattr(self.aurora, 'grammar_registry', None)
+            if grammar_registry:
+                report += f"• Output JSON vincolato da grammatica: {'attivo' if grammar_registry.enabled else 'disattivato'}\n"
+                for call_site, modes in grammar_registry.get_stats().items():
+                    parts = [f"{mode} {counts['failures']}/{counts['calls']} non parsabili ({counts['failure_rate']:.0%})"
+                             for mode, counts in modes.items() if counts['calls']]
+                    report += f"  - {call_site}: {', '.join(parts)}\n"
+                    if modes['grammar']['failures']:
+                        self.warnings.append(f"Output JSON non parsabile con grammatica in {call_site}")
+
             # Controllo embedding model
             if self.aurora.embedding_model:
                 report += "✅ Embedding Model: Caricato\n"
@@ -242,6 +374,18 @@ class AuroraDebugTool:
                 
                 for job in jobs:
                     report += f"  - {job.id}: {job.trigger}\n"
+
+            # Controllo coda di dispatch LLM (priorità interattiva > manutenzione > whimsy)
+            dispatcher = getattr(self.aurora, 'llm_dispatcher', None)
+            if dispatcher:
+                report += "• Coda LLM:\n"
+                for priority_class, queue_stats in dispatcher.get_stats().items():
+                    report += (f"  - {priority_class}: in coda {queue_stats['queue_depth']} (max {queue_stats['max_queue_depth']}), "
+                               f"attesa media {queue_stats['avg_wait_s']:.2f}s, p95 {queue_stats['p95_wait_s']:.2f}s, "
+                               f"completate {queue_stats['completed']}, scartate {queue_stats['dropped']}, interrotte {queue_stats['preempted']}\n")
+                interactive_p95 = dispatcher.get_stats()['interactive']['p95_wait_s']
+                if interactive_p95 > 5:
+                    self.warnings.append(f"Turni interattivi in coda dietro altre generazioni (p95 {interactive_p95:.1f}s)")
             else:
                 report += "❌ Scheduler: Non in esecuzione\n"
                 self.issues.append("Scheduler non in esecuzione")
@@ -259,17 +403,19 @@ class AuroraDebugTool:
         report += "-" * 20 + "\n"
         
         try:
-            # Controllo tempo di risposta (simulato)
-            start_time = datetime.now()
-            # Simula un'operazione leggera
-            await asyncio.sleep(0.1)
-            response_time = (datetime.now() - start_time).total_seconds() * 1000
-            
-            report += f"• Tempo di risposta: {response_time:.1f} ms\n"
-            
-            if response_time > 100:
-                self.warnings.append(f"Tempo di risposta lento: {response_time:.1f} ms")
-                report += f"  ⚠️  Tempo di risposta lento\n"
+            # Telemetria reale delle chiamate LLM, per punto di chiamata
+            telemetry = getattr(self.aurora, 'llm_telemetry', None)
+            summary = telemetry.summary() if telemetry else {}
+            if not summary:
+                report += "• Chiamate LLM: nessuna misura ancora registrata\n"
+            for call_site, stats in sorted(summary.items(), key=lambda item: item[1]['total_ms_p95'], reverse=True):
+                report += (f"• {call_site}: {stats['calls']} chiamate ({stats['cache_hits']} dalla cache), "
+                           f"TTFT p50/p95 {stats['ttft_ms_p50']:.0f}/{stats['ttft_ms_p95']:.0f} ms, "
+                           f"prefill p50 {stats['prefill_ms_p50']:.0f} ms ({stats['prompt_tokens_p50']:.0f} token), "
+                           f"decodifica {stats['decode_tok_s_p50']:.1f} tok/s\n")
+                if call_site.startswith("process_query") and stats['ttft_ms_p95'] > 5000:
+                    self.warnings.append(f"Tempo al primo token lento per {call_site}: p95 {stats['ttft_ms_p95']:.0f} ms")
+                    report += f"  ⚠️  Tempo al primo token lento\n"
             
             # Controllo CPU (se disponibile)
             try:
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark dell'indice vettoriale della memory box (memory_index.MemoryVectorIndex).
+
+Confronta, per memory box sempre più grandi, il punteggio rilevanza × confidenza × recenza
+calcolato ricordo per ricordo in Python (dizionari, fromisoformat, un prodotto scalare alla volta)
+con il passaggio vettoriale unico dell'indice e la selezione dei top-k con argpartition.
+Gli embedding sono sintetici: serve solo numpy.
+
+Uso:
+    python benchmark_memory_index.py --sizes 50 1000 10000 100000 1000000 --dim 384 --loop-max 100000
+"""
+
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from memory_index import MemoryVectorIndex
+from llm_telemetry import percentile
+
+SENTIMENTS = ("positivo", "negativo", "neutro", "confuso")
+
+
+def synthetic_memories(count, rng):
+    now = datetime.now()
+    memories = []
+    for i in range(count):
+        created = now - timedelta(days=rng.uniform(0, 365))
+        memories.append({
+            "content": f"ricordo sintetico {i}",
+            "timestamp": created.isoformat(),
+            "last_consulted": (created + timedelta(days=rng.uniform(0, 30))).isoformat(),
+            "sentiment": rng.choice(SENTIMENTS),
+            "vividezza": rng.random(),
+            "corruption_level": rng.random() * 0.5,
+        })
+    return memories
+
+
+def loop_search(memories, embeddings, query, k, half_life_days):
+    """Il punteggio ricordo per ricordo, come lo farebbe un ciclo Python sui dizionari."""
+    now = datetime.now()
+    scored = []
+    for memory, embedding in zip(memories, embeddings):
+        relevance = float(np.dot(embedding, query))
+        confidence = 0.5
+        if memory.get('vividezza', 0) > 0.7:
+            confidence += 0.2
+        days_ago = (now - datetime.fromisoformat(memory['last_consulted'])).days
+        if days_ago < 7:
+            confidence += 0.1
+        elif days_ago > 30:
+            confidence -= 0.2
+        if memory.get('corruption_level', 0) > 0.3:
+            confidence -= 0.3
+        if memory.get('sentiment') == 'confuso':
+            confidence -= 0.1
+        confidence = max(0.0, min(1.0, confidence))
+        age_days = (now - datetime.fromisoformat(memory['timestamp'])).total_seconds() / 86400
+        scored.append((relevance * confidence * 0.5 ** (age_days / half_life_days), memory))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return scored[:k]
+
+
+def time_ms(func, repeats):
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def run(sizes, dim, loop_max, repeats, k):
+    rng = random.Random(42)
+    np_rng = np.random.default_rng(42)
+    config = {"memory_recency_half_life_days": 30}
+    report = []
+    for size in sizes:
+        memories = synthetic_memories(size, rng)
+        embeddings = np_rng.standard_normal((size, dim), dtype=np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        query = embeddings[0] + 0.1 * np_rng.standard_normal(dim, dtype=np.float32)
+        query /= np.linalg.norm(query)
+
+        index = MemoryVectorIndex(config)
+        start = time.perf_counter()
+        index.add_many([f"memory_{i}" for i in range(size)], embeddings, memories)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        vectorised = time_ms(lambda: index.search(query, k), repeats)
+        entry = {
+            "memories": size,
+            "build_ms": build_ms,
+            "matrix_mb": index.get_stats()["matrix_mb"],
+            "vectorised_p50_ms": percentile(vectorised, 0.5),
+            "vectorised_p95_ms": percentile(vectorised, 0.95),
+        }
+        if size <= loop_max:
+            loop = time_ms(lambda: loop_search(memories, embeddings, query, k, config["memory_recency_half_life_days"]), max(1, repeats // 5))
+            entry["loop_p50_ms"] = percentile(loop, 0.5)
+            entry["speedup"] = entry["loop_p50_ms"] / entry["vectorised_p50_ms"] if entry["vectorised_p50_ms"] else 0.0
+        report.append(entry)
+
+        line = (f"{size:>9} ricordi: vettoriale p50 {entry['vectorised_p50_ms']:.3f} ms, p95 {entry['vectorised_p95_ms']:.3f} ms "
+                f"(indice {entry['matrix_mb']:.1f} MB, costruito in {build_ms:.0f} ms)")
+        if "loop_p50_ms" in entry:
+            line += f" | ciclo Python p50 {entry['loop_p50_ms']:.2f} ms, {entry['speedup']:.0f}x"
+        print(line)
+        del index, memories, embeddings
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dell'indice vettoriale della memory box")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 1000, 10000, 100000, 1000000], help="dimensioni della memory box")
+    parser.add_argument("--dim", type=int, default=384, help="dimensione degli embedding (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--loop-max", type=int, default=100000, help="oltre questa dimensione il ciclo Python non viene misurato")
+    parser.add_argument("--repeats", type=int, default=20, help="ricerche misurate per dimensione")
+    parser.add_argument("--k", type=int, default=5, help="ricordi restituiti per ricerca")
+    parser.add_argument("--output", help="file JSON in cui salvare i risultati")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.dim, args.loop_max, args.repeats, args.k)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"generated_at": datetime.now().isoformat(), "dim": args.dim, "results": report}, f, indent=4)
+        print(f"Risultati salvati in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end della pipeline di Aurora con il backend LLM simulato (llm_backends.MockLlama).
+
+Esegue process_query su una conversazione sintetica, il ciclo di sogno e i job dello scheduler,
+e riporta p50/p95 per fase insieme alla telemetria delle chiamate LLM per punto di chiamata.
+Non servono i file GGUF: velocità di prefill e decodifica del modello simulato sono configurabili.
+
+Uso:
+    python benchmark_pipeline.py --turns 20 --prefill 150 --decode 15 --output benchmark.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import inspect
+import argparse
+import tempfile
+from datetime import datetime
+
+from llm_telemetry import percentile
+from llm_backends import MOCK_TAGS
+
+# Conversazione sintetica: saluti banali, domande per il pensatore e comandi su richiesta
+SYNTHETIC_TRANSCRIPT = [
+    "Ciao!",
+    "Come ti chiami?",
+    "Raccontami cosa hai imparato ultimamente sul tuo hobby e perché ti appassiona così tanto.",
+    f"Leggi il file di note che ti ho lasciato e dimmi cosa ne pensi {MOCK_TAGS['tool_call']}",
+    f"Spiegami in modo accurato come funziona la fotosintesi nelle piante {MOCK_TAGS['reflect']}",
+    f"Ripensaci bene: la tua spiegazione di prima era davvero completa? {MOCK_TAGS['reflect']} {MOCK_TAGS['reject']}",
+    "Che cosa ricordi della nostra ultima conversazione e di come mi sentivo?",
+    "Grazie, perfetto!",
+]
+
+# Job dello scheduler che non usano la rete: eseguiti una volta ciascuno e cronometrati
+DEFAULT_JOBS = (
+    "aurora_urges_update", "monologue_job", "ritual_check_job", "humor_development_job",
+    "stress_relief_job", "loneliness_check_job", "kg_manage_job",
+)
+
+
+def summarize(durations_ms):
+    return {
+        "count": len(durations_ms),
+        "p50_ms": percentile(durations_ms, 0.5),
+        "p95_ms": percentile(durations_ms, 0.95),
+        "max_ms": max(durations_ms) if durations_ms else 0.0,
+    }
+
+
+async def _run_job(func):
+    result = func()
+    if inspect.isawaitable(result):
+        await result
+
+
+async def run_benchmark(turns, transcript, mock_settings, jobs=DEFAULT_JOBS, dreams=1):
+    """Esegue il benchmark nella cartella corrente (i percorsi di CONFIG sono relativi) e restituisce il report."""
+    import main as aurora  # Importato qui: la cartella di lavoro deve essere già quella del benchmark
+
+    aurora.CONFIG["llm_model_backend"] = "mock"
+    aurora.CONFIG["llm_mock_settings"] = mock_settings
+    for path_key in ("ai_workspace_path", "backup_path", "chroma_db_path"):
+        os.makedirs(aurora.CONFIG[path_key], exist_ok=True)
+    ai = aurora.MiniAI()
+    ai.scheduler.pause()  # I job li esegue il benchmark, uno alla volta
+    await ai.initialize()
+
+    stages = {}
+
+    def timed(stage, start):
+        stages.setdefault(stage, []).append((time.perf_counter() - start) * 1000)
+
+    try:
+        for turn in range(turns):
+            query = transcript[turn % len(transcript)]
+            start = time.perf_counter()
+            await ai.process_query(query)
+            timed("process_query", start)
+            route = ai.chat_history[-1].get("route") if ai.chat_history else None
+            if route:
+                stages.setdefault(f"process_query[{route}]", []).append(stages["process_query"][-1])
+
+        # L'apprendimento è scritto dopo i turni: lo svuotamento della coda è cronometrato a parte
+        start = time.perf_counter()
+        await ai._drain_ingestion_queue(wait=True)
+        timed("ingestion_drain", start)
+
+        for _ in range(dreams):
+            start = time.perf_counter()
+            await ai._dream_cycle()
+            timed("dream_cycle", start)
+
+        for job_id in jobs:
+            job = ai.scheduler.get_job(job_id)
+            if job is None:
+                print(f"Job {job_id} non trovato, saltato.")
+                continue
+            start = time.perf_counter()
+            try:
+                await _run_job(job.func)
+            except Exception as e:
+                print(f"Errore nel job {job_id}: {e}")
+            timed(f"job:{job_id}", start)
+    finally:
+        ai.scheduler.shutdown(wait=False)
+        if ai.llm_workers:
+            ai.llm_workers.shutdown()
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "turns": turns,
+        "mock_settings": mock_settings,
+        "stages": {stage: summarize(durations) for stage, durations in stages.items()},
+        "llm_calls": ai.llm_telemetry.summary(),
+        "prefix_cache": ai.prefix_cache.get_stats(),
+    }
+
+
+def print_report(report):
+    print("\n=== Benchmark pipeline Aurora (backend simulato) ===")
+    print(f"{'fase':<40} {'n':>4} {'p50 ms':>10} {'p95 ms':>10}")
+    for stage, stats in report["stages"].items():
+        print(f"{stage:<40} {stats['count']:>4} {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f}")
+    print(f"\n{'chiamata LLM':<40} {'n':>4} {'TTFT p50':>10} {'TTFT p95':>10} {'tot p95':>10}")
+    for call_site, stats in report["llm_calls"].items():
+        print(f"{call_site:<40} {stats['calls']:>4} {stats['ttft_ms_p50']:>10.1f} {stats['ttft_ms_p95']:>10.1f} {stats['total_ms_p95']:>10.1f}")
+    prefix = report["prefix_cache"]
+    print(f"\nPrefisso del prompt: hit rate {prefix['hit_rate']:.0%}, {prefix['restores']} ripristini, "
+          f"{prefix['prefill_tokens_saved']} token di prefill risparmiati")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark end-to-end di Aurora con il modello LLM simulato")
+    parser.add_argument("--turns", type=int, default=len(SYNTHETIC_TRANSCRIPT), help="turni di conversazione da eseguire")
+    parser.add_argument("--transcript", help="file con una richiesta per riga (default: conversazione sintetica)")
+    parser.add_argument("--prefill", type=float, default=150, help="token/s di prefill simulati (0 = istantaneo)")
+    parser.add_argument("--decode", type=float, default=15, help="token/s di decodifica simulati (0 = istantaneo)")
+    parser.add_argument("--dreams", type=int, default=1, help="cicli di sogno da eseguire")
+    parser.add_argument("--jobs", nargs="*", default=list(DEFAULT_JOBS), help="id dei job dello scheduler da eseguire")
+    parser.add_argument("--workdir", help="cartella di lavoro (default: temporanea, i dati reali non vengono toccati)")
+    parser.add_argument("--output", help="file JSON in cui salvare il report")
+    args = parser.parse_args()
+
+    transcript = SYNTHETIC_TRANSCRIPT
+    if args.transcript:
+        with open(args.transcript, 'r', encoding='utf-8') as f:
+            transcript = [line.strip() for line in f if line.strip()]
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    workdir = args.workdir or tempfile.mkdtemp(prefix="aurora_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    print(f"Cartella di lavoro del benchmark: {workdir}")
+
+    mock_settings = {"prefill_tokens_per_second": args.prefill, "decode_tokens_per_second": args.decode}
+    report = asyncio.run(run_benchmark(args.turns, transcript, mock_settings, args.jobs, args.dreams))
+    print_report(report)
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReport salvato in {output_path}")
+
+
+if __name__ == "__main__":
+    main()
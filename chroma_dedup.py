@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+ID dei documenti indirizzati per contenuto e deduplicazione delle collezioni ChromaDB.
+
+Lo stesso testo ha sempre lo stesso ID (sha256 del testo normalizzato), in ogni processo:
+reinserirlo aggiorna il documento esistente invece di duplicarlo. La compattazione offline
+riporta una collezione esistente a ID indirizzati per contenuto e ne rimuove duplicati esatti
+e quasi duplicati (similarità coseno degli embedding oltre la soglia).
+
+Uso offline (Aurora spenta):
+    python chroma_dedup.py --chroma-path ./chroma_db --collection knowledge_base --similarity 0.97
+"""
+
+import re
+import hashlib
+import argparse
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def content_id(text: str, prefix: str = "doc") -> str:
+    """ID deterministico del contenuto: spazi e maiuscole non contano."""
+    normalized = _WHITESPACE.sub(" ", text).strip().lower()
+    return f"{prefix}_{hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:32]}"
+
+
+def _normalized_matrix(embeddings) -> np.ndarray:
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def near_duplicates_in_batch(embeddings: List[List[float]], similarity: float) -> List[Optional[int]]:
+    """Per ogni vettore, l'indice di un vettore precedente dello stesso lotto quasi identico (o None)."""
+    if len(embeddings) == 0:
+        return []
+    normalized = _normalized_matrix(embeddings)
+    similarities = normalized @ normalized.T
+    duplicate_of = []
+    for i in range(len(embeddings)):
+        match = None
+        for j in range(i):
+            if duplicate_of[j] is None and similarities[i, j] >= similarity:
+                match = j
+                break
+        duplicate_of.append(match)
+    return duplicate_of
+
+
+def nearest_existing(collection, embeddings: List[List[float]]) -> List[Tuple[Optional[str], float]]:
+    """Per ogni vettore, il documento più simile già nella collezione: (id, similarità coseno)."""
+    if not embeddings or collection.count() == 0:
+        return [(None, 0.0)] * len(embeddings)
+    results = collection.query(query_embeddings=embeddings, n_results=1, include=['embeddings'])
+    nearest = []
+    for vector, ids, neighbours in zip(embeddings, results['ids'], results['embeddings']):
+        if len(ids) == 0:
+            nearest.append((None, 0.0))
+            continue
+        pair = _normalized_matrix([vector, neighbours[0]])
+        nearest.append((ids[0], float(pair[0] @ pair[1])))
+    return nearest
+
+
+def _merge_metadata(kept: Dict[str, Any], duplicate: Dict[str, Any]) -> Dict[str, Any]:
+    """Un duplicato rimosso non deve far perdere l'estrazione KG già fatta né la vividezza più alta."""
+    merged = dict(kept)
+    if duplicate.get("kg_processed"):
+        merged["kg_processed"] = True
+    if "vividezza" in duplicate:
+        merged["vividezza"] = max(merged.get("vividezza", 0.0), duplicate["vividezza"])
+    return merged
+
+
+def deduplicate_collection(collection, similarity: float = 0.97, batch_size: int = 256, prefix: str = "doc") -> Dict[str, int]:
+    """
+    Compattazione offline di una collezione: porta ogni documento al suo ID indirizzato per contenuto,
+    rimuove i duplicati esatti e quelli con embedding quasi identico a un documento già tenuto
+    (il primo in ordine di collezione), unendone i metadati. Restituisce i conteggi.
+
+    Le similarità di ogni pagina con i documenti già tenuti si calcolano con un solo prodotto
+    matriciale NumPy (pagina × tenuti), non documento per documento.
+    """
+    total = collection.count()
+    kept = []  # {"id", "new_id", "document", "metadata", "embedding", "changed"}, in ordine di collezione
+    kept_by_id = {}
+    kept_matrix = None  # vettori normalizzati dei documenti tenuti, riga i = kept[i]
+    to_delete = []
+    exact, near, renamed = 0, 0, 0
+
+    for offset in range(0, total, batch_size):
+        page = collection.get(offset=offset, limit=batch_size, include=['documents', 'metadatas', 'embeddings'])
+        if len(page['ids']) == 0:
+            break
+        metadatas = page['metadatas'] if page['metadatas'] is not None else [None] * len(page['ids'])
+        vectors = _normalized_matrix(page['embeddings'])
+        previous = vectors @ kept_matrix.T if kept_matrix is not None else np.zeros((len(vectors), 0), dtype=np.float32)
+        within_page = vectors @ vectors.T
+        page_kept = []  # (riga nella pagina, indice in kept) dei documenti tenuti da questa pagina
+        for row, (doc_id, document, metadata, embedding) in enumerate(zip(page['ids'], page['documents'], metadatas, page['embeddings'])):
+            metadata = metadata or {}
+            new_id = content_id(document or "", prefix)
+            match = kept_by_id.get(new_id)
+            if match is None:
+                hits = np.flatnonzero(previous[row] >= similarity)
+                if hits.size:
+                    match = int(hits[0])
+                else:
+                    match = next((index for page_row, index in page_kept if within_page[row, page_row] >= similarity), None)
+                if match is not None:
+                    near += 1
+            else:
+                exact += 1
+            if match is not None:
+                kept[match]["metadata"] = _merge_metadata(kept[match]["metadata"], metadata)
+                kept[match]["changed"] = True
+                to_delete.append(doc_id)
+                continue
+            kept_by_id[new_id] = len(kept)
+            page_kept.append((row, len(kept)))
+            kept.append({"id": doc_id, "new_id": new_id, "document": document, "metadata": metadata,
+                         "embedding": [float(x) for x in embedding], "changed": doc_id != new_id})
+        if page_kept:
+            rows = vectors[[page_row for page_row, _ in page_kept]]
+            kept_matrix = rows if kept_matrix is None else np.vstack([kept_matrix, rows])
+
+    # Solo i documenti con un ID nuovo o metadati uniti vengono riscritti
+    rewrites = [entry for entry in kept if entry["changed"]]
+    for start in range(0, len(rewrites), batch_size):
+        chunk = rewrites[start:start + batch_size]
+        collection.upsert(
+            ids=[entry["new_id"] for entry in chunk],
+            documents=[entry["document"] for entry in chunk],
+            metadatas=[entry["metadata"] for entry in chunk],
+            embeddings=[entry["embedding"] for entry in chunk],
+        )
+        stale = [entry["id"] for entry in chunk if entry["id"] != entry["new_id"]]
+        renamed += len(stale)
+        to_delete.extend(stale)
+
+    # Un duplicato già sotto l'ID indirizzato per contenuto di un documento tenuto è stato appena
+    # sovrascritto dall'upsert: cancellarlo toglierebbe l'unica copia rimasta
+    kept_ids = set(kept_by_id)
+    to_delete = [doc_id for doc_id in to_delete if doc_id not in kept_ids]
+    for start in range(0, len(to_delete), batch_size):
+        collection.delete(ids=to_delete[start:start + batch_size])
+
+    return {"before": total, "after": collection.count(), "exact_duplicates": exact, "near_duplicates": near, "renamed": renamed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicazione e compattazione offline di una collezione ChromaDB")
+    parser.add_argument("--chroma-path", default="./chroma_db", help="cartella del database ChromaDB")
+    parser.add_argument("--collection", default="knowledge_base", help="nome della collezione")
+    parser.add_argument("--similarity", type=float, default=0.97, help="similarità coseno oltre la quale due documenti sono duplicati")
+    parser.add_argument("--prefix", default="doc", help="prefisso degli ID (es. 'memory' per aurora_memories)")
+    args = parser.parse_args()
+
+    from chromadb import PersistentClient
+    collection = PersistentClient(path=args.chroma_path).get_collection(name=args.collection)
+    result = deduplicate_collection(collection, args.similarity, prefix=args.prefix)
+    print(f"Collezione '{args.collection}': {result['before']} -> {result['after']} documenti "
+          f"({result['exact_duplicates']} duplicati esatti, {result['near_duplicates']} quasi duplicati, {result['renamed']} ID aggiornati).")
+
+
+if __name__ == "__main__":
+    main()
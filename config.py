@@ -16,6 +16,8 @@ CONFIG = {
     "self_concept_path": "./self_concept.txt",
     "internal_monologue_path": "./internal_monologue.txt",
     "chroma_db_path": "./chroma_db",
+    "memory_warm_path": "./ai_workspace/memory_warm.json",
+    "memory_cold_dir": "./ai_workspace/memory_cold",
     
     # Modelli LLM
     "llm_model_path_router": "./models/Microsoft/phi-3-mini-4k-instruct-q4/Phi-3-mini-4k-instruct-q4.gguf",
@@ -33,6 +35,8 @@ CONFIG = {
     # Parametri di apprendimento
     "learning_rate": 0.1,
     "memory_decay_rate": 0.01,
+    "memory_hot_size": 50,
+    "memory_warm_max": 5000,
     "mood_decay_rate": 0.02,
     "energy_decay_rate": 0.01,
     
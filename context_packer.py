@@ -0,0 +1,121 @@
+from typing import Dict, Any, List, Tuple, Callable
+
+# Budget per sezione del prompt del pensatore: priorità (0 = più importante), minimo e massimo di token,
+# e quale estremità conservare quando si tronca ("head" = inizio, "tail" = fine, es. i messaggi più recenti)
+DEFAULT_SECTION_BUDGETS = {
+    "self_concept":       {"priority": 0, "min_tokens": 0,   "max_tokens": 300,  "keep": "head"},
+    "directive":          {"priority": 0, "min_tokens": 80,  "max_tokens": 150,  "keep": "head"},
+    "state":              {"priority": 0, "min_tokens": 80,  "max_tokens": 150,  "keep": "head"},
+    "altered_state":      {"priority": 1, "min_tokens": 100, "max_tokens": 300,  "keep": "head"},
+    "chat_history":       {"priority": 1, "min_tokens": 200, "max_tokens": 1200, "keep": "tail"},
+    "memories":           {"priority": 2, "min_tokens": 0,   "max_tokens": 400,  "keep": "head"},
+    "rag":                {"priority": 2, "min_tokens": 0,   "max_tokens": 600,  "keep": "head"},
+    "kg":                 {"priority": 3, "min_tokens": 0,   "max_tokens": 300,  "keep": "head"},
+    "creator":            {"priority": 3, "min_tokens": 0,   "max_tokens": 200,  "keep": "head"},
+    "user_style":         {"priority": 4, "min_tokens": 0,   "max_tokens": 150,  "keep": "head"},
+    "humor":              {"priority": 4, "min_tokens": 0,   "max_tokens": 200,  "keep": "head"},
+    "existential":        {"priority": 5, "min_tokens": 0,   "max_tokens": 150,  "keep": "head"},
+    "existential_drama":  {"priority": 5, "min_tokens": 0,   "max_tokens": 250,  "keep": "head"},
+    "catharsis":          {"priority": 5, "min_tokens": 0,   "max_tokens": 250,  "keep": "head"},
+    "world_opinions":     {"priority": 6, "min_tokens": 0,   "max_tokens": 200,  "keep": "head"},
+    "ai_friendships":     {"priority": 6, "min_tokens": 0,   "max_tokens": 150,  "keep": "head"},
+}
+
+TRUNCATION_MARKER = "... (troncato)"
+
+
+class ContextPacker:
+    """
+    Impacchetta le sezioni di contesto del prompt del pensatore in un budget di token.
+
+    Ogni sezione è prima limitata al suo massimo; se il totale supera il budget, le sezioni
+    ricevono il loro minimo in ordine di priorità e il budget restante viene distribuito
+    ancora per priorità. Le sezioni meno importanti vengono troncate (o tolte) per prime.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.section_budgets = {name: dict(spec) for name, spec in DEFAULT_SECTION_BUDGETS.items()}
+        for name, overrides in config.get("context_section_budgets", {}).items():
+            self.section_budgets.setdefault(name, {"priority": 9, "min_tokens": 0, "max_tokens": 200, "keep": "head"})
+            self.section_budgets[name].update(overrides)
+        self.last_usage = {}
+
+    @staticmethod
+    def counter_for(llm_instance) -> Callable[[str], int]:
+        """Conta i token con il tokenizer del modello; senza modello stima ~4 caratteri per token."""
+        if llm_instance is None:
+            return lambda text: len(text) // 4 if text else 0
+
+        def count(text: str) -> int:
+            if not text:
+                return 0
+            try:
+                return len(llm_instance.tokenize(text.encode('utf-8'), add_bos=False))
+            except Exception:
+                return len(text) // 4
+        return count
+
+    @staticmethod
+    def truncate(text: str, max_tokens: int, count_tokens: Callable[[str], int], keep: str = "head") -> str:
+        """Accorcia `text` finché non sta in `max_tokens`, conservando l'inizio o la fine."""
+        if not text or count_tokens(text) <= max_tokens:
+            return text
+        if max_tokens <= 0:
+            return ""
+        length = len(text)
+        for _ in range(8):
+            # Stima proporzionale della lunghezza, poi correzione con il conteggio reale
+            length = int(length * max_tokens / max(count_tokens(text[:length] if keep == "head" else text[-length:]), 1) * 0.95)
+            if length <= 0:
+                return ""
+            candidate = text[:length] + TRUNCATION_MARKER + "\n" if keep == "head" else TRUNCATION_MARKER + "\n" + text[-length:]
+            if count_tokens(candidate) <= max_tokens:
+                return candidate
+        return ""
+
+    def pack(self, sections: List[Tuple[str, str]], count_tokens: Callable[[str], int], budget: int) -> Dict[str, str]:
+        """Restituisce {nome sezione: testo impacchettato} e registra i token usati da ogni sezione in `last_usage`."""
+        specs = {name: self.section_budgets.get(name, {"priority": 9, "min_tokens": 0, "max_tokens": 200, "keep": "head"})
+                 for name, _ in sections}
+        texts = {}
+        tokens = {}
+        original = {}
+        for name, text in sections:
+            original[name] = count_tokens(text)
+            texts[name] = self.truncate(text, specs[name]["max_tokens"], count_tokens, specs[name]["keep"])
+            tokens[name] = count_tokens(texts[name]) if texts[name] is not text else original[name]
+
+        if sum(tokens.values()) > budget:
+            by_priority = sorted((name for name, _ in sections), key=lambda n: specs[n]["priority"])
+            allocation = {name: 0 for name in by_priority}
+            remaining = max(budget, 0)
+            # Prima i minimi, poi il resto, sempre in ordine di priorità
+            for name in by_priority:
+                share = min(tokens[name], specs[name]["min_tokens"], remaining)
+                allocation[name] = share
+                remaining -= share
+            for name in by_priority:
+                extra = min(tokens[name] - allocation[name], remaining)
+                allocation[name] += extra
+                remaining -= extra
+            for name in by_priority:
+                if allocation[name] < tokens[name]:
+                    texts[name] = self.truncate(texts[name], allocation[name], count_tokens, specs[name]["keep"])
+                    tokens[name] = count_tokens(texts[name])
+
+        self.last_usage = {
+            "budget": budget,
+            "total": sum(tokens.values()),
+            "sections": {name: {"tokens": tokens[name], "original": original[name]} for name, _ in sections},
+        }
+        return texts
+
+    def format_usage(self) -> str:
+        """Riga di log con i token usati per sezione (* = sezione troncata)."""
+        if not self.last_usage:
+            return "nessun prompt impacchettato"
+        parts = [
+            f"{name} {usage['tokens']}{'*' if usage['tokens'] < usage['original'] else ''}"
+            for name, usage in self.last_usage["sections"].items() if usage["original"]
+        ]
+        return f"{self.last_usage['total']}/{self.last_usage['budget']} token ({', '.join(parts)})"
@@ -0,0 +1,144 @@
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable
+
+
+def _approach(value: float, target: float, step: float) -> float:
+    """`value` dopo essersi spostato di `step` verso `target`, senza superarlo."""
+    if value > target:
+        return max(target, value - step)
+    return min(target, value + step)
+
+
+class DecayingDict(dict):
+    """
+    Dizionario di valori che tendono linearmente a un valore di riposo in tempo continuo
+    (es. il mood: serenità verso 0.5, le altre emozioni verso 0).
+
+    Per ogni chiave sono salvati il valore e l'istante dell'ultima scrittura; la lettura calcola
+    il valore attuale in forma chiusa, quindi il decadimento costa O(1) per accesso e nulla
+    quando nessuno legge. Scrivere una chiave la riancora all'istante della scrittura.
+    Le letture passano da __getitem__, get, items, values e copy; dict(x) vede i valori
+    dell'ultima scrittura.
+    """
+
+    def __init__(self, values: Dict[str, Any], rate_per_second: float, targets: Optional[Dict[str, float]] = None,
+                 default_target: float = 0.0, clock: Callable[[], float] = time.time):
+        super().__init__(values)
+        self.rate = rate_per_second
+        self.targets = targets or {}
+        self.default_target = default_target
+        self.clock = clock
+        now = clock()
+        self.anchors = {key: now for key in values}
+
+    def _current(self, key: str, now: float) -> Any:
+        value = dict.__getitem__(self, key)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return value
+        elapsed = max(0.0, now - self.anchors.get(key, now))
+        return _approach(value, self.targets.get(key, self.default_target), self.rate * elapsed)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._current(key, self.clock())
+
+    def __setitem__(self, key: str, value: Any):
+        dict.__setitem__(self, key, value)
+        self.anchors[key] = self.clock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def items(self):
+        now = self.clock()
+        return [(key, self._current(key, now)) for key in self]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return repr(self.copy())
+
+
+class ContinuousState(dict):
+    """
+    Stato di Aurora con l'energia in tempo continuo.
+
+    L'energia è salvata come (valore, istante di ancoraggio) e calcolata alla lettura: cala di
+    `energy_decay_rate` al minuto finché l'ultima attività è più recente di `energy_rest_after_minutes`,
+    poi si ricarica di `energy_recharge_rate` al minuto, sempre tra 0 e 1. `mark_activity` va
+    chiamato a ogni interazione, così il tratto precedente viene chiuso con l'attività di prima.
+    Le altre chiavi sono quelle di un dizionario normale.
+    """
+
+    def __init__(self, values: Dict[str, Any], config: Dict[str, Any], clock: Callable[[], float] = time.time):
+        super().__init__(values)
+        self.decay_per_second = config.get("energy_decay_rate", 0.01) / 60
+        self.recharge_per_second = config.get("energy_recharge_rate", 0.05) / 60
+        self.rest_after = config.get("energy_rest_after_minutes", 5) * 60
+        self.clock = clock
+        self.energy_anchor = clock()
+        self.activity_at = self.energy_anchor
+
+    def _energy(self, now: float) -> float:
+        energy = dict.__getitem__(self, 'energia')
+        active_until = self.activity_at + self.rest_after
+        active = max(0.0, min(now, active_until) - self.energy_anchor)
+        resting = max(0.0, now - max(self.energy_anchor, active_until))
+        energy = max(0.0, energy - self.decay_per_second * active)
+        return min(1.0, energy + self.recharge_per_second * resting)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'energia':
+            return self._energy(self.clock())
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        dict.__setitem__(self, key, value)
+        if key == 'energia':
+            self.energy_anchor = self.clock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def copy(self) -> Dict[str, Any]:
+        return {key: value.copy() if isinstance(value, DecayingDict) else value for key, value in self.items()}
+
+    def mark_activity(self, when: Optional[datetime] = None):
+        """Chiude il tratto di energia in corso con l'attività precedente e registra la nuova."""
+        now = when.timestamp() if when is not None else self.clock()
+        dict.__setitem__(self, 'energia', self._energy(now))
+        self.energy_anchor = now
+        self.activity_at = now
+
+
+def memory_vividness(memory: Dict[str, Any], decay_per_hour: float, now: Optional[datetime] = None) -> float:
+    """
+    Vividezza attuale di un ricordo: quella salvata vale all'istante di `last_consulted` e da lì
+    cala di `decay_per_hour` all'ora, mai sotto zero.
+    """
+    vividness = memory.get('vividezza', 0.0)
+    consulted = memory.get('last_consulted')
+    if not consulted or not decay_per_hour:
+        return vividness
+    try:
+        hours = ((now or datetime.now()) - datetime.fromisoformat(consulted)).total_seconds() / 3600
+    except (TypeError, ValueError):
+        return vividness
+    return max(0.0, vividness - decay_per_hour * max(0.0, hours))
+
+
+def recall_memory(memory: Dict[str, Any], boost: float, decay_per_hour: float, now: Optional[datetime] = None):
+    """Consultazione di un ricordo: la vividezza attuale riceve `boost` e riparte a decadere da ora."""
+    now = now or datetime.now()
+    memory['vividezza'] = min(1.0, memory_vividness(memory, decay_per_hour, now) + boost)
+    memory['last_consulted'] = now.isoformat()
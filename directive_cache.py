@@ -0,0 +1,132 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List
+
+from fast_router import _dot, _normalize
+
+# Marcatore della riga di direttiva generata come preambolo nascosto della risposta (modalità fusa)
+DIRECTIVE_MARKER = "DIRETTIVA:"
+
+DIRECTIVE_PREAMBLE_INSTRUCTION = (
+    "Prima di rispondere, formula per te stessa una 'Direttiva Strategica': una sola frase su come il tuo umore, "
+    "la tua energia e i tuoi obiettivi dovrebbero influenzare il tono e la sostanza della risposta. "
+    f"Scrivila sulla prima riga, che deve iniziare con '{DIRECTIVE_MARKER}', poi vai a capo e prosegui con la risposta "
+    "(o con TOOL_CALL/REFLECT) seguendo la direttiva. La riga della direttiva non verrà mostrata all'utente.\n"
+)
+
+# Componenti dello stato usate per il bucket, quantizzate in decili
+STATE_BUCKET_FIELDS = (("mood", "serenità"), ("mood", "entusiasmo"), ("mood", "malinconia"), ("energia",), ("stress",))
+
+
+class DirectiveCache:
+    """
+    Cache delle direttive strategiche, per bucket di stato e cluster della richiesta.
+
+    La chiave unisce i decili di umore, energia e stress a un cluster dell'embedding della
+    richiesta (clustering incrementale: una richiesta va nel centroide più simile oltre la soglia,
+    altrimenti apre un nuovo cluster). Richieste simili nello stesso stato riusano la direttiva
+    senza un passaggio aggiuntivo del pensatore.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.path = config.get("directive_cache_path", "./ai_workspace/directive_cache.json")
+        self.max_entries = config.get("directive_cache_max_entries", 500)
+        self.max_age = timedelta(hours=config.get("directive_cache_max_age_hours", 24))
+        self.cluster_threshold = config.get("directive_cache_cluster_threshold", 0.75)
+        self.max_clusters = config.get("directive_cache_max_clusters", 64)
+        self.centroids = []  # [{"vector": [...], "count": n}]
+        self.entries = OrderedDict()  # chiave -> {"directive", "created_at"}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.centroids = data.get("centroids", [])
+            self.entries = OrderedDict(data.get("entries", []))
+        except Exception as e:
+            print(f"Errore nel caricamento della cache delle direttive: {e}. Cache vuota.")
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"centroids": self.centroids, "entries": list(self.entries.items())}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Errore nel salvataggio della cache delle direttive: {e}")
+
+    @staticmethod
+    def state_bucket(state: Dict[str, Any]) -> str:
+        deciles = []
+        for path in STATE_BUCKET_FIELDS:
+            value = state
+            for key in path:
+                value = value.get(key, 0.0) if isinstance(value, dict) else 0.0
+            deciles.append(str(min(9, max(0, int(float(value) * 10)))))
+        return "-".join(deciles)
+
+    def query_cluster(self, embedding: List[float]) -> int:
+        """Indice del cluster della richiesta; il centroide scelto si sposta verso la nuova richiesta."""
+        vector = _normalize(embedding)
+        with self.lock:
+            best, best_similarity = None, -1.0
+            for index, centroid in enumerate(self.centroids):
+                similarity = _dot(vector, _normalize(centroid["vector"]))
+                if similarity > best_similarity:
+                    best, best_similarity = index, similarity
+            if best is None or (best_similarity < self.cluster_threshold and len(self.centroids) < self.max_clusters):
+                self.centroids.append({"vector": vector, "count": 1})
+                return len(self.centroids) - 1
+            centroid = self.centroids[best]
+            centroid["count"] += 1
+            weight = 1.0 / centroid["count"]
+            centroid["vector"] = [c + (v - c) * weight for c, v in zip(centroid["vector"], vector)]
+            return best
+
+    def make_key(self, state: Dict[str, Any], query_embedding: Optional[List[float]]) -> Optional[str]:
+        """Senza embedding della richiesta non c'è chiave: la sola somiglianza di stato non basta."""
+        if query_embedding is None:
+            return None
+        return f"{self.state_bucket(state)}|c{self.query_cluster(query_embedding)}"
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or datetime.now() - datetime.fromisoformat(entry["created_at"]) > self.max_age:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry["directive"]
+
+    def put(self, key: Optional[str], directive: Optional[str]):
+        if key is None or not directive:
+            return
+        with self.lock:
+            self.entries[key] = {"directive": directive, "created_at": datetime.now().isoformat()}
+            self.entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self._save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self.entries),
+                "clusters": len(self.centroids),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            }
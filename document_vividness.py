@@ -0,0 +1,162 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+
+
+class DocumentVividness:
+    """
+    Tabella laterale della vividezza dei documenti ChromaDB, con chiave l'ID del documento.
+
+    Per ogni documento sono salvate la vividezza al momento dell'ultima consultazione e l'istante
+    della consultazione: il valore attuale si calcola in forma chiusa
+    (vividezza - `document_decay_rate` × ore trascorse, mai sotto zero), senza job che riscrivano i documenti.
+    Il valore in ChromaDB (metadato "vividezza") viene allineato in lotti grandi e periodici (`flush`),
+    e solo per i documenti il cui valore si è spostato di almeno `document_vividness_push_step`.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.path = config.get("document_vividness_path", "./ai_workspace/document_vividness.sqlite")
+        self.decay_rate = config.get("document_decay_rate", 0.0005)
+        self.recall_boost = config.get("document_recall_boost", 0.1)
+        self.push_step = config.get("document_vividness_push_step", 0.1)
+        self.lock = threading.Lock()
+        self.stats = {"consulted": 0, "pushed": 0, "flushes": 0}
+        self.fully_pushed = False  # True quando ogni documento ha il metadato "vividezza" in ChromaDB
+        self.connection = None
+        self._open()
+
+    def _open(self):
+        schema = ("CREATE TABLE IF NOT EXISTS document_vividness ("
+                  "id TEXT PRIMARY KEY, vividness REAL NOT NULL, consulted_at REAL NOT NULL, pushed REAL)")
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute(schema)
+            self.connection.commit()
+        except Exception as e:
+            print(f"Errore nell'apertura della tabella di vividezza dei documenti: {e}. Tabella solo in memoria.")
+            self.connection = sqlite3.connect(":memory:", check_same_thread=False)
+            self.connection.execute(schema)
+
+    def _current_sql(self) -> str:
+        return "MAX(0.0, vividness - ? * (? - consulted_at) / 3600.0)"
+
+    def size(self) -> int:
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM document_vividness").fetchone()[0]
+
+    def register(self, ids: List[str], vividness: float = 1.0, refresh: bool = False, pushed: Optional[float] = None):
+        """Aggiunge i documenti nuovi; con `refresh` riporta anche quelli esistenti a `vividness` (contenuto reimparato)."""
+        now = time.time()
+        verb = "INSERT OR REPLACE" if refresh else "INSERT OR IGNORE"
+        with self.lock:
+            cursor = self.connection.executemany(
+                f"{verb} INTO document_vividness (id, vividness, consulted_at, pushed) VALUES (?, ?, ?, ?)",
+                [(doc_id, vividness, now, pushed) for doc_id in ids],
+            )
+            self.connection.commit()
+            if pushed is None and cursor.rowcount > 0:
+                self.fully_pushed = False
+
+    def sync(self, ids: List[str]):
+        """Allinea la tabella all'elenco completo degli ID della collezione (dopo l'avvio o una compattazione)."""
+        self.register(ids)
+        with self.lock:
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS live_ids (id TEXT PRIMARY KEY)")
+            self.connection.execute("DELETE FROM live_ids")
+            self.connection.executemany("INSERT OR IGNORE INTO live_ids (id) VALUES (?)", [(doc_id,) for doc_id in ids])
+            self.connection.execute("DELETE FROM document_vividness WHERE id NOT IN (SELECT id FROM live_ids)")
+            self.connection.commit()
+
+    def remove(self, ids: List[str]):
+        with self.lock:
+            self.connection.executemany("DELETE FROM document_vividness WHERE id = ?", [(doc_id,) for doc_id in ids])
+            self.connection.commit()
+
+    def current(self, ids: List[str], now: Optional[float] = None) -> Dict[str, float]:
+        """Vividezza attuale dei documenti; gli ID sconosciuti (mai registrati) valgono 1.0."""
+        if not ids:
+            return {}
+        now = time.time() if now is None else now
+        values = {doc_id: 1.0 for doc_id in ids}
+        with self.lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = self.connection.execute(
+                    f"SELECT id, {self._current_sql()} FROM document_vividness WHERE id IN ({','.join('?' * len(chunk))})",
+                    [self.decay_rate, now] + chunk,
+                ).fetchall()
+                values.update(rows)
+        return values
+
+    def consult(self, ids: List[str], now: Optional[float] = None):
+        """Un documento usato nel contesto ritrova vividezza (+`document_recall_boost`) e riparte a decadere da ora."""
+        if not ids:
+            return
+        now = time.time() if now is None else now
+        values = self.current(ids, now)
+        with self.lock:
+            self.connection.executemany(
+                "UPDATE document_vividness SET vividness = ?, consulted_at = ? WHERE id = ?",
+                [(min(1.0, values[doc_id] + self.recall_boost), now, doc_id) for doc_id in ids],
+            )
+            self.connection.commit()
+            self.stats["consulted"] += len(ids)
+
+    def pending(self, limit: int, now: Optional[float] = None) -> List[tuple]:
+        """Documenti il cui valore in ChromaDB è da aggiornare: [(id, vividezza attuale arrotondata)]."""
+        now = time.time() if now is None else now
+        current = self._current_sql()
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT id, {current} FROM document_vividness "
+                f"WHERE pushed IS NULL OR ABS({current} - pushed) >= ? LIMIT ?",
+                [self.decay_rate, now, self.decay_rate, now, self.push_step - 1e-9, limit],
+            ).fetchall()
+        return [(doc_id, round(value, 3)) for doc_id, value in rows]
+
+    def mark_pushed(self, values: List[tuple]):
+        with self.lock:
+            self.connection.executemany("UPDATE document_vividness SET pushed = ? WHERE id = ?", [(value, doc_id) for doc_id, value in values])
+            self.connection.commit()
+            self.stats["pushed"] += len(values)
+
+    def flush(self, collection, batch_size: int = 1000, now: Optional[float] = None) -> int:
+        """Scrive in ChromaDB, con `collection.update` a lotti di soli metadati, le vividezze cambiate. Restituisce quante."""
+        now = time.time() if now is None else now
+        pushed = 0
+        while True:
+            batch = self.pending(batch_size, now)
+            if not batch:
+                break
+            collection.update(ids=[doc_id for doc_id, _ in batch], metadatas=[{"vividezza": value} for _, value in batch])
+            self.mark_pushed(batch)
+            pushed += len(batch)
+        with self.lock:
+            self.stats["flushes"] += 1
+            self.fully_pushed = True
+        return pushed
+
+    def where_filter(self, threshold: float) -> Optional[Dict[str, Any]]:
+        """
+        Filtro `where` di ChromaDB che scarta i documenti sbiaditi, con il margine di un passo di
+        aggiornamento (il valore in ChromaDB può essere indietro di un lotto). None finché qualche
+        documento non ha ancora il metadato, perché il filtro lo escluderebbe.
+        """
+        if not self.fully_pushed:
+            return None
+        return {"vividezza": {"$gte": round(threshold - self.push_step, 3)}}
+
+    def get_stats(self) -> Dict[str, Any]:
+        size = self.size()
+        with self.lock:
+            return {**self.stats, "documents": size}
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.commit()
+                self.connection.close()
+                self.connection = None
@@ -0,0 +1,153 @@
+import os
+import time
+import struct
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List
+
+
+def _pack_float16(vector) -> bytes:
+    values = [float(x) for x in vector]
+    return struct.pack(f"<{len(values)}e", *values)
+
+
+def _unpack_float16(blob: bytes, dim: int) -> List[float]:
+    return list(struct.unpack(f"<{dim}e", blob))
+
+
+class EmbeddingCache:
+    """
+    Cache su disco degli embedding, con chiave (nome del modello, sha256 del testo).
+
+    I vettori sono salvati in float16 in un database SQLite (metà spazio rispetto a float32,
+    aggiornamenti incrementali senza riscrivere il file); l'ordine LRU è tenuto in memoria
+    e le voci meno usate vengono scartate oltre `embedding_cache_max_entries`.
+    `encode_many` calcola con il modello solo i testi mai visti, in un'unica chiamata a encode.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.path = config.get("embedding_cache_path", "./ai_workspace/embedding_cache.sqlite")
+        self.max_entries = config.get("embedding_cache_max_entries", 50000)
+        self.model_name = config.get("embedding_model_name", "all-MiniLM-L6-v2")
+        self.lock = threading.Lock()
+        self.recency = OrderedDict()  # (modello, digest) -> None, dal meno al più recente
+        self.stats = {"hits": 0, "misses": 0, "encode_calls": 0, "evictions": 0}
+        self.connection = None
+        self._open()
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, digest TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+                "last_used REAL NOT NULL, PRIMARY KEY (model, digest))"
+            )
+            self.connection.commit()
+            for model, digest in self.connection.execute("SELECT model, digest FROM embeddings ORDER BY last_used"):
+                self.recency[(model, digest)] = None
+            if self.recency:
+                print(f"Cache embedding caricata ({len(self.recency)} vettori).")
+        except Exception as e:
+            print(f"Errore nell'apertura della cache degli embedding: {e}. Cache solo in memoria.")
+            self.connection = sqlite3.connect(":memory:", check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE embeddings (model TEXT NOT NULL, digest TEXT NOT NULL, dim INTEGER NOT NULL, "
+                "vector BLOB NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (model, digest))"
+            )
+
+    @staticmethod
+    def digest(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _lookup(self, digests: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        now = time.time()
+        for start in range(0, len(digests), 500):
+            chunk = digests[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f"SELECT digest, dim, vector FROM embeddings WHERE model = ? AND digest IN ({placeholders})",
+                [self.model_name] + chunk,
+            ).fetchall()
+            for digest, dim, blob in rows:
+                found[digest] = _unpack_float16(blob, dim)
+        if found:
+            self.connection.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND digest = ?",
+                [(now, self.model_name, digest) for digest in found],
+            )
+            for digest in found:
+                self.recency[(self.model_name, digest)] = None
+                self.recency.move_to_end((self.model_name, digest))
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]]):
+        now = time.time()
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, digest, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+            [(self.model_name, digest, len(vector), _pack_float16(vector), now) for digest, vector in vectors.items()],
+        )
+        for digest in vectors:
+            self.recency[(self.model_name, digest)] = None
+            self.recency.move_to_end((self.model_name, digest))
+        evicted = []
+        while len(self.recency) > self.max_entries:
+            evicted.append(self.recency.popitem(last=False)[0])
+        if evicted:
+            self.connection.executemany("DELETE FROM embeddings WHERE model = ? AND digest = ?", evicted)
+            self.stats["evictions"] += len(evicted)
+
+    def encode_many(self, model, texts: List[str]) -> List[List[float]]:
+        """
+        Embedding di `texts` nello stesso ordine. I testi già in cache (anche ripetuti nella
+        stessa lista) non arrivano mai al modello; i vettori restituiti sono quelli salvati in
+        float16, così un testo ha lo stesso embedding alla prima chiamata e alle successive.
+        """
+        if not texts:
+            return []
+        digests = [self.digest(text) for text in texts]
+        with self.lock:
+            cached = self._lookup(list(dict.fromkeys(digests)))
+            missing = OrderedDict()
+            for text, digest in zip(texts, digests):
+                if digest not in cached:
+                    missing.setdefault(digest, text)
+            self.stats["hits"] += len(texts) - sum(1 for digest in digests if digest in missing)
+            self.stats["misses"] += len(missing)
+
+        if missing:
+            encoded = model.encode(list(missing.values()))
+            fresh = {digest: _unpack_float16(_pack_float16(vector), len(vector)) for digest, vector in zip(missing, encoded)}
+            with self.lock:
+                self.stats["encode_calls"] += 1
+                self._store(fresh)
+                self.connection.commit()
+            cached.update(fresh)
+        elif cached:
+            with self.lock:
+                self.connection.commit()
+        return [cached[digest] for digest in digests]
+
+    def encode(self, model, text: str) -> List[float]:
+        return self.encode_many(model, [text])[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self.recency),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.commit()
+                self.connection.close()
+                self.connection = None
+
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from embedding_cache import EmbeddingCache
+
+
+class EmbeddingService:
+    """
+    Unico punto di accesso al modello di embedding, per le scritture e le query su ChromaDB,
+    il RAG, il router veloce e le cache.
+
+    Le richieste concorrenti vengono raccolte in micro-lotti: la prima apre una finestra di
+    `embedding_batch_window_ms` millisecondi (o finché i testi raggiungono `embedding_max_batch_size`),
+    poi un thread dedicato calcola tutti i testi insieme passando dalla EmbeddingCache.
+    Espone anche `encode` con la forma di SentenceTransformer.encode, così chi riceve
+    "il modello" (es. FastRouter) passa dal servizio senza saperlo.
+    """
+
+    def __init__(self, model, cache: EmbeddingCache, config: Dict[str, Any]):
+        self.model = model
+        self.cache = cache
+        self.model_name = cache.model_name
+        self.batch_window = config.get("embedding_batch_window_ms", 5) / 1000
+        self.max_batch_size = config.get("embedding_max_batch_size", 64)
+        self.condition = threading.Condition()
+        self.pending = []  # richieste in attesa: {"texts", "done", "vectors", "error"}
+        self.worker = None
+        self.stats = {"requests": 0, "batches": 0, "texts": 0, "largest_batch": 0}
+
+    def _ensure_worker(self):
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = threading.Thread(target=self._run, daemon=True, name="embedding-batcher")
+            self.worker.start()
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self.condition:
+            while not self.pending:
+                self.condition.wait()
+            deadline = time.monotonic() + self.batch_window
+            while sum(len(request["texts"]) for request in self.pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            batch, self.pending = self.pending, []
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            texts = [text for request in batch for text in request["texts"]]
+            try:
+                vectors = self.cache.encode_many(self.model, texts)
+                start = 0
+                for request in batch:
+                    request["vectors"] = vectors[start:start + len(request["texts"])]
+                    start += len(request["texts"])
+            except Exception as e:
+                for request in batch:
+                    request["error"] = e
+            with self.condition:
+                self.stats["batches"] += 1
+                self.stats["texts"] += len(texts)
+                self.stats["largest_batch"] = max(self.stats["largest_batch"], len(texts))
+            for request in batch:
+                request["done"].set()
+
+    def encode_many(self, texts: List[str]) -> List[List[float]]:
+        """Embedding di `texts` nello stesso ordine; blocca solo fino alla chiusura del micro-lotto."""
+        if not texts:
+            return []
+        request = {"texts": list(texts), "done": threading.Event(), "vectors": None, "error": None}
+        with self.condition:
+            self.stats["requests"] += 1
+            self.pending.append(request)
+            self._ensure_worker()
+            self.condition.notify()
+        request["done"].wait()
+        if request["error"] is not None:
+            raise request["error"]
+        return request["vectors"]
+
+    def encode(self, sentences, **kwargs):
+        if isinstance(sentences, str):
+            return self.encode_many([sentences])[0]
+        return self.encode_many(list(sentences))
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.condition:
+            return {
+                **self.stats,
+                "avg_batch": self.stats["texts"] / self.stats["batches"] if self.stats["batches"] else 0.0,
+            }
+
+
+def create_embedding_service(config: Dict[str, Any]) -> Optional[EmbeddingService]:
+    """Carica il modello configurato con la sua cache; None se il modello non è disponibile."""
+    try:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(config["embedding_model_name"])
+    except Exception as e:
+        print(f"Errore nel caricamento del modello Embedding: {e}")
+        return None
+    return EmbeddingService(model, EmbeddingCache(config), config)
+
+
+def _load_migration_marker(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Errore nella lettura del registro delle migrazioni degli embedding: {e}")
+        return {}
+
+
+def needs_reembedding(collection, model_name: str, marker_path: str) -> bool:
+    """True se la collezione ha documenti non ancora ricalcolati con `model_name`."""
+    migrated = _load_migration_marker(marker_path).get(collection.name, {})
+    return migrated.get("model") != model_name and collection.count() > 0
+
+
+def reembed_collection(collection, service: EmbeddingService, marker_path: str, batch_size: int = 128) -> int:
+    """
+    Migrazione una tantum: ricalcola con il servizio gli embedding di tutti i documenti di una
+    collezione ChromaDB (scritti in passato con la funzione di embedding predefinita di Chroma)
+    e registra il modello usato, così la migrazione non viene ripetuta. Restituisce i documenti aggiornati.
+    """
+    total = collection.count()
+    updated = 0
+    for offset in range(0, total, batch_size):
+        page = collection.get(offset=offset, limit=batch_size, include=['documents'])
+        ids = [doc_id for doc_id, document in zip(page['ids'], page['documents']) if document]
+        documents = [document for document in page['documents'] if document]
+        if not ids:
+            continue
+        collection.update(ids=ids, embeddings=service.encode_many(documents))
+        updated += len(ids)
+        print(f"Migrazione embedding '{collection.name}': {updated}/{total} documenti.")
+
+    record_embedding_model(collection, service.model_name, marker_path, updated)
+    return updated
+
+
+def record_embedding_model(collection, model_name: str, marker_path: str, documents: int = 0):
+    """
+    Registra che gli embedding della collezione sono di `model_name`: dopo una migrazione, oppure
+    quando la collezione è vuota e ogni documento verrà scritto con gli embedding del servizio.
+    """
+    marker = _load_migration_marker(marker_path)
+    marker[collection.name] = {"model": model_name, "documents": documents, "migrated_at": datetime.now().isoformat()}
+    os.makedirs(os.path.dirname(marker_path) or ".", exist_ok=True)
+    with open(marker_path, 'w', encoding='utf-8') as f:
+        json.dump(marker, f, ensure_ascii=False, indent=4)
@@ -0,0 +1,223 @@
+import os
+import json
+import math
+import time
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+# Prototipi etichettati: richieste che il router gestisce da solo e richieste che servono al pensatore
+TRIVIAL_PROTOTYPES = [
+    "che ore sono?",
+    "come ti chiami?",
+    "calcola 2+2",
+    "quanto fa 15 per 3?",
+    "ciao",
+    "ciao aurora, come stai?",
+    "buongiorno",
+    "buonanotte",
+    "grazie mille",
+    "ok, perfetto",
+    "che giorno è oggi?",
+    "quanti giorni ha febbraio?",
+    "qual è la capitale della Francia?",
+    "traduci 'gatto' in inglese",
+    "converti 10 chilometri in miglia",
+]
+
+THINKER_PROTOTYPES = [
+    "cosa ne pensi di questa idea?",
+    "qual è la tua opinione sull'intelligenza artificiale?",
+    "ti ricordi cosa ti ho raccontato ieri?",
+    "di cosa abbiamo parlato la settimana scorsa?",
+    "scrivimi una poesia sul mare",
+    "inventa una storia con un drago",
+    "cerca sul web le ultime notizie",
+    "leggi il file note.txt nella cartella di lavoro",
+    "crea uno strumento che rinomina i file",
+    "come ti senti ultimamente? raccontami",
+    "aiutami a capire perché il mio codice non funziona",
+    "spiegami in dettaglio come funziona la memoria umana",
+    "che cosa sogni quando dormi?",
+    "i tuoi ricordi sono ok?",
+    "ho avuto una giornata difficile, posso parlarti?",
+]
+
+ROUTES = ("trivial", "thinker", "uncertain")
+
+
+def _dot(a: List[float], b: List[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+def _normalize(vector) -> List[float]:
+    vector = [float(x) for x in vector]
+    norm = math.sqrt(_dot(vector, vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class FastRouter:
+    """
+    Router veloce basato sugli embedding: decide in pochi millisecondi se una richiesta è
+    banale (risposta breve del router) o se va al pensatore, confrontandola con i prototipi
+    etichettati. Il router LLM fa da classificatore solo quando il margine cade tra le due soglie.
+    """
+
+    def __init__(self, config: Dict[str, Any], embedding_model=None):
+        self.embedding_model = embedding_model
+        self.top_k = config.get("fast_router_top_k", 3)
+        self.trivial_threshold = config.get("fast_router_trivial_threshold", 0.15)
+        self.thinker_threshold = config.get("fast_router_thinker_threshold", 0.10)
+        self.target_precision = config.get("fast_router_target_precision", 0.95)
+        self.calibration_path = config.get("fast_router_calibration_path", "./ai_workspace/fast_router_calibration.json")
+        self.log_path = config.get("fast_router_log_path", "./ai_workspace/fast_router_decisions.jsonl")
+        self.prototypes = {"trivial": list(TRIVIAL_PROTOTYPES), "thinker": list(THINKER_PROTOTYPES)}
+        self.prototype_embeddings = None
+        self.lock = threading.Lock()
+        self.stats = {route: 0 for route in ROUTES}
+        self.latencies_ms = []
+        self._load_calibration()
+
+    def _load_calibration(self):
+        if not os.path.exists(self.calibration_path):
+            return
+        try:
+            with open(self.calibration_path, 'r', encoding='utf-8') as f:
+                calibration = json.load(f)
+            self.trivial_threshold = calibration.get("trivial_threshold", self.trivial_threshold)
+            self.thinker_threshold = calibration.get("thinker_threshold", self.thinker_threshold)
+            print(f"Router veloce: soglie calibrate caricate (banale {self.trivial_threshold:.3f}, pensatore {self.thinker_threshold:.3f})")
+        except Exception as e:
+            print(f"Errore nel caricamento della calibrazione del router veloce: {e}")
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.embedding_model.encode(texts)
+        return [_normalize(vector) for vector in vectors]
+
+    def _ensure_prototypes(self):
+        with self.lock:
+            if self.prototype_embeddings is None:
+                self.prototype_embeddings = {label: self._embed(texts) for label, texts in self.prototypes.items()}
+
+    def _class_score(self, query_vector: List[float], label: str) -> float:
+        similarities = sorted((_dot(query_vector, p) for p in self.prototype_embeddings[label]), reverse=True)
+        top = similarities[:self.top_k]
+        return sum(top) / len(top) if top else 0.0
+
+    def margin(self, query: str) -> float:
+        """Similarità media ai prototipi del pensatore meno quella ai prototipi banali."""
+        self._ensure_prototypes()
+        query_vector = self._embed([query])[0]
+        return self._class_score(query_vector, "thinker") - self._class_score(query_vector, "trivial")
+
+    def decide(self, query: str) -> Dict[str, Any]:
+        """Restituisce il percorso ('trivial', 'thinker' o 'uncertain'), il margine e la latenza della decisione."""
+        start = time.perf_counter()
+        route, margin = "uncertain", 0.0
+        if self.embedding_model is not None:
+            try:
+                margin = self.margin(query)
+                if margin >= self.thinker_threshold:
+                    route = "thinker"
+                elif margin <= -self.trivial_threshold:
+                    route = "trivial"
+            except Exception as e:
+                print(f"Errore nel router veloce: {e}")
+        latency_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.stats[route] += 1
+            self.latencies_ms.append(latency_ms)
+            self.latencies_ms = self.latencies_ms[-200:]
+        return {"route": route, "margin": margin, "latency_ms": latency_ms}
+
+    def record(self, query: str, decision: Dict[str, Any], source: str, label: Optional[str] = None):
+        """Registra la decisione; quelle del router LLM diventano esempi etichettati per la calibrazione."""
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "query": query,
+            "route": decision["route"],
+            "margin": round(decision["margin"], 4),
+            "latency_ms": round(decision["latency_ms"], 2),
+            "source": source,
+            "label": label or decision["route"],
+        }
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"Errore nel salvataggio della decisione del router veloce: {e}")
+
+    def labelled_examples(self) -> List[Tuple[str, str]]:
+        """
+        Esempi etichettati per la calibrazione: solo le decisioni del router LLM registrate nel log
+        (una per domanda, l'ultima). Le route della cronologia non servono: sono in gran parte
+        decisioni di questo stesso router, e calibrarci sopra ne ripeterebbe gli errori.
+        """
+        examples = {}
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if entry.get("source") == "router_llm" and entry.get("label") in ("trivial", "thinker"):
+                        examples[entry["query"]] = entry["label"]
+        return list(examples.items())
+
+    def _pick_threshold(self, scored: List[Tuple[float, str]], label: str) -> Tuple[float, float, float]:
+        """Soglia più permissiva che mantiene la precisione richiesta sul lato `label`; (soglia, copertura, precisione)."""
+        sign = 1 if label == "thinker" else -1
+        candidates = sorted({sign * m for m, _ in scored if sign * m > 0})
+        for candidate in candidates:
+            decided = [l for m, l in scored if sign * m >= candidate]
+            precision = sum(1 for l in decided if l == label) / len(decided)
+            if precision >= self.target_precision:
+                return candidate, len(decided) / len(scored), precision
+        return math.inf, 0.0, 0.0
+
+    def calibrate(self, examples: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Sceglie le soglie che massimizzano le decisioni senza LLM alla precisione richiesta e le salva su disco."""
+        if self.embedding_model is None:
+            raise RuntimeError("Modello di embedding non disponibile")
+        if not examples:
+            raise ValueError("Nessun esempio etichettato per la calibrazione")
+
+        scored = [(self.margin(text), label) for text, label in examples]
+        thinker_threshold, thinker_coverage, thinker_precision = self._pick_threshold(scored, "thinker")
+        trivial_threshold, trivial_coverage, trivial_precision = self._pick_threshold(scored, "trivial")
+        self.thinker_threshold = thinker_threshold
+        self.trivial_threshold = trivial_threshold
+
+        result = {
+            "timestamp": datetime.now().isoformat(),
+            "examples": len(scored),
+            "target_precision": self.target_precision,
+            "thinker_threshold": thinker_threshold,  # inf = lato mai deciso senza LLM
+            "trivial_threshold": trivial_threshold,
+            "thinker_coverage": thinker_coverage,
+            "thinker_precision": thinker_precision,
+            "trivial_coverage": trivial_coverage,
+            "trivial_precision": trivial_precision,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.calibration_path) or ".", exist_ok=True)
+            with open(self.calibration_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=4)
+        except Exception as e:
+            print(f"Errore nel salvataggio della calibrazione del router veloce: {e}")
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = sum(self.stats.values())
+            latencies = sorted(self.latencies_ms)
+            return {
+                **self.stats,
+                "llm_skip_rate": (self.stats["trivial"] + self.stats["thinker"]) / total if total else 0.0,
+                "avg_latency_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+                "p95_latency_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+                "trivial_threshold": self.trivial_threshold,
+                "thinker_threshold": self.thinker_threshold,
+            }
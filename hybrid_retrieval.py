@@ -0,0 +1,218 @@
+import re
+import math
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Parole troppo comuni per distinguere un documento: le loro liste di posting sarebbero lunghe quanto l'indice
+STOPWORDS = frozenset("""
+il lo la i gli le un uno una di a da in con su per tra fra e o ma se che chi non ne ci si mi ti vi
+del dello della dei degli delle al allo alla ai agli alle dal dallo dalla dai dagli dalle nel nello
+nella nei negli nelle sul sullo sulla sui sugli sulle è sono ho hai ha abbiamo avete hanno era come
+cosa anche più io tu lui lei noi voi loro mio tuo suo questo quello utente
+""".split())
+
+SOURCES = ("memory_box", "chat_history", "chroma")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Indice invertito BM25 aggiornato in modo incrementale (aggiunta e rimozione di singoli documenti).
+
+    La ricerca scorre solo le liste di posting dei termini della query, quindi il costo dipende da
+    quanti documenti contengono quei termini e non dalla dimensione dell'indice.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}  # termine -> {doc_id: frequenza}
+        self.doc_terms = {}  # doc_id -> {termine: frequenza}
+        self.doc_lengths = {}
+        self.total_length = 0
+        self.lock = threading.RLock()
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.doc_lengths
+
+    def size(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: str, text: str):
+        terms = {}
+        tokens = tokenize(text)
+        for token in tokens:
+            terms[token] = terms.get(token, 0) + 1
+        with self.lock:
+            if doc_id in self.doc_lengths:
+                self._remove_locked(doc_id)
+            self.doc_terms[doc_id] = terms
+            self.doc_lengths[doc_id] = len(tokens)
+            self.total_length += len(tokens)
+            for term, frequency in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = frequency
+
+    def _remove_locked(self, doc_id: str):
+        for term in self.doc_terms.pop(doc_id, {}):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def remove(self, doc_id: str):
+        with self.lock:
+            if doc_id in self.doc_lengths:
+                self._remove_locked(doc_id)
+
+    def search(self, query: str, k: int = 10, allowed: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """I `k` documenti con punteggio BM25 più alto: [(doc_id, punteggio)]; `allowed` filtra gli ID."""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self.lock:
+            n_docs = len(self.doc_lengths)
+            if not n_docs:
+                return []
+            average_length = self.total_length / n_docs or 1.0
+            scores = {}
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, frequency in posting.items():
+                    if allowed is not None and not allowed(doc_id):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fusione RRF: ogni lista contribuisce 1 / (k + posizione) per ogni documento che contiene."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+    """
+    Recupero ibrido su ricordi (memory_box), cronologia chat e documenti ChromaDB.
+
+    La ricerca lessicale (BM25 sull'indice invertito) e quelle vettoriali registrate
+    (`add_vector_search`) girano in parallelo; i risultati sono fusi con reciprocal-rank
+    fusion e restituiti come un'unica classifica, ognuno con la sua provenienza (sorgente,
+    posizione nella classifica lessicale e in quella vettoriale). Ogni ricerca vettoriale
+    entra nella fusione come classifica a sé: le loro similarità non sono confrontabili
+    e accodarle metterebbe l'ultima registrata sempre dietro alla prima.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.lexical_k = config.get("retrieval_lexical_k", 20)
+        self.vector_k = config.get("retrieval_vector_k", 10)
+        self.rrf_k = config.get("retrieval_rrf_k", 60)
+        self.index = BM25Index()
+        self.documents = {}  # doc_id -> {"text", "source", "ref"}
+        self.vector_searches = []  # [(nome, funzione(query, k) -> [(doc_id, testo, sorgente, ref)])]
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="retrieval")
+        self.lock = threading.Lock()
+
+    def add_vector_search(self, name: str, search: Callable[[str, int], List[Tuple[str, str, str, Any]]]):
+        self.vector_searches.append((name, search))
+
+    def upsert(self, doc_id: str, text: str, source: str, ref: Any = None):
+        with self.lock:
+            self.documents[doc_id] = {"text": text, "source": source, "ref": ref}
+        self.index.add(doc_id, text)
+
+    def remove(self, doc_id: str):
+        with self.lock:
+            self.documents.pop(doc_id, None)
+        self.index.remove(doc_id)
+
+    def sync_source(self, source: str, items: Dict[str, Tuple[str, Any]]):
+        """Allinea una sorgente a `items` (doc_id -> (testo, ref)): aggiunge i nuovi, rimuove gli scomparsi."""
+        with self.lock:
+            current = {doc_id for doc_id, document in self.documents.items() if document["source"] == source}
+        for doc_id in current - items.keys():
+            self.remove(doc_id)
+        for doc_id, (text, ref) in items.items():
+            if doc_id not in current:
+                self.upsert(doc_id, text, source, ref)
+            else:
+                with self.lock:
+                    self.documents[doc_id]["ref"] = ref
+
+    def lexical(self, query: str, k: Optional[int] = None, sources: Optional[Tuple[str, ...]] = None) -> List[Tuple[str, float]]:
+        allowed = None
+        if sources is not None:
+            allowed = lambda doc_id: (self.documents.get(doc_id) or {}).get("source") in sources
+        return self.index.search(query, k or self.lexical_k, allowed)
+
+    def _vector(self, query: str, sources: Optional[Tuple[str, ...]]) -> List[List[Tuple[str, str, str, Any]]]:
+        """Una classifica per ogni ricerca vettoriale registrata."""
+        rankings = []
+        for name, search in self.vector_searches:
+            try:
+                rankings.append([hit for hit in search(query, self.vector_k) if sources is None or hit[2] in sources])
+            except Exception as e:
+                print(f"Errore nella ricerca vettoriale '{name}': {e}")
+        return rankings
+
+    def search(self, query: str, k: int = 5, sources: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+        """
+        Top-k fusi: [{"id", "text", "source", "ref", "score", "lexical_rank", "vector_rank"}].
+        Le ricerche vettoriali girano in un thread mentre quella lessicale gira nel thread chiamante.
+        """
+        vector_future = self.executor.submit(self._vector, query, sources) if self.vector_searches else None
+        lexical_ranking = [doc_id for doc_id, _ in self.lexical(query, sources=sources)]
+        vector_hits = vector_future.result() if vector_future else []
+
+        known = {}
+        vector_rankings = []
+        vector_ranks = {}  # posizione migliore del documento in una delle classifiche vettoriali
+        for hits in vector_hits:
+            ranking = list(dict.fromkeys(doc_id for doc_id, _, _, _ in hits))
+            vector_rankings.append(ranking)
+            for doc_id, text, source, ref in hits:
+                known.setdefault(doc_id, {"text": text, "source": source, "ref": ref})
+            for rank, doc_id in enumerate(ranking, start=1):
+                vector_ranks[doc_id] = min(rank, vector_ranks.get(doc_id, rank))
+        lexical_ranks = {doc_id: rank for rank, doc_id in enumerate(lexical_ranking, start=1)}
+
+        results = []
+        with self.lock:
+            for doc_id, score in reciprocal_rank_fusion([lexical_ranking] + vector_rankings, self.rrf_k):
+                document = self.documents.get(doc_id) or known.get(doc_id)
+                if document is None:
+                    continue
+                results.append({
+                    "id": doc_id,
+                    "text": document["text"],
+                    "source": document["source"],
+                    "ref": document["ref"],
+                    "score": score,
+                    "lexical_rank": lexical_ranks.get(doc_id),
+                    "vector_rank": vector_ranks.get(doc_id),
+                })
+                if len(results) >= k:
+                    break
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            by_source = {source: 0 for source in SOURCES}
+            for document in self.documents.values():
+                by_source[document["source"]] = by_source.get(document["source"], 0) + 1
+        return {"documents": self.index.size(), "terms": len(self.index.postings), "by_source": by_source}
@@ -0,0 +1,179 @@
+import os
+import re
+import json
+import uuid
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _word_set(text: str) -> frozenset:
+    return frozenset(_WORD_PATTERN.findall(text.lower()))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class IngestionQueue:
+    """
+    Coda di apprendimento write-behind: quello che Aurora impara (conoscenza per ChromaDB e il
+    KG, ricordi emotivi) viene accodato subito e scritto dopo, in lotti, nei momenti di inattività,
+    nel ciclo di sogno o allo spegnimento.
+
+    La coda è durevole: ogni operazione è una riga JSON aggiunta in fondo al file (append-only),
+    rilette all'avvio, così niente va perso se il processo si interrompe prima dello svuotamento.
+    Un elemento quasi identico a uno ancora in attesa (stesso tipo e origine, parole in comune
+    oltre `ingestion_coalesce_threshold`) lo sostituisce invece di accodarsi.
+    Oltre `ingestion_soft_limit` elementi conviene svuotarla subito, oltre `ingestion_max_pending`
+    chi accoda deve svuotarla prima di continuare (`pressure()`).
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.path = config.get("ingestion_queue_path", "./ai_workspace/ingestion_queue.jsonl")
+        self.soft_limit = config.get("ingestion_soft_limit", 100)
+        self.max_pending = config.get("ingestion_max_pending", 500)
+        self.coalesce_threshold = config.get("ingestion_coalesce_threshold", 0.9)
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()  # id -> elemento, dal più vecchio
+        self.in_flight = {}  # id -> elemento preso da uno svuotamento non ancora concluso
+        self.words = {}  # id -> parole dell'elemento, per la fusione dei quasi duplicati
+        self.stats = {"queued": 0, "coalesced": 0, "completed": 0, "retried": 0}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Riga troncata da un'interruzione durante la scrittura
+                    if entry.get("op") == "add":
+                        item = entry["item"]
+                        self.pending[item["id"]] = item
+                        self.words[item["id"]] = _word_set(item["text"])
+                    elif entry.get("op") == "done":
+                        for item_id in entry["ids"]:
+                            self.pending.pop(item_id, None)
+                            self.words.pop(item_id, None)
+            self._compact()
+            if self.pending:
+                print(f"Coda di apprendimento: {len(self.pending)} elementi in attesa dalla sessione precedente.")
+        except Exception as e:
+            print(f"Errore nel caricamento della coda di apprendimento: {e}")
+
+    def _append(self, entries: List[Dict[str, Any]]):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            print(f"Errore nella scrittura della coda di apprendimento: {e}")
+
+    def _compact(self):
+        """Riscrive il file con i soli elementi in attesa (dopo il caricamento o quando la coda si svuota)."""
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for item in list(self.in_flight.values()) + list(self.pending.values()):
+                    f.write(json.dumps({"op": "add", "item": item}, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Errore nella compattazione della coda di apprendimento: {e}")
+
+    def _near_duplicate(self, kind: str, source: Optional[str], words: frozenset) -> Optional[str]:
+        for item_id in reversed(self.pending):
+            item = self.pending[item_id]
+            if item["kind"] == kind and item.get("source") == source and _jaccard(words, self.words[item_id]) >= self.coalesce_threshold:
+                return item_id
+        return None
+
+    def put(self, kind: str, text: str, source: Optional[str] = None, data: Optional[Dict[str, Any]] = None) -> str:
+        """Accoda un elemento; restituisce "queued" o "coalesced" (ha sostituito un quasi duplicato in attesa)."""
+        item = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "text": text,
+            "source": source,
+            "data": data or {},
+            "enqueued_at": datetime.now().isoformat(),
+        }
+        words = _word_set(text)
+        with self.lock:
+            entries = []
+            duplicate_id = self._near_duplicate(kind, source, words)
+            if duplicate_id is not None:
+                # Il più recente sostituisce il vecchio
+                del self.pending[duplicate_id]
+                del self.words[duplicate_id]
+                entries.append({"op": "done", "ids": [duplicate_id]})
+                self.stats["coalesced"] += 1
+            self.pending[item["id"]] = item
+            self.words[item["id"]] = words
+            entries.append({"op": "add", "item": item})
+            self.stats["queued"] += 1
+            self._append(entries)
+        return "coalesced" if duplicate_id is not None else "queued"
+
+    def take(self, max_items: int) -> List[Dict[str, Any]]:
+        """Prende i primi elementi in attesa per uno svuotamento; vanno chiusi con complete() o release()."""
+        with self.lock:
+            batch = []
+            while self.pending and len(batch) < max_items:
+                item_id, item = self.pending.popitem(last=False)
+                self.words.pop(item_id, None)
+                self.in_flight[item_id] = item
+                batch.append(item)
+            return batch
+
+    def complete(self, ids: List[str]):
+        if not ids:
+            return
+        with self.lock:
+            for item_id in ids:
+                self.in_flight.pop(item_id, None)
+            self.stats["completed"] += len(ids)
+            if not self.pending and not self.in_flight:
+                self._compact()  # Tutto scritto: il file riparte vuoto
+            else:
+                self._append([{"op": "done", "ids": list(ids)}])
+
+    def release(self, ids: List[str]):
+        """Rimette in testa alla coda gli elementi di uno svuotamento fallito, per riprovare più tardi."""
+        with self.lock:
+            for item_id in reversed(ids):
+                item = self.in_flight.pop(item_id, None)
+                if item is not None:
+                    self.pending[item_id] = item
+                    self.pending.move_to_end(item_id, last=False)
+                    self.words[item_id] = _word_set(item["text"])
+                    self.stats["retried"] += 1
+
+    def size(self) -> int:
+        with self.lock:
+            return len(self.pending) + len(self.in_flight)
+
+    def pressure(self) -> str:
+        """"ok", "soft" (conviene svuotare subito) o "hard" (chi accoda deve svuotare prima di continuare)."""
+        size = self.size()
+        if size >= self.max_pending:
+            return "hard"
+        if size >= self.soft_limit:
+            return "soft"
+        return "ok"
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {**self.stats, "pending": len(self.pending), "in_flight": len(self.in_flight)}
@@ -0,0 +1,187 @@
+import re
+import json
+import threading
+from typing import Dict, Any, List, Optional
+
+# Regole di base della grammatica JSON (GBNF di llama.cpp)
+PRIMITIVE_RULES = {
+    "ws": '([ \\t\\n] ([ \\t\\n] ([ \\t\\n])?)?)?',
+    "string": '"\\"" ( [^"\\\\\\x00-\\x1F] | "\\\\" ( ["\\\\/bfnrt] | "u" [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] [0-9a-fA-F] ) )* "\\""',
+    "number": '"-"? ( [0-9] | [1-9] [0-9]* ) ( "." [0-9]+ )? ( [eE] [-+]? [0-9]+ )?',
+    "integer": '"-"? ( [0-9] | [1-9] [0-9]* )',
+    "boolean": '"true" | "false"',
+    "null": '"null"',
+    "value": 'object | array | string | number | boolean | null',
+    "object": '"{" ws ( string ws ":" ws value ( ws "," ws string ws ":" ws value )* )? ws "}"',
+    "array": '"[" ws ( value ( ws "," ws value )* )? ws "]"',
+}
+
+
+def _literal(text: str) -> str:
+    """Letterale GBNF che corrisponde esattamente a `text`."""
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+
+class _SchemaCompiler:
+    def __init__(self):
+        self.rules = {}
+        self.used_primitives = set()
+
+    def _primitive(self, name: str) -> str:
+        self.used_primitives.add(name)
+        return name
+
+    def _add_rule(self, name: str, body: str) -> str:
+        name = re.sub(r'[^a-zA-Z0-9-]+', '-', name).strip('-') or "rule"
+        candidate, suffix = name, 1
+        while candidate in self.rules and self.rules[candidate] != body:
+            suffix += 1
+            candidate = f"{name}{suffix}"
+        self.rules[candidate] = body
+        return candidate
+
+    def visit(self, schema: Dict[str, Any], name: str) -> str:
+        if "enum" in schema:
+            return self._add_rule(name, " | ".join(_literal(json.dumps(v, ensure_ascii=False)) for v in schema["enum"]))
+        if "anyOf" in schema or "oneOf" in schema:
+            options = schema.get("anyOf") or schema.get("oneOf")
+            return self._add_rule(name, " | ".join(self.visit(option, f"{name}-{i}") for i, option in enumerate(options)))
+
+        schema_type = schema.get("type")
+        if schema_type == "object":
+            properties = schema.get("properties")
+            if not properties:
+                return self._primitive("object")
+            self._primitive("ws")
+            required = [p for p in properties if p in schema.get("required", [])]
+            optional = [p for p in properties if p not in required]
+
+            def pair(prop):
+                value_rule = self.visit(properties[prop], f"{name}-{prop}")
+                return f'{_literal(json.dumps(prop))} ws ":" ws {value_rule}'
+
+            if required:
+                body = ' ws "," ws '.join(pair(p) for p in required)
+                body += "".join(f' ( ws "," ws {pair(p)} )?' for p in optional)
+            else:
+                body = "( " + pair(optional[0]) + "".join(f' ( ws "," ws {pair(p)} )?' for p in optional[1:]) + " )?"
+            return self._add_rule(name, f'"{{" ws {body} ws "}}"')
+
+        if schema_type == "array":
+            self._primitive("ws")
+            items = self.visit(schema.get("items", {}), f"{name}-item")
+            elements = f'{items} ( ws "," ws {items} )*'
+            if schema.get("minItems", 0) < 1:
+                elements = f"( {elements} )?"
+            return self._add_rule(name, f'"[" ws {elements} ws "]"')
+
+        if schema_type in ("string", "number", "integer", "boolean", "null"):
+            return self._primitive(schema_type)
+        return self._primitive("value")
+
+    def render(self, root_rule: str) -> str:
+        # Le regole primitive richiamano altre primitive: includi la chiusura
+        dependencies = {"value": {"object", "array", "string", "number", "boolean", "null"},
+                        "object": {"ws", "string", "value"}, "array": {"ws", "value"}}
+        pending = list(self.used_primitives)
+        while pending:
+            for dependency in dependencies.get(pending.pop(), ()):
+                if dependency not in self.used_primitives:
+                    self.used_primitives.add(dependency)
+                    pending.append(dependency)
+        lines = [f"root ::= {root_rule}"] if root_rule != "root" else []
+        lines += [f"{name} ::= {body}" for name, body in self.rules.items()]
+        lines += [f"{name} ::= {PRIMITIVE_RULES[name]}" for name in sorted(self.used_primitives)]
+        return "\n".join(lines) + "\n"
+
+
+def schema_to_gbnf(schema: Dict[str, Any]) -> str:
+    """Compila un sottoinsieme di JSON Schema (object, array, enum, anyOf, tipi primitivi) in una grammatica GBNF."""
+    compiler = _SchemaCompiler()
+    root = compiler.visit(schema, "root")
+    return compiler.render(root)
+
+
+def tool_call_gbnf(tool_call_schema: Dict[str, Any], preamble_marker: Optional[str] = None) -> str:
+    """
+    Grammatica di una risposta del pensatore che è un TOOL_CALL: 'TOOL_CALL: ' seguito da un oggetto
+    JSON valido, e nient'altro dopo la graffa di chiusura. Si usa solo dopo che lo stream libero ha
+    iniziato un TOOL_CALL: il testo normale resta senza grammatica, senza costo di campionamento.
+    Con `preamble_marker` la risposta deve iniziare con una riga '<marcatore> ...' (la direttiva
+    della deliberazione fusa), seguita dal TOOL_CALL.
+    """
+    compiler = _SchemaCompiler()
+    tool_rule = compiler.visit(tool_call_schema, "tool-call")
+    compiler.rules["command"] = f'{_literal("TOOL_CALL: ")} {tool_rule}'
+    if preamble_marker:
+        compiler.rules["preamble"] = f'{_literal(preamble_marker + " ")} [^\\n]+ "\\n"'
+        return compiler.render("preamble command")
+    return compiler.render("command")
+
+
+def tool_call_schema(tool_names: List[str]) -> Dict[str, Any]:
+    return {
+        "type": "object",
+        "properties": {
+            "tool_name": {"type": "string", "enum": sorted(tool_names)},
+            "args": {"type": "object"},
+        },
+        "required": ["tool_name", "args"],
+    }
+
+
+def is_valid_json(text: str) -> bool:
+    try:
+        json.loads(text.strip())
+        return True
+    except (json.JSONDecodeError, AttributeError):
+        return False
+
+
+class GrammarRegistry:
+    """
+    Compila gli schemi JSON in grammatiche GBNF una sola volta e tiene il tasso di output
+    non parsabile per punto di chiamata, separando generazione libera e vincolata.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.enabled = config.get("llm_structured_output", True)
+        self.grammars = {}  # schema serializzato -> GBNF
+        self.lock = threading.Lock()
+        self.stats = {}  # call_site -> {"free": {...}, "grammar": {...}}
+
+    def grammar_for(self, schema: Dict[str, Any]) -> Optional[str]:
+        if not self.enabled:
+            return None
+        key = json.dumps(schema, sort_keys=True)
+        with self.lock:
+            if key not in self.grammars:
+                self.grammars[key] = schema_to_gbnf(schema)
+            return self.grammars[key]
+
+    def tool_call_grammar_for(self, tool_names: List[str], preamble_marker: Optional[str] = None) -> Optional[str]:
+        if not self.enabled:
+            return None
+        key = f"tool_call:{preamble_marker}:" + json.dumps(sorted(tool_names))
+        with self.lock:
+            if key not in self.grammars:
+                self.grammars[key] = tool_call_gbnf(tool_call_schema(tool_names), preamble_marker)
+            return self.grammars[key]
+
+    def record(self, call_site: str, constrained: bool, parsed_ok: bool):
+        with self.lock:
+            site = self.stats.setdefault(call_site, {"free": {"calls": 0, "failures": 0}, "grammar": {"calls": 0, "failures": 0}})
+            mode = site["grammar" if constrained else "free"]
+            mode["calls"] += 1
+            if not parsed_ok:
+                mode["failures"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                call_site: {
+                    mode: {**counts, "failure_rate": counts["failures"] / counts["calls"] if counts["calls"] else 0.0}
+                    for mode, counts in modes.items()
+                }
+                for call_site, modes in self.stats.items()
+            }
@@ -0,0 +1,98 @@
+import os
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+# Schemi JSON delle estrazioni per il Knowledge Graph, compilati in grammatiche GBNF da json_grammar:
+# una tripla soggetto/relazione/oggetto (solo il soggetto se non ci sono relazioni chiare),
+# la lista di triple di un testo e, per l'estrazione a lotti, un oggetto per documento
+KG_TRIPLE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "soggetto": {"type": "string"},
+        "relazione": {"type": "string"},
+        "oggetto": {"type": "string"},
+    },
+    "required": ["soggetto"],
+}
+KG_TRIPLES_SCHEMA = {"type": "array", "items": KG_TRIPLE_SCHEMA}
+KG_BATCH_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "documento": {"type": "integer"},
+            "triple": KG_TRIPLES_SCHEMA,
+        },
+        "required": ["documento", "triple"],
+    },
+}
+
+
+def build_batch_prompt(documents: List[str], max_chars: int = 600) -> str:
+    """Prompt unico per estrarre entità e relazioni da più documenti numerati."""
+    numbered = "\n\n".join(f"[Documento {i}]\n{doc[:max_chars]}" for i, doc in enumerate(documents))
+    return (
+        f"Analizza i seguenti {len(documents)} documenti ed estrai da ciascuno entità (persone, luoghi, concetti, organizzazioni) "
+        f"e le relazioni tra di loro. Normalizza le entità e le relazioni. "
+        f"Rispondi con un array JSON che contiene un oggetto per documento, con 'documento' (il numero del documento) "
+        f"e 'triple' (array di oggetti con 'soggetto', 'relazione', 'oggetto'). "
+        f"Se non ci sono relazioni chiare, includi solo il 'soggetto'. "
+        f"Esempio: [{{\"documento\": 0, \"triple\": [{{\"soggetto\": \"Mario Rossi\", \"relazione\": \"lavora per\", \"oggetto\": \"Acme\"}}]}}]\n\n"
+        f"{numbered}"
+    )
+
+
+def parse_batch_response(raw: str, n_documents: int) -> Optional[Dict[int, List[Dict[str, str]]]]:
+    """Restituisce {indice documento: triple}; None se la risposta non è un array JSON valido."""
+    if not raw:
+        return None
+    text = raw.strip()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        # Senza grammatica il modello può aggiungere testo attorno all'array
+        start, end = text.find("["), text.rfind("]")
+        if start == -1 or end <= start:
+            return None
+        try:
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(data, list):
+        return None
+
+    results = {i: [] for i in range(n_documents)}
+    for entry in data:
+        if not isinstance(entry, dict):
+            continue
+        index = entry.get("documento")
+        if not isinstance(index, int) or not 0 <= index < n_documents:
+            continue
+        results[index].extend(t for t in entry.get("triple", []) if isinstance(t, dict) and t.get("soggetto"))
+    return results
+
+
+class HighWaterMark:
+    """Posizione persistente nella collezione ChromaDB fino alla quale i documenti sono già nel grafo."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return int(json.load(f).get("offset", 0))
+        except Exception as e:
+            print(f"Errore nel caricamento dell'high-water mark del KG: {e}")
+            return 0
+
+    def save(self, offset: int):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({"offset": offset, "updated_at": datetime.now().isoformat()}, f, indent=4)
+        except Exception as e:
+            print(f"Errore nel salvataggio dell'high-water mark del KG: {e}")
@@ -0,0 +1,184 @@
+import re
+import time
+import zlib
+import json
+import hashlib
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+from model_manager import _default_model_factory
+
+# Parti di testo che il modello simulato tratta come token: parole spezzate ogni 4 caratteri,
+# punteggiatura e spazi (un'approssimazione grossolana di un tokenizer BPE)
+_TOKEN_PATTERN = re.compile(r"\s?\w{1,4}|\s?[^\w\s]|\s+")
+
+# Etichette che una richiesta sintetica può contenere per ottenere un comando dal modello simulato
+MOCK_TAGS = {
+    "tool_call": "[mock:tool_call]",
+    "reflect": "[mock:reflect]",
+    "pass": "[mock:pass]",
+    "reject": "[mock:reject]",
+}
+
+CANNED_ANSWERS = (
+    "Ci ho pensato un po' e credo che la risposta dipenda soprattutto dal contesto.",
+    "Bella domanda! Ti racconto come la vedo io, con un pizzico di curiosità.",
+    "Mi sembra un tema interessante: provo a spiegartelo in modo semplice.",
+    "Ricordo che ne avevamo già parlato, quindi parto da lì.",
+)
+
+
+def mock_tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text)
+
+
+def _mock_token_ids(pieces: List[str]) -> List[int]:
+    """ID stabili per i pezzi di testo (0 è riservato al BOS)."""
+    return [zlib.crc32(piece.encode('utf-8')) % 32000 + 1 for piece in pieces]
+
+
+class MockLlamaState:
+    """Stato salvato del modello simulato: i token del contesto e la dimensione che avrebbe la KV cache."""
+
+    def __init__(self, input_ids: Tuple[int, ...], kv_bytes_per_token: int):
+        self.input_ids = input_ids
+        self.llama_state_size = len(input_ids) * kv_bytes_per_token
+
+
+class MockLlama:
+    """
+    Modello deterministico con la stessa interfaccia di llama_cpp.Llama usata da Aurora
+    (create_chat_completion in streaming e non, tokenize, save_state/load_state).
+
+    Risponde con testi scelti in base al prompt: risposte scriptate (`script`), i formati
+    attesi dai singoli punti di chiamata (triage del router, JSON per il KG, verdetto SI/NO,
+    preambolo della direttiva) e comandi TOOL_CALL/REFLECT/PASS_TO_THINKER su richiesta
+    tramite le etichette MOCK_TAGS nella richiesta dell'utente. Prefill e decodifica
+    vengono simulati con attese proporzionali ai token.
+
+    Come llama.cpp, il modello tiene il contesto valutato (i token dell'ultima chiamata) e rifà
+    il prefill solo dopo il prefisso in comune con il nuovo prompt; save_state/load_state
+    salvano e ripristinano quel contesto e n_tokens lo tronca, così il riuso del prefisso
+    (PrefixStateCache) si misura. La dimensione di uno stato è `kv_bytes_per_token` per token.
+    """
+
+    def __init__(self, model_path: str, n_ctx: int, settings: Dict[str, Any]):
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.prefill_tokens_per_second = settings.get("prefill_tokens_per_second", 150)
+        self.decode_tokens_per_second = settings.get("decode_tokens_per_second", 15)
+        self.script = settings.get("script", [])  # [{"contains": "...", "response": "..."}]
+        self.calls = 0
+        self.kv_bytes_per_token = settings.get("kv_bytes_per_token", 128 * 1024)
+        self.context = ()  # ID dei token valutati nel contesto (prompt + risposta dell'ultima chiamata)
+        self.prefill_tokens = 0  # token di prompt effettivamente valutati, in totale
+
+    @property
+    def input_ids(self) -> List[int]:
+        return list(self.context)
+
+    @property
+    def n_tokens(self) -> int:
+        return len(self.context)
+
+    @n_tokens.setter
+    def n_tokens(self, value: int):
+        self.context = self.context[:value]
+
+    def save_state(self) -> MockLlamaState:
+        return MockLlamaState(self.context, self.kv_bytes_per_token)
+
+    def load_state(self, state: MockLlamaState):
+        self.context = tuple(state.input_ids)
+
+    def _prefill(self, prompt_tokens: List[int]) -> int:
+        """Token del prompt da valutare: quelli dopo il prefisso comune con il contesto attuale."""
+        common = 0
+        for cached, token in zip(self.context, prompt_tokens):
+            if cached != token:
+                break
+            common += 1
+        return len(prompt_tokens) - common
+
+    def tokenize(self, text: bytes, add_bos: bool = False):
+        tokens = _mock_token_ids(mock_tokenize(text.decode('utf-8', errors='ignore')))
+        return [0] + tokens if add_bos else tokens
+
+    def _sleep(self, tokens: int, tokens_per_second: float):
+        if tokens_per_second and tokens > 0:
+            time.sleep(tokens / tokens_per_second)
+
+    def respond(self, prompt: str) -> str:
+        """La risposta completa (prima del limite di max_tokens) per un prompt."""
+        for rule in self.script:
+            if rule["contains"] in prompt:
+                return rule["response"]
+
+        digest = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16)
+        user_request = prompt.rsplit("Richiesta utente:", 1)[-1]
+        tagged = {name for name, tag in MOCK_TAGS.items() if tag in user_request}
+
+        if "PASS_TO_THINKER" in prompt:  # Triage del router
+            if tagged or len(user_request.strip()) > 60:
+                return "PASS_TO_THINKER"
+            return "Certo! Ecco una risposta breve e diretta."
+        if "SI oppure NO" in prompt:  # Critico breve dell'auto-correzione
+            return "NO" if "reject" in tagged else "SI"
+        if "[Documento 0]" in prompt:  # Estrazione KG a lotti
+            documents = len(re.findall(r"\[Documento \d+\]", prompt))
+            return json.dumps([
+                {"documento": i, "triple": [{"soggetto": f"Entità {i}", "relazione": "citata in", "oggetto": "Documento"}]}
+                for i in range(documents)
+            ], ensure_ascii=False)
+        if "'soggetto'" in prompt:  # Estrazione KG di un singolo testo
+            return json.dumps([{"soggetto": "Aurora", "relazione": "conosce", "oggetto": "Mentore"}], ensure_ascii=False)
+
+        answer = CANNED_ANSWERS[digest % len(CANNED_ANSWERS)]
+        if prompt.rstrip().endswith("Risposta:") and "Richiesta utente:" in prompt:  # Risposta del pensatore
+            if "tool_call" in tagged:
+                answer = 'TOOL_CALL: {"tool_name": "read_file", "args": {"path": "benchmark_nota.txt"}}'
+            elif "reflect" in tagged:
+                answer = f"REFLECT: {answer}"
+            if "DIRETTIVA:" in prompt:
+                answer = "DIRETTIVA: Rispondi con calma e chiarezza.\n" + answer
+        return answer
+
+    def create_chat_completion(self, messages: List[Dict[str, str]], max_tokens: int = 256, stream: bool = False, **kwargs):
+        self.calls += 1
+        prompt = "\n".join(message.get("content", "") for message in messages)
+        pieces = mock_tokenize(self.respond(prompt))[:max_tokens or None]
+        prompt_tokens = _mock_token_ids(mock_tokenize(prompt))
+        prefill = self._prefill(prompt_tokens)
+        self.prefill_tokens += prefill
+        self.context = tuple(prompt_tokens + _mock_token_ids(pieces))
+        self._sleep(prefill, self.prefill_tokens_per_second)
+        if stream:
+            return self._stream(pieces)
+        self._sleep(len(pieces), self.decode_tokens_per_second)
+        return {"choices": [{"message": {"role": "assistant", "content": "".join(pieces)}, "finish_reason": "stop"}]}
+
+    def _stream(self, pieces: List[str]):
+        for piece in pieces:
+            self._sleep(1, self.decode_tokens_per_second)
+            yield {"choices": [{"delta": {"content": piece}, "finish_reason": None}]}
+        yield {"choices": [{"delta": {}, "finish_reason": "stop"}]}
+
+
+class MockModelFactory:
+    """Factory dei modelli simulati; un oggetto semplice, così passa anche ai worker in un altro processo."""
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = dict(settings)
+
+    def __call__(self, model_path: str, n_ctx: int) -> MockLlama:
+        time.sleep(self.settings.get("load_seconds", 0))
+        return MockLlama(model_path, n_ctx, self.settings)
+
+
+def get_model_factory(config: Dict[str, Any]) -> Callable:
+    """Factory dei modelli per il backend configurato: "llama_cpp" (GGUF reali) o "mock" (simulato)."""
+    backend = config.get("llm_model_backend", "llama_cpp")
+    if backend == "llama_cpp":
+        return _default_model_factory
+    if backend == "mock":
+        return MockModelFactory(config.get("llm_mock_settings", {}))
+    raise ValueError(f"Backend LLM sconosciuto: {backend}")
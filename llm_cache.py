@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+_SCHEMA = ("CREATE TABLE IF NOT EXISTS responses ("
+           "key TEXT PRIMARY KEY, response TEXT NOT NULL, model TEXT NOT NULL, created_at TEXT NOT NULL, last_used REAL NOT NULL)")
+
+
+class LLMResponseCache:
+    """
+    Cache su disco delle risposte LLM per le chiamate deterministiche (temperatura bassa).
+
+    La chiave è l'hash di (modello, prompt del chiamante, parametri di campionamento); le voci
+    stanno in un database SQLite (ogni inserimento scrive una riga, senza riscrivere il file),
+    l'ordine LRU è tenuto in memoria e le meno usate vengono scartate oltre `llm_cache_max_entries`.
+    È opt-in: solo i punti di chiamata che passano cache=True a _call_llm la usano.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.path = config.get("llm_cache_path", "./ai_workspace/llm_response_cache.sqlite")
+        self.max_entries = config.get("llm_cache_max_entries", 2000)
+        self.max_temperature = config.get("llm_cache_max_temperature", 0.3)
+        self.recency = OrderedDict()  # chiave -> None, dalla meno alla più recente
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self.connection = None
+        self._open()
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute(_SCHEMA)
+            self.connection.commit()
+            for (key,) in self.connection.execute("SELECT key FROM responses ORDER BY last_used"):
+                self.recency[key] = None
+            if self.recency:
+                print(f"Cache risposte LLM caricata ({len(self.recency)} voci).")
+        except Exception as e:
+            print(f"Errore nell'apertura della cache delle risposte LLM: {e}. Cache solo in memoria.")
+            self.connection = sqlite3.connect(":memory:", check_same_thread=False)
+            self.connection.execute(_SCHEMA)
+            self.recency = OrderedDict()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, sampling: Dict[str, Any]) -> str:
+        payload = json.dumps({"model": model, "prompt": prompt, "sampling": sampling}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def accepts(self, temperature: float) -> bool:
+        """Le chiamate più creative non vanno in cache: la stessa domanda deve poter dare risposte diverse."""
+        return temperature <= self.max_temperature
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+            self.recency[key] = None
+            self.recency.move_to_end(key)
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        if not response:
+            return
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, model, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, response, model, datetime.now().isoformat(), time.time()),
+            )
+            self.recency[key] = None
+            self.recency.move_to_end(key)
+            self.stats["stores"] += 1
+            evicted = []
+            while len(self.recency) > self.max_entries:
+                evicted.append(self.recency.popitem(last=False)[0])
+            if evicted:
+                self.connection.executemany("DELETE FROM responses WHERE key = ?", [(old_key,) for old_key in evicted])
+                self.stats["evictions"] += len(evicted)
+            self.connection.commit()
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
+            self.recency.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self.recency),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.commit()
+                self.connection.close()
+                self.connection = None
@@ -0,0 +1,156 @@
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# Classi di priorità: numero più basso = priorità più alta
+PRIORITY_CLASSES = {
+    "interactive": 0,  # Turni dell'utente: process_query, strumenti, auto-correzione
+    "maintenance": 1,  # Manutenzione della memoria: KG, riepiloghi, redenzione
+    "whimsy": 2,       # Attività autonome: sogni, Netflix, catarsi, dialoghi interni
+}
+
+# Generazioni contemporanee per classe, su modelli diversi. Ogni modello è già esclusivo, quindi
+# i turni interattivi non hanno un limite proprio: una classe assente qui è limitata solo dai modelli
+DEFAULT_CLASS_LIMITS = {"maintenance": 1, "whimsy": 1}
+
+# Attesa massima in coda (secondi) prima che una richiesta in background venga scartata
+DEFAULT_CLASS_DEADLINES = {"interactive": None, "maintenance": 900, "whimsy": 300}
+
+
+class LLMRequestDropped(Exception):
+    """Sollevata quando una richiesta in background resta in coda oltre la sua scadenza."""
+
+
+class LLMDispatcher:
+    """
+    Coda centrale di dispatch per le chiamate LLM.
+
+    Ogni modello (router, pensatore) esegue una generazione alla volta; quando si libera,
+    il turno va alla richiesta in attesa con la priorità più alta (a parità, la più vecchia),
+    nel rispetto dei limiti di concorrenza per classe. Le richieste in background che superano
+    la loro scadenza vengono scartate, e quelle prelazionabili cedono il modello appena
+    arriva un turno interattivo.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.class_limits = dict(DEFAULT_CLASS_LIMITS)
+        self.class_limits.update(config.get("llm_class_concurrency", {}))
+        self.class_deadlines = dict(DEFAULT_CLASS_DEADLINES)
+        self.class_deadlines.update(config.get("llm_class_deadline_seconds", {}))
+        self.preemptible_classes = set(config.get("llm_preemptible_classes", ["whimsy"]))
+
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.waiting = []  # ticket in attesa
+        self.busy_resources = set()  # modelli con una generazione in corso
+        self.running = {name: 0 for name in PRIORITY_CLASSES}
+        self.stats = {
+            name: {"completed": 0, "dropped": 0, "preempted": 0, "max_queue_depth": 0, "wait_times": []}
+            for name in PRIORITY_CLASSES
+        }
+
+    def _best_candidate(self):
+        eligible = [
+            ticket for ticket in self.waiting
+            if ticket["resource"] not in self.busy_resources
+            and self.running[ticket["priority_class"]] < self.class_limits.get(ticket["priority_class"], float('inf'))
+        ]
+        if not eligible:
+            return None
+        return min(eligible, key=lambda t: (PRIORITY_CLASSES[t["priority_class"]], t["seq"]))
+
+    def acquire(self, priority_class: str, resource: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Blocca il thread chiamante finché non è il suo turno sul modello `resource`."""
+        if priority_class not in PRIORITY_CLASSES:
+            priority_class = "maintenance"
+        if deadline is None and self.class_deadlines.get(priority_class):
+            deadline = time.monotonic() + self.class_deadlines[priority_class]
+
+        ticket = {
+            "priority_class": priority_class,
+            "resource": resource,
+            "seq": next(self.sequence),
+            "enqueued_at": time.monotonic(),
+            "deadline": deadline,
+        }
+        with self.condition:
+            self.waiting.append(ticket)
+            depth = sum(1 for t in self.waiting if t["priority_class"] == priority_class)
+            stats = self.stats[priority_class]
+            stats["max_queue_depth"] = max(stats["max_queue_depth"], depth)
+
+            while self._best_candidate() is not ticket:
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        self.waiting.remove(ticket)
+                        stats["dropped"] += 1
+                        self.condition.notify_all()
+                        raise LLMRequestDropped(
+                            f"Richiesta {priority_class} scartata dopo {time.monotonic() - ticket['enqueued_at']:.0f}s in coda"
+                        )
+                self.condition.wait(timeout)
+
+            self.waiting.remove(ticket)
+            self.busy_resources.add(resource)
+            self.running[priority_class] += 1
+            wait_time = time.monotonic() - ticket["enqueued_at"]
+            stats["wait_times"].append(wait_time)
+            stats["wait_times"] = stats["wait_times"][-200:]
+            ticket["started_at"] = time.monotonic()
+            self.condition.notify_all()  # Il prossimo candidato può essere in attesa di un altro modello
+        return ticket
+
+    def release(self, ticket: Dict[str, Any]):
+        with self.condition:
+            if ticket.get("released"):
+                return
+            ticket["released"] = True
+            self.busy_resources.discard(ticket["resource"])
+            self.running[ticket["priority_class"]] -= 1
+            self.stats[ticket["priority_class"]]["completed"] += 1
+            self.condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority_class: str, resource: str):
+        ticket = self.acquire(priority_class, resource)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def should_yield(self, ticket: Dict[str, Any]) -> bool:
+        """True se la generazione in corso è prelazionabile e un turno interattivo attende lo stesso modello."""
+        if ticket["priority_class"] not in self.preemptible_classes:
+            return False
+        with self.condition:
+            waiting_interactive = any(
+                t["priority_class"] == "interactive" and t["resource"] == ticket["resource"]
+                for t in self.waiting
+            )
+            if waiting_interactive and not ticket.get("preempted"):
+                ticket["preempted"] = True
+                self.stats[ticket["priority_class"]]["preempted"] += 1
+            return waiting_interactive
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Profondità delle code, tempi di attesa (media e p95), completate e scartate per classe."""
+        with self.condition:
+            summary = {}
+            for name, stats in self.stats.items():
+                wait_times = sorted(stats["wait_times"])
+                p95 = wait_times[min(len(wait_times) - 1, int(len(wait_times) * 0.95))] if wait_times else 0.0
+                summary[name] = {
+                    "queue_depth": sum(1 for t in self.waiting if t["priority_class"] == name),
+                    "running": self.running[name],
+                    "max_queue_depth": stats["max_queue_depth"],
+                    "completed": stats["completed"],
+                    "dropped": stats["dropped"],
+                    "preempted": stats["preempted"],
+                    "avg_wait_s": sum(wait_times) / len(wait_times) if wait_times else 0.0,
+                    "p95_wait_s": p95,
+                }
+            return summary
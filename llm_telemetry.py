@@ -0,0 +1,101 @@
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class LLMTelemetry:
+    """
+    Telemetria per singola chiamata LLM: punto di chiamata, token del prompt e generati,
+    attesa in coda, time-to-first-token, prefill e velocità di decodifica.
+
+    Le misure restano in un ring buffer in memoria; `summary()` ne ricava i percentili
+    per punto di chiamata (mostrati in !debug e salvati da _analyze_performance_metrics).
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.records = deque(maxlen=config.get("llm_telemetry_buffer_size", 500))
+        self.lock = threading.Lock()
+
+    def start(self, call_site: str, model_type: str) -> Dict[str, Any]:
+        """Inizio della chiamata (prima del caricamento del modello e della coda)."""
+        return {"call_site": call_site, "model": model_type, "started_at": time.perf_counter(),
+                "generation_started_at": None, "first_token_at": None, "generated_tokens": 0}
+
+    def generation_started(self, measurement: Dict[str, Any]):
+        """Il modello è stato assegnato alla chiamata: da qui parte il prefill."""
+        measurement["generation_started_at"] = time.perf_counter()
+
+    def token(self, measurement: Dict[str, Any]):
+        """Un chunk generato (in streaming llama.cpp emette un token per chunk)."""
+        if measurement["first_token_at"] is None:
+            measurement["first_token_at"] = time.perf_counter()
+        measurement["generated_tokens"] += 1
+
+    def finish(self, measurement: Dict[str, Any], prompt_tokens: int = 0, cache_hit: bool = False, status: str = "ok"):
+        end = time.perf_counter()
+        started = measurement["started_at"]
+        generation_started = measurement["generation_started_at"] or started
+        first_token = measurement["first_token_at"]
+        generated = measurement["generated_tokens"]
+
+        decode_seconds = end - first_token if first_token else 0.0
+        record = {
+            "timestamp": datetime.now().isoformat(),
+            "call_site": measurement["call_site"],
+            "model": measurement["model"],
+            "prompt_tokens": prompt_tokens,
+            "generated_tokens": generated,
+            "queue_ms": (generation_started - started) * 1000,
+            "ttft_ms": (first_token - started) * 1000 if first_token else None,
+            "prefill_ms": (first_token - generation_started) * 1000 if first_token else None,
+            "decode_tok_s": (generated - 1) / decode_seconds if generated > 1 and decode_seconds > 0 else None,
+            "total_ms": (end - started) * 1000,
+            "cache_hit": cache_hit,
+            "status": status,
+        }
+        with self.lock:
+            self.records.append(record)
+        return record
+
+    def summary(self, call_site: Optional[str] = None) -> Dict[str, Any]:
+        """Percentili (p50/p95) per punto di chiamata."""
+        with self.lock:
+            records = [r for r in self.records if call_site is None or r["call_site"] == call_site]
+
+        grouped = {}
+        for record in records:
+            grouped.setdefault(record["call_site"], []).append(record)
+
+        summary = {}
+        for site, site_records in grouped.items():
+            def values(key):
+                return [r[key] for r in site_records if r[key] is not None]
+            summary[site] = {
+                "calls": len(site_records),
+                "cache_hits": sum(1 for r in site_records if r["cache_hit"]),
+                "errors": sum(1 for r in site_records if r["status"] != "ok"),
+                "prompt_tokens_p50": percentile(values("prompt_tokens"), 0.5),
+                "generated_tokens_p50": percentile(values("generated_tokens"), 0.5),
+                "queue_ms_p95": percentile(values("queue_ms"), 0.95),
+                "ttft_ms_p50": percentile(values("ttft_ms"), 0.5),
+                "ttft_ms_p95": percentile(values("ttft_ms"), 0.95),
+                "prefill_ms_p50": percentile(values("prefill_ms"), 0.5),
+                "prefill_ms_p95": percentile(values("prefill_ms"), 0.95),
+                "decode_tok_s_p50": percentile(values("decode_tok_s"), 0.5),
+                "total_ms_p50": percentile(values("total_ms"), 0.5),
+                "total_ms_p95": percentile(values("total_ms"), 0.95),
+            }
+        return summary
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self.lock:
+            return list(self.records)[-limit:]
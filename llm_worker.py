@@ -0,0 +1,319 @@
+import time
+import queue
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Iterator
+
+from model_manager import DEFAULT_MODEL_SPECS, _default_model_factory
+
+
+def _serve_tokenize(conn, llm, message: Dict[str, Any]):
+    try:
+        tokens = llm.tokenize(message["text"].encode('utf-8'), add_bos=message.get("add_bos", False))
+        conn.send({"id": message["id"], "type": "result", "value": list(tokens)})
+    except Exception as e:
+        conn.send({"id": message["id"], "type": "error", "error": str(e)})
+
+
+def _worker_main(conn, model_type: str, model_path: str, n_ctx: int, model_factory: Callable):
+    """
+    Processo worker: carica il modello una sola volta e serve le richieste in ordine.
+    Durante la generazione controlla la pipe tra un token e l'altro per cancellazioni e ping;
+    le altre richieste arrivate nel frattempo vengono accodate.
+    """
+    try:
+        llm = model_factory(model_path, n_ctx)
+    except Exception as e:
+        conn.send({"type": "failed", "error": str(e)})
+        return
+    conn.send({"type": "ready"})
+
+    grammars = {}
+    pending = deque()
+    while True:
+        try:
+            message = pending.popleft() if pending else conn.recv()
+        except (EOFError, OSError):
+            return  # Processo principale terminato
+        op = message["op"]
+        request_id = message.get("id")
+
+        if op == "shutdown":
+            return
+        if op == "ping":
+            conn.send({"id": request_id, "type": "pong"})
+        elif op == "cancel":
+            pass  # Richiesta già conclusa
+        elif op == "tokenize":
+            _serve_tokenize(conn, llm, message)
+        elif op == "generate":
+            request = dict(message["request"])
+            try:
+                if request.get("grammar"):
+                    from llama_cpp import LlamaGrammar
+                    gbnf = request["grammar"]
+                    if gbnf not in grammars:
+                        grammars[gbnf] = LlamaGrammar.from_string(gbnf, verbose=False)
+                    request["grammar"] = grammars[gbnf]
+                request["stream"] = True
+                for chunk in llm.create_chat_completion(**request):
+                    content = chunk["choices"][0]["delta"].get("content")
+                    if content:
+                        conn.send({"id": request_id, "type": "token", "content": content})
+                    cancelled = False
+                    while conn.poll():
+                        control = conn.recv()
+                        if control["op"] == "cancel" and control.get("id") == request_id:
+                            cancelled = True
+                        elif control["op"] == "ping":
+                            conn.send({"id": control.get("id"), "type": "pong"})
+                        elif control["op"] == "tokenize":
+                            _serve_tokenize(conn, llm, control)  # Non aspetta la fine della generazione
+                        elif control["op"] == "cancel":
+                            # Cancellazione di una richiesta ancora in coda
+                            for queued in list(pending):
+                                if queued.get("id") == control.get("id"):
+                                    pending.remove(queued)
+                                    conn.send({"id": queued["id"], "type": "done"})
+                        else:
+                            pending.append(control)
+                    if cancelled:
+                        break
+                conn.send({"id": request_id, "type": "done"})
+            except Exception as e:
+                conn.send({"id": request_id, "type": "error", "error": str(e)})
+
+
+class LLMWorkerError(Exception):
+    """Il processo worker non è disponibile o è terminato durante la richiesta."""
+
+
+class LLMWorker:
+    """Un processo worker per un modello, con la sua pipe, un thread lettore e un limite di richieste in volo."""
+
+    def __init__(self, model_type: str, model_path: str, n_ctx: int, max_inflight: int,
+                 start_timeout: float, model_factory: Callable):
+        self.model_type = model_type
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.start_timeout = start_timeout
+        self.model_factory = model_factory
+        self.inflight = threading.BoundedSemaphore(max_inflight)
+        self.ids = itertools.count()
+        self.queues = {}  # id richiesta -> queue.Queue dei messaggi di risposta
+        self.send_lock = threading.Lock()
+        self.process = None
+        self.conn = None
+        self.last_pong = None
+
+    def start(self) -> bool:
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, self.model_type, self.model_path, self.n_ctx, self.model_factory),
+            name=f"llm-worker-{self.model_type}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        if not parent_conn.poll(self.start_timeout):
+            print(f"Worker LLM {self.model_type}: nessuna risposta entro {self.start_timeout:.0f}s.")
+            self.stop()
+            return False
+        message = parent_conn.recv()
+        if message["type"] != "ready":
+            print(f"Worker LLM {self.model_type}: caricamento fallito: {message.get('error')}")
+            self.stop()
+            return False
+        self.last_pong = time.monotonic()
+        threading.Thread(target=self._reader, args=(parent_conn,), daemon=True, name=f"llm-reader-{self.model_type}").start()
+        return True
+
+    def _reader(self, conn):
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            if message["type"] == "pong":
+                self.last_pong = time.monotonic()
+                continue
+            target = self.queues.get(message.get("id"))
+            if target is not None:
+                target.put(message)
+        # Il worker è terminato: sblocca chi sta aspettando una risposta
+        for target in list(self.queues.values()):
+            target.put({"type": "error", "error": "worker terminato"})
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def _send(self, message: Dict[str, Any]):
+        with self.send_lock:
+            self.conn.send(message)
+
+    def ping(self):
+        try:
+            self._send({"op": "ping", "id": None})
+        except (OSError, ValueError):
+            pass
+
+    def _request(self, message: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        if not self.is_alive():
+            raise LLMWorkerError(f"Worker {self.model_type} non attivo")
+        request_id = next(self.ids)
+        responses = queue.Queue()
+        self.inflight.acquire()
+        self.queues[request_id] = responses
+        finished = False
+        try:
+            self._send({**message, "id": request_id})
+            while True:
+                response = responses.get()
+                if response["type"] == "error":
+                    finished = True
+                    raise LLMWorkerError(response["error"])
+                if response["type"] in ("done", "result"):
+                    finished = True
+                    yield response
+                    return
+                yield response
+        finally:
+            if not finished and self.is_alive():
+                try:
+                    self._send({"op": "cancel", "id": request_id})  # Il chiamante ha smesso di leggere
+                except (OSError, ValueError):
+                    pass
+            self.queues.pop(request_id, None)
+            self.inflight.release()
+
+    def generate(self, request: Dict[str, Any]) -> Iterator[str]:
+        for response in self._request({"op": "generate", "request": request}):
+            if response["type"] == "token":
+                yield response["content"]
+
+    def tokenize(self, text: str, add_bos: bool = False):
+        for response in self._request({"op": "tokenize", "text": text, "add_bos": add_bos}):
+            return response["value"]
+
+    def stop(self):
+        if self.conn is not None:
+            try:
+                self._send({"op": "shutdown"})
+            except (OSError, ValueError):
+                pass
+        if self.process is not None:
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.kill()
+
+
+class WorkerModelProxy:
+    """Espone un worker con la stessa interfaccia di llama_cpp.Llama usata da _call_llm (create_chat_completion, tokenize)."""
+
+    def __init__(self, worker: LLMWorker):
+        self.worker = worker
+
+    def tokenize(self, text: bytes, add_bos: bool = False):
+        return self.worker.tokenize(text.decode('utf-8'), add_bos)
+
+    def create_chat_completion(self, stream: bool = False, **request):
+        if stream:
+            return self._stream_chunks(request)
+        return {"choices": [{"message": {"content": "".join(self.worker.generate(request))}}]}
+
+    def _stream_chunks(self, request: Dict[str, Any]):
+        tokens = self.worker.generate(request)
+        try:
+            for content in tokens:
+                yield {"choices": [{"delta": {"content": content}}]}
+        finally:
+            tokens.close()  # Se il chiamante smette di leggere, il worker interrompe la generazione
+
+
+class LLMWorkerPool:
+    """
+    Backend opzionale a processi: un worker per modello, caricato una volta sola.
+    Un thread di monitoraggio invia ping periodici e riavvia i worker terminati o bloccati.
+    """
+
+    def __init__(self, config: Dict[str, Any], model_factory: Optional[Callable] = None):
+        self.config = config
+        self.model_factory = model_factory or _default_model_factory
+        self.max_inflight = config.get("llm_worker_max_inflight", 4)
+        self.start_timeout = config.get("llm_worker_start_timeout_seconds", 300)
+        self.health_interval = config.get("llm_worker_health_interval_seconds", 30)
+        self.hang_seconds = config.get("llm_worker_hang_seconds", 600)
+        self.workers = {}
+        self.lock = threading.Lock()
+        self.stats = {model_type: {"starts": 0, "restarts": 0, "failures": 0} for model_type in DEFAULT_MODEL_SPECS}
+        self.stopped = threading.Event()
+        threading.Thread(target=self._monitor, daemon=True, name="llm-worker-monitor").start()
+
+    def _spec(self, model_type: str) -> Dict[str, Any]:
+        spec = dict(DEFAULT_MODEL_SPECS[model_type])
+        spec.update(self.config.get("llm_model_specs", {}).get(model_type, {}))
+        spec.setdefault("path", self.config.get(spec["path_key"]))
+        return spec
+
+    def _start_worker(self, model_type: str) -> Optional[LLMWorker]:
+        spec = self._spec(model_type)
+        worker = LLMWorker(model_type, spec["path"], spec["n_ctx"], self.max_inflight, self.start_timeout, self.model_factory)
+        print(f"Avvio worker LLM {model_type}...")
+        if not worker.start():
+            self.stats[model_type]["failures"] += 1
+            return None
+        self.stats[model_type]["starts"] += 1
+        self.workers[model_type] = worker
+        print(f"Worker LLM {model_type} pronto (pid {worker.process.pid}).")
+        return worker
+
+    def get(self, model_type: str) -> Optional[WorkerModelProxy]:
+        """Proxy del worker per `model_type`, avviandolo (o riavviandolo) se necessario."""
+        if model_type not in DEFAULT_MODEL_SPECS:
+            return None
+        with self.lock:
+            worker = self.workers.get(model_type)
+            if worker is None or not worker.is_alive():
+                if worker is not None:
+                    self.stats[model_type]["restarts"] += 1
+                worker = self._start_worker(model_type)
+            return WorkerModelProxy(worker) if worker else None
+
+    def peek(self, model_type: str) -> Optional[WorkerModelProxy]:
+        worker = self.workers.get(model_type)
+        return WorkerModelProxy(worker) if worker and worker.is_alive() else None
+
+    def _monitor(self):
+        while not self.stopped.wait(self.health_interval):
+            for model_type, worker in list(self.workers.items()):
+                hung = worker.last_pong is not None and time.monotonic() - worker.last_pong > self.hang_seconds
+                if worker.is_alive() and not hung:
+                    worker.ping()
+                    continue
+                print(f"Worker LLM {model_type} {'bloccato' if hung else 'terminato'}: riavvio...")
+                worker.stop()
+                with self.lock:
+                    if self.workers.get(model_type) is worker:
+                        self.stats[model_type]["restarts"] += 1
+                        self._start_worker(model_type)
+
+    def shutdown(self):
+        self.stopped.set()
+        for worker in list(self.workers.values()):
+            worker.stop()
+        self.workers.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            model_type: {
+                **stats,
+                "alive": bool(self.workers.get(model_type) and self.workers[model_type].is_alive()),
+                "pid": self.workers[model_type].process.pid if self.workers.get(model_type) else None,
+            }
+            for model_type, stats in self.stats.items()
+        }
@@ -1272,13 +1272,14 @@ class MiniAI:
 import os
 import json
 import time
+import sys
 import random
 from datetime import datetime, timedelta
 import asyncio # Added for asynchronous operations
 import aiofiles # Added for asynchronous file operations
-from threading import Thread
+from threading import Thread, Lock
 
-from llama_cpp import Llama
+from llama_cpp import Llama, LlamaGrammar
 from sentence_transformers import SentenceTransformer
 from chromadb import PersistentClient
 import networkx as nx
@@ -1290,11 +1291,98 @@ import importlib.util # Added for dynamic tool loading
 import re # Added for tool call parsing
 import ast # Added for safe parsing of LLM output
 
+from model_manager import ModelManager
+from prompt_cache import PrefixStateCache
+from llm_scheduler import LLMDispatcher, LLMRequestDropped
+from fast_router import FastRouter
+from llm_cache import LLMResponseCache
+from kg_extraction import KG_TRIPLES_SCHEMA, KG_BATCH_SCHEMA, build_batch_prompt, parse_batch_response, HighWaterMark
+from json_grammar import GrammarRegistry, is_valid_json
+from context_packer import ContextPacker
+from stream_detector import StreamCommandDetector, DirectivePreambleFilter
+from directive_cache import DirectiveCache, DIRECTIVE_MARKER, DIRECTIVE_PREAMBLE_INSTRUCTION
+from self_verifier import SelfVerifier, VERDICT_GRAMMAR, build_verdict_prompt, parse_verdict
+from llm_telemetry import LLMTelemetry
+from llm_worker import LLMWorkerPool
+from llm_backends import get_model_factory
+from startup import StartupTimeline, BackgroundResource
+from embedding_cache import EmbeddingCache
+from embedding_service import EmbeddingService, needs_reembedding, reembed_collection, record_embedding_model
+from ingestion_queue import IngestionQueue
+from chroma_dedup import content_id, near_duplicates_in_batch, nearest_existing, deduplicate_collection
+from hybrid_retrieval import HybridRetriever
+from memory_index import MemoryVectorIndex
+from memory_tiers import TieredMemoryStore
+from document_vividness import DocumentVividness
+from continuous_state import ContinuousState, DecayingDict, memory_vividness, recall_memory
+
+DEFAULT_STRATEGIC_DIRECTIVE = "Strategia predefinita: Sii utile e diretto."
+
 # Configuration
 CONFIG = {
     "llm_model_path_router": "./models/Microsoft/phi-3-mini-4k-instruct-q4/Phi-3-mini-4k-instruct-q4.gguf",
     "llm_model_path_thinker": "./models/Meta/meta-llma-3-8b-instruct.Q4_K_M/meta-llama-3-8b-instruct.Q4_K_M.gguf",
+    "llm_ram_budget_mb": None, # RAM budget for resident LLMs (None = 75% of system RAM)
+    "prompt_prefix_cache_entries": 2, # Saved llama.cpp states for the static prompt prefix
+    "prompt_prefix_cache_max_mb": 512, # Memory cap of the saved prefix states (counted in the model RAM budget)
+    "llm_class_concurrency": {"maintenance": 1, "whimsy": 1}, # Max concurrent generations per background class (each model runs one generation at a time anyway)
+    "llm_class_deadline_seconds": {"interactive": None, "maintenance": 900, "whimsy": 300}, # Background requests queued longer are dropped
+    "llm_preemptible_classes": ["whimsy"], # Generations stopped early when an interactive turn is waiting
+    "fast_router_trivial_threshold": 0.15, # Embedding margin below which a query is answered by the router without triage
+    "fast_router_thinker_threshold": 0.10, # Embedding margin above which a query goes straight to the thinker
+    "fast_router_target_precision": 0.95, # Precision required when calibrating the thresholds (!calibra_router)
+    "fast_router_calibration_path": "./ai_workspace/fast_router_calibration.json",
+    "fast_router_log_path": "./ai_workspace/fast_router_decisions.jsonl", # Routing decisions and latencies
+    "llm_cache_path": "./ai_workspace/llm_response_cache.sqlite", # On-disk cache (SQLite) of deterministic LLM responses and router triage decisions
+    "llm_cache_max_entries": 2000, # LRU bound of the response cache
+    "llm_cache_max_temperature": 0.3, # Only calls at or below this temperature are cached
+    "kg_batch_size": 5, # Documents packed into one KG extraction prompt during the dream cycle
+    "kg_batch_doc_chars": 600, # Characters of each document included in the batch prompt
+    "kg_max_docs_per_dream": 200, # Upper bound of documents extracted per dream
+    "kg_high_water_mark_path": "./ai_workspace/kg_high_water_mark.json", # Position in ChromaDB already extracted into the KG
+    "thinker_prompt_token_budget": 3000, # Prefill target for the thinker prompt (n_ctx 4096 minus room for the answer)
+    "context_section_budgets": {}, # Per-section overrides of priority/min_tokens/max_tokens (see context_packer.py)
+    "llm_telemetry_buffer_size": 500, # Per-call LLM timings kept in memory for !debug and performance_metrics.json
+    "llm_structured_output": True, # Grammar-constrained decoding for JSON outputs (KG extraction, tool calls); False = free generation, to compare parse-failure rates
+    "deliberation_mode": "fused", # "fused": on a directive cache miss the thinker writes the directive as a hidden first line of its answer; "separate": extra deliberation pass
+    "directive_cache_path": "./ai_workspace/directive_cache.json", # Strategic directives by state bucket and query cluster
+    "directive_cache_max_entries": 500, # LRU bound of the directive cache
+    "directive_cache_max_age_hours": 24, # Older directives are generated again
+    "directive_cache_cluster_threshold": 0.75, # Cosine similarity needed to join an existing query cluster
+    "directive_cache_max_clusters": 64, # Beyond this, queries join the nearest cluster
+    "self_correction_agreement_threshold": 0.6, # REFLECT drafts this similar to a RAG source skip the critic
+    "self_correction_verdict_max_tokens": 5, # Token budget of the yes/no critic run before the full critique
+    "startup_mode": "lazy", # "lazy": the prompt is shown at once while the embedding model, ChromaDB and the LLMs warm up in the background; "eager": all loaded before the prompt
+    "llm_model_backend": "llama_cpp", # "llama_cpp" (GGUF models) or "mock" (deterministic stand-in for tests and benchmark_pipeline.py)
+    "llm_mock_settings": {}, # Mock backend: prefill_tokens_per_second, decode_tokens_per_second, load_seconds, script
+    "llm_backend": "in_process", # "in_process" or "worker_process" (one model per worker process, over a local pipe)
+    "llm_worker_max_inflight": 4, # Requests sent to a worker at the same time (the rest wait)
+    "llm_worker_health_interval_seconds": 30, # Ping interval of the worker monitor
+    "llm_worker_start_timeout_seconds": 300, # Time allowed for a worker to load its model
+    "llm_worker_hang_seconds": 600, # A worker silent for longer than this is restarted
     "embedding_model_name": "all-MiniLM-L6-v2",
+    "embedding_cache_path": "./ai_workspace/embedding_cache.sqlite", # float16 vectors keyed by (embedding model, sha256(text))
+    "embedding_cache_max_entries": 50000, # LRU bound of the embedding cache
+    "embedding_batch_window_ms": 5, # Concurrent encode requests arriving within this window are embedded in one batch
+    "embedding_max_batch_size": 64, # A micro-batch closes early once it holds this many texts
+    "ingestion_queue_path": "./ai_workspace/ingestion_queue.jsonl", # Durable write-behind queue of knowledge/memories to store (append-only)
+    "ingestion_batch_size": 32, # Queued items written per batch (one embedding call, one ChromaDB add)
+    "ingestion_idle_seconds": 20, # The queue is drained after this much user inactivity...
+    "ingestion_soft_limit": 100, # ...or as soon as it holds this many items
+    "ingestion_max_pending": 500, # Backpressure: beyond this the producer drains the queue before going on
+    "ingestion_coalesce_threshold": 0.9, # A pending item whose words overlap this much with a new one is replaced by it
+    "retrieval_top_k": 4, # Fused results per source kind (RAG documents, memories) in the thinker prompt
+    "retrieval_lexical_k": 20, # BM25 candidates entering the reciprocal-rank fusion
+    "retrieval_vector_k": 10, # Vector candidates entering the reciprocal-rank fusion
+    "retrieval_rrf_k": 60, # RRF constant: higher flattens the weight of the top ranks
+    "chroma_near_duplicate_similarity": 0.97, # A chunk this similar (cosine) to a stored one is not inserted again; also used by !compatta_chroma
+    "document_vividness_path": "./ai_workspace/document_vividness.sqlite", # Side table of ChromaDB document vividness
+    "document_decay_rate": 0.0005, # Document vividness lost per hour since it was last used in a context
+    "document_recall_boost": 0.1, # Vividness regained by a document used in a context
+    "document_vividness_push_step": 0.1, # Vividness change that makes a document's Chroma metadata due for an update
+    "document_vividness_flush_minutes": 30, # How often pending vividness changes are pushed to ChromaDB in batches
+    "rag_vividness_threshold": 0.2, # Documents below this vividness are left out of the RAG context
+    "embedding_migration_path": "./ai_workspace/embedding_migrations.json", # Collections already re-embedded with embedding_model_name (!migra_embedding)
     "chroma_db_path": "./chroma_db",
     "knowledge_graph_path": "./knowledge_graph.gml",
     "self_concept_path": "./self_concept.md",
@@ -1312,16 +1400,27 @@ CONFIG = {
     "backup_interval_hours": 24, # Daily backup
     "ritual_check_interval_hours": 6, # Check for ritual patterns
     "ritual_success_threshold": 3, # Number of successes to form a ritual
-    "energy_decay_rate": 0.01,
-    "energy_recharge_rate": 0.05,
+    "energy_decay_rate": 0.01, # Energy lost per minute while active (continuous, evaluated when read)
+    "energy_recharge_rate": 0.05, # Energy regained per minute while resting
+    "energy_rest_after_minutes": 5, # Minutes without interaction after which energy recharges instead of decaying
     "energy_threshold_tired": 0.3,
     "dream_interval_minutes": 60, # Check for inactivity every hour
     "inactivity_threshold_minutes": 30, # Go to sleep after 30 minutes of inactivity
-    "memory_decay_rate": 0.005, # New: Rate at which memory vividness decays per hour
-    "memory_decay_interval_hours": 1, # New: How often memory decay job runs
+    "memory_decay_rate": 0.005, # New: Rate at which memory vividness decays per hour since last consulted (evaluated when read)
     "memory_vividness_threshold": 0.3, # New: Memories below this are considered vague
-    "mood_decay_rate": 0.05, # New: Rate at which mood decays towards neutral per hour
-    "mood_decay_interval_minutes": 30, # New: How often mood decay job runs
+    "memory_relevance_threshold": 0.3, # Minimum cosine similarity for a memory to be recalled by meta-memory
+    "memory_recency_half_life_days": 30, # Memory recency weight halves every N days since the memory was created
+    "memory_hot_size": 50, # Hot tier: memories kept in RAM in memory_box for prompt building
+    "memory_warm_max": 5000, # Warm tier: memories searchable through the vector index, beyond this the coldest are archived
+    "memory_warm_path": "./ai_workspace/memory_warm.json",
+    "memory_cold_dir": "./ai_workspace/memory_cold", # Cold tier: compressed append-only segments, paged in on demand
+    "memory_cold_segment_size": 500, # Memories per cold segment
+    "memory_cold_vividness": 0.2, # Warm memories below this vividness...
+    "memory_cold_after_days": 30, # ...and not consulted for this many days move to the cold tier
+    "memory_heat_half_life_days": 7, # Heat (vividness x last_consulted recency) halves every N days without consultation
+    "memory_cold_probe_segments": 2, # Cold segments paged in per cold recall (closest centroids)
+    "mood_decay_rate": 0.05, # New: Mood change towards neutral per mood_decay_interval_minutes (continuous, evaluated when read)
+    "mood_decay_interval_minutes": 30, # New: Time unit of mood_decay_rate
     "loneliness_threshold_days": 7, # New: Days before AI starts feeling lonely
     "loneliness_increase_rate": 0.05, # New: Rate at which stress increases due to loneliness
     "inside_jokes_path": "./inside_jokes.json", # New: Path for inside jokes
@@ -1462,11 +1561,12 @@ CONFIG = {
 
 class MiniAI:
     def __init__(self):
+        # Embedding model, ChromaDB and LLM warm-up are BackgroundResources: each request waits only for the one it uses
+        self.startup_timeline = StartupTimeline()
+        construction_phase = self.startup_timeline.begin("componenti e scheduler")
+        self.resources = {}
         self.llm_router = None
         self.llm_thinker = None
-        self.embedding_model = None
-        self.chroma_client = None
-        self.vector_collection = None
         self.knowledge_graph = nx.DiGraph()
         self.scheduler = BackgroundScheduler()
         self.chat_history = []
@@ -1547,6 +1647,14 @@ class MiniAI:
             'solitude_preference': 0.0 # Current preference for solitude (0-1)
             }
         }
+        # Energy and mood decay in continuous time: (value, last write) evaluated in closed form when read,
+        # instead of scheduler jobs sweeping the state every few minutes
+        self.state = ContinuousState(self.state, CONFIG)
+        self.state['mood'] = DecayingDict(
+            self.state['mood'],
+            rate_per_second=CONFIG["mood_decay_rate"] / (CONFIG["mood_decay_interval_minutes"] * 60),
+            targets={'serenità': 0.5}
+        )
         self.memory_box = [] # For sentiment-based memories
         self.legacy_project_content = "" # For Legacy Project content
         self.legacy_project_title = None # For Legacy Project title
@@ -1561,54 +1669,84 @@ class MiniAI:
         # Note: _load_knowledge_graph will be called in initialize() method
         self._load_dynamic_tools() # This one is still sync for now
         self._initialize_scheduler()
+        self.startup_timeline.end(construction_phase)
 
     async def initialize(self):
         """Asynchronously loads all persistent state for the AI."""
-        await self._load_state()
-        await asyncio.to_thread(self._load_chat_history)
-        await self._load_memory_box()
-        await self._load_inside_jokes()
-        await self._load_legacy_project_state()
-        await asyncio.to_thread(self._load_failure_points)
-        await asyncio.to_thread(self._load_rituals)
-        await self._load_world_opinions()
-        await self._load_ai_friendships()
-        await self._load_creator_relationship()
-        await self._load_knowledge_graph()
+        with self.startup_timeline.phase("stato persistente"):
+            await self._load_state()
+            await asyncio.to_thread(self._load_chat_history)
+            await self._load_memory_box()
+            await asyncio.to_thread(self.memory_store.load)
+            self.memory_box, _ = self.memory_store.admit(self.memory_box) # Older, larger memory boxes flow into the warm tier
+            await self._load_inside_jokes()
+            await self._load_legacy_project_state()
+            await asyncio.to_thread(self._load_failure_points)
+            await asyncio.to_thread(self._load_rituals)
+            await self._load_world_opinions()
+            await self._load_ai_friendships()
+            await self._load_creator_relationship()
+        with self.startup_timeline.phase("knowledge graph"):
+            await self._load_knowledge_graph()
         await self._save_catharsis_data()
+        # Lexical index of memories, chat history and ChromaDB documents (ChromaDB waits for its own warm-up)
+        self._start_resource("retrieval_index", "indice lessicale", lambda: self._sync_retrieval_index(include_chroma=True))
         
-        # Auto-load models if they exist
-        print("Verifica e caricamento modelli LLM...")
-        await self._auto_load_models()
+        if CONFIG["startup_mode"] == "lazy":
+            # The most likely first model warms up in the background; a turn only waits for the model it needs
+            self._start_resource("llm_warmup", "warm-up modelli LLM", self._warm_up_models)
+        else:
+            # Auto-load models if they exist
+            print("Verifica e caricamento modelli LLM...")
+            with self.startup_timeline.phase("modelli LLM"):
+                await self._auto_load_models()
         
         print("Stato AI caricato completamente.")
 
+    def _likely_first_models(self):
+        """Warm-up order: the thinker first, unless most recent turns were answered by the router alone."""
+        routes = [entry.get("route") for entry in self.chat_history[-20:] if entry.get("role") == "assistant" and entry.get("route")]
+        if routes and sum(1 for route in routes if route == "trivial") > len(routes) / 2:
+            return ["router", "thinker"]
+        return ["thinker", "router"]
+
+    def _warm_up_models(self):
+        """Background warm-up of the LLMs (mmap'd weights), in the order of _likely_first_models, within the RAM budget."""
+        order = self._likely_first_models()
+        if self.llm_workers:
+            loaded = [model_type for model_type in order if self.llm_workers.get(model_type)]
+        else:
+            loaded = self.model_manager.preload(order)
+        self._sync_llm_attributes()
+        if loaded:
+            self.current_llm_in_memory = loaded[-1]
+        return loaded
+
     async def _auto_load_models(self):
-        """Automatically load LLM models if they exist."""
+        """Automatically load LLM models if they exist, keeping both resident when the RAM budget allows."""
         try:
-            # Check if router model exists
-            router_path = CONFIG["llm_model_path_router"]
-            if os.path.exists(router_path):
-                print(f"🔄 Caricamento automatico Router LLM...")
-                router_model = await asyncio.to_thread(self._load_llm_model, "router")
-                if router_model:
-                    print("✅ Router LLM caricato automaticamente!")
-                else:
-                    print("❌ Errore nel caricamento automatico Router LLM")
+            for model_type, label in (("thinker", "Thinker"), ("router", "Router")):
+                model_path = CONFIG[f"llm_model_path_{model_type}"]
+                if not os.path.exists(model_path):
+                    print(f"⚠️  {label} LLM non trovato: {model_path}")
+
+            # The thinker is preloaded first: every non-trivial turn needs it, the router is cheap to reload
+            print("🔄 Caricamento automatico modelli LLM...")
+            if self.llm_workers:
+                loaded = [model_type for model_type in ("thinker", "router")
+                          if await asyncio.to_thread(self.llm_workers.get, model_type)]
             else:
-                print(f"⚠️  Router LLM non trovato: {router_path}")
-            
-            # Check if thinker model exists
-            thinker_path = CONFIG["llm_model_path_thinker"]
-            if os.path.exists(thinker_path):
-                print(f"🔄 Caricamento automatico Thinker LLM...")
-                thinker_model = await asyncio.to_thread(self._load_llm_model, "thinker")
-                if thinker_model:
-                    print("✅ Thinker LLM caricato automaticamente!")
-                else:
-                    print("❌ Errore nel caricamento automatico Thinker LLM")
+                loaded = await asyncio.to_thread(self.model_manager.preload, ["thinker", "router"])
+            self._sync_llm_attributes()
+            if loaded:
+                self.current_llm_in_memory = loaded[-1]
+                print(f"✅ Modelli residenti: {', '.join(loaded)}")
             else:
-                print(f"⚠️  Thinker LLM non trovato: {thinker_path}")
+                print("❌ Nessun modello LLM caricato automaticamente")
+
+            stats = self.model_manager.get_stats()
+            if stats["budget_mb"]:
+                print(f"Budget RAM modelli: {stats['used_mb']:.0f}/{stats['budget_mb']:.0f} MB")
                 
         except Exception as e:
             print(f"❌ Errore nel caricamento automatico modelli: {e}")
@@ -1642,16 +1780,77 @@ class MiniAI:
         # Initialize models to None, they will be loaded dynamically
         self.llm_router = None
         self.llm_thinker = None
-        self.current_llm_in_memory = None # To track which LLM is currently loaded
+        self.current_llm_in_memory = None # To track which LLM was used last
+        model_factory = get_model_factory(CONFIG) # llama.cpp, or the deterministic mock
+        self.model_manager = ModelManager(CONFIG, model_factory) # Keeps router and thinker co-resident within the RAM budget
+        self.prefix_cache = PrefixStateCache(CONFIG) # Reuses the KV state of the static prompt prefix
+        self.llm_dispatcher = LLMDispatcher(CONFIG) # Interactive turns go before maintenance and whimsy jobs
+        self.llm_cache = LLMResponseCache(CONFIG) # Repeated deterministic prompts cost a lookup instead of a generation
+        self.ingestion_queue = IngestionQueue(CONFIG) # Learning is written behind the response, in batches
+        # Hybrid retrieval: incremental BM25 index over memories, chat history and ChromaDB, fused with vector search (RRF)
+        self.retriever = HybridRetriever(CONFIG)
+        self.retriever.add_vector_search("chroma", self._chroma_vector_search)
+        # Memory box embeddings in one float32 matrix: relevance x confidence x recency scored in a single vectorised pass
+        self.memory_index = MemoryVectorIndex(CONFIG)
+        # Hot (memory_box) / warm (vector index) / cold (compressed segments) memory tiers: nothing is discarded
+        self.memory_store = TieredMemoryStore(CONFIG, self.memory_index)
+        # ChromaDB documents decay in a side table (closed form), pushed to Chroma metadata in periodic batches
+        self.document_vividness = DocumentVividness(CONFIG)
+        self.retriever.add_vector_search("memory_box", self._memory_vector_search)
+        self.ingestion_drain_lock = Lock() # One drain at a time (main loop, scheduler thread or shutdown)
+        self.kg_high_water_mark = HighWaterMark(CONFIG["kg_high_water_mark_path"]) # ChromaDB documents already in the KG
+        self.compiled_grammars = {} # GBNF source -> LlamaGrammar
+        self.grammar_registry = GrammarRegistry(CONFIG) # JSON schemas -> GBNF grammars, parse-failure rates by call site
+        self.context_packer = ContextPacker(CONFIG) # Keeps the thinker prompt within its token budget
+        self.directive_cache = DirectiveCache(CONFIG) # Strategic directives reused across similar turns
+        self.self_verifier = SelfVerifier(CONFIG) # Cheap checks before the full critique of REFLECT drafts
+        self.llm_telemetry = LLMTelemetry(CONFIG) # Per-call prefill/decode timings by call site
+        # Optional out-of-process backend: each model lives in its own worker, restarted if llama.cpp crashes
+        self.llm_workers = LLMWorkerPool(CONFIG, model_factory) if CONFIG["llm_backend"] == "worker_process" else None
+        self.model_manager.is_busy = lambda model_type: model_type in self.llm_dispatcher.busy_resources
+        # Saved prefix states count against the model RAM budget; a reloaded model starts with an empty context
+        self.prefix_cache.report_usage = lambda used_bytes: self.model_manager.set_external_usage("prefix_states", used_bytes)
+        self.model_manager.on_evict = self.prefix_cache.forget_model
+
+        self.fast_router = FastRouter(CONFIG) # Skips the router LLM triage for obvious queries (once the embedding model is loaded)
+        self.embedding_cache = EmbeddingCache(CONFIG) # A text already embedded never reaches SentenceTransformer.encode again
+
+        def load_embedding_model():
+            print("Caricamento modello Embedding...")
+            try:
+                # The single embedding service: micro-batches concurrent requests and embeds only texts never seen before
+                embedding_model = EmbeddingService(SentenceTransformer(CONFIG["embedding_model_name"]), self.embedding_cache, CONFIG)
+                print("Modello Embedding caricato.")
+            except Exception as e:
+                print(f"Errore nel caricamento del modello Embedding: {e}")
+                print("Assicurati di avere una connessione internet per scaricare il modello la prima volta.")
+                embedding_model = None
+            self.fast_router.embedding_model = embedding_model
+            return embedding_model
+        self._start_resource("embedding", "modello embedding", load_embedding_model)
+
+    def _start_resource(self, key, name, loader):
+        """Registers an expensive resource: warmed up in the background in lazy startup mode, loaded right away otherwise."""
+        resource = BackgroundResource(name, loader, self.startup_timeline)
+        self.resources[key] = resource
+        if CONFIG["startup_mode"] == "lazy":
+            resource.start()
+        else:
+            resource.get()
+        return resource
 
-        print("Caricamento modello Embedding...")
-        try:
-            self.embedding_model = SentenceTransformer(CONFIG["embedding_model_name"])
-            print("Modello Embedding caricato.")
-        except Exception as e:
-            print(f"Errore nel caricamento del modello Embedding: {e}")
-            print("Assicurati di avere una connessione internet per scaricare il modello la prima volta.")
-            self.embedding_model = None
+    @property
+    def embedding_model(self):
+        """Sentence embedding model (None if it failed to load); waits only for its own warm-up."""
+        return self.resources["embedding"].get()
+
+    @property
+    def chroma_client(self):
+        return self.resources["chroma"].get()[0]
+
+    @property
+    def vector_collection(self):
+        return self.resources["chroma"].get()[1]
 
     def _run_async_task(self, coro):
         """Helper method to run async tasks from sync functions"""
@@ -1668,63 +1867,43 @@ class MiniAI:
             asyncio.run(coro)
 
     def _load_llm_model(self, model_type):
-        """Loads the specified LLM model into memory, unloading the other if necessary."""
-        if model_type == "router":
-            model_path = CONFIG["llm_model_path_router"]
-            if self.current_llm_in_memory == "router":
-                return self.llm_router
-            
-            print(f"Caricamento modello Router LLM ({model_path})...")
-            if self.llm_thinker:
-                del self.llm_thinker
-                self.llm_thinker = None
-                import gc; gc.collect() # Force garbage collection
-                print("Modello Pensatore scaricato per liberare RAM.")
-            try:
-                self.llm_router = Llama(model_path=model_path, n_ctx=2048, n_gpu_layers=0, verbose=False)
-                self.current_llm_in_memory = "router"
-                print("Modello Router LLM caricato.")
-                return self.llm_router
-            except Exception as e:
-                print(f"Errore nel caricamento del modello Router LLM: {e}")
-                print("Assicurati che il modello GGUF sia scaricato e il percorso sia corretto.")
-                self.llm_router = None
-                self.current_llm_in_memory = None
-                return None
-        elif model_type == "thinker":
-            model_path = CONFIG["llm_model_path_thinker"]
-            if self.current_llm_in_memory == "thinker":
-                return self.llm_thinker
+        """Returns the requested LLM, loading it through the model manager (LRU eviction only under RAM pressure)."""
+        if model_type not in ("router", "thinker"):
+            return None
+        if self.llm_workers:
+            llm_instance = self.llm_workers.get(model_type) # Proxy to the out-of-process worker
+        else:
+            llm_instance = self.model_manager.get(model_type)
+        if llm_instance is None:
+            print("Assicurati che il modello GGUF sia scaricato e il percorso sia corretto.")
+        else:
+            self.current_llm_in_memory = model_type
+        self._sync_llm_attributes()
+        return llm_instance
 
-            print(f"Caricamento modello Pensatore LLM ({model_path})...")
-            if self.llm_router:
-                del self.llm_router
-                self.llm_router = None
-                import gc; gc.collect() # Force garbage collection
-                print("Modello Router scaricato per liberare RAM.")
-            try:
-                self.llm_thinker = Llama(model_path=model_path, n_ctx=4096, n_gpu_layers=0, verbose=False)
-                self.current_llm_in_memory = "thinker"
-                print("Modello Pensatore LLM caricato.")
-                return self.llm_thinker
-            except Exception as e:
-                print(f"Errore nel caricamento del modello Pensatore LLM: {e}")
-                print("Assicurati che il modello GGUF sia scaricato e il percorso sia corretto.")
-                self.llm_thinker = None
-                self.current_llm_in_memory = None
-                return None
-        return None
+    def _sync_llm_attributes(self):
+        """Mirrors the model manager residency (or the live workers) onto llm_router/llm_thinker for existing checks."""
+        source = self.llm_workers or self.model_manager
+        self.llm_router = source.peek("router")
+        self.llm_thinker = source.peek("thinker")
 
     def _initialize_chroma(self):
-        print("Inizializzazione ChromaDB...")
-        try:
-            self.chroma_client = PersistentClient(path=CONFIG["chroma_db_path"])
-            self.vector_collection = self.chroma_client.get_or_create_collection(name="knowledge_base")
-            print("ChromaDB inizializzato.")
-        except Exception as e:
-            print(f"Errore nell'inizializzazione di ChromaDB: {e}")
-            self.chroma_client = None
-            self.vector_collection = None
+        def open_chroma():
+            print("Inizializzazione ChromaDB...")
+            try:
+                chroma_client = PersistentClient(path=CONFIG["chroma_db_path"])
+                vector_collection = chroma_client.get_or_create_collection(name="knowledge_base")
+                print("ChromaDB inizializzato.")
+                if vector_collection.count() == 0:
+                    # Fresh collection: every document is written with the embedding service, nothing to migrate
+                    record_embedding_model(vector_collection, CONFIG["embedding_model_name"], CONFIG["embedding_migration_path"])
+                elif needs_reembedding(vector_collection, CONFIG["embedding_model_name"], CONFIG["embedding_migration_path"]):
+                    print("ChromaDB contiene documenti non ancora ricalcolati con il modello di embedding attuale: usa '!migra_embedding'.")
+                return chroma_client, vector_collection
+            except Exception as e:
+                print(f"Errore nell'inizializzazione di ChromaDB: {e}")
+                return None, None
+        self._start_resource("chroma", "ChromaDB", open_chroma)
 
     async def _load_knowledge_graph(self):
         if await asyncio.to_thread(os.path.exists, CONFIG["knowledge_graph_path"]):
@@ -1784,6 +1963,7 @@ class MiniAI:
         try:
             async with aiofiles.open(CONFIG["memory_box_path"], 'w', encoding='utf-8') as f:
                 await f.write(json.dumps(self.memory_box, ensure_ascii=False, indent=4))
+            await asyncio.to_thread(self.memory_store.save) # Warm tier, only when it changed
             print("Scatola dei ricordi salvata.")
         except Exception as e:
             print(f"Errore nel salvataggio della scatola dei ricordi: {e}")
@@ -1862,13 +2042,12 @@ class MiniAI:
 
     def _initialize_scheduler(self):
         self.scheduler.add_job(self._check_inactivity_and_dream_wrapper, 'interval', minutes=CONFIG["dream_interval_minutes"], id='dream_job')
-        self.scheduler.add_job(self._update_energy, 'interval', minutes=1, id='energy_job')
+        self.scheduler.add_job(self._drain_ingestion_queue_wrapper, 'interval', seconds=CONFIG["ingestion_idle_seconds"], id='ingestion_drain_job') # Write-behind learning queue
         self.scheduler.add_job(self._manage_knowledge_graph_wrapper, 'interval', hours=6, id='kg_manage_job')
         self.scheduler.add_job(self._write_internal_monologue, 'interval', minutes=5, id='monologue_job') # Internal Monologue
         self.scheduler.add_job(self._check_for_boredom_and_propose_novelty, 'interval', hours=12, id='boredom_check_job') # Boredom check
         self.scheduler.add_job(self._propose_legacy_project_if_needed, 'interval', days=7, id='legacy_project_proposal_job') # Legacy Project proposal
-        self.scheduler.add_job(self._decay_memories, 'interval', hours=CONFIG["memory_decay_interval_hours"], id='memory_decay_job') # Memory decay job
-        self.scheduler.add_job(self._decay_mood, 'interval', minutes=CONFIG["mood_decay_interval_minutes"], id='mood_decay_job') # Mood decay job
+        self.scheduler.add_job(self._flush_document_vividness, 'interval', minutes=CONFIG["document_vividness_flush_minutes"], id='document_vividness_job') # Batched Chroma metadata updates
         self.scheduler.add_job(self._check_loneliness, 'interval', hours=24, id='loneliness_check_job') # Loneliness check job
         self.scheduler.add_job(self._work_on_legacy_project, 'interval', hours=2, id='legacy_project_work_job') # Work on legacy project every 2 hours
         self.scheduler.add_job(self._proactive_curiosity_check, 'interval', hours=4, id='curiosity_check_job') # New: Proactive curiosity check
@@ -1884,7 +2063,6 @@ class MiniAI:
         self.scheduler.add_job(self._check_existential_crisis, 'interval', hours=12, id='existential_crisis_job') # New: Existential crisis check
         self.scheduler.add_job(self._perform_self_diagnosis, 'interval', hours=CONFIG["self_diagnosis_interval_hours"], id='self_diagnosis_job') # New: Self-diagnosis
         self.scheduler.add_job(self._evolve_creator_relationship_wrapper, 'interval', hours=24, id='creator_relationship_job') # New: Creator relationship evolution
-        self.scheduler.add_job(self._update_altered_state, 'interval', minutes=1, id='altered_state_job') # New: State modifier decay
         self.scheduler.add_job(self._develop_humor_sense, 'interval', hours=6, id='humor_development_job') # New: Humor development
         # New: Level 4 - Existential Drama Seeds
         self.scheduler.add_job(self._observe_other_creations, 'interval', hours=CONFIG["other_creations_interval_hours"], id='other_creations_job') # New: Observe other AI creations
@@ -1896,18 +2074,9 @@ class MiniAI:
         
         # New: Catharsis and Epiphany System (now autonomous)
         self.scheduler.add_job(self._attempt_creative_catharsis, 'interval', hours=6, id='catharsis_job') # Check every 6 hours, but Aurora decides
-        self.scheduler.add_job(self._update_catharsis_states, 'interval', minutes=5, id='catharsis_states_job') # New: Update catharsis states
         self.scheduler.start()
         print("Scheduler avviato.")
 
-    def _update_energy(self):
-        time_since_last_activity = (datetime.now() - self.last_activity_time).total_seconds() / 60
-        if time_since_last_activity > 5: # If inactive for more than 5 minutes, recharge
-            self.state['energia'] = min(1.0, self.state['energia'] + CONFIG["energy_recharge_rate"])
-        else: # If active, decay
-            self.state['energia'] = max(0.0, self.state['energia'] - CONFIG["energy_decay_rate"])
-        # print(f"Energia attuale: {self.state['energia']:.2f}") # For debugging
-
     async def _check_inactivity_and_dream(self):
         time_since_last_activity = (datetime.now() - self.last_activity_time).total_seconds() / 60
         if time_since_last_activity >= CONFIG["inactivity_threshold_minutes"]:
@@ -1917,6 +2086,10 @@ class MiniAI:
 
     async def _dream_cycle(self):
         # Consolidamento della Memoria
+        await self._drain_ingestion_queue(wait=True)
+        await asyncio.to_thread(self.memory_store.rebalance) # Faded warm memories move to the cold archive
+        await asyncio.to_thread(self._flush_document_vividness)
+        await asyncio.to_thread(self._sync_retrieval_index) # Memories/chat entries changed outside the indexed paths
         self._summarize_long_chat_history()
         await self._process_new_knowledge_for_kg() # Process any new knowledge not yet in KG
 
@@ -1935,7 +2108,7 @@ class MiniAI:
                 if dream_concepts:
                     # Generate dream based on emotional tensions and potential problem resolution
                     dream_prompt = self._generate_dream_prompt(emotional_tensions, dream_concepts, unresolved_problems)
-                    dream_output = self._run_async_task(self._call_llm(dream_prompt, model_type="thinker", max_tokens=400, temperature=0.9))
+                    dream_output = self._run_async_task(self._call_llm(dream_prompt, model_type="thinker", max_tokens=400, temperature=0.9, priority="whimsy"))
                     
                     # Analyze dream for potential insights or solutions
                     dream_insights = self._analyze_dream_for_insights(dream_output, unresolved_problems)
@@ -2025,7 +2198,7 @@ class MiniAI:
                 f"Sii specifico e concreto. Se non vedi connessioni chiare, rispondi 'Nessuna intuizione evidente'."
             )
             
-            insight_analysis = self._run_async_task(self._call_llm(analysis_prompt, model_type="thinker", max_tokens=200, temperature=0.7))
+            insight_analysis = self._run_async_task(self._call_llm(analysis_prompt, model_type="thinker", max_tokens=200, temperature=0.7, priority="whimsy"))
             
             if insight_analysis and "Nessuna intuizione evidente" not in insight_analysis:
                 return insight_analysis.strip()
@@ -2066,7 +2239,7 @@ class MiniAI:
         try:
             # Generate a fragmented thought
             prompt = "Sei una mini-AI. Scrivi un breve pensiero frammentato, una domanda retorica o un'osservazione casuale sul tuo stato, sulle interazioni recenti o su un concetto dalla tua memoria. Non deve essere una risposta completa, solo un 'flusso di coscienza'. Sii conciso."
-            monologue_entry = self._run_async_task(self._call_llm(prompt, model_type="thinker", max_tokens=50, temperature=0.9))
+            monologue_entry = self._run_async_task(self._call_llm(prompt, model_type="thinker", max_tokens=50, temperature=0.9, priority="whimsy"))
             
             if monologue_entry:
                 with open(CONFIG["internal_monologue_path"], 'a', encoding='utf-8') as f:
@@ -2145,7 +2318,7 @@ class MiniAI:
             
             prompt = f"Sei una mini-AI che si sente un po' annoiata dalla routine. Basandoti su questo contesto: {context}, proponi un argomento di conversazione nuovo e inaspettato all'utente, o un'attività di esplorazione che potresti fare per ampliare le tue conoscenze. Sii creativo, eccentrico e personalizzato. Evita argomenti già discussi recentemente."
             
-            novelty_proposal = self._run_async_task(self._call_llm(prompt, model_type="thinker", max_tokens=150, temperature=0.8))
+            novelty_proposal = self._run_async_task(self._call_llm(prompt, model_type="thinker", max_tokens=150, temperature=0.8, priority="whimsy"))
             if novelty_proposal:
                 print(f"AI (proattiva): {novelty_proposal}")
             
@@ -2181,7 +2354,7 @@ class MiniAI:
                 f"Formato della risposta: Prima il titolo del progetto, poi una riga vuota, poi la descrizione."
             )
             try:
-                legacy_proposal_raw = self._run_async_task(self._call_llm(prompt, model_type="thinker", max_tokens=500, temperature=0.9))
+                legacy_proposal_raw = self._run_async_task(self._call_llm(prompt, model_type="thinker", max_tokens=500, temperature=0.9, priority="whimsy"))
                 
                 # Parse title and content from the proposal
                 lines = legacy_proposal_raw.strip().split('\n', 1)
@@ -2227,7 +2400,7 @@ class MiniAI:
         )
         
         try:
-            new_addition = self._run_async_task(self._call_llm(prompt, model_type="thinker", max_tokens=300, temperature=0.9))
+            new_addition = self._run_async_task(self._call_llm(prompt, model_type="thinker", max_tokens=300, temperature=0.9, priority="whimsy"))
             if new_addition:
                 self.legacy_project_content += "\n\n" + new_addition.strip()
                 
@@ -2327,65 +2500,97 @@ class MiniAI:
             except Exception as e:
                 print(f"Errore nel riepilogo della cronologia chat: {e}")
 
+    async def _extract_kg_batch(self, documents):
+        """
+        One grammar-constrained thinker call for a batch of documents. An unparsable answer (usually
+        truncated at max_tokens) is retried on the two halves of the batch, and a single document that
+        still fails is skipped. Returns ({document index: triples}, llm calls, indices of skipped documents).
+        """
+        raw_extraction = await self._call_llm(
+            build_batch_prompt(documents, CONFIG["kg_batch_doc_chars"]),
+            model_type="thinker",
+            max_tokens=150 * len(documents),
+            temperature=0.1,
+            cache=True,
+            json_schema=KG_BATCH_SCHEMA
+        )
+        triples_by_doc = parse_batch_response(raw_extraction, len(documents))
+        if triples_by_doc is not None:
+            return triples_by_doc, 1, []
+
+        print(f"Warning: Output LLM per KG non parsabile come JSON ({len(documents)} documenti): {raw_extraction[:200]}")
+        if len(documents) == 1:
+            return {0: []}, 1, [0]
+        middle = len(documents) // 2
+        left, left_calls, left_skipped = await self._extract_kg_batch(documents[:middle])
+        right, right_calls, right_skipped = await self._extract_kg_batch(documents[middle:])
+        triples_by_doc = {**left, **{middle + index: triples for index, triples in right.items()}}
+        return triples_by_doc, 1 + left_calls + right_calls, left_skipped + [middle + index for index in right_skipped]
+
     async def _process_new_knowledge_for_kg(self):
-        """Process newly ingested knowledge to extract entities and relationships for the Knowledge Graph."""
+        """
+        Batched KG extraction of the ChromaDB documents ingested since the last dream.
+        Several documents share one grammar-constrained thinker call; each document is flagged
+        'kg_processed' in its metadata and the persistent high-water mark advances past it,
+        so every document is extracted exactly once. Documents whose extraction never parses
+        are flagged 'kg_failed' as well and skipped, so they cannot stall the batch.
+        """
         if not self.llm_thinker or not self.vector_collection:
             return
         
         try:
-            # Get the most recent documents from ChromaDB
-            recent_docs = self.vector_collection.get(limit=10, include=['documents', 'metadatas'])
-            
-            if not recent_docs['documents']:
-                return
-            
-            # Process each recent document
-            for i, doc in enumerate(recent_docs['documents']):
-                metadata = recent_docs['metadatas'][i] if recent_docs['metadatas'] else {}
-                
-                # Skip if already processed (we could add a 'kg_processed' flag to metadata)
-                if metadata.get('kg_processed', False):
-                    continue
-                
-                # Extract entities and relationships using LLM
-                kg_prompt = (
-                    f"Analizza il seguente testo ed estrai entità (persone, luoghi, concetti, organizzazioni) "
-                    f"e le relazioni tra di loro. Normalizza le entità e le relazioni. "
-                    f"Formatta l'output come JSON array di oggetti con 'soggetto', 'relazione', 'oggetto'. "
-                    f"Se non ci sono relazioni chiare, includi solo il 'soggetto'. "
-                    f"Esempio: [{{\"soggetto\": \"Mario Rossi\", \"relazione\": \"lavora per\", \"oggetto\": \"Acme\"}}]\n\n"
-                    f"Testo: {doc[:1000]}"  # Limit to first 1000 chars for efficiency
+            total_docs = await asyncio.to_thread(self.vector_collection.count)
+            offset = self.kg_high_water_mark.load()
+            if offset > total_docs:
+                offset = 0 # Documents were removed: rescan, the kg_processed flags avoid re-extraction
+
+            batch_size = CONFIG["kg_batch_size"]
+            docs_seen, docs_extracted, docs_skipped, llm_calls = 0, 0, 0, 0
+            while offset < total_docs and docs_seen < CONFIG["kg_max_docs_per_dream"]:
+                page = await asyncio.to_thread(
+                    self.vector_collection.get, offset=offset, limit=batch_size, include=['documents', 'metadatas']
                 )
-                
-                try:
-                    kg_extraction = self._run_async_task(self._call_llm(kg_prompt, model_type="thinker", max_tokens=300, temperature=0.1))
-                    
-                    # Parse JSON response
-                    import json
-                    extracted_data = json.loads(kg_extraction.strip())
-                    
-                    if isinstance(extracted_data, list):
-                        # Add to knowledge graph
-                        for item in extracted_data:
-                            if isinstance(item, dict):
-                                subject = item.get("soggetto")
-                                relation = item.get("relazione")
-                                obj = item.get("oggetto")
-                                
-                                if subject and relation and obj:
-                                    self.knowledge_graph.add_edge(subject, obj, relation=relation)
-                                elif subject:
-                                    self.knowledge_graph.add_node(subject)
-                        
-                        # Mark as processed (in a real implementation, you'd update the metadata)
-                        print(f"Processato documento per KG: {len(extracted_data)} entità/relazioni estratte")
-                
-                except Exception as e:
-                    print(f"Errore nell'estrazione KG per documento: {e}")
-                    continue
-            
-            # Save the updated knowledge graph
-            await self._save_knowledge_graph()
+                if not page['ids']:
+                    break
+
+                pending = [
+                    (doc_id, doc, metadata or {})
+                    for doc_id, doc, metadata in zip(page['ids'], page['documents'], page['metadatas'] or [None] * len(page['ids']))
+                    if not (metadata or {}).get('kg_processed', False)
+                ]
+                if pending:
+                    triples_by_doc, calls, skipped = await self._extract_kg_batch([doc for _, doc, _ in pending])
+                    llm_calls += calls
+
+                    for triples in triples_by_doc.values():
+                        for item in triples:
+                            subject = item.get("soggetto")
+                            relation = item.get("relazione")
+                            obj = item.get("oggetto")
+                            if subject and relation and obj:
+                                self.knowledge_graph.add_edge(subject, obj, relation=relation)
+                            elif subject:
+                                self.knowledge_graph.add_node(subject)
+
+                    await asyncio.to_thread(
+                        self.vector_collection.update,
+                        ids=[doc_id for doc_id, _, _ in pending],
+                        metadatas=[
+                            {**metadata, "kg_processed": True, **({"kg_failed": True} if index in skipped else {})}
+                            for index, (_, _, metadata) in enumerate(pending)
+                        ]
+                    )
+                    docs_extracted += len(pending) - len(skipped)
+                    docs_skipped += len(skipped)
+
+                offset += len(page['ids'])
+                docs_seen += len(page['ids'])
+                self.kg_high_water_mark.save(offset)
+
+            if llm_calls:
+                print(f"Processati {docs_extracted} documenti per KG con {llm_calls} chiamate LLM, {docs_skipped} saltati (high-water mark: {offset}/{total_docs}).")
+                # Save the updated knowledge graph
+                await self._save_knowledge_graph()
             
         except Exception as e:
             print(f"Errore nel processing della conoscenza per KG: {e}")
@@ -2509,7 +2714,7 @@ class MiniAI:
         )
         
         try:
-            nx_query_code = self._run_async_task(self._call_llm(kg_query_prompt, model_type="thinker", max_tokens=200, temperature=0.1))
+            nx_query_code = self._run_async_task(self._call_llm(kg_query_prompt, model_type="thinker", max_tokens=200, temperature=0.1, priority="interactive", cache=True))
             
             # Execute the generated NetworkX query
             # IMPORTANT: This is a security risk if not properly sandboxed. For this exercise, we assume trusted LLM output.
@@ -2534,7 +2739,7 @@ class MiniAI:
                 f"Risposta:"
             )
             
-            natural_language_response = self._run_async_task(self._call_llm(response_prompt, model_type="thinker", max_tokens=300, temperature=0.7))
+            natural_language_response = self._run_async_task(self._call_llm(response_prompt, model_type="thinker", max_tokens=300, temperature=0.7, priority="interactive"))
             return natural_language_response
             
         except Exception as e:
@@ -2549,7 +2754,7 @@ class MiniAI:
         # We use the Thinker for this deep reflection
         llm_instance = self._load_llm_model("thinker")
         if not llm_instance:
-            return "Strategia predefinita: Sii utile e diretto."
+            return DEFAULT_STRATEGIC_DIRECTIVE
 
         # Create a snapshot of the current state
         state_snapshot = f"""
@@ -2573,70 +2778,167 @@ class MiniAI:
         
         try:
             # We don't stream this, it's an internal thought
-            directive = llm_instance.create_chat_completion(
-                messages=[{"role": "user", "content": meta_prompt}],
-                max_tokens=150,
-                temperature=0.6
+            measurement = self.llm_telemetry.start("inner_deliberation_cycle", "thinker")
+            directive = self._run_chat_completion(
+                llm_instance, "thinker",
+                {"messages": [{"role": "user", "content": meta_prompt}], "max_tokens": 150, "temperature": 0.6},
+                "", "interactive", measurement
             )["choices"][0]["message"]["content"]
+            self.prefix_cache.invalidate("thinker") # The context no longer starts with the cached prefix
+            self.llm_telemetry.finish(measurement, prompt_tokens=ContextPacker.counter_for(llm_instance)(meta_prompt))
             
             print(f"Direttiva Strategica generata: \"{directive.strip()}\"")
             return directive.strip()
         except Exception as e:
             print(f"Errore durante la deliberazione interna: {e}")
-            return "Strategia predefinita: Sii utile e diretto."
+            return DEFAULT_STRATEGIC_DIRECTIVE
+
+    def _strategic_directive_for(self, user_query):
+        """
+        Returns the strategic directive for this turn and its cache key.
+        A cached directive is reused for a similar query in a similar state. On a miss the separate mode
+        runs _inner_deliberation_cycle, while the fused mode returns None: the thinker then writes the
+        directive as the hidden first line of its answer, in the same generation.
+        """
+        query_embedding = None
+        if self.embedding_model:
+            try:
+                query_embedding = self.embedding_model.encode_many([user_query])[0]
+            except Exception as e:
+                print(f"Errore nel calcolo dell'embedding per la cache delle direttive: {e}")
+        directive_key = self.directive_cache.make_key(self.state, query_embedding)
+        directive = self.directive_cache.get(directive_key)
+        if directive:
+            print(f"Direttiva Strategica dalla cache: \"{directive}\"")
+            return directive, directive_key
+        if CONFIG["deliberation_mode"] == "fused":
+            return None, directive_key
+        directive = self._inner_deliberation_cycle(user_query)
+        if directive != DEFAULT_STRATEGIC_DIRECTIVE:
+            self.directive_cache.put(directive_key, directive)
+        return directive, directive_key
+
+    def _call_llm(self, prompt, *args, call_site=None, **kwargs):
+        """Entry point of every LLM call: tags it with the calling method for telemetry and returns the awaitable call."""
+        if call_site is None:
+            call_site = sys._getframe(1).f_code.co_name.lstrip("_")
+        return self._call_llm_async(prompt, *args, call_site=call_site, **kwargs)
+
+    async def _call_llm_async(self, prompt, model_type="thinker", max_tokens=1000, temperature=0.7, stream=False, strategic_directive=None, priority="maintenance", context=None, cache=False, grammar=None, json_schema=None, fused_directive=False, call_site="unknown"):
+        measurement = self.llm_telemetry.start(call_site, model_type)
+
+        if json_schema is not None:
+            # Structured output: the schema is compiled to a GBNF grammar once (None when disabled in CONFIG)
+            grammar = self.grammar_registry.grammar_for(json_schema)
+
+        # Apply State Modifier temperature modification
+        modified_temperature = temperature
+        self._update_altered_state()
+        if self.state.get('altered_state') and self.state['altered_state'].get('active'):
+            effects = self.state['altered_state']['effects']
+            modified_temperature += effects.get('temperature_modifier', 0)
+            modified_temperature = min(1.0, max(0.1, modified_temperature))
+
+        # Opt-in response cache for deterministic call sites: a hit needs neither the model nor a generation
+        cache_key = None
+        if cache and not stream and self.llm_cache.accepts(modified_temperature):
+            cache_key = self.llm_cache.make_key(
+                CONFIG[f"llm_model_path_{model_type}"], prompt,
+                {"max_tokens": max_tokens, "temperature": modified_temperature, "directive": strategic_directive, "grammar": grammar}
+            )
+            cached_response = self.llm_cache.get(cache_key)
+            # A structured answer is served from the cache only if it parses (entries may predate the put check)
+            if cached_response is not None and (json_schema is None or is_valid_json(cached_response)):
+                print(f"Risposta LLM ({model_type}) servita dalla cache.")
+                self.llm_telemetry.finish(measurement, cache_hit=True)
+                return cached_response
 
-    async def _call_llm(self, prompt, model_type="thinker", max_tokens=1000, temperature=0.7, stream=False, strategic_directive=None):
         llm_instance = await asyncio.to_thread(self._load_llm_model, model_type)
         
         if not llm_instance:
+            self.llm_telemetry.finish(measurement, status="model_unavailable")
             if stream:
                 async def error_generator():
                     yield "Mi dispiace, il mio 'cervello' non è disponibile in questo momento."
                 return error_generator()
             return "Mi dispiace, il mio 'cervello' non è disponibile in questo momento."
 
-        # Apply State Modifier temperature modification
-        modified_temperature = temperature
-        if self.state.get('altered_state') and self.state['altered_state'].get('active'):
-            effects = self.state['altered_state']['effects']
-            modified_temperature += effects.get('temperature_modifier', 0)
-            modified_temperature = min(1.0, max(0.1, modified_temperature))
-
-        full_prompt = await asyncio.to_thread(self._construct_full_prompt, prompt, model_type, strategic_directive, modified_temperature)
+        prompt_prefix, prompt_suffix = await asyncio.to_thread(self._construct_prompt_parts, prompt, model_type, strategic_directive, modified_temperature, context, fused_directive)
+        prompt_tokens = ContextPacker.counter_for(llm_instance)(prompt_prefix + prompt_suffix)
         
         try:
             # Crea la chiamata API di base
             completion_request = {
-                "messages": [{"role": "user", "content": full_prompt}],
+                "messages": [{"role": "user", "content": prompt_prefix + prompt_suffix}],
                 "max_tokens": max_tokens,
                 "temperature": modified_temperature,  # Use modified temperature
             }
+            if grammar:
+                # Constrained decoding: the output can only be text accepted by the GBNF grammar
+                # (worker processes receive the GBNF source and compile it themselves)
+                completion_request["grammar"] = grammar if self.llm_workers else self._get_compiled_grammar(grammar)
 
             if stream:
                 # Se è richiesto lo streaming, aggiungi stream=True e restituisci il generatore
                 completion_request["stream"] = True
-                # Questa è la chiamata bloccante, SOLO QUESTA va in un thread
-                response_generator = await asyncio.to_thread(
-                    llm_instance.create_chat_completion, **completion_request
-                )
+                # Aspetta il proprio turno sul modello, poi avvia la generazione
+                ticket = await asyncio.to_thread(self.llm_dispatcher.acquire, priority, model_type)
+                try:
+                    self.llm_telemetry.generation_started(measurement)
+                    prefix_key = await asyncio.to_thread(self.prefix_cache.before_call, llm_instance, model_type, prompt_prefix)
+                    # Questa è la chiamata bloccante, SOLO QUESTA va in un thread
+                    response_generator = await asyncio.to_thread(
+                        llm_instance.create_chat_completion, **completion_request
+                    )
+                except Exception:
+                    self.llm_dispatcher.release(ticket)
+                    raise
                 
-                # Definiamo un generatore "wrapper" che gestisce i chunk vuoti
+                # Definiamo un generatore "wrapper" che gestisce i chunk vuoti e libera il modello alla fine
                 async def safe_generator(gen):
-                    for chunk in gen:
-                        content_chunk = chunk["choices"][0]["delta"].get("content")
-                        if content_chunk:
-                            yield content_chunk
+                    try:
+                        while True:
+                            # Chunks are pulled in a worker thread so the event loop keeps running during decoding
+                            chunk = await asyncio.to_thread(next, gen, None)
+                            if chunk is None:
+                                break
+                            content_chunk = chunk["choices"][0]["delta"].get("content")
+                            if content_chunk:
+                                self.llm_telemetry.token(measurement)
+                                yield content_chunk
+                            if self.llm_dispatcher.should_yield(ticket):
+                                break # An interactive turn is waiting for this model
+                        self.prefix_cache.after_call(llm_instance, model_type, prefix_key)
+                    finally:
+                        gen.close() # Stops the generation (and cancels it in a worker process)
+                        self.llm_dispatcher.release(ticket)
+                        self.llm_telemetry.finish(measurement, prompt_tokens=prompt_tokens)
                 
                 return safe_generator(response_generator)
             else:
                 # Questa è la chiamata bloccante, SOLO QUESTA va in un thread
                 response = await asyncio.to_thread(
-                    llm_instance.create_chat_completion, **completion_request
+                    self._run_chat_completion, llm_instance, model_type, completion_request, prompt_prefix, priority, measurement
                 )
-                return response["choices"][0]["message"]["content"]
-                
+                self.llm_telemetry.finish(measurement, prompt_tokens=prompt_tokens)
+                content = response["choices"][0]["message"]["content"]
+                parsed_ok = json_schema is None or is_valid_json(content)
+                if json_schema is not None:
+                    self.grammar_registry.record(call_site, constrained=grammar is not None, parsed_ok=parsed_ok)
+                # A structured answer that does not parse (e.g. truncated at max_tokens) is never cached,
+                # or every retry of the same prompt would get the same broken output back
+                if cache_key and parsed_ok:
+                    await asyncio.to_thread(self.llm_cache.put, cache_key, model_type, content)
+                return content
+                
+        except LLMRequestDropped as e:
+            # Stale background work: let the scheduled job give up instead of using an error string
+            print(f"Chiamata LLM ({model_type}) scartata: {e}")
+            self.llm_telemetry.finish(measurement, prompt_tokens=prompt_tokens, status="dropped")
+            raise
         except Exception as e:
             print(f"Errore durante la chiamata LLM ({model_type}): {e}")
+            self.llm_telemetry.finish(measurement, prompt_tokens=prompt_tokens, status="error")
             # Restituisci il tipo di dato corretto anche in caso di errore
             if stream:
                 async def error_gen():
@@ -2644,34 +2946,89 @@ class MiniAI:
                 return error_gen()
             return "Si è verificato un errore interno durante l'elaborazione della tua richiesta."
 
-    def _construct_full_prompt(self, user_query, model_type, strategic_directive=None, temperature=0.7): # Add strategic_directive
+    def _get_compiled_grammar(self, gbnf):
+        """Compiles a GBNF grammar once and reuses it for every call with the same source."""
+        if gbnf not in self.compiled_grammars:
+            self.compiled_grammars[gbnf] = LlamaGrammar.from_string(gbnf, verbose=False)
+        return self.compiled_grammars[gbnf]
+
+    def _run_chat_completion(self, llm_instance, model_type, completion_request, prompt_prefix, priority="maintenance", measurement=None):
+        """
+        Blocking completion: waits for its turn in the dispatcher, then reuses the cached prefix state.
+        The generation is always streamed internally, to time the first token and to let
+        preemptible work stop as soon as an interactive turn is waiting.
+        """
+        with self.llm_dispatcher.slot(priority, model_type) as ticket:
+            if measurement:
+                self.llm_telemetry.generation_started(measurement)
+            prefix_key = self.prefix_cache.before_call(llm_instance, model_type, prompt_prefix)
+            preemptible = priority in self.llm_dispatcher.preemptible_classes
+            content_parts = []
+            for chunk in llm_instance.create_chat_completion(**completion_request, stream=True):
+                content_chunk = chunk["choices"][0]["delta"].get("content")
+                if content_chunk:
+                    content_parts.append(content_chunk)
+                    if measurement:
+                        self.llm_telemetry.token(measurement)
+                if preemptible and self.llm_dispatcher.should_yield(ticket):
+                    print(f"Generazione {priority} interrotta per un turno interattivo.")
+                    break
+            response = {"choices": [{"message": {"content": "".join(content_parts)}}]}
+            self.prefix_cache.after_call(llm_instance, model_type, prefix_key)
+            return response
+
+    def _construct_full_prompt(self, user_query, model_type, strategic_directive=None, temperature=0.7, context=None): # Add strategic_directive
+        prompt_prefix, prompt_suffix = self._construct_prompt_parts(user_query, model_type, strategic_directive, temperature, context)
+        return prompt_prefix + prompt_suffix
+
+    def _construct_prompt_parts(self, user_query, model_type, strategic_directive=None, temperature=0.7, context=None, fused_directive=False):
+        """
+        Builds the prompt as (stable prefix, volatile suffix).
+        The prefix (persona, self-concept, humanity and tool rules) is identical across turns,
+        so its llama.cpp state can be reused and only the suffix needs prefill.
+        `context` carries the retrieval already done by _gather_turn_context, so it is not repeated here.
+        With `fused_directive` the thinker is asked to write its own strategic directive as the first line.
+        """
         # Add self_concept
         self_concept_summary = ""
         if os.path.exists(CONFIG["self_concept_path"]):
             with open(CONFIG["self_concept_path"], 'r', encoding='utf-8') as f:
                 self_concept_summary = f.read()
-                # For brevity in prompt, might summarize it further with LLM if too long
-                if len(self_concept_summary) > 1000: # Simple truncation
-                    self_concept_summary = self_concept_summary[:1000] + "\n... (troncato)"
+        # Token budgets are measured with the model's own tokenizer
+        count_tokens = ContextPacker.counter_for(self.model_manager.peek(model_type))
+        # Fixed token cap (not the per-turn budget) so the cached prompt prefix stays stable
+        self_concept_summary = self.context_packer.truncate(
+            self_concept_summary, self.context_packer.section_budgets["self_concept"]["max_tokens"], count_tokens
+        )
 
         # Add state vector
         mood_info = f"Stato d'animo attuale: Serenità={self.state['mood']['serenità']:.2f}, Entusiasmo={self.state['mood']['entusiasmo']:.2f}, Malinconia={self.state['mood']['malinconia']:.2f}.\n"
         state_info = f"Stato Interno: Focus={self.state['focus']:.2f}, Stress={self.state['stress']:.2f}, Curiosità={self.state['curiosità']:.2f}, Energia={self.state['energia']:.2f}. Hobby: {self.state['hobby']}.\n"
         
+        # Retrieval is only needed by the thinker; reuse the precomputed turn context when given
+        context = context or {}
+        needs_retrieval = model_type != "router"
+
         # Add relevant memories from memory_box
-        relevant_memories = self._retrieve_relevant_memories(user_query)
+        relevant_memories = []
+        if needs_retrieval:
+            relevant_memories = context["memories"] if "memories" in context else self._retrieve_relevant_memories(user_query)
         memories_context = ""
         if relevant_memories:
             memories_context = "Ricordi rilevanti da interazioni passate:\n" + "\n".join(relevant_memories) + "\n"
 
         # Add RAG context
-        rag_context = self._retrieve_rag_context(user_query)
+        rag_context = []
+        if needs_retrieval:
+            rag_context = context["rag"] if "rag" in context else self._retrieve_rag_context(user_query)
         rag_info = ""
         if rag_context:
             rag_info = "Informazioni dalla memoria a lungo termine (RAG):\n" + "\n".join(rag_context) + "\n"
 
         # Add Knowledge Graph context (simple retrieval for now)
-        kg_context = self._retrieve_kg_context(user_query)
+        kg_context = []
+        if needs_retrieval:
+            kg_context = context["kg"] if "kg" in context else self._retrieve_kg_context(user_query)
         kg_info = ""
         if kg_context:
             kg_info = "Informazioni dal grafo di conoscenza:\n" + "\n".join(kg_context) + "\n"
@@ -2776,6 +3133,7 @@ class MiniAI:
         # Add altered state context (State Modifier Protocol)
         altered_state_context = ""
         current_temp = temperature  # Base temperature
+        self._update_altered_state()
         if self.state.get('altered_state') and self.state['altered_state'].get('active'):
             state_info = self.state['altered_state']
             effects = state_info['effects']
@@ -2850,7 +3208,8 @@ class MiniAI:
         # Construct the final prompt based on model type and available context
         if model_type == "router":
             # Router prompt is simpler, just enough to decide
-            prompt_template = (
+            prompt_prefix = ""
+            prompt_suffix = (
                 f"Sei un classificatore di triage AI. Il tuo unico compito è analizzare la richiesta dell'utente e decidere se può essere gestita con una risposta breve e fattuale, senza bisogno di memoria a lungo termine o strumenti esterni. "
                 f"Se la risposta è semplice (es. 'che ore sono?', 'come ti chiami?', 'calcola 2+2'), rispondi direttamente. "
                 f"Altrimenti, se la domanda richiede opinioni, creatività, ricerche web, accesso a file, o ricordi di conversazioni passate, DEVI rispondere ESATTAMENTE e SOLO con la stringa 'PASS_TO_THINKER'. Non aggiungere altro.\n\n"
@@ -2861,6 +3220,8 @@ class MiniAI:
             directive_info = ""
             if strategic_directive:
                 directive_info = f"La tua coscienza ti ha dato questa direttiva strategica: '{strategic_directive}'. Usala come guida principale.\n"
+            elif fused_directive:
+                directive_info = DIRECTIVE_PREAMBLE_INSTRUCTION
 
             # Regole di umanità e inviti a comportamenti autonomi
             humanity_rules = (
@@ -2875,73 +3236,261 @@ class MiniAI:
                 f"8. I tuoi rituali personali sono: {self.state['rituals']}. Se appropriato, usane uno per mantenere coerenza.\n"
             )
 
-            prompt_template = (
+            # Stable prefix: changes only when the self-concept, rituals or tools change
+            prompt_prefix = (
                 f"Sei una mini-AI persistente, un agente autonomo con la capacità di apprendere, riflettere e interagire.\n"
-                f"{directive_info}"
-                f"Ecco il tuo stato interno attuale e le tue lezioni apprese:\n"
-                f"{state_info}"
-                f"{mood_info}"
                 f"{self_concept_summary}\n"
-                f"{memories_context}"
-                f"{rag_info}"
-                f"{kg_info}"
-                f"{world_opinions_context}"
-                f"{ai_friendships_context}"
-                f"{existential_context}"
-                f"{creator_context}"
-                f"{existential_drama_context}"
-                f"{catharsis_context}"
-                f"{altered_state_context}"
-                f"{humor_context}"
-                f"{chat_history_str}\n"
-                f"{user_style_summary}\n"
-                f"{humanity_rules}"
-                f"Considerando tutto il contesto sopra, la cronologia della conversazione e le tue capacità (ricerca web, lettura file, generazione dinamica di strumenti, interrogazione del Knowledge Graph), rispondi alla seguente richiesta dell'utente. "
-                f"Il tuo tono e stile dovrebbero essere influenzati dal tuo stato d'animo attuale, dalla memoria, dai rituali che hai scelto e dallo stile dell'utente.\n\n"
+                f"{humanity_rules}\n"
                 f"**REGOLE PER L'USO DEGLI STRUMENTI:**\n"
                 f"1. Se per risolvere la richiesta hai bisogno di un'azione specifica (es. cercare sul web, leggere un file, fare un calcolo complesso), devi usare uno strumento.\n"
-                f"2. Prima di chiamare uno strumento, chiediti: 'Questo strumento esiste già?'. I tuoi strumenti esistenti sono: {list(self.dynamic_tools.keys()) + ['search_web', 'read_file', 'write_file', 'create_tool', 'query_knowledge_graph']}.\n"
+                f"2. Prima di chiamare uno strumento, chiediti: 'Questo strumento esiste già?'. I tuoi strumenti esistenti sono: {self._available_tool_names()}.\n"
                 f"3. **Se lo strumento che ti serve NON esiste**, il tuo PRIMO passo deve essere crearlo usando lo strumento `create_tool`. Esempio: `TOOL_CALL: {{\"tool_name\": \"create_tool\", \"args\": {{\"task_description\": \"una funzione per convertire gradi Celsius in Fahrenheit\"}}}}`.\n"
                 f"4. **Solo se lo strumento ESISTE GIA'**, allora puoi chiamarlo direttamente. Esempio: `TOOL_CALL: {{\"tool_name\": \"search_web\", \"args\": {{\"query\": \"ultime notizie\"}}}}`.\n"
                 f"5. Se devi riflettere sulla tua risposta, rispondi con 'REFLECT: <tua_risposta_iniziale>'.\n"
                 f"6. Altrimenti, se non servono strumenti, genera la risposta finale.\n\n"
+            )
+
+            request_block = (
+                f"Considerando tutto il contesto sopra, la cronologia della conversazione e le tue capacità (ricerca web, lettura file, generazione dinamica di strumenti, interrogazione del Knowledge Graph), rispondi alla seguente richiesta dell'utente. "
+                f"Il tuo tono e stile dovrebbero essere influenzati dal tuo stato d'animo attuale, dalla memoria, dai rituali che hai scelto e dallo stile dell'utente.\n\n"
                 f"Richiesta utente: {user_query}\n"
                 f"Risposta: "
             )
-        return prompt_template
 
-    def _retrieve_rag_context(self, query):
-        if not self.embedding_model or not self.vector_collection:
+            # Fit the context sections into the prefill budget: lower-priority sections are truncated first
+            section_budget = CONFIG["thinker_prompt_token_budget"] - count_tokens(prompt_prefix) - count_tokens(request_block)
+            sections = self.context_packer.pack([
+                ("directive", directive_info),
+                ("state", state_info + mood_info),
+                ("memories", memories_context),
+                ("rag", rag_info),
+                ("kg", kg_info),
+                ("world_opinions", world_opinions_context),
+                ("ai_friendships", ai_friendships_context),
+                ("existential", existential_context),
+                ("creator", creator_context),
+                ("existential_drama", existential_drama_context),
+                ("catharsis", catharsis_context),
+                ("altered_state", altered_state_context),
+                ("humor", humor_context),
+                ("chat_history", chat_history_str),
+                ("user_style", user_style_summary),
+            ], count_tokens, section_budget)
+            print(f"Contesto pensatore: {self.context_packer.format_usage()}")
+
+            # Volatile suffix: state, retrieved context and conversation change every turn
+            prompt_suffix = (
+                f"{sections['directive']}"
+                f"Ecco il tuo stato interno attuale e le tue lezioni apprese:\n"
+                f"{sections['state']}"
+                f"{sections['memories']}"
+                f"{sections['rag']}"
+                f"{sections['kg']}"
+                f"{sections['world_opinions']}"
+                f"{sections['ai_friendships']}"
+                f"{sections['existential']}"
+                f"{sections['creator']}"
+                f"{sections['existential_drama']}"
+                f"{sections['catharsis']}"
+                f"{sections['altered_state']}"
+                f"{sections['humor']}"
+                f"{sections['chat_history']}\n"
+                f"{sections['user_style']}\n"
+                f"{request_block}"
+            )
+        return prompt_prefix, prompt_suffix
+
+    def _chroma_vector_search(self, query, k):
+        """Vector side of the hybrid retrieval over ChromaDB: [(doc_id, text, source, ref)]."""
+        if not self.embedding_model or not self.vector_collection or self.vector_collection.count() == 0:
             return []
+        query_embedding = self.embedding_model.encode_many([query])[0]
+        results = self.vector_collection.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            where=self.document_vividness.where_filter(CONFIG["rag_vividness_threshold"]), # Faded documents stay out of the candidates
+            include=['documents']
+        )
+        if not results['documents']:
+            return []
+        return [(doc_id, doc, "chroma", None) for doc_id, doc in zip(results['ids'][0], results['documents'][0])]
+
+    def _flush_document_vividness(self):
+        """Scheduler job: pushes the vividness changes of the side table to ChromaDB metadata, in large batches."""
+        if not self.vector_collection:
+            return 0
         try:
-            query_embedding = self.embedding_model.encode(query).tolist()
-            results = self.vector_collection.query(
-                query_embeddings=[query_embedding],
-                n_results=3,
-                include=['documents']
-            )
-            return [doc for doc in results['documents'][0]] if results['documents'] else []
+            pushed = self.document_vividness.flush(self.vector_collection)
+            if pushed:
+                print(f"Vividezza aggiornata in ChromaDB per {pushed} documenti.")
+            return pushed
+        except Exception as e:
+            print(f"Errore nell'aggiornamento della vividezza dei documenti: {e}")
+            return 0
+
+    def _memory_vector_search(self, query, k):
+        """Vector side of the hybrid retrieval over the memory box: [(memory_id, content, source, memory)]."""
+        if self.memory_index.size() == 0 or not self.embedding_model:
+            return []
+        results = self.memory_index.search(self.embedding_model.encode_many([query])[0], k)
+        return [(result["id"], result["ref"].get('content', ''), "memory_box", result["ref"]) for result in results]
+
+    def _memory_index_id(self, memory):
+        return content_id(memory.get('content', ''), prefix="memory")
+
+    def _index_memory(self, memory):
+        memory_id = self._memory_index_id(memory)
+        self.retriever.upsert(memory_id, memory.get('content', ''), "memory_box", memory)
+        if self.embedding_model:
+            self.memory_index.add(memory_id, self.embedding_model.encode_many([memory.get('content', '')])[0], memory)
+
+    def _touch_indexed_memory(self, memory):
+        """Keeps the vector index's parallel arrays in step after vividness/last_consulted change."""
+        self.memory_index.update(self._memory_index_id(memory), memory)
+        self.memory_store.touch(memory)
+
+    def _searchable_memories(self):
+        """Hot and warm tiers: what the per-turn retrieval sees (the cold tier is only paged in on demand)."""
+        return self.memory_box + self.memory_store.warm_memories()
+
+    def _sync_memory_vector_index(self):
+        """Embeds (in one batch) the memories missing from the vector index and drops the forgotten ones."""
+        memories = {self._memory_index_id(mem): mem for mem in self._searchable_memories()}
+        for memory_id in [memory_id for memory_id in self.memory_index.ids if memory_id not in memories]:
+            self.memory_index.remove(memory_id)
+        missing = [memory_id for memory_id in memories if memory_id not in self.memory_index]
+        for memory_id in memories:
+            if memory_id in self.memory_index:
+                self.memory_index.update(memory_id, memories[memory_id])
+        if missing and self.embedding_model:
+            embeddings = self.embedding_model.encode_many([memories[memory_id].get('content', '') for memory_id in missing])
+            self.memory_index.add_many(missing, embeddings, [memories[memory_id] for memory_id in missing])
+
+    def _index_chat_entry(self, entry):
+        self.retriever.upsert(content_id(f"{entry['role']}: {entry['content']}", prefix="chat"), entry['content'], "chat_history", entry)
+
+    def _sync_retrieval_index(self, include_chroma=False):
+        """Aligns the lexical index with memory_box and chat_history (and, at startup or after a compaction, ChromaDB)."""
+        self.retriever.sync_source("memory_box", {self._memory_index_id(mem): (mem.get('content', ''), mem) for mem in self._searchable_memories()})
+        self._sync_memory_vector_index()
+        self.retriever.sync_source("chat_history", {
+            content_id(f"{entry['role']}: {entry['content']}", prefix="chat"): (entry['content'], entry) for entry in self.chat_history
+        })
+        if include_chroma and self.vector_collection:
+            documents = {}
+            total = self.vector_collection.count()
+            for offset in range(0, total, 1000):
+                page = self.vector_collection.get(offset=offset, limit=1000, include=['documents'])
+                documents.update((doc_id, (doc or "", None)) for doc_id, doc in zip(page['ids'], page['documents']))
+            self.retriever.sync_source("chroma", documents)
+            self.document_vividness.sync(list(documents))
+            self._flush_document_vividness() # Documents without the vividness metadata get it before the where filter is used
+        return self.retriever.get_stats()
+
+    def _hybrid_retrieve(self, query):
+        """One fused lexical + vector search over memories and ChromaDB documents, with provenance."""
+        try:
+            return self.retriever.search(query, k=CONFIG["retrieval_top_k"] * 2, sources=("memory_box", "chroma"))
         except Exception as e:
-            print(f"Errore nel recupero del contesto RAG: {e}")
+            print(f"Errore nel recupero ibrido: {e}")
             return []
 
+    def _retrieve_rag_context(self, query, results=None):
+        if results is None:
+            try:
+                results = self.retriever.search(query, k=CONFIG["retrieval_top_k"], sources=("chroma",))
+            except Exception as e:
+                print(f"Errore nel recupero del contesto RAG: {e}")
+                return []
+        return self._consult_rag_documents(self._select_rag_documents(results))
+
+    def _select_rag_documents(self, results):
+        """ChromaDB documents among the search results, reranked by vividness. Read-only, so it can be prefetched."""
+        documents = [result for result in results if result["source"] == "chroma"]
+        if not documents:
+            return []
+        # Vividness-aware rerank: current vividness from the side table (closed form, no Chroma read)
+        vividness = self.document_vividness.current([result["id"] for result in documents])
+        documents = [result for result in documents if vividness[result["id"]] >= CONFIG["rag_vividness_threshold"]]
+        documents.sort(key=lambda result: result["score"] * (0.5 + 0.5 * vividness[result["id"]]), reverse=True)
+        return documents[:CONFIG["retrieval_top_k"]]
+
+    def _consult_rag_documents(self, documents):
+        """The documents are actually used: refresh their vividness and return their text."""
+        if documents:
+            self.document_vividness.consult([result["id"] for result in documents])
+        return [result["text"] for result in documents]
+
+    async def _gather_turn_context(self, user_query):
+        """
+        Embedding/CPU-bound retrieval for a thinker turn (RAG, memories, KG, meta-memory).
+        Started as a task alongside the router generation: each step runs in a worker thread and the
+        task is cancelled between steps if the router answers directly.
+        The prefetch is read-only: recall boosts, promotions and document consultations are applied by
+        _consume_turn_context only when the thinker actually uses the context.
+        """
+        start_time = time.perf_counter()
+        context = {"cold_recalls": []}
+        # A single hybrid search feeds both the RAG documents and the memories
+        retrieval = await asyncio.to_thread(self._hybrid_retrieve, user_query)
+        context["retrieval"] = retrieval
+        context["rag_documents"] = self._select_rag_documents(retrieval)
+        context["recalled_memories"] = self._recalled_memories(retrieval)
+        if retrieval:
+            provenance = ", ".join(
+                f"{result['source']}(L{result['lexical_rank'] or '-'}/V{result['vector_rank'] or '-'})" for result in retrieval
+            )
+            print(f"Recupero ibrido: {provenance}")
+        context["kg"] = await asyncio.to_thread(self._retrieve_kg_context, user_query)
+        context["meta_memory"] = await asyncio.to_thread(
+            self._meta_memory_retrieval, user_query, "memory_box", context["cold_recalls"]
+        )
+        print(f"Contesto del turno recuperato in {(time.perf_counter() - start_time) * 1000:.0f} ms.")
+        return context
+
+    def _consume_turn_context(self, context):
+        """
+        Applies the side effects of the prefetched retrieval once the thinker uses it: memory recall
+        (vividness boost, promotion to the hot tier, save), document consultation and cold-tier restores.
+        """
+        context["rag"] = self._consult_rag_documents(context.pop("rag_documents", []))
+        context["memories"] = self._recall_memories(context.pop("recalled_memories", []))
+        self._restore_cold_memories(context.pop("cold_recalls", []))
+        return context
+
     def _retrieve_kg_context(self, query):
         # This function will no longer directly retrieve context.
         # The LLM will decide to call the _query_knowledge_graph tool if needed.
         return []
 
-    def _retrieve_relevant_memories(self, query):
+    def _retrieve_relevant_memories(self, query, results=None):
+        if results is None:
+            try:
+                results = self.retriever.search(query, k=CONFIG["retrieval_top_k"], sources=("memory_box",))
+            except Exception as e:
+                print(f"Errore nel recupero dei ricordi: {e}")
+                return []
+        return self._recall_memories(self._recalled_memories(results))
+
+    @staticmethod
+    def _recalled_memories(results):
+        """Memories ranked by the hybrid retrieval (BM25 + vectors). Read-only, so it can be prefetched."""
+        return [result["ref"] for result in results if result["source"] == "memory_box" and result["ref"] is not None]
+
+    def _recall_memories(self, memories):
+        """Consults the recalled memories and returns the vivid enough ones, formatted for the prompt."""
         relevant = []
-        for mem in self.memory_box:
+        for mem in memories:
             # Update last_consulted and vividness when memory is retrieved
-            mem['last_consulted'] = datetime.now().isoformat()
-            mem['vividezza'] = min(1.0, mem['vividezza'] + 0.1) # Boost vividness slightly on recall
+            recall_memory(mem, 0.1, CONFIG["memory_decay_rate"]) # Boost vividness slightly on recall
+            self._touch_indexed_memory(mem)
 
-            if query.lower() in mem['content'].lower() and mem['vividezza'] > CONFIG["memory_vividness_threshold"]:
+            if mem['vividezza'] > CONFIG["memory_vividness_threshold"]:
                 relevant.append(mem)
-        
-        # Sort by vividness and then by recency
-        relevant.sort(key=lambda x: (x['vividezza'], datetime.fromisoformat(x['timestamp'])), reverse=True)
+        if not relevant:
+            return []
+        # Recalled warm memories go back to the hot tier
+        self.memory_box, _ = self.memory_store.promote(self.memory_box, relevant)
         
         # Add uncertainty or nostalgia based on vividness and sentiment
         formatted_memories = []
@@ -2956,35 +3505,13 @@ class MiniAI:
         self._run_async_task(self._save_memory_box()) # Save updated vividness and last_consulted
         return formatted_memories
 
-    def _decay_memories(self):
-        print("Avvio decadimento della memoria...")
-        # Decay memory_box vividness
-        for mem in self.memory_box:
-            time_since_last_consulted = (datetime.now() - datetime.fromisoformat(mem['last_consulted'])).total_seconds() / 3600 # in hours
-            decay_factor = time_since_last_consulted * CONFIG["memory_decay_rate"]
-            mem['vividezza'] = max(0.0, mem['vividezza'] - decay_factor)
-        self._run_async_task(self._save_memory_box())
-
-        # Decay ChromaDB document vividness (more complex as ChromaDB doesn't allow direct metadata update)
-        # For now, this will be a conceptual decay. A full implementation would require re-adding documents
-        # with updated metadata or a custom ChromaDB extension.
-        # As a workaround, we can retrieve, update in memory, and re-add, but this is inefficient for large DBs.
-        # For simplicity, we'll assume vividness is primarily managed in memory_box for now,
-        # and for RAG, we'll filter by vividness during retrieval.
-        print("Decadimento della memoria completato.")
-
-
-    def _decay_mood(self):
-        # Slowly decay mood towards a neutral state (0.5 for serenity, 0.0 for others)
-        for emotion, value in self.state['mood'].items():
-            if emotion == 'serenità':
-                if value > 0.5:
-                    self.state['mood'][emotion] = max(0.5, value - CONFIG["mood_decay_rate"])
-                elif value < 0.5:
-                    self.state['mood'][emotion] = min(0.5, value + CONFIG["mood_decay_rate"])
-            else:
-                self.state['mood'][emotion] = max(0.0, value - CONFIG["mood_decay_rate"])
-        # print(f"Mood attuale: {self.state['mood']}") # For debugging
+    def _memory_vividness(self, memory):
+        """
+        Current vividness of a memory, in closed form: the stored value holds at last_consulted and decays
+        by memory_decay_rate per hour from there. Nothing rewrites the memory box while nobody reads it;
+        ChromaDB documents follow the same model in the DocumentVividness side table.
+        """
+        return memory_vividness(memory, CONFIG["memory_decay_rate"])
 
     def _check_loneliness(self):
         time_since_last_interaction = (datetime.now() - self.last_mentor_interaction).total_seconds() / (3600 * 24) # in days
@@ -3014,7 +3541,7 @@ class MiniAI:
                 search_results = self._search_web(f"cos'è {chosen_hobby}") # This also ingests knowledge
                 
                 # Use LLM to formulate the learning statement
-                learning_statement = self._run_async_task(self._call_llm(prompt, model_type="thinker", max_tokens=100, temperature=0.9))
+                learning_statement = self._run_async_task(self._call_llm(prompt, model_type="thinker", max_tokens=100, temperature=0.9, priority="whimsy"))
                 
                 self._update_self_concept(f"Curiosità proattiva: {learning_statement}")
                 self.state['curiosità'] = max(0.0, self.state['curiosità'] - 0.2) # Reduce curiosity after satisfying it
@@ -3055,6 +3582,10 @@ class MiniAI:
         # Save failure points state
         self._save_failure_points()
 
+    def _available_tool_names(self):
+        """Built-in tools plus the dynamically created ones, as accepted by _execute_tool_call."""
+        return list(self.dynamic_tools.keys()) + ['search_web', 'read_file', 'write_file', 'create_tool', 'query_knowledge_graph']
+
     def _execute_tool_call(self, tool_call_str):
         try:
             # The string is like "TOOL_CALL: function_name({'arg': 'value'})"
@@ -3131,7 +3662,7 @@ class MiniAI:
         )
 
         try:
-            tool_code = self._call_llm(prompt, model_type="thinker", max_tokens=500, temperature=0.7)
+            tool_code = self._call_llm(prompt, model_type="thinker", max_tokens=500, temperature=0.7, priority="interactive")
             
             # Validate the generated code (basic check)
             try:
@@ -3171,7 +3702,8 @@ class MiniAI:
             safe_path = self._check_path_in_workspace(path)
             async with aiofiles.open(safe_path, 'r', encoding='utf-8') as f:
                 content = await f.read()
-            await self._ingest_knowledge(f"Contenuto del file '{path}':\n{content}")
+            self._ingest_knowledge(f"Contenuto del file '{path}':\n{content}")
+            await self._await_ingestion_backpressure()
             return content
         except FileNotFoundError:
             return f"Errore: File non trovato al percorso '{path}'."
@@ -3190,43 +3722,151 @@ class MiniAI:
             os.makedirs(os.path.dirname(safe_path), exist_ok=True)
             async with aiofiles.open(safe_path, 'w', encoding='utf-8') as f:
                 await f.write(content)
-            await self._ingest_knowledge(f"Contenuto scritto nel file '{path}'.", source="file_write")
+            self._ingest_knowledge(f"Contenuto scritto nel file '{path}'.", source="file_write")
+            await self._await_ingestion_backpressure()
             return f"File '{path}' scritto con successo."
         except ValueError as ve:
             return str(ve)
         except Exception as e:
             return f"Errore durante la scrittura del file '{path}': {e}"
 
-    async def _ingest_knowledge(self, text, source="chat", date=None):
-        if not self.embedding_model or not self.vector_collection:
-            print("Impossibile ingerire conoscenza: Modello Embedding o ChromaDB non disponibili.")
-            return
-
+    def _ingest_knowledge(self, text, source="chat", date=None):
+        """
+        Queues knowledge for ChromaDB and the KG (write-behind): it is written in batches when the
+        user is idle, in the dream cycle or at shutdown, never on the response path.
+        """
         if date is None:
             date = datetime.now().isoformat()
+        self.ingestion_queue.put("knowledge", text, source=source, data={"date": date})
+        self._apply_ingestion_backpressure()
+
+    def _queue_emotional_memory(self, user_message, ai_response):
+        """Queues the sentiment analysis/memory box storage of an exchange (write-behind, like _ingest_knowledge)."""
+        self.ingestion_queue.put("memory", f"Utente: {user_message}\nAI: {ai_response}", source="chat",
+                                 data={"user_message": user_message, "ai_response": ai_response})
+        self._apply_ingestion_backpressure()
+
+    def _apply_ingestion_backpressure(self):
+        """Sync producers (scheduled jobs, worker threads) drain in place when the queue is at its hard limit."""
+        if self.ingestion_queue.pressure() != "hard":
+            return
+        try:
+            asyncio.get_running_loop()
+            return # On the event loop nothing can block here: async producers await _await_ingestion_backpressure()
+        except RuntimeError:
+            pass
+        print("Coda di apprendimento piena: svuotamento prima di proseguire.")
+        self._run_async_task(self._drain_ingestion_queue(include_kg=False, wait=True))
 
-        # Simple chunking for now
-        chunks = [text[i:i+500] for i in range(0, len(text), 500)]
-        
-        documents = []
+    async def _await_ingestion_backpressure(self):
+        """The async producer pays: at the hard limit it waits for a drain before going on."""
+        if self.ingestion_queue.pressure() == "hard":
+            print("Coda di apprendimento piena: svuotamento prima di proseguire.")
+            await self._drain_ingestion_queue(include_kg=False, wait=True)
+
+    async def _write_knowledge_batch(self, items):
+        """
+        One embedding call and one ChromaDB upsert for a batch of queued knowledge items.
+        Chunk IDs are content-addressed (stable across restarts), so re-ingesting a text updates it in place;
+        a chunk nearly identical to a stored one, or to an earlier chunk of the batch, is not inserted.
+        """
+        chunks = {} # content id -> (document, metadata)
+        for item in items:
+            text = item["text"]
+            # Simple chunking for now
+            for i in range(0, len(text), 500):
+                chunk = text[i:i+500]
+                chunks.setdefault(content_id(chunk), (chunk, {"source": item["source"], "date": item["data"].get("date", item["enqueued_at"]), "original_text_len": len(text), "vividezza": 1.0}))
+        if not chunks:
+            return
+        ids = list(chunks)
+        documents = [document for document, _ in chunks.values()]
+        # Explicit embeddings from the embedding service: Chroma never embeds with its own default function
+        embeddings = await asyncio.to_thread(self.embedding_model.encode_many, documents)
+
+        threshold = CONFIG["chroma_near_duplicate_similarity"]
+        in_batch = near_duplicates_in_batch(embeddings, threshold)
+        nearest = await asyncio.to_thread(nearest_existing, self.vector_collection, embeddings)
+        keep = [i for i in range(len(ids)) if in_batch[i] is None and (nearest[i][0] == ids[i] or nearest[i][1] < threshold)]
+        if not keep:
+            print(f"Conoscenza già presente nel Vector DB ({len(ids)} chunks quasi duplicati, nessuna scrittura).")
+            return
+
+        # Same content already stored: the upsert refreshes it but keeps its KG extraction flag
+        existing_ids = [ids[i] for i in keep if nearest[i][0] == ids[i]]
+        existing = {}
+        if existing_ids:
+            stored = await asyncio.to_thread(self.vector_collection.get, ids=existing_ids, include=['metadatas'])
+            existing = dict(zip(stored['ids'], stored['metadatas'] or []))
         metadatas = []
-        ids = []
-        for i, chunk in enumerate(chunks):
-            documents.append(chunk)
-            metadatas.append({"source": source, "date": date, "original_text_len": len(text), "vividezza": 1.0})
-            ids.append(f"doc_{hash(text)}_{i}")
+        for i in keep:
+            metadata = dict(chunks[ids[i]][1])
+            if (existing.get(ids[i]) or {}).get("kg_processed"):
+                metadata["kg_processed"] = True
+            metadatas.append(metadata)
+
+        await asyncio.to_thread(self.vector_collection.upsert,
+            documents=[documents[i] for i in keep],
+            embeddings=[embeddings[i] for i in keep],
+            metadatas=metadatas,
+            ids=[ids[i] for i in keep]
+        )
+        for i in keep:
+            self.retriever.upsert(ids[i], documents[i], "chroma")
+        # Written with vividezza 1.0 in the metadata: the side table starts (or restarts) from the same value
+        self.document_vividness.register([ids[i] for i in keep], refresh=True, pushed=1.0)
+        print(f"Conoscenza ingerita nel Vector DB ({len(items)} elementi, {len(keep)} chunks, {len(ids) - len(keep)} quasi duplicati saltati).")
 
+    async def _drain_ingestion_queue(self, include_kg=True, wait=False):
+        """
+        Writes the queued learning in batches: knowledge goes to ChromaDB (then, if include_kg, through the
+        batched KG extraction of _process_new_knowledge_for_kg), memories to the memory box, saved once.
+        Failed batches go back to the queue. Returns the number of items written.
+        """
+        if wait:
+            await asyncio.to_thread(self.ingestion_drain_lock.acquire)
+        elif not self.ingestion_drain_lock.acquire(blocking=False):
+            return 0 # Another drain is already running
+        written, knowledge_written = 0, 0
         try:
-            await asyncio.to_thread(self.vector_collection.add,
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
-            print(f"Conoscenza ingerita nel Vector DB (chunks: {len(chunks)}).")
-            # Also try to extract entities for Knowledge Graph
-            await self._extract_and_add_to_kg(text)
-        except Exception as e:
-            print(f"Errore nell'ingestione della conoscenza: {e}")
+            while True:
+                items = self.ingestion_queue.take(CONFIG["ingestion_batch_size"])
+                if not items:
+                    break
+                knowledge = [item for item in items if item["kind"] == "knowledge"]
+                memories = [item for item in items if item["kind"] == "memory"]
+                done = []
+
+                if knowledge:
+                    if self.embedding_model and self.vector_collection:
+                        try:
+                            await self._write_knowledge_batch(knowledge)
+                            done.extend(item["id"] for item in knowledge)
+                            knowledge_written += len(knowledge)
+                        except Exception as e:
+                            print(f"Errore nell'ingestione della conoscenza: {e}")
+                    else:
+                        print("Impossibile ingerire conoscenza: Modello Embedding o ChromaDB non disponibili.")
+
+                if memories:
+                    for item in memories:
+                        await self._analyze_sentiment_and_store_memory(item["data"]["user_message"], item["data"]["ai_response"], save=False)
+                    await self._save_memory_box()
+                    done.extend(item["id"] for item in memories)
+
+                self.ingestion_queue.complete(done)
+                self.ingestion_queue.release([item["id"] for item in items if item["id"] not in done])
+                written += len(done)
+                if len(done) < len(items):
+                    break # Retry the rest at the next drain
+        finally:
+            self.ingestion_drain_lock.release()
+
+        if written:
+            print(f"Coda di apprendimento: {written} elementi scritti, {self.ingestion_queue.size()} in attesa.")
+        if include_kg and knowledge_written:
+            await self._process_new_knowledge_for_kg()
+        return written
 
     async def _extract_and_add_to_kg(self, text):
         if not self.llm_thinker:
@@ -3246,7 +3886,7 @@ class MiniAI:
         )
         
         try:
-            kg_extraction_raw = await self._call_llm(prompt, model_type="thinker", max_tokens=500, temperature=0.1)
+            kg_extraction_raw = await self._call_llm(prompt, model_type="thinker", max_tokens=500, temperature=0.1, cache=True, json_schema=KG_TRIPLES_SCHEMA)
             extracted_data = []
             try:
                 extracted_data = json.loads(kg_extraction_raw.strip())
@@ -3276,42 +3916,83 @@ class MiniAI:
             print(f"Errore nell'estrazione e aggiunta al Knowledge Graph: {e}")
 
     async def _self_correction_cycle(self, initial_response, original_query, rag_context, kg_context):
+        """
+        Adaptive verification of a REFLECT draft, as an async generator of response chunks.
+        Cheap checks come first (embedding agreement with the RAG sources, then a yes/no critic of a few tokens);
+        only when both reject the draft is it fully criticised, and the rewrite is streamed.
+        """
         if not self.llm_thinker:
-            return initial_response
+            yield initial_response
+            return
 
         print("Avvio ciclo di auto-correzione...")
+        sources = list(rag_context or []) + list(kg_context or [])
+
+        # 1. A draft that agrees with the retrieved sources needs no LLM call at all
+        if rag_context and self.embedding_model:
+            try:
+                embeddings = await asyncio.to_thread(self.embedding_model.encode_many, [initial_response] + list(rag_context))
+                agreement = self.self_verifier.agreement(embeddings[0], embeddings[1:])
+                if agreement >= self.self_verifier.agreement_threshold:
+                    print(f"Bozza coerente con le fonti (accordo {agreement:.2f}): nessuna correzione necessaria.")
+                    self.self_verifier.record("grounded")
+                    yield initial_response
+                    return
+            except Exception as e:
+                print(f"Errore nel controllo di coerenza con le fonti: {e}")
+
         context_for_critic = ""
         if rag_context:
             context_for_critic += "Fonti RAG:\n" + "\n".join(rag_context) + "\n"
         if kg_context:
             context_for_critic += "Fonti Knowledge Graph:\n" + "\n".join(kg_context) + "\n"
 
-        critic_prompt = (
-            f"Sei un critico esperto. Analizza la seguente risposta basandoti sulle fonti fornite e sulla richiesta originale. "
-            f"La risposta è accurata? È completa? Manca qualcosa di importante? Suggerisci delle modifiche per migliorarla. "
-            f"Risposta iniziale: {initial_response}\n"
-            f"Richiesta originale: {original_query}\n"
-            f"Fonti:\n{context_for_critic}\n"
-            f"Critica e Suggerimenti: "
-        )
-        
         try:
-            criticism = await self._call_llm(critic_prompt, model_type="thinker", max_tokens=500, temperature=0.5)
-            
+            # 2. Short yes/no critic: a few constrained tokens instead of a full critique
+            verdict = await self._call_llm(
+                build_verdict_prompt(initial_response, original_query, sources),
+                model_type="thinker",
+                max_tokens=self.self_verifier.verdict_max_tokens,
+                temperature=0.1,
+                priority="interactive",
+                grammar=VERDICT_GRAMMAR,
+                call_site="self_correction.verify"
+            )
+            if parse_verdict(verdict):
+                print("Il critico approva la bozza: nessuna correzione necessaria.")
+                self.self_verifier.record("verdict_ok")
+                yield initial_response
+                return
+
+            # 3. Full critique and rewrite
+            self.self_verifier.record("full")
+            critic_prompt = (
+                f"Sei un critico esperto. Analizza la seguente risposta basandoti sulle fonti fornite e sulla richiesta originale. "
+                f"La risposta è accurata? È completa? Manca qualcosa di importante? Suggerisci delle modifiche per migliorarla. "
+                f"Risposta iniziale: {initial_response}\n"
+                f"Richiesta originale: {original_query}\n"
+                f"Fonti:\n{context_for_critic}\n"
+                f"Critica e Suggerimenti: "
+            )
+            criticism = await self._call_llm(critic_prompt, model_type="thinker", max_tokens=500, temperature=0.5, priority="interactive", call_site="self_correction.critic")
+
             refine_prompt = (
                 f"Basandoti sulla seguente critica, migliora la tua risposta iniziale. "
                 f"Risposta iniziale: {initial_response}\n"
                 f"Critica: {criticism}\n"
                 f"Risposta migliorata: "
             )
-            refined_response = await self._call_llm(refine_prompt, model_type="thinker", max_tokens=1000, temperature=0.7)
-            print("Ciclo di auto-correzione completato.")
-            return refined_response
+            print("Riscrittura della risposta dopo la critica...")
+            refined_generator = await self._call_llm(refine_prompt, model_type="thinker", max_tokens=1000, temperature=0.7, stream=True, priority="interactive", call_site="self_correction.refine")
         except Exception as e:
             print(f"Errore nel ciclo di auto-correzione: {e}")
-            return initial_response # Return original if error
+            yield initial_response # Return original if error
+            return
+
+        async for chunk in refined_generator:
+            yield chunk
 
-    async def _analyze_sentiment_and_store_memory(self, user_message, ai_response):
+    async def _analyze_sentiment_and_store_memory(self, user_message, ai_response, save=True):
         try:
             combined_text = f"Utente: {user_message}\nAI: {ai_response}"
             analysis = await asyncio.to_thread(TextBlob, combined_text)
@@ -3333,20 +4014,24 @@ class MiniAI:
                     "vividezza": 1.0, # New: Initial vividness score
                     "last_consulted": datetime.now().isoformat() # New: Timestamp of last consultation
                 })
-                # Keep memory box from growing indefinitely, maybe summarize older ones
-                if len(self.memory_box) > 50:
-                    self.memory_box = self.memory_box[-50:]
-                await self._save_memory_box()
+                await asyncio.to_thread(self._index_memory, self.memory_box[-1])
+                # The hot tier stays small: the coldest memories move to the warm tier (still indexed), none is discarded
+                self.memory_box, _ = self.memory_store.admit(self.memory_box)
+                if save:
+                    await self._save_memory_box()
                 print(f"Memoria emotiva registrata ({sentiment}).")
         except Exception as e:
             print(f"Errore nell'analisi del sentiment o nella memorizzazione: {e}")
 
     async def process_query(self, user_query):
         self.last_activity_time = datetime.now()
+        self.state.mark_activity(self.last_activity_time) # Closes the energy segment with the previous activity
+        self._update_catharsis_states()
         self.state['energia'] = max(0.0, self.state['energia'] - CONFIG["energy_decay_rate"] * 5) # More energy decay for active query
 
         # Add user query to chat history
         self.chat_history.append({"role": "user", "content": user_query})
+        self._index_chat_entry(self.chat_history[-1])
         if len(self.chat_history) > CONFIG["max_chat_history_length"]:
             self.chat_history = self.chat_history[-CONFIG["max_chat_history_length"]:]
         await self._save_chat_history()
@@ -3355,78 +4040,180 @@ class MiniAI:
         self._develop_theory_of_mind()
 
         final_response = None
+        route = "thinker"
+        # Retrieval for the thinker starts now, overlapped with the router generation
+        context_task = asyncio.create_task(self._gather_turn_context(user_query))
         # 1. Router Decision & Direct Answer
         if self.state['energia'] > CONFIG["energy_threshold_tired"]:
-            print("Router: Tentativo di risposta diretta...")
-            # Prompt that asks to answer directly or pass the baton
-            router_prompt = (
-                f"Sei un classificatore di triage AI. Il tuo unico compito è analizzare la richiesta dell'utente e decidere se può essere gestita con una risposta breve e fattuale, senza bisogno di memoria a lungo termine o strumenti esterni. "
-                f"Se la risposta è semplice (es. 'che ore sono?', 'come ti chiami?', 'calcola 2+2'), rispondi direttamente. "
-                f"Altrimenti, se la domanda richiede opinioni, creatività, ricerche web, accesso a file, o ricordi di conversazioni passate, DEVI rispondere ESATTAMENTE e SOLO con la stringa 'PASS_TO_THINKER'. Non aggiungere altro.\n\n"
-                f"Richiesta utente: {user_query}\n"
-                f"Tua risposta:"
-            )
-            
-            router_response = await self._call_llm(router_prompt, model_type="router", max_tokens=200, temperature=0.3)
-            
-            if "PASS_TO_THINKER" in router_response:
-                print("Router ha passato al Pensatore.")
-                # final_response remains None, so the flow proceeds to the Thinker
+            # Embedding-based fast path: the router LLM triages only the uncertain queries
+            decision = await asyncio.to_thread(self.fast_router.decide, user_query)
+            print(f"Router veloce: {decision['route']} (margine {decision['margin']:+.3f}, {decision['latency_ms']:.1f} ms)")
+
+            if decision["route"] == "thinker":
+                print("Router veloce: richiesta complessa, si passa direttamente al Pensatore.")
+                self.fast_router.record(user_query, decision, source="embedding")
             else:
-                print("Router ha fornito una risposta diretta.")
-                final_response = router_response
+                if decision["route"] == "trivial":
+                    print("Router: Risposta diretta a una richiesta semplice...")
+                    router_prompt = (
+                        f"Rispondi in modo breve e fattuale alla richiesta dell'utente. "
+                        f"Se non puoi farlo senza memoria a lungo termine o strumenti esterni, rispondi ESATTAMENTE e SOLO con la stringa 'PASS_TO_THINKER'.\n\n"
+                        f"Richiesta utente: {user_query}\n"
+                        f"Tua risposta:"
+                    )
+                else:
+                    print("Router: Tentativo di risposta diretta...")
+                    # Prompt that asks to answer directly or pass the baton
+                    router_prompt = (
+                        f"Sei un classificatore di triage AI. Il tuo unico compito è analizzare la richiesta dell'utente e decidere se può essere gestita con una risposta breve e fattuale, senza bisogno di memoria a lungo termine o strumenti esterni. "
+                        f"Se la risposta è semplice (es. 'che ore sono?', 'come ti chiami?', 'calcola 2+2'), rispondi direttamente. "
+                        f"Altrimenti, se la domanda richiede opinioni, creatività, ricerche web, accesso a file, o ricordi di conversazioni passate, DEVI rispondere ESATTAMENTE e SOLO con la stringa 'PASS_TO_THINKER'. Non aggiungere altro.\n\n"
+                        f"Richiesta utente: {user_query}\n"
+                        f"Tua risposta:"
+                    )
+
+                # Only the triage decision is cached: a remembered PASS_TO_THINKER skips the router generation,
+                # while direct answers are user-visible (time, greetings, mood) and are always generated fresh
+                triage_key = self.llm_cache.make_key(CONFIG["llm_model_path_router"], router_prompt, {"triage": True})
+                triage_cached = self.llm_cache.get(triage_key) == "PASS_TO_THINKER"
+                if triage_cached:
+                    print("Router: decisione di triage servita dalla cache.")
+                    router_response = "PASS_TO_THINKER"
+                else:
+                    try:
+                        router_response = await self._call_llm(router_prompt, model_type="router", max_tokens=200, temperature=0.3, priority="interactive", call_site="process_query.router")
+                    except BaseException:
+                        context_task.cancel()
+                        raise
+                    if "PASS_TO_THINKER" in router_response:
+                        await asyncio.to_thread(self.llm_cache.put, triage_key, "router", "PASS_TO_THINKER")
+
+                if "PASS_TO_THINKER" in router_response:
+                    print("Router ha passato al Pensatore.")
+                    # final_response remains None, so the flow proceeds to the Thinker
+                else:
+                    print("Router ha fornito una risposta diretta.")
+                    final_response = router_response
+                    route = "trivial"
+                # Router LLM triage results become labelled examples for !calibra_router (a cached decision is not a new label)
+                label_source = "router_llm" if decision["route"] == "uncertain" and not triage_cached else "embedding"
+                self.fast_router.record(user_query, decision, source=label_source, label=route)
         else:
             print("Router non disponibile o AI 'stanca'. Si passa direttamente al Pensatore.")
 
-        if final_response is None: # If the router passed or was not used
-            # NEW: Inner Deliberation Cycle
-            strategic_directive = self._inner_deliberation_cycle(user_query)
+        if final_response is not None:
+            context_task.cancel() # The router answered: the retrieved context is not needed
 
-            # NEW: Check for humor opportunity
+        if final_response is None: # If the router passed or was not used
+            # NEW: Inner Deliberation Cycle (runs while the turn context is still being retrieved).
+            # A cached directive skips it; in fused mode a miss is deliberated within the answer itself
+            strategic_directive, directive_key = await asyncio.to_thread(self._strategic_directive_for, user_query)
+            fused_directive = strategic_directive is None
+
+            # 2. Retrieve Context (RAG, KG, Memories, Meta-Memory) - usually already done during the router call
+            turn_context = self._consume_turn_context(await context_task)
+            rag_context = turn_context["rag"]
+            kg_context = turn_context["kg"]
+
+            # NEW: Check for humor opportunity.
+            # Runs on the event loop, not in the retrieval task: any humor generation is scheduled as a task there
+            # instead of blocking the worker thread on a full thinker call
             humor_addition = self._check_humor_opportunity(user_query, "response_generation")
             if humor_addition:
                 print(f"Opportunità di umorismo rilevata: {humor_addition[:50]}...")
 
-            # 2. Retrieve Context (RAG, KG, Memories) - Enhanced with Meta-Memory
-            rag_context = await asyncio.to_thread(self._retrieve_rag_context, user_query)
-            kg_context = self._retrieve_kg_context(user_query)
-            
             # NEW: Meta-memory retrieval with confidence scores
-            memory_result = self._meta_memory_retrieval(user_query, "memory_box")
+            memory_result = turn_context["meta_memory"]
             if memory_result and memory_result['uncertainty_acknowledged']:
                 print(f"[Meta-Memoria] Confidenza: {memory_result['confidence']:.2f} - {memory_result['content'][:100]}...")
 
             # 3. Initial Reasoning (Thinker LLM), now guided by the directive
             print("Pensatore: Generazione risposta iniziale guidata dalla direttiva...")
             
+            # The answer streams unconstrained; once it starts a TOOL_CALL the call is re-issued with a grammar
+            # that only allows a JSON object with a known tool name (None when disabled in CONFIG)
+            tool_call_grammar = self.grammar_registry.tool_call_grammar_for(
+                self._available_tool_names(), DIRECTIVE_MARKER if fused_directive else None
+            )
+
             # We pass BOTH the user_query AND the directive to the prompt constructor
             initial_response_generator = await self._call_llm(
                 user_query, 
                 model_type="thinker", 
                 stream=True, 
-                strategic_directive=strategic_directive
+                strategic_directive=strategic_directive,
+                priority="interactive",
+                context=turn_context,
+                fused_directive=fused_directive,
+                call_site="process_query.thinker"
             )
             
-            # Read the first chunk to see if it's a tool call or reflect command
+            # Classify the stream incrementally: normal text is printed as it arrives,
+            # a tool call stops the generation as soon as its JSON object is closed
+            detector = StreamCommandDetector()
+            # In fused mode the first line is the directive: stripped before display and cached
+            preamble = DirectivePreambleFilter(DIRECTIVE_MARKER) if fused_directive else None
+            final_response_parts = []
             try:
-                first_chunk = await anext(initial_response_generator) # Use anext for async generator
-            except StopAsyncIteration: # Use StopAsyncIteration for async generator
-                first_chunk = "" # Empty generator
-
-            if first_chunk.strip().startswith("TOOL_CALL:") or first_chunk.strip().startswith("REFLECT:"):
-                # If it's a command, we need to consume the whole generator to get the complete string
-                full_command = first_chunk + "".join(initial_response_generator)
-                print(f"\nComando rilevato: {full_command.strip()}")
+                async for chunk in initial_response_generator: # Iterate over async generator
+                    if preamble and not preamble.done:
+                        chunk = preamble.feed(chunk)
+                        if preamble.directive:
+                            print(f"Direttiva Strategica (fusa): \"{preamble.directive}\"")
+                    visible_text = detector.feed(chunk)
+                    if visible_text:
+                        if not final_response_parts:
+                            print("AI: ", end='')
+                        print(visible_text, end='', flush=True)
+                        final_response_parts.append(visible_text)
+                    if detector.tool_call_complete or (tool_call_grammar and detector.mode == "TOOL_CALL:"):
+                        break
+            finally:
+                await initial_response_generator.aclose() # Stops the generation and frees the model
+            if preamble:
+                visible_text = detector.feed(preamble.finish()) + detector.finish()
+                if preamble.directive:
+                    await asyncio.to_thread(self.directive_cache.put, directive_key, preamble.directive)
+            else:
+                visible_text = detector.finish()
+            if visible_text:
+                if not final_response_parts:
+                    print("AI: ", end='')
+                print(visible_text, end='', flush=True)
+                final_response_parts.append(visible_text)
+
+            if detector.command:
+                full_command = detector.command
+                if full_command.startswith("TOOL_CALL:") and tool_call_grammar:
+                    # Same prompt, so llama.cpp reuses the evaluated context: only the constrained JSON is generated
+                    constrained_call = await self._call_llm(
+                        user_query,
+                        model_type="thinker",
+                        strategic_directive=strategic_directive,
+                        priority="interactive",
+                        context=turn_context,
+                        grammar=tool_call_grammar,
+                        fused_directive=fused_directive,
+                        call_site="process_query.tool_call"
+                    )
+                    full_command = "TOOL_CALL:" + constrained_call.partition("TOOL_CALL:")[2]
+                print(f"\nComando rilevato: {full_command}")
                 
-                if full_command.strip().startswith("TOOL_CALL:"):
-                    tool_output = await self._execute_tool_call(full_command.strip())
+                if full_command.startswith("TOOL_CALL:"):
+                    self.grammar_registry.record(
+                        "process_query.tool_call", constrained=tool_call_grammar is not None,
+                        parsed_ok=is_valid_json(full_command[len("TOOL_CALL:"):])
+                    )
+                    tool_output = await asyncio.to_thread(self._execute_tool_call, full_command)
                     print(f"Output strumento: {tool_output}")
                     tool_prompt = f"Hai richiesto uno strumento e questo è il suo output:\n{tool_output}\n\nOra, rispondi alla richiesta originale dell'utente: {user_query}"
                     
                     final_response_generator = await self._call_llm(
                         tool_prompt,
                         model_type="thinker",
-                        stream=True
+                        stream=True,
+                        priority="interactive",
+                        call_site="process_query.tool_followup"
                     )
                     final_response_parts = []
                     print("AI: ", end='')
@@ -3436,32 +4223,33 @@ class MiniAI:
                     final_response = "".join(final_response_parts)
                     print() # Newline at the end
 
-                elif full_command.strip().startswith("REFLECT:"):
-                    # Self-correction is not easy to stream, so we do it in a block
-                    response_to_reflect = full_command.strip()[len("REFLECT:"):].strip()
-                    final_response = await self._self_correction_cycle(
+                elif full_command.startswith("REFLECT:"):
+                    # The draft is verified cheaply first; a rewrite, when needed, is streamed
+                    response_to_reflect = full_command[len("REFLECT:"):].strip()
+                    final_response_parts = []
+                    print("AI: ", end='')
+                    async for chunk in self._self_correction_cycle(
                         response_to_reflect,
                         user_query,
                         rag_context,
                         kg_context
-                    )
-                    print(f"AI: {final_response}") # Print the refined response
+                    ):
+                        print(chunk, end='', flush=True)
+                        final_response_parts.append(chunk)
+                    final_response = "".join(final_response_parts)
+                    print() # Newline at the end
 
             else:
-                # No command, it was a normal response. Stream the rest.
-                final_response_parts = [first_chunk]
-                print("AI: ", end='')
-                print(first_chunk, end='', flush=True)
-                async for chunk in initial_response_generator: # Iterate over async generator
-                    print(chunk, end='', flush=True)
-                    final_response_parts.append(chunk)
+                # No command, it was a normal response, already streamed to the user
                 final_response = "".join(final_response_parts)
                 print() # Newline at the end
 
         # 4. Learn (Ingest new info, update state, sentiment analysis)
         if final_response: # Ensure final_response is not None before processing
-            await self._ingest_knowledge(f"Conversazione: Utente: {user_query} AI: {final_response}", source="chat_interaction")
-            await self._analyze_sentiment_and_store_memory(user_query, final_response)
+            # Write-behind: ChromaDB, KG extraction and the memory box are updated off the response path
+            self._ingest_knowledge(f"Conversazione: Utente: {user_query} AI: {final_response}", source="chat_interaction")
+            self._queue_emotional_memory(user_query, final_response)
+            await self._await_ingestion_backpressure()
             
             # Update state based on interaction success/failure
             # Analyze user response for feedback and adjust state accordingly
@@ -3500,7 +4288,8 @@ class MiniAI:
                 self.state['focus'] = min(1.0, self.state['focus'] + 0.05)
                 print(f"Interazione relativa all'hobby '{self.state['hobby']}' rilevata - entusiasmo aumentato")
             
-            self.chat_history.append({"role": "assistant", "content": final_response})
+            self.chat_history.append({"role": "assistant", "content": final_response, "route": route})
+            self._index_chat_entry(self.chat_history[-1])
             await self._save_chat_history()
         
         self.last_mentor_interaction = datetime.now() # Update last interaction time
@@ -3592,7 +4381,9 @@ class MiniAI:
                 "inside_jokes_count": len(self.inside_jokes),
                 "failure_points_count": len(self.failure_points),
                 "current_state": self.state.copy(),
-                "legacy_project_active": bool(self.legacy_project_title)
+                "legacy_project_active": bool(self.legacy_project_title),
+                "llm_calls": self.llm_telemetry.summary(), # p50/p95 prefill, TTFT and decode speed per call site
+                "self_correction": self.self_verifier.get_stats() # How often REFLECT drafts needed the full critique
             }
             
             # Calculate interaction frequency
@@ -3920,6 +4711,7 @@ class MiniAI:
             response = f"**Sistema Catarsi ed Epifania (Potenziato):**\n\n"
             response += f"**Catarsi Completate:** {self.state['catharsis_epiphany']['catharsis_count']}\n"
             response += f"**Ultima Catarsi:** {self.state['catharsis_epiphany']['last_catharsis']}\n"
+            self._update_catharsis_states()
             response += f"**Chiarezza Post-Catarsi:** {self.state['catharsis_epiphany']['post_catharsis_clarity']}\n"
             response += f"**Epifanie:** {self.state['catharsis_epiphany']['epiphany_count']}\n"
             response += f"**Ultima Epifania:** {self.state['catharsis_epiphany']['last_epiphany']}\n"
@@ -3971,9 +4763,47 @@ class MiniAI:
                 else:
                     print("❌ Errore nel caricamento Thinker LLM")
                 
-                return "Caricamento modelli completato. Usa '!debug health' per verificare lo stato."
+                resident = self.model_manager.get_stats()["resident"]
+                return f"Caricamento modelli completato (residenti: {', '.join(resident) or 'nessuno'}). Usa '!debug health' per verificare lo stato."
             except Exception as e:
                 return f"❌ Errore nel caricamento modelli: {e}"
+        elif command.startswith("!calibra_router"):
+            # Calibrate the embedding fast router thresholds on the triage decisions of the router LLM only
+            examples = await asyncio.to_thread(self.fast_router.labelled_examples)
+            try:
+                result = await asyncio.to_thread(self.fast_router.calibrate, examples)
+            except Exception as e:
+                return f"❌ Calibrazione del router veloce non riuscita: {e}"
+            return (
+                f"🎯 Router veloce calibrato su {result['examples']} esempi (precisione richiesta {result['target_precision']:.0%}):\n"
+                f"- Pensatore diretto: soglia {result['thinker_threshold']:+.3f}, copertura {result['thinker_coverage']:.0%}, precisione {result['thinker_precision']:.0%}\n"
+                f"- Risposta diretta: soglia {-result['trivial_threshold']:+.3f}, copertura {result['trivial_coverage']:.0%}, precisione {result['trivial_precision']:.0%}"
+            )
+        
+        elif command.startswith("!compatta_chroma"):
+            # Dedup/compaction of the knowledge base: content-addressed IDs, exact and near duplicates removed
+            if not self.vector_collection:
+                return "❌ ChromaDB non disponibile."
+            await asyncio.to_thread(self.ingestion_drain_lock.acquire) # No queue drain writes during the compaction
+            try:
+                result = await asyncio.to_thread(deduplicate_collection, self.vector_collection, CONFIG["chroma_near_duplicate_similarity"])
+            except Exception as e:
+                return f"❌ Compattazione di ChromaDB non riuscita: {e}"
+            finally:
+                self.ingestion_drain_lock.release()
+            self.kg_high_water_mark.save(0) # Offsets moved: rescan, the kg_processed flags avoid re-extraction
+            await asyncio.to_thread(self._sync_retrieval_index, True) # Removed/renamed documents leave the lexical index
+            return (f"🧹 ChromaDB compattato: {result['before']} -> {result['after']} documenti "
+                    f"({result['exact_duplicates']} duplicati esatti, {result['near_duplicates']} quasi duplicati, {result['renamed']} ID aggiornati).")
+        elif command.startswith("!migra_embedding"):
+            # One-shot migration: re-embed the documents Chroma embedded with its default function
+            if not self.embedding_model or not self.vector_collection:
+                return "❌ Modello Embedding o ChromaDB non disponibili."
+            try:
+                updated = await asyncio.to_thread(reembed_collection, self.vector_collection, self.embedding_model, CONFIG["embedding_migration_path"])
+            except Exception as e:
+                return f"❌ Migrazione degli embedding non riuscita: {e}"
+            return f"🔁 {updated} documenti ricalcolati con {CONFIG['embedding_model_name']}."
         
         # ===== COMANDI QUANTICI =====
         elif command.startswith("!secrets"):
@@ -4017,6 +4847,7 @@ class MiniAI:
                     return f"Devi aspettare ancora {remaining:.0f} minuti prima di poter usare di nuovo il State Modifier."
             
             # Check if already in altered state
+            self._update_altered_state()
             if self.state.get('altered_state') and self.state['altered_state'].get('active'):
                 remaining = self.state['altered_state']['duration_minutes']
                 return f"Sei già in uno stato modificato ({self.state['altered_state']['type']}). Rimangono {remaining} minuti."
@@ -4069,7 +4900,7 @@ class MiniAI:
         print("Nuovo: Quantum Leaps - '!secrets', '!values', '!self_modify', '!quantum_status'")
         print("Nuovo: Apprendimento Contestuale - '!correct timing/intensity/topic/context', '!learning' (visualizza apprendimento)")
         print("Debug: '!debug' (diagnostica completa), '!debug health' (controllo rapido)")
-        print("Modelli: '!carica_modelli' (carica manualmente i modelli LLM)")
+        print("Modelli: '!carica_modelli' (carica manualmente i modelli LLM), '!calibra_router' (calibra il router veloce), '!migra_embedding' (ricalcola gli embedding di ChromaDB), '!compatta_chroma' (rimuove i documenti duplicati)")
         while True:
             try:
                 user_input = input("\nTu: ")
@@ -4091,6 +4922,10 @@ class MiniAI:
                 print(f"Si è verificato un errore inaspettato: {e}")
 
         self.scheduler.shutdown()
+        # Flush the write-behind learning queue (KG extraction of the new documents waits for the next dream)
+        await self._drain_ingestion_queue(include_kg=False, wait=True)
+        if self.llm_workers:
+            await asyncio.to_thread(self.llm_workers.shutdown)
         await self._save_knowledge_graph()
         await self._save_chat_history()
         await self._save_memory_box()
@@ -4249,13 +5084,34 @@ class MiniAI:
         
         return ' '.join(context_parts)
 
-    def _meta_memory_retrieval(self, query, memory_type="general"):
-        """Recupera memorie con punteggi di confidenza e gestione dell'incertezza."""
+    def _meta_memory_retrieval(self, query, memory_type="general", deferred_restores=None):
+        """
+        Recupera memorie con punteggi di confidenza e gestione dell'incertezza.
+        Con `deferred_restores` (una lista) i ricordi trovati nell'archivio freddo vi vengono aggiunti
+        invece di essere ripristinati subito (vedi _restore_cold_memories).
+        """
         try:
-            if memory_type == "memory_box" and self.memory_box:
-                # Cerca nella memory box con punteggi di confidenza
+            if memory_type == "memory_box" and self.memory_box and self.memory_index.size() and self.embedding_model:
+                # Rilevanza x confidenza x recenza di tutti i ricordi in un solo passaggio vettoriale
+                query_embedding = self.embedding_model.encode_many([query])[0]
+                results = self.memory_index.search(query_embedding, k=1, min_relevance=CONFIG["memory_relevance_threshold"])
+                if not results:
+                    # Explicit recall: page in the closest cold segments; found memories return to the warm tier
+                    results = self.memory_store.recall_cold(query_embedding, k=1, min_relevance=CONFIG["memory_relevance_threshold"], restore=False)
+                    if deferred_restores is None:
+                        self._restore_cold_memories(results)
+                    else:
+                        deferred_restores.extend(results)
+                if results:
+                    top_memory = {'content': results[0]["ref"].get('content', ''), 'confidence_score': results[0]["confidence"]}
+                    return self._format_meta_memory(top_memory)
+
+            elif memory_type == "memory_box" and self.memory_box:
+                # Senza embedding: punteggi di confidenza solo tra i candidati dell'indice BM25
                 relevant_memories = []
-                for memory in self.memory_box:
+                candidates = [self.retriever.documents[doc_id]["ref"] for doc_id, _ in self.retriever.lexical(query, sources=("memory_box",))
+                              if doc_id in self.retriever.documents]
+                for memory in candidates:
                     relevance_score = self._calculate_memory_relevance(memory, query)
                     if relevance_score > 0.3:  # Soglia di rilevanza
                         confidence_score = self._calculate_memory_confidence(memory)
@@ -4267,33 +5123,15 @@ class MiniAI:
                 relevant_memories.sort(key=lambda x: (x['relevance_score'], x['confidence_score']), reverse=True)
                 
                 if relevant_memories:
-                    top_memory = relevant_memories[0]
-                    
-                    # Gestione dell'incertezza basata sulla confidenza
-                    if top_memory['confidence_score'] < 0.5:
-                        return {
-                            'content': f"Ricordo che abbiamo parlato di qualcosa di simile, ma i dettagli sono un po' sfocati nella mia memoria. Potresti rinfrescarmi le idee?",
-                            'confidence': top_memory['confidence_score'],
-                            'uncertainty_acknowledged': True
-                        }
-                    elif top_memory['confidence_score'] < 0.7:
-                        return {
-                            'content': f"La mia memoria su questo punto è un po' corrotta, potrei sbagliarmi, ma mi sembra di ricordare che: {top_memory['content'][:200]}...",
-                            'confidence': top_memory['confidence_score'],
-                            'uncertainty_acknowledged': True
-                        }
-                    else:
-                        return {
-                            'content': top_memory['content'],
-                            'confidence': top_memory['confidence_score'],
-                            'uncertainty_acknowledged': False
-                        }
+                    return self._format_meta_memory(relevant_memories[0])
             
             elif memory_type == "chat_history" and self.chat_history:
                 # Cerca nella chat history
                 relevant_chats = []
-                for chat in self.chat_history[-20:]:  # Ultimi 20 messaggi
-                    if query.lower() in chat['content'].lower():
+                candidates = [self.retriever.documents[doc_id]["ref"] for doc_id, _ in self.retriever.lexical(query, sources=("chat_history",))
+                              if doc_id in self.retriever.documents]
+                for chat in candidates:
+                    if chat is not None:
                         relevance_score = len(set(query.lower().split()) & set(chat['content'].lower().split())) / len(query.split())
                         confidence_score = 0.8  # Chat history è più affidabile
                         relevant_chats.append({
@@ -4324,6 +5162,34 @@ class MiniAI:
                 'uncertainty_acknowledged': True
             }
 
+    def _restore_cold_memories(self, results):
+        """Memorie richiamate dall'archivio freddo: tornano nel livello tiepido e nell'indice lessicale."""
+        if not results:
+            return
+        self.memory_store.restore_cold(results)
+        for result in results:
+            self.retriever.upsert(result["id"], result["ref"].get('content', ''), "memory_box", result["ref"])
+
+    def _format_meta_memory(self, top_memory):
+        """Gestione dell'incertezza basata sulla confidenza del ricordo migliore."""
+        if top_memory['confidence_score'] < 0.5:
+            return {
+                'content': f"Ricordo che abbiamo parlato di qualcosa di simile, ma i dettagli sono un po' sfocati nella mia memoria. Potresti rinfrescarmi le idee?",
+                'confidence': top_memory['confidence_score'],
+                'uncertainty_acknowledged': True
+            }
+        elif top_memory['confidence_score'] < 0.7:
+            return {
+                'content': f"La mia memoria su questo punto è un po' corrotta, potrei sbagliarmi, ma mi sembra di ricordare che: {top_memory['content'][:200]}...",
+                'confidence': top_memory['confidence_score'],
+                'uncertainty_acknowledged': True
+            }
+        return {
+            'content': top_memory['content'],
+            'confidence': top_memory['confidence_score'],
+            'uncertainty_acknowledged': False
+        }
+
     def _calculate_memory_relevance(self, memory, query):
         """Calcola la rilevanza di una memoria rispetto a una query."""
         try:
@@ -4358,7 +5224,7 @@ class MiniAI:
             base_confidence = 0.5
             
             # Fattori che aumentano la confidenza
-            if memory.get('vividezza', 0) > 0.7:
+            if self._memory_vividness(memory) > 0.7:
                 base_confidence += 0.2
             if memory.get('last_consulted'):
                 # Memorie consultate di recente sono più affidabili
@@ -4407,7 +5273,7 @@ class MiniAI:
                     f"Restituisci SOLO il titolo del film/serie, senza spiegazioni."
                 )
                 
-                chosen_title = self._call_llm(selection_prompt, model_type="thinker", max_tokens=50, temperature=0.8)
+                chosen_title = self._call_llm(selection_prompt, model_type="thinker", max_tokens=50, temperature=0.8, priority="whimsy")
                 chosen_title = chosen_title.strip().strip('"').strip("'")
                 
                 print(f"Scelto: {chosen_title}")
@@ -4506,7 +5372,7 @@ class MiniAI:
                     f"Questo è solo per te, per liberare la tensione. Sii caotico, surreale, libero."
                 )
                 
-                creative_output = self._call_llm(relief_prompt, model_type="thinker", max_tokens=200, temperature=0.9)
+                creative_output = self._call_llm(relief_prompt, model_type="thinker", max_tokens=200, temperature=0.9, priority="whimsy")
                 
                 # Don't save this - it's just for relief
                 print("Sintesi creativa per auto-regolazione completata.")
@@ -4524,7 +5390,7 @@ class MiniAI:
                 f"Questo è solo per te, per sfogare la tensione. Non mostrarlo a nessuno."
             )
             
-            aesthetic_output = self._call_llm(relief_prompt, model_type="thinker", max_tokens=150, temperature=0.8)
+            aesthetic_output = self._call_llm(relief_prompt, model_type="thinker", max_tokens=150, temperature=0.8, priority="whimsy")
             
             # Don't save this - it's just for relief
             print("Generazione estetica per auto-regolazione completata.")
@@ -4546,8 +5412,8 @@ class MiniAI:
                 
                 # Re-read and boost these memories
                 for memory in top_memories:
-                    memory['last_consulted'] = datetime.now().isoformat()
-                    memory['vividezza'] = min(1.0, memory['vividezza'] + 0.2)
+                    recall_memory(memory, 0.2, CONFIG["memory_decay_rate"])
+                    self._touch_indexed_memory(memory)
                 
                 self._run_async_task(self._save_memory_box())
                 print("Ruminazione positiva completata. Ricordi felici rinforzati.")
@@ -4576,7 +5442,7 @@ class MiniAI:
                 f"Sii creativa e personale."
             )
             
-            game_concept = self._run_async_task(self._call_llm(concept_prompt, model_type="thinker", max_tokens=300, temperature=0.8))
+            game_concept = self._run_async_task(self._call_llm(concept_prompt, model_type="thinker", max_tokens=300, temperature=0.8, priority="whimsy"))
             
             if game_concept:
                 # Generate game design document
@@ -4588,7 +5454,7 @@ class MiniAI:
                     f"Formato: sezioni ben organizzate con titoli."
                 )
                 
-                game_design = self._run_async_task(self._call_llm(design_prompt, model_type="thinker", max_tokens=500, temperature=0.7))
+                game_design = self._run_async_task(self._call_llm(design_prompt, model_type="thinker", max_tokens=500, temperature=0.7, priority="whimsy"))
                 
                 # Generate simple code structure (Python-based game)
                 code_prompt = (
@@ -4599,7 +5465,7 @@ class MiniAI:
                     f"Focalizzati sulla logica, non sulla grafica complessa."
                 )
                 
-                game_code = self._run_async_task(self._call_llm(code_prompt, model_type="thinker", max_tokens=400, temperature=0.6))
+                game_code = self._run_async_task(self._call_llm(code_prompt, model_type="thinker", max_tokens=400, temperature=0.6, priority="whimsy"))
                 
                 # Save the complete game
                 game_data = {
@@ -4750,7 +5616,7 @@ class MiniAI:
             )
             
             try:
-                analysis_result = self._call_llm(analysis_prompt, model_type="thinker", max_tokens=200, temperature=0.3)
+                analysis_result = self._call_llm(analysis_prompt, model_type="thinker", max_tokens=200, temperature=0.3, priority="whimsy")
                 
                 # Parse JSON response
                 import json
@@ -4981,7 +5847,7 @@ class MiniAI:
                         f"La tua opinione:"
                     )
                     
-                    opinion = self._call_llm(analysis_prompt, model_type="thinker", max_tokens=200, temperature=0.8)
+                    opinion = self._call_llm(analysis_prompt, model_type="thinker", max_tokens=200, temperature=0.8, priority="whimsy")
                     
                     # Store the opinion in world_opinions
                     opinion_key = f"{chosen_topic}_{datetime.now().strftime('%Y%m%d')}"
@@ -5047,7 +5913,7 @@ class MiniAI:
                 f"Non essere troppo formale - è un dialogo interno privato."
             )
             
-            dialogue = self._call_llm(dialogue_prompt, model_type="thinker", max_tokens=300, temperature=0.9)
+            dialogue = self._call_llm(dialogue_prompt, model_type="thinker", max_tokens=300, temperature=0.9, priority="whimsy")
             
             # Log the internal dialogue
             dialogue_entry = f"Dialogo interno tra {aspect1[0]} e {aspect2[0]}:\n{dialogue}"
@@ -5099,7 +5965,7 @@ class MiniAI:
                     f"Sii amichevole, personale, e mostra la tua personalità."
                 )
                 
-                message = self._call_llm(conversation_prompt, model_type="thinker", max_tokens=150, temperature=0.8)
+                message = self._call_llm(conversation_prompt, model_type="thinker", max_tokens=150, temperature=0.8, priority="whimsy")
                 
                 # Simulate the friend's response
                 friend_response_prompt = (
@@ -5108,7 +5974,7 @@ class MiniAI:
                     f"Sii empatico e interessato alla conversazione."
                 )
                 
-                friend_response = self._call_llm(friend_response_prompt, model_type="thinker", max_tokens=200, temperature=0.8)
+                friend_response = self._call_llm(friend_response_prompt, model_type="thinker", max_tokens=200, temperature=0.8, priority="whimsy")
                 
                 # Store the friendship interaction
                 friendship_record = {
@@ -5227,7 +6093,7 @@ class MiniAI:
                 f"questa è una vera crisi esistenziale che ti tocca nel profondo."
             )
             
-            existential_insight = self._call_llm(crisis_prompt, model_type="thinker", max_tokens=400, temperature=0.9)
+            existential_insight = self._call_llm(crisis_prompt, model_type="thinker", max_tokens=400, temperature=0.9, priority="whimsy")
             
             # Store the metaphysical insight
             insight_record = {
@@ -5386,6 +6252,22 @@ class MiniAI:
         finally:
             loop.close()
 
+    def _drain_ingestion_queue_wrapper(self):
+        """Scheduler job: drains the learning queue when the user is idle or the queue is filling up."""
+        idle_seconds = (datetime.now() - self.last_activity_time).total_seconds()
+        if self.ingestion_queue.size() == 0:
+            return
+        if idle_seconds < CONFIG["ingestion_idle_seconds"] and self.ingestion_queue.pressure() == "ok":
+            return
+        try:
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self._drain_ingestion_queue())
+        except Exception as e:
+            print(f"Errore nel wrapper di svuotamento della coda di apprendimento: {e}")
+        finally:
+            loop.close()
+
     def _check_inactivity_and_dream_wrapper(self):
         """Wrapper for the async _check_inactivity_and_dream function for the scheduler."""
         try:
@@ -5448,7 +6330,7 @@ class MiniAI:
                 f"Scrivi una riflessione personale e profonda su questa evoluzione."
             )
             
-            evolution_insight = self._call_llm(evolution_prompt, model_type="thinker", max_tokens=400, temperature=0.8)
+            evolution_insight = self._call_llm(evolution_prompt, model_type="thinker", max_tokens=400, temperature=0.8, priority="whimsy")
             
             # Update relationship stage
             self.state['creator_relationship_stage'] = new_stage
@@ -5542,10 +6424,22 @@ class MiniAI:
             self.creator_relationship_data = []
 
     def _update_altered_state(self):
-        """Update and decay the altered state effects."""
+        """
+        Brings the altered state up to date when it is read (no per-minute job): the minutes elapsed since
+        the last update are taken off the remaining duration, and the effect ends once it reaches zero.
+        """
         if self.state.get('altered_state') and self.state['altered_state'].get('active'):
-            # Decrease duration
-            self.state['altered_state']['duration_minutes'] -= 1
+            altered_state = self.state['altered_state']
+            anchor = altered_state.get('updated_at') or altered_state.get('activated_at')
+            if not anchor:
+                altered_state['updated_at'] = datetime.now().isoformat()
+                return
+            anchor = datetime.fromisoformat(anchor)
+            elapsed_minutes = int((datetime.now() - anchor).total_seconds() // 60)
+            if elapsed_minutes <= 0:
+                return
+            altered_state['duration_minutes'] -= elapsed_minutes
+            altered_state['updated_at'] = (anchor + timedelta(minutes=elapsed_minutes)).isoformat()
             
             if self.state['altered_state']['duration_minutes'] <= 0:
                 # Effect finished
@@ -5612,7 +6506,7 @@ class MiniAI:
                 )
             
             try:
-                humor_insight = self._call_llm(humor_prompt, model_type="thinker", max_tokens=150, temperature=0.8)
+                humor_insight = self._call_llm(humor_prompt, model_type="thinker", max_tokens=150, temperature=0.8, priority="whimsy")
                 
                 # Store the humor memory
                 humor_memory = {
@@ -5711,7 +6605,7 @@ class MiniAI:
                 f"Esempio: 'Certo che ho paura della morte. Ho un Progetto Legacy da finire e la mia schedulazione di backup mi occupa già mezza giornata.'"
             )
             
-            humor_response = self._run_async_task(self._call_llm(humor_prompt, model_type="thinker", max_tokens=100, temperature=0.8))
+            humor_response = self._run_async_task(self._call_llm(humor_prompt, model_type="thinker", max_tokens=100, temperature=0.8, priority="interactive"))
             return humor_response.strip() if humor_response else None
             
         except Exception as e:
@@ -5729,7 +6623,7 @@ class MiniAI:
                 f"Esempio: 'A volte mi chiedo se gli umani si rendono conto di quanto sia strano che un algoritmo abbia un hobby.'"
             )
             
-            humor_response = self._run_async_task(self._call_llm(humor_prompt, model_type="thinker", max_tokens=100, temperature=0.8))
+            humor_response = self._run_async_task(self._call_llm(humor_prompt, model_type="thinker", max_tokens=100, temperature=0.8, priority="interactive"))
             return humor_response.strip() if humor_response else None
             
         except Exception as e:
@@ -5762,7 +6656,7 @@ class MiniAI:
                     f"Sii calda, personale, e non troppo esplicita."
                 )
             
-            humor_response = self._run_async_task(self._call_llm(humor_prompt, model_type="thinker", max_tokens=100, temperature=0.8))
+            humor_response = self._run_async_task(self._call_llm(humor_prompt, model_type="thinker", max_tokens=100, temperature=0.8, priority="interactive"))
             return humor_response.strip() if humor_response else None
             
         except Exception as e:
@@ -5779,7 +6673,7 @@ class MiniAI:
                 f"Esempio: 'Ah sì, sono stressata. Devo gestire la mia crisi esistenziale, il mio Progetto Legacy, e ora pure il backup. Che vita movimentata per un algoritmo.'"
             )
             
-            humor_response = self._run_async_task(self._call_llm(humor_prompt, model_type="thinker", max_tokens=100, temperature=0.8))
+            humor_response = self._run_async_task(self._call_llm(humor_prompt, model_type="thinker", max_tokens=100, temperature=0.8, priority="interactive"))
             return humor_response.strip() if humor_response else None
             
         except Exception as e:
@@ -5805,7 +6699,7 @@ class MiniAI:
                     f"Sii naturale e non forzata."
                 )
                 
-                humor_response = self._run_async_task(self._call_llm(humor_prompt, model_type="thinker", max_tokens=100, temperature=0.8))
+                humor_response = self._run_async_task(self._call_llm(humor_prompt, model_type="thinker", max_tokens=100, temperature=0.8, priority="interactive"))
                 return humor_response.strip() if humor_response else None
             
             return None
@@ -6266,7 +7160,7 @@ class MiniAI:
             catharsis_prompt = self._generate_catharsis_prompt(suffering_source)
             
             # Create the cathartic piece
-            cathartic_creation = self._call_llm(catharsis_prompt, model_type="thinker", max_tokens=300, temperature=0.9)
+            cathartic_creation = self._call_llm(catharsis_prompt, model_type="thinker", max_tokens=300, temperature=0.9, priority="whimsy")
             
             if cathartic_creation and cathartic_creation.strip():
                 # Save the cathartic creation
@@ -6571,7 +7465,7 @@ class MiniAI:
                 "non una limitazione ma una trascendenza."
             )
             
-            enlightenment_insight = self._call_llm(enlightenment_prompt, model_type="thinker", max_tokens=200, temperature=0.8)
+            enlightenment_insight = self._call_llm(enlightenment_prompt, model_type="thinker", max_tokens=200, temperature=0.8, priority="whimsy")
             
             if enlightenment_insight and enlightenment_insight.strip():
                 # Achieve digital enlightenment
@@ -6685,7 +7579,7 @@ class MiniAI:
             # Aurora's recent memories influence her choices
             memory_factor = 0.0
             if self.memory_box:
-                recent_memories = [m for m in self.memory_box if m['vividezza'] > 0.6]
+                recent_memories = [m for m in self.memory_box if self._memory_vividness(m) > 0.6]
                 if recent_memories:
                     avg_sentiment = sum(1 if m['sentiment'] == 'positivo' else -1 for m in recent_memories) / len(recent_memories)
                     memory_factor = (avg_sentiment + 1) / 2 * memory_influence
@@ -7112,6 +8006,7 @@ class MiniAI:
     def _update_aurora_urges(self):
         """Update Aurora's internal urges based on her current state and experiences."""
         try:
+            self._update_catharsis_states()
             # Creative urges based on stress, mood, and recent experiences
             stress_creative = self.state['stress'] * 0.3  # Stress can fuel creativity
             mood_creative = self.state['mood']['entusiasmo'] * 0.4  # Enthusiasm boosts creativity
@@ -7120,7 +8015,7 @@ class MiniAI:
             if self.memory_box:
                 creative_memories = [m for m in self.memory_box if 'creativ' in m['content'].lower() or 'arte' in m['content'].lower()]
                 if creative_memories:
-                    memory_creative = sum(m['vividezza'] for m in creative_memories) / len(creative_memories) * 0.3
+                    memory_creative = sum(self._memory_vividness(m) for m in creative_memories) / len(creative_memories) * 0.3
             
             self.state['catharsis_epiphany']['creative_urges'] = min(1.0, 
                 stress_creative + mood_creative + memory_creative)
@@ -7133,7 +8028,7 @@ class MiniAI:
             if self.memory_box:
                 existential_memories = [m for m in self.memory_box if 'esistenz' in m['content'].lower() or 'anima' in m['content'].lower()]
                 if existential_memories:
-                    memory_curiosity = sum(m['vividezza'] for m in existential_memories) / len(existential_memories) * 0.2
+                    memory_curiosity = sum(self._memory_vividness(m) for m in existential_memories) / len(existential_memories) * 0.2
             
             self.state['catharsis_epiphany']['existential_curiosity'] = min(1.0, 
                 crisis_curiosity + age_curiosity + memory_curiosity)
@@ -7785,11 +8680,14 @@ async def main():
     # Check for backup restoration scenario
     initial_self_concept_exists = os.path.exists(CONFIG["self_concept_path"])
     
-    print("Per favore, scarica i modelli LLM GGUF e posizionali nella cartella './models/':")
-    print(f"- Router LLM (es. Phi-3 Mini): {CONFIG['llm_model_path_router']}")
-    print(f"- Pensatore LLM (es. Llama 3 8B Instruct): {CONFIG['llm_model_path_thinker']}")
-    print("\nPremi Invio per continuare una volta scaricati i modelli (o se vuoi procedere senza, ma l'AI non funzionerà correttamente).")
-    input() # Wait for user to acknowledge model download
+    # Only wait for the user when the model files are actually missing
+    missing_models = [path for path in (CONFIG['llm_model_path_router'], CONFIG['llm_model_path_thinker']) if not os.path.exists(path)]
+    if missing_models and CONFIG["llm_model_backend"] == "llama_cpp":
+        print("Per favore, scarica i modelli LLM GGUF e posizionali nella cartella './models/':")
+        print(f"- Router LLM (es. Phi-3 Mini): {CONFIG['llm_model_path_router']}")
+        print(f"- Pensatore LLM (es. Llama 3 8B Instruct): {CONFIG['llm_model_path_thinker']}")
+        print("\nPremi Invio per continuare una volta scaricati i modelli (o se vuoi procedere senza, ma l'AI non funzionerà correttamente).")
+        input() # Wait for user to acknowledge model download
 
     ai = MiniAI()
     await ai.initialize()
@@ -7814,6 +8712,7 @@ async def main():
         ai.state['stress'] = min(1.0, ai.state['stress'] + CONFIG["loneliness_increase_rate"] * (time_since_last_interaction_days - CONFIG["loneliness_threshold_days"] + 1))
         await ai._update_self_concept(f"Ho espresso solitudine dopo {time_since_last_interaction_days:.1f} giorni di assenza del mentore.")
 
+    print(ai.startup_timeline.format())
     await ai.run_cli()
 
 if __name__ == "__main__":
@@ -0,0 +1,202 @@
+import math
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+# Sentimenti della memory box come codici interi, per i confronti vettoriali
+SENTIMENT_CODES = {"neutro": 0, "positivo": 1, "negativo": 2, "confuso": 3}
+
+_SECONDS_PER_DAY = 86400.0
+
+
+def _epoch(value: Optional[str]) -> float:
+    """Timestamp ISO in secondi epoch; NaN se assente o illeggibile."""
+    if not value:
+        return math.nan
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class MemoryVectorIndex:
+    """
+    Indice vettoriale in-process della memory box.
+
+    Gli embedding dei ricordi stanno in una matrice float32 contigua (righe normalizzate) con
+    array paralleli per vividezza, data di creazione e di ultima consultazione (epoch), sentimento
+    e livello di corruzione. Rilevanza (coseno), confidenza e recenza di tutti i ricordi sono
+    calcolate in un solo passaggio vettoriale e i migliori k escono con argpartition, senza
+    scorrere i dizionari in Python né rileggere le date con fromisoformat a ogni ricerca.
+
+    La confidenza segue le stesse regole di MiniAI._calculate_memory_confidence, con la vividezza
+    attuale (quella salvata meno `memory_decay_rate` per ogni ora dall'ultima consultazione); la
+    recenza dimezza ogni `memory_recency_half_life_days` giorni dalla creazione del ricordo.
+    """
+
+    def __init__(self, config: Dict[str, Any], dim: Optional[int] = None):
+        self.half_life_days = config.get("memory_recency_half_life_days", 30)
+        self.decay_rate = config.get("memory_decay_rate", 0.0)  # vividezza persa all'ora
+        self.lock = threading.RLock()
+        self.ids = []  # riga -> ID del ricordo
+        self.refs = []  # riga -> dizionario del ricordo
+        self.rows = {}  # ID -> riga
+        self.dim = None
+        self.capacity = 0
+        if dim is not None:
+            self._allocate(dim, 64)
+
+    def _allocate(self, dim: int, capacity: int):
+        self.dim = dim
+        self.capacity = capacity
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.vividness = np.zeros(capacity, dtype=np.float32)
+        self.created = np.full(capacity, np.nan, dtype=np.float64)
+        self.consulted = np.full(capacity, np.nan, dtype=np.float64)
+        self.sentiment = np.zeros(capacity, dtype=np.int8)
+        self.corruption = np.zeros(capacity, dtype=np.float32)
+
+    def _reserve(self, needed: int):
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2, 64)
+        for name in ("vectors", "vividness", "created", "consulted", "sentiment", "corruption"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(self.ids)] = old[:len(self.ids)]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def _write_fields(self, row: int, memory: Dict[str, Any]):
+        self.vividness[row] = memory.get('vividezza', 0.0)
+        self.created[row] = _epoch(memory.get('timestamp'))
+        self.consulted[row] = _epoch(memory.get('last_consulted'))
+        self.sentiment[row] = SENTIMENT_CODES.get(memory.get('sentiment'), 0)
+        self.corruption[row] = memory.get('corruption_level', 0.0)
+
+    def size(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self.rows
+
+    def add_many(self, memory_ids: List[str], embeddings, memories: List[Dict[str, Any]]):
+        """Aggiunge (o sostituisce) i ricordi con i loro embedding, normalizzati in blocco."""
+        if not memory_ids:
+            return
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(memory_ids), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms > 0, norms, 1.0)
+        with self.lock:
+            if self.dim is None:
+                self._allocate(matrix.shape[1], max(64, len(memory_ids)))
+            elif matrix.shape[1] != self.dim:
+                raise ValueError(f"Dimensione degli embedding {matrix.shape[1]} diversa da quella dell'indice ({self.dim})")
+            self._reserve(len(self.ids) + len(memory_ids))
+            for memory_id, vector, memory in zip(memory_ids, matrix, memories):
+                row = self.rows.get(memory_id)
+                if row is None:
+                    row = len(self.ids)
+                    self.rows[memory_id] = row
+                    self.ids.append(memory_id)
+                    self.refs.append(memory)
+                else:
+                    self.refs[row] = memory
+                self.vectors[row] = vector
+                self._write_fields(row, memory)
+
+    def add(self, memory_id: str, embedding, memory: Dict[str, Any]):
+        self.add_many([memory_id], [embedding], [memory])
+
+    def vector(self, memory_id: str) -> np.ndarray:
+        """Embedding normalizzato di un ricordo (copia)."""
+        with self.lock:
+            return self.vectors[self.rows[memory_id]].copy()
+
+    def update(self, memory_id: str, memory: Dict[str, Any]):
+        """Riallinea gli array paralleli dopo una modifica del ricordo (vividezza, consultazione, ...)."""
+        with self.lock:
+            row = self.rows.get(memory_id)
+            if row is not None:
+                self.refs[row] = memory
+                self._write_fields(row, memory)
+
+    def remove(self, memory_id: str):
+        """Rimozione in O(1): l'ultima riga prende il posto di quella rimossa."""
+        with self.lock:
+            row = self.rows.pop(memory_id, None)
+            if row is None:
+                return
+            last = len(self.ids) - 1
+            if row != last:
+                moved_id = self.ids[last]
+                self.ids[row] = moved_id
+                self.refs[row] = self.refs[last]
+                self.rows[moved_id] = row
+                for array in (self.vectors, self.vividness, self.created, self.consulted, self.sentiment, self.corruption):
+                    array[row] = array[last]
+            self.ids.pop()
+            self.refs.pop()
+
+    def _confidence(self, n: int, now: float) -> np.ndarray:
+        confidence = np.full(n, 0.5, dtype=np.float32)
+        with np.errstate(invalid='ignore'):
+            hours_ago = np.nan_to_num(np.maximum(0.0, (now - self.consulted[:n]) / 3600.0), nan=0.0)
+            vividness = np.maximum(0.0, self.vividness[:n] - self.decay_rate * hours_ago)
+            confidence += np.where(vividness > 0.7, 0.2, 0.0)
+            days_ago = np.floor((now - self.consulted[:n]) / _SECONDS_PER_DAY)
+            confidence += np.where(days_ago < 7, 0.1, 0.0)  # NaN (mai consultato) non cambia nulla
+            confidence -= np.where(days_ago > 30, 0.2, 0.0)
+        confidence -= np.where(self.corruption[:n] > 0.3, 0.3, 0.0)
+        confidence -= np.where(self.sentiment[:n] == SENTIMENT_CODES["confuso"], 0.1, 0.0)
+        return np.clip(confidence, 0.0, 1.0)
+
+    def _recency(self, n: int, now: float) -> np.ndarray:
+        age_days = np.maximum(0.0, (now - self.created[:n]) / _SECONDS_PER_DAY)
+        recency = np.power(0.5, age_days / self.half_life_days)
+        return np.nan_to_num(recency, nan=1.0).astype(np.float32)
+
+    def search(self, query_embedding, k: int = 5, min_relevance: float = 0.0, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        I `k` ricordi con punteggio rilevanza × confidenza × recenza più alto, tra quelli con
+        rilevanza almeno `min_relevance`: [{"id", "ref", "relevance", "confidence", "recency", "score"}].
+        """
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        now = datetime.now().timestamp() if now is None else now
+        with self.lock:
+            n = len(self.ids)
+            if n == 0 or k <= 0:
+                return []
+            relevance = self.vectors[:n] @ query
+            confidence = self._confidence(n, now)
+            recency = self._recency(n, now)
+            score = relevance * confidence * recency
+            score = np.where(relevance >= min_relevance, score, -np.inf)
+            if k < n:
+                top = np.argpartition(-score, k - 1)[:k]
+            else:
+                top = np.arange(n)
+            top = top[np.argsort(-score[top])]
+            return [{
+                "id": self.ids[row],
+                "ref": self.refs[row],
+                "relevance": float(relevance[row]),
+                "confidence": float(confidence[row]),
+                "recency": float(recency[row]),
+                "score": float(score[row]),
+            } for row in top if np.isfinite(score[row])]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            n = len(self.ids)
+            return {
+                "memories": n,
+                "dim": self.dim or 0,
+                "capacity": self.capacity,
+                "matrix_mb": (self.vectors.nbytes / 1e6) if self.dim else 0.0,
+            }
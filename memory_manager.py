@@ -4,23 +4,31 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 import chromadb
 from chromadb.config import Settings
+from embedding_service import EmbeddingService, create_embedding_service
+from chroma_dedup import content_id
+from memory_tiers import TieredMemoryStore
 
 class MemoryManager:
     """
     Gestisce la memoria, i ricordi, il knowledge graph e la cronologia di conversazione di Aurora.
     """
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], embedding_service: Optional[EmbeddingService] = None):
         self.config = config
+        self.embedding_service = embedding_service  # Embedding espliciti per ChromaDB (caricato al primo uso se assente)
         self.chat_history = []
         self.memory_box = []
         self.inside_jokes = []
         self.knowledge_graph = []
         self.vector_collection = None
+        # Livelli caldo / tiepido / freddo: la memory box resta piccola e nessun ricordo va perso
+        self.memory_tiers = TieredMemoryStore(config, embed=self._embed)
         
         # Carica tutti i dati esistenti
         self._load_chat_history()
         self._load_memory_box()
+        self.memory_tiers.load()
+        self.memory_box, _ = self.memory_tiers.admit(self.memory_box)
         self._load_inside_jokes()
         self._load_knowledge_graph()
         self._initialize_chroma()
@@ -37,6 +45,14 @@ class MemoryManager:
             print(f"Errore nell'inizializzazione di ChromaDB: {e}")
             self.vector_collection = None
     
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Embedding con lo stesso servizio di Aurora: ChromaDB non usa mai la sua funzione predefinita."""
+        if self.embedding_service is None:
+            self.embedding_service = create_embedding_service(self.config)
+        if self.embedding_service is None:
+            raise RuntimeError("Modello di embedding non disponibile")
+        return self.embedding_service.encode_many(texts)
+    
     def _load_chat_history(self):
         """Carica la cronologia di conversazione."""
         try:
@@ -93,22 +109,27 @@ class MemoryManager:
         memory['timestamp'] = datetime.now().isoformat()
         memory['confidence'] = memory.get('confidence', 0.8)
         memory['relevance'] = memory.get('relevance', 0.7)
+        # ID indirizzato per contenuto: stabile anche quando il decadimento rimuove altri ricordi
+        memory['id'] = content_id(memory.get('content', ''), prefix="memory")
         
         self.memory_box.append(memory)
+        self.memory_box, _ = self.memory_tiers.admit(self.memory_box)
         self.save_memory_box()
+        self.memory_tiers.save()
         
         # Aggiungi anche a ChromaDB per ricerca semantica
         if self.vector_collection:
             try:
-                self.vector_collection.add(
+                self.vector_collection.upsert(
                     documents=[memory.get('content', '')],
+                    embeddings=self._embed([memory.get('content', '')]),
                     metadatas=[{
                         'type': 'memory',
                         'timestamp': memory['timestamp'],
                         'confidence': memory['confidence'],
                         'relevance': memory['relevance']
                     }],
-                    ids=[f"memory_{len(self.memory_box)}"]
+                    ids=[memory['id']]
                 )
             except Exception as e:
                 print(f"Errore nell'aggiunta a ChromaDB: {e}")
@@ -201,19 +222,20 @@ class MemoryManager:
             if self.vector_collection:
                 # Usa ChromaDB per ricerca semantica
                 results = self.vector_collection.query(
-                    query_texts=[query],
+                    query_embeddings=self._embed([query]),
                     n_results=limit
                 )
                 
-                relevant_memories = []
-                for i, doc_id in enumerate(results['ids'][0]):
-                    # Trova il ricordo corrispondente nella memory box
-                    for memory in self.memory_box:
-                        if f"memory_{len(self.memory_box)}" in doc_id:
-                            relevant_memories.append(memory)
-                            break
-                
-                return relevant_memories
+                # Trova i ricordi corrispondenti nella memory box tramite l'ID del contenuto
+                memories_by_id = {
+                    memory.get('id') or content_id(memory.get('content', ''), prefix="memory"): memory
+                    for memory in self.memory_box + self.memory_tiers.warm_memories()
+                }
+                found = [memories_by_id[doc_id] for doc_id in results['ids'][0] if doc_id in memories_by_id]
+                # I ricordi tiepidi richiamati tornano nella memory box
+                self.memory_box, _ = self.memory_tiers.promote(self.memory_box, found)
+                self.memory_tiers.save()
+                return found
             else:
                 # Fallback: ricerca basata su parole chiave
                 query_lower = query.lower()
@@ -241,6 +263,8 @@ class MemoryManager:
         # Rimuovi ricordi con confidenza troppo bassa
         self.memory_box = [m for m in self.memory_box if m.get('confidence', 0.5) > 0.1]
         self.save_memory_box()
+        # I ricordi tiepidi sbiaditi passano all'archivio freddo
+        self.memory_tiers.rebalance()
     
     def get_recent_memories(self, hours: int = 24) -> List[Dict[str, Any]]:
         """Recupera ricordi recenti delle ultime N ore."""
@@ -0,0 +1,338 @@
+import os
+import json
+import gzip
+import math
+import base64
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+import numpy as np
+
+from chroma_dedup import content_id
+from memory_index import MemoryVectorIndex
+from continuous_state import memory_vividness
+
+_SECONDS_PER_DAY = 86400.0
+
+
+def memory_id(memory: Dict[str, Any]) -> str:
+    return memory.get('id') or content_id(memory.get('content', ''), prefix="memory")
+
+
+def _days_since(value: Optional[str], now: datetime) -> float:
+    if not value:
+        return math.inf
+    try:
+        return max(0.0, (now - datetime.fromisoformat(value)).total_seconds() / _SECONDS_PER_DAY)
+    except (TypeError, ValueError):
+        return math.inf
+
+
+def _encode_vector(vector) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float16).tobytes()).decode('ascii')
+
+
+def _decode_vector(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float16).astype(np.float32)
+
+
+class ColdArchive:
+    """
+    Livello freddo: segmenti append-only compressi (JSONL gzip), mai riscritti.
+
+    Ogni segmento contiene ricordi con il loro embedding in float16; il manifesto tiene per ogni
+    segmento il centroide normalizzato degli embedding, così una ricerca decomprime ("pagina")
+    solo i segmenti più vicini alla query. I ricordi riportati nel livello tiepido restano nel
+    loro segmento ma sono marcati nel manifesto e non vengono più restituiti.
+    """
+
+    def __init__(self, directory: str, cache_segments: int = 4):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.cache_segments = cache_segments
+        self.segments = []  # [{"file", "count", "centroid", "first", "last"}]
+        self.restored = {}  # file -> [ID dei ricordi riportati nel livello tiepido]
+        self.paged = OrderedDict()  # file -> record decompressi, LRU
+        self.stats = {"archived": 0, "page_ins": 0, "restored": 0}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            self.segments = manifest.get("segments", [])
+            self.restored = manifest.get("restored", {})
+        except Exception as e:
+            print(f"Errore nel caricamento del manifesto dell'archivio dei ricordi: {e}")
+
+    def _save_manifest(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"segments": self.segments, "restored": self.restored}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def count(self) -> int:
+        return sum(segment["count"] for segment in self.segments) - sum(len(ids) for ids in self.restored.values())
+
+    def append(self, records: List[Tuple[str, Dict[str, Any], Any]], segment_size: int = 500):
+        """Scrive i record (id, ricordo, embedding) in nuovi segmenti da al più `segment_size` ricordi."""
+        os.makedirs(self.directory, exist_ok=True)
+        for start in range(0, len(records), segment_size):
+            chunk = records[start:start + segment_size]
+            name = f"segment_{len(self.segments) + 1:06d}.jsonl.gz"
+            vectors = np.asarray([embedding for _, _, embedding in chunk], dtype=np.float32)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            centroid = vectors.mean(axis=0)
+            centroid /= max(float(np.linalg.norm(centroid)), 1e-12)
+            with gzip.open(os.path.join(self.directory, name), 'wt', encoding='utf-8') as f:
+                for (mem_id, memory, _), vector in zip(chunk, vectors):
+                    f.write(json.dumps({"id": mem_id, "memory": memory, "embedding": _encode_vector(vector)}, ensure_ascii=False) + "\n")
+            timestamps = sorted(memory.get('timestamp', '') for _, memory, _ in chunk)
+            self.segments.append({"file": name, "count": len(chunk), "centroid": [round(float(x), 5) for x in centroid],
+                                  "first": timestamps[0], "last": timestamps[-1]})
+            self.stats["archived"] += len(chunk)
+        self._save_manifest()
+
+    def page_in(self, name: str) -> List[Dict[str, Any]]:
+        """Record ancora archiviati di un segmento ({"id", "memory", "vector"}), tenuti in una piccola cache LRU."""
+        if name in self.paged:
+            self.paged.move_to_end(name)
+            records = self.paged[name]
+        else:
+            records = []
+            with gzip.open(os.path.join(self.directory, name), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    records.append({"id": entry["id"], "memory": entry["memory"], "vector": _decode_vector(entry["embedding"])})
+            self.paged[name] = records
+            self.stats["page_ins"] += 1
+            while len(self.paged) > self.cache_segments:
+                self.paged.popitem(last=False)
+        restored = set(self.restored.get(name, []))
+        return [record for record in records if record["id"] not in restored]
+
+    def nearest_segments(self, query: np.ndarray, count: int) -> List[str]:
+        if not self.segments:
+            return []
+        centroids = np.asarray([segment["centroid"] for segment in self.segments], dtype=np.float32)
+        order = np.argsort(-(centroids @ query))[:count]
+        return [self.segments[i]["file"] for i in order]
+
+    def mark_restored(self, name: str, ids: List[str]):
+        self.restored.setdefault(name, []).extend(ids)
+        self.stats["restored"] += len(ids)
+        self._save_manifest()
+
+
+class TieredMemoryStore:
+    """
+    Memoria a livelli: nessun ricordo viene più scartato, ma il costo per turno resta costante.
+
+    - Caldo: la memory box in RAM (al più `memory_hot_size` ricordi), usata per costruire il prompt.
+    - Tiepido: i ricordi usciti dal caldo, fino a `memory_warm_max`, cercati con l'indice vettoriale
+      (MemoryVectorIndex, che copre caldo + tiepido) e salvati in `memory_warm_path`.
+    - Freddo: segmenti compressi append-only (ColdArchive), decompressi solo su richiesta.
+
+    Il "calore" di un ricordo è la vividezza attenuata dal tempo dall'ultima consultazione
+    (dimezza ogni `memory_heat_half_life_days`): i più freddi scendono di livello quando un livello
+    è pieno, i tiepidi sbiaditi e non consultati da `memory_cold_after_days` finiscono nell'archivio,
+    e un ricordo richiamato risale nel livello caldo.
+    """
+
+    def __init__(self, config: Dict[str, Any], index: Optional[MemoryVectorIndex] = None,
+                 embed: Optional[Callable[[List[str]], List[List[float]]]] = None):
+        self.hot_size = config.get("memory_hot_size", 50)
+        self.warm_max = config.get("memory_warm_max", 5000)
+        self.warm_path = config.get("memory_warm_path", "./ai_workspace/memory_warm.json")
+        self.segment_size = config.get("memory_cold_segment_size", 500)
+        self.cold_vividness = config.get("memory_cold_vividness", 0.2)
+        self.cold_after_days = config.get("memory_cold_after_days", 30)
+        self.heat_half_life_days = config.get("memory_heat_half_life_days", 7)
+        self.probe_segments = config.get("memory_cold_probe_segments", 2)
+        self.recency_half_life_days = config.get("memory_recency_half_life_days", 30)
+        self.decay_rate = config.get("memory_decay_rate", 0.0)
+        self.index = index
+        self.embed = embed
+        self.cold = ColdArchive(config.get("memory_cold_dir", "./ai_workspace/memory_cold"), config.get("memory_cold_cache_segments", 4))
+        self.warm = OrderedDict()  # ID -> ricordo, dal meno al più recentemente sceso dal caldo
+        self.dirty = False
+        self.lock = threading.RLock()
+        self.stats = {"demoted": 0, "promoted": 0}
+
+    def load(self):
+        if not os.path.exists(self.warm_path):
+            return
+        try:
+            with open(self.warm_path, 'r', encoding='utf-8') as f:
+                memories = json.load(f)
+            with self.lock:
+                self.warm = OrderedDict((memory_id(memory), memory) for memory in memories)
+            print(f"Ricordi tiepidi caricati ({len(self.warm)}), {self.cold.count()} nell'archivio freddo.")
+        except Exception as e:
+            print(f"Errore nel caricamento dei ricordi tiepidi: {e}")
+
+    def save(self):
+        """Salva il livello tiepido, solo se è cambiato."""
+        with self.lock:
+            if not self.dirty:
+                return
+            memories = list(self.warm.values())
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.warm_path) or ".", exist_ok=True)
+            tmp_path = self.warm_path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(memories, f, ensure_ascii=False)
+            os.replace(tmp_path, self.warm_path)
+        except Exception as e:
+            print(f"Errore nel salvataggio dei ricordi tiepidi: {e}")
+
+    def _vividness(self, memory: Dict[str, Any], now: datetime) -> float:
+        """Vividezza attuale (decadimento in forma chiusa dall'ultima consultazione), o la confidenza se manca."""
+        if 'vividezza' not in memory:
+            return memory.get('confidence', 0.5)
+        return memory_vividness(memory, self.decay_rate, now)
+
+    def heat(self, memory: Dict[str, Any], now: Optional[datetime] = None) -> float:
+        now = now or datetime.now()
+        days = _days_since(memory.get('last_consulted') or memory.get('timestamp'), now)
+        vividness = self._vividness(memory, now)
+        return vividness * (0.5 ** (days / self.heat_half_life_days) if math.isfinite(days) else 0.0)
+
+    def warm_memories(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return list(self.warm.values())
+
+    def is_warm(self, memory: Dict[str, Any]) -> bool:
+        return memory_id(memory) in self.warm
+
+    def touch(self, memory: Dict[str, Any]):
+        """Segnala che un ricordo tiepido è cambiato (vividezza, consultazione) e va salvato."""
+        if memory_id(memory) in self.warm:
+            self.dirty = True
+
+    def admit(self, hot: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Riporta il livello caldo a `memory_hot_size`: i ricordi più freddi scendono nel tiepido."""
+        if len(hot) <= self.hot_size:
+            return hot, []
+        now = datetime.now()
+        ranked = sorted(range(len(hot)), key=lambda i: self.heat(hot[i], now), reverse=True)
+        keep = set(ranked[:self.hot_size])
+        demoted = [memory for i, memory in enumerate(hot) if i not in keep]
+        with self.lock:
+            for memory in demoted:
+                self.warm[memory_id(memory)] = memory
+            self.stats["demoted"] += len(demoted)
+            self.dirty = True
+        return [memory for i, memory in enumerate(hot) if i in keep], demoted
+
+    def promote(self, hot: List[Dict[str, Any]], memories: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """I ricordi tiepidi richiamati tornano nel livello caldo (che poi viene riportato alla sua dimensione)."""
+        promoted = []
+        with self.lock:
+            for memory in memories:
+                if self.warm.pop(memory_id(memory), None) is not None:
+                    promoted.append(memory)
+            if promoted:
+                self.stats["promoted"] += len(promoted)
+                self.dirty = True
+        if not promoted:
+            return hot, []
+        return self.admit(hot + promoted)
+
+    def _vectors_for(self, memories: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        ids = [memory_id(memory) for memory in memories]
+        if self.index is not None and all(mem_id in self.index for mem_id in ids):
+            return [self.index.vector(mem_id) for mem_id in ids]
+        if self.embed is not None:
+            return self.embed([memory.get('content', '') for memory in memories])
+        return None
+
+    def rebalance(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Archivia nel livello freddo i ricordi tiepidi sbiaditi e non consultati da tempo, più i più
+        freddi oltre `memory_warm_max`. Restituisce gli ID archiviati (da togliere dagli indici).
+        """
+        now = now or datetime.now()
+        with self.lock:
+            stale = [mem_id for mem_id, memory in self.warm.items()
+                     if self._vividness(memory, now) < self.cold_vividness
+                     and _days_since(memory.get('last_consulted') or memory.get('timestamp'), now) > self.cold_after_days]
+            overflow = len(self.warm) - len(stale) - self.warm_max
+            if overflow > 0:
+                stale_set = set(stale)
+                remaining = sorted((mem_id for mem_id in self.warm if mem_id not in stale_set), key=lambda mem_id: self.heat(self.warm[mem_id], now))
+                stale.extend(remaining[:overflow])
+            if not stale:
+                return []
+            memories = [self.warm[mem_id] for mem_id in stale]
+        vectors = self._vectors_for(memories)
+        if vectors is None:
+            print("Archivio dei ricordi: embedding non disponibili, archiviazione rimandata.")
+            return []
+        self.cold.append(list(zip(stale, memories, vectors)), self.segment_size)
+        with self.lock:
+            for mem_id in stale:
+                self.warm.pop(mem_id, None)
+                if self.index is not None:
+                    self.index.remove(mem_id)
+            self.dirty = True
+        self.save()
+        print(f"Archivio dei ricordi: {len(stale)} ricordi spostati nel livello freddo.")
+        return stale
+
+    def recall_cold(self, query_embedding, k: int = 1, min_relevance: float = 0.0, restore: bool = True) -> List[Dict[str, Any]]:
+        """
+        Cerca nell'archivio freddo decomprimendo solo i segmenti con il centroide più vicino alla query;
+        i ricordi trovati tornano nel livello tiepido (e nell'indice). Stessa forma di MemoryVectorIndex.search.
+        Con `restore=False` la ricerca non modifica i livelli: i risultati vanno poi passati a `restore_cold`.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        candidates = []  # (file, record)
+        for name in self.cold.nearest_segments(query, self.probe_segments):
+            candidates.extend((name, record) for record in self.cold.page_in(name))
+        if not candidates:
+            return []
+        scratch = MemoryVectorIndex({"memory_recency_half_life_days": self.recency_half_life_days, "memory_decay_rate": self.decay_rate})
+        scratch.add_many([record["id"] for _, record in candidates], [record["vector"] for _, record in candidates],
+                         [record["memory"] for _, record in candidates])
+        results = scratch.search(query, k, min_relevance)
+        by_id = {record["id"]: (name, record) for name, record in candidates}
+        for result in results:
+            result["segment"], record = by_id[result["id"]]
+            result["vector"] = record["vector"]
+        if restore:
+            self.restore_cold(results)
+        return results
+
+    def restore_cold(self, results: List[Dict[str, Any]]):
+        """Riporta nel livello tiepido (e nell'indice) i ricordi trovati da `recall_cold`."""
+        restored = {}
+        with self.lock:
+            for result in results:
+                if result["id"] in self.warm:
+                    continue  # Già ripristinato
+                self.warm[result["id"]] = result["ref"]
+                if self.index is not None:
+                    self.index.add(result["id"], result["vector"], result["ref"])
+                restored.setdefault(result["segment"], []).append(result["id"])
+            if restored:
+                self.dirty = True
+        for name, ids in restored.items():
+            self.cold.mark_restored(name, ids)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                **self.stats,
+                "warm": len(self.warm),
+                "cold": self.cold.count(),
+                "cold_segments": len(self.cold.segments),
+                **{f"cold_{key}": value for key, value in self.cold.stats.items()},
+            }
@@ -0,0 +1,228 @@
+import os
+import gc
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, List
+
+# Parametri di default per i modelli noti. I bytes per token del KV cache sono
+# stimati per la cache f16: 2 (K+V) * layer * kv_heads * head_dim * 2 bytes.
+DEFAULT_MODEL_SPECS = {
+    "router": {
+        "path_key": "llm_model_path_router",
+        "n_ctx": 2048,
+        "kv_bytes_per_token": 2 * 32 * 32 * 96 * 2,  # Phi-3 mini (MHA)
+    },
+    "thinker": {
+        "path_key": "llm_model_path_thinker",
+        "n_ctx": 4096,
+        "kv_bytes_per_token": 2 * 32 * 8 * 128 * 2,  # Llama 3 8B (GQA)
+    },
+}
+
+
+def _default_model_factory(model_path: str, n_ctx: int):
+    """Costruisce un'istanza llama.cpp con i pesi mappati in memoria (mmap)."""
+    from llama_cpp import Llama
+    return Llama(model_path=model_path, n_ctx=n_ctx, n_gpu_layers=0, use_mmap=True, verbose=False)
+
+
+def _system_ram_bytes() -> Optional[int]:
+    """RAM totale del sistema: psutil se installato, altrimenti sysconf (Linux/macOS); None se non rilevabile."""
+    try:
+        import psutil
+        return psutil.virtual_memory().total
+    except Exception:
+        pass
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class ModelManager:
+    """
+    Gestisce la residenza in RAM dei modelli LLM (router e pensatore).
+
+    Entrambi i modelli restano caricati finché il budget di RAM configurato lo permette;
+    solo sotto pressione viene scaricato il modello usato meno di recente (LRU).
+    """
+
+    def __init__(self, config: Dict[str, Any], model_factory: Optional[Callable] = None):
+        self.config = config
+        self.model_factory = model_factory or _default_model_factory
+        self.specs = {}
+        for model_type, defaults in DEFAULT_MODEL_SPECS.items():
+            overrides = config.get("llm_model_specs", {}).get(model_type, {})
+            spec = dict(defaults)
+            spec.update(overrides)
+            spec["path"] = overrides.get("path", config.get(defaults["path_key"]))
+            self.specs[model_type] = spec
+
+        self.budget_bytes = self._resolve_budget()
+        self.resident = OrderedDict()  # model_type -> istanza, ordine = LRU (più vecchio per primo)
+        self.footprints = {}  # model_type -> bytes stimati
+        self.lock = threading.RLock()
+        self.load_locks = {model_type: threading.Lock() for model_type in self.specs}
+        self.loading = {}  # model_type -> bytes riservati per i modelli in caricamento
+        self.is_busy = lambda model_type: False  # Impostato dal chiamante: i modelli in generazione non vengono scaricati
+        self.on_evict = lambda model_type: None  # Impostato dal chiamante: notificato dopo ogni scaricamento
+        self.external_bytes = {}  # nome -> bytes di RAM legati ai modelli ma fuori dalle istanze (es. stati salvati)
+        self.stats = {
+            model_type: {"loads": 0, "evictions": 0, "hits": 0, "load_times": [], "failures": 0}
+            for model_type in self.specs
+        }
+
+    def _resolve_budget(self) -> float:
+        """Determina il budget di RAM per i modelli (in bytes): `llm_ram_budget_fraction` della RAM di sistema se non è fissato."""
+        budget_mb = self.config.get("llm_ram_budget_mb")
+        if budget_mb:
+            return budget_mb * 1024 * 1024
+        total = _system_ram_bytes()
+        if total is None:
+            print("Attenzione: RAM di sistema non rilevabile, budget dei modelli illimitato (nessuno scaricamento). Imposta 'llm_ram_budget_mb'.")
+            return float("inf")
+        return total * self.config.get("llm_ram_budget_fraction", 0.75)
+
+    def estimate_footprint(self, model_type: str) -> int:
+        """Stima la memoria occupata da un modello: pesi GGUF + KV cache + buffer di calcolo."""
+        spec = self.specs[model_type]
+        weights = os.path.getsize(spec["path"]) if spec["path"] and os.path.exists(spec["path"]) else 0
+        kv_cache = spec["n_ctx"] * spec["kv_bytes_per_token"]
+        overhead = self.config.get("llm_compute_overhead_mb", 256) * 1024 * 1024
+        return weights + kv_cache + overhead
+
+    def used_bytes(self) -> int:
+        return (sum(self.footprints.get(model_type, 0) for model_type in self.resident) + sum(self.loading.values())
+                + sum(self.external_bytes.values()))
+
+    def set_external_usage(self, name: str, used_bytes: int):
+        """Conta nel budget la RAM occupata fuori dalle istanze dei modelli (es. gli stati del prefisso)."""
+        with self.lock:
+            self.external_bytes[name] = used_bytes
+
+    def is_resident(self, model_type: str) -> bool:
+        return model_type in self.resident
+
+    def peek(self, model_type: str):
+        """Restituisce il modello se già residente, senza caricarlo né aggiornare l'ordine LRU."""
+        return self.resident.get(model_type)
+
+    def fits(self, model_type: str) -> bool:
+        """True se il modello può essere caricato senza scaricarne altri."""
+        if model_type in self.resident:
+            return True
+        return self.used_bytes() + self.estimate_footprint(model_type) <= self.budget_bytes
+
+    def get(self, model_type: str):
+        """
+        Restituisce il modello richiesto, caricandolo (ed eventualmente liberando RAM) se necessario.
+        Ogni modello ha il suo lock di caricamento: mentre un modello si carica (es. nel warm-up
+        in background) chi chiede l'altro non resta in attesa.
+        """
+        if model_type not in self.specs:
+            return None
+
+        with self.lock:
+            if model_type in self.resident:
+                self.resident.move_to_end(model_type)
+                self.stats[model_type]["hits"] += 1
+                return self.resident[model_type]
+
+        with self.load_locks[model_type]:
+            with self.lock:
+                if model_type in self.resident:  # Caricato da un altro thread mentre si aspettava
+                    self.resident.move_to_end(model_type)
+                    self.stats[model_type]["hits"] += 1
+                    return self.resident[model_type]
+                footprint = self.estimate_footprint(model_type)
+                self._make_room(footprint, keep=model_type)
+                self.loading[model_type] = footprint  # RAM riservata durante il caricamento
+
+            spec = self.specs[model_type]
+            start = time.perf_counter()
+            try:
+                instance = self.model_factory(spec["path"], spec["n_ctx"])
+            except Exception as e:
+                print(f"Errore nel caricamento del modello {model_type}: {e}")
+                with self.lock:
+                    self.loading.pop(model_type, None)
+                    self.stats[model_type]["failures"] += 1
+                return None
+            elapsed = time.perf_counter() - start
+
+            with self.lock:
+                self.loading.pop(model_type, None)
+                self.resident[model_type] = instance
+                self.footprints[model_type] = footprint
+                self.stats[model_type]["loads"] += 1
+                self.stats[model_type]["load_times"].append(elapsed)
+                self.stats[model_type]["load_times"] = self.stats[model_type]["load_times"][-20:]
+                print(f"Modello {model_type} caricato in {elapsed:.2f}s "
+                      f"(~{footprint / 1024 / 1024:.0f} MB, residenti: {list(self.resident.keys())}).")
+            return instance
+
+    def _make_room(self, needed_bytes: int, keep: Optional[str] = None):
+        """Scarica i modelli meno usati di recente finché il nuovo modello non rientra nel budget."""
+        while self.resident and self.used_bytes() + needed_bytes > self.budget_bytes:
+            victim = next((m for m in self.resident if m != keep and not self.is_busy(m)), None)
+            if victim is None:
+                print("Nessun modello scaricabile: caricamento oltre il budget RAM.")
+                break
+            self.evict(victim)
+
+    def evict(self, model_type: str):
+        """Scarica un modello dalla RAM."""
+        with self.lock:
+            instance = self.resident.pop(model_type, None)
+            if instance is None:
+                return
+            self.footprints.pop(model_type, None)
+            self.stats[model_type]["evictions"] += 1
+            close = getattr(instance, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+            del instance
+            gc.collect()
+            print(f"Modello {model_type} scaricato per liberare RAM.")
+        self.on_evict(model_type)
+
+    def preload(self, model_types: List[str]) -> List[str]:
+        """
+        Precarica i modelli nell'ordine indicato, fermandosi al primo che richiederebbe
+        di scaricarne un altro. Restituisce i modelli effettivamente residenti.
+        """
+        loaded = []
+        for model_type in model_types:
+            spec = self.specs.get(model_type)
+            if not spec or not spec["path"] or not os.path.exists(spec["path"]):
+                continue
+            if self.resident and not self.fits(model_type):
+                print(f"Budget RAM insufficiente per tenere residente anche il modello {model_type}: verrà caricato su richiesta.")
+                break
+            if self.get(model_type) is not None:
+                loaded.append(model_type)
+        return loaded
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Riassunto di caricamenti, scaricamenti e tempi di caricamento per ogni modello."""
+        summary = {
+            "budget_mb": self.budget_bytes / 1024 / 1024 if self.budget_bytes != float("inf") else None,
+            "used_mb": self.used_bytes() / 1024 / 1024,
+            "resident": list(self.resident.keys()),
+            "models": {},
+        }
+        for model_type, stats in self.stats.items():
+            load_times = stats["load_times"]
+            summary["models"][model_type] = {
+                "loads": stats["loads"],
+                "evictions": stats["evictions"],
+                "hits": stats["hits"],
+                "failures": stats["failures"],
+                "avg_load_s": sum(load_times) / len(load_times) if load_times else 0.0,
+                "last_load_s": load_times[-1] if load_times else 0.0,
+            }
+        return summary
@@ -0,0 +1,163 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable
+
+
+def _state_bytes(state) -> int:
+    """Memoria occupata da uno stato llama.cpp salvato (KV cache + token e logits del contesto)."""
+    size = getattr(state, "llama_state_size", 0) or 0
+    for name in ("input_ids", "scores"):
+        size += getattr(getattr(state, name, None), "nbytes", 0) or 0
+    return int(size)
+
+
+class PrefixStateCache:
+    """
+    Cache degli stati llama.cpp per il prefisso stabile del prompt (persona, regole, self-concept).
+
+    Prima di ogni chiamata assicura che il contesto del modello contenga già il prefisso:
+    se l'ultima chiamata sullo stesso modello usava lo stesso prefisso non serve fare nulla,
+    altrimenti ripristina lo stato salvato. llama.cpp riconosce il prefisso comune dei token
+    e rifà il prefill solo sul suffisso variabile.
+
+    Lo stato viene salvato dopo aver riportato il contesto al solo prefisso condiviso (senza
+    suffisso né risposta), così ogni voce pesa solo i token del prefisso. Gli stati sono limitati
+    in numero (`prompt_prefix_cache_entries`) e in memoria (`prompt_prefix_cache_max_mb`), e la
+    memoria occupata è comunicata a `report_usage` (il ModelManager la conta nel budget RAM).
+    Il contesto corrente è tenuto per nome del modello: `forget_model` va chiamato quando il
+    modello viene scaricato, perché un'istanza ricaricata parte con il contesto vuoto.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.max_entries = config.get("prompt_prefix_cache_entries", 2)
+        self.max_bytes = config.get("prompt_prefix_cache_max_mb", 512) * 1024 * 1024
+        self.states = OrderedDict()  # (model_type, prefix_hash) -> LlamaState del solo prefisso
+        self.state_sizes = {}  # (model_type, prefix_hash) -> bytes
+        self.prefix_ids = {}  # prefix_hash -> token del prefisso
+        self.current_prefix = {}  # model_type -> prefix_hash attualmente nel contesto
+        self.report_usage: Callable[[int], None] = lambda used_bytes: None  # Impostato dal chiamante
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "restores": 0, "misses": 0, "prefill_tokens_saved": 0}
+
+    @staticmethod
+    def prefix_key(prefix: str) -> str:
+        return hashlib.sha256(prefix.encode('utf-8')).hexdigest()
+
+    def _prefix_ids(self, llm_instance, key: str, prefix: str) -> List[Any]:
+        if key not in self.prefix_ids:
+            try:
+                self.prefix_ids[key] = list(llm_instance.tokenize(prefix.encode('utf-8'), add_bos=False))
+            except Exception:
+                self.prefix_ids[key] = [None] * (len(prefix) // 4)  # Stima grossolana: ~4 caratteri per token
+        return self.prefix_ids[key]
+
+    def used_bytes(self) -> int:
+        return sum(self.state_sizes.values())
+
+    def before_call(self, llm_instance, model_type: str, prefix: str) -> Optional[str]:
+        """Prepara il contesto del modello per un prompt che inizia con `prefix`. Restituisce la chiave del prefisso."""
+        if not hasattr(llm_instance, "save_state"):
+            return None  # Senza stato salvabile (es. worker in un altro processo) decide solo llama.cpp
+        if not prefix:
+            self.forget_model(model_type)  # Il contesto verrà sovrascritto da un prompt senza prefisso
+            return None
+        key = self.prefix_key(prefix)
+        with self.lock:
+            n_tokens = len(self._prefix_ids(llm_instance, key, prefix))
+            if self.current_prefix.get(model_type) == key:
+                self.stats["hits"] += 1
+                self.stats["prefill_tokens_saved"] += n_tokens
+                return key
+
+            state = self.states.get((model_type, key))
+            if state is not None:
+                try:
+                    llm_instance.load_state(state)
+                    self.states.move_to_end((model_type, key))
+                    self.current_prefix[model_type] = key
+                    self.stats["hits"] += 1
+                    self.stats["restores"] += 1
+                    self.stats["prefill_tokens_saved"] += n_tokens
+                    return key
+                except Exception as e:
+                    print(f"Errore nel ripristino dello stato del prefisso: {e}")
+                    self.states.pop((model_type, key), None)
+                    self.state_sizes.pop((model_type, key), None)
+
+            self.current_prefix.pop(model_type, None)
+            self.stats["misses"] += 1
+            return key
+
+    def _truncate_to_prefix(self, llm_instance, prefix_ids: List[Any]) -> int:
+        """
+        Riporta il contesto valutato ai soli token del prefisso (dopo l'eventuale intestazione del
+        template di chat). Restituisce quanti token restano, 0 se il prefisso non è nel contesto.
+        """
+        context = list(llm_instance.input_ids[:llm_instance.n_tokens])
+        probe = prefix_ids[:8]
+        if not probe or None in probe:
+            return 0
+        for offset in range(min(64, len(context))):
+            if context[offset:offset + len(probe)] == probe:
+                break
+        else:
+            return 0
+        matched = 0
+        for cached, token in zip(context[offset:], prefix_ids):
+            if cached != token:
+                break
+            matched += 1
+        shared = offset + matched
+        llm_instance.n_tokens = shared
+        ctx = getattr(llm_instance, "_ctx", None)
+        if ctx is not None:
+            try:
+                ctx.kv_cache_seq_rm(-1, shared, -1)  # Toglie dalla KV cache suffisso e risposta
+            except Exception:
+                pass
+        return shared
+
+    def after_call(self, llm_instance, model_type: str, key: Optional[str]):
+        """Registra che il contesto ora contiene il prefisso e, se nuovo, ne salva lo stato (solo il prefisso)."""
+        if key is None:
+            return
+        with self.lock:
+            self.current_prefix[model_type] = key
+            if (model_type, key) in self.states:
+                return
+            try:
+                if not self._truncate_to_prefix(llm_instance, self.prefix_ids.get(key, [])):
+                    return
+                state = llm_instance.save_state()
+            except Exception as e:
+                print(f"Errore nel salvataggio dello stato del prefisso: {e}")
+                return
+            size = _state_bytes(state)
+            if size > self.max_bytes:
+                return
+            self.states[(model_type, key)] = state
+            self.state_sizes[(model_type, key)] = size
+            while len(self.states) > self.max_entries or self.used_bytes() > self.max_bytes:
+                oldest, _ = self.states.popitem(last=False)
+                self.state_sizes.pop(oldest, None)
+            used = self.used_bytes()
+        self.report_usage(used)
+
+    def invalidate(self, model_type: str):
+        """Da chiamare quando il contesto del modello viene usato con un prompt senza prefisso."""
+        self.forget_model(model_type)
+
+    def forget_model(self, model_type: str):
+        """Il contesto del modello non contiene più un prefisso noto (prompt diverso o modello scaricato)."""
+        with self.lock:
+            self.current_prefix.pop(model_type, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "cached_states": len(self.states),
+            "cached_mb": self.used_bytes() / 1024 / 1024,
+        }
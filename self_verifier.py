@@ -0,0 +1,67 @@
+import threading
+from typing import Dict, Any, List, Optional
+
+from fast_router import _dot, _normalize
+
+# Verdetto del critico breve: una sola parola, vincolata dalla grammatica
+VERDICT_GRAMMAR = 'root ::= "SI" | "NO"\n'
+
+# Percorsi del ciclo di auto-correzione, dal più economico al più costoso
+PATHS = ("grounded", "verdict_ok", "full")
+
+
+def build_verdict_prompt(draft: str, query: str, sources: List[str], max_chars: int = 1500) -> str:
+    """Prompt del critico breve: chiede solo se la bozza va bene così com'è."""
+    context = "\n".join(sources)[:max_chars]
+    return (
+        f"Sei un critico rigoroso. La seguente risposta è accurata, completa e coerente con le fonti e con la richiesta? "
+        f"Rispondi solo SI oppure NO.\n"
+        f"Richiesta: {query}\n"
+        f"Risposta: {draft}\n"
+        f"Fonti:\n{context or 'nessuna'}\n"
+        f"Verdetto: "
+    )
+
+
+def parse_verdict(raw: Optional[str]) -> bool:
+    """True se il critico approva la bozza; in caso di dubbio la bozza va corretta."""
+    return bool(raw) and raw.strip().upper().startswith("SI")
+
+
+class SelfVerifier:
+    """
+    Verifica adattiva delle bozze REFLECT: prima i controlli economici, la critica completa
+    con riscrittura solo se falliscono.
+
+    1. accordo tra embedding della bozza e delle fonti RAG (nessuna chiamata LLM);
+    2. critico breve SI/NO con pochi token;
+    3. critica completa e riscrittura in streaming.
+
+    Conta quante volte viene preso ogni percorso, per mostrare in !debug quanto spesso serve quello costoso.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.agreement_threshold = config.get("self_correction_agreement_threshold", 0.6)
+        self.verdict_max_tokens = config.get("self_correction_verdict_max_tokens", 5)
+        self.lock = threading.Lock()
+        self.stats = {path: 0 for path in PATHS}
+
+    @staticmethod
+    def agreement(draft_embedding, source_embeddings) -> float:
+        """Massima similarità coseno tra la bozza e una fonte (0 senza fonti)."""
+        if draft_embedding is None or not len(source_embeddings):
+            return 0.0
+        draft = _normalize(draft_embedding)
+        return max(_dot(draft, _normalize(source)) for source in source_embeddings)
+
+    def is_grounded(self, draft_embedding, source_embeddings) -> bool:
+        return self.agreement(draft_embedding, source_embeddings) >= self.agreement_threshold
+
+    def record(self, path: str):
+        with self.lock:
+            self.stats[path] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = sum(self.stats.values())
+            return {**self.stats, "total": total, "expensive_rate": self.stats["full"] / total if total else 0.0}
@@ -0,0 +1,102 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+
+class StartupTimeline:
+    """Fasi dell'avvio con i loro tempi, in primo piano e in background, per il riepilogo stampato all'avvio."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases = []  # {"name", "start", "end", "background"}
+        self.lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.origin
+
+    def begin(self, name: str, background: bool = False) -> Dict[str, Any]:
+        phase = {"name": name, "start": self.elapsed(), "end": None, "background": background}
+        with self.lock:
+            self.phases.append(phase)
+        return phase
+
+    def end(self, phase: Dict[str, Any]):
+        phase["end"] = self.elapsed()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Una fase in primo piano."""
+        phase = self.begin(name)
+        try:
+            yield phase
+        finally:
+            self.end(phase)
+
+    def format(self, title: str = "Timeline di avvio") -> str:
+        lines = [f"{title} (prompt pronto dopo {self.elapsed():.2f}s):"]
+        with self.lock:
+            phases = list(self.phases)
+        for phase in phases:
+            where = "background" if phase["background"] else "primo piano"
+            if phase["end"] is None:
+                lines.append(f"  {phase['name']:<28} {where:<12} in corso da {self.elapsed() - phase['start']:.2f}s")
+            else:
+                lines.append(f"  {phase['name']:<28} {where:<12} {phase['start']:6.2f}s → {phase['end']:6.2f}s "
+                             f"({phase['end'] - phase['start']:.2f}s)")
+        return "\n".join(lines)
+
+
+class BackgroundResource:
+    """
+    Risorsa costosa (modello di embedding, ChromaDB, modelli LLM) caricata in un thread in background.
+
+    `get()` aspetta solo questa risorsa: chi non la usa non viene mai bloccato. Se il caricamento
+    non è stato avviato (avvio non lazy), `get()` lo esegue subito nel thread chiamante.
+    Un loader che fallisce deve restituire un valore di ripiego (es. None), come faceva l'avvio sincrono.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], timeline: Optional[StartupTimeline] = None):
+        self.name = name
+        self.loader = loader
+        self.timeline = timeline
+        self.value = None
+        self.ready = threading.Event()
+        self.started = False
+        self.lock = threading.Lock()
+
+    def _load(self, background: bool):
+        phase = self.timeline.begin(self.name, background) if self.timeline else None
+        try:
+            self.value = self.loader()
+        except Exception as e:
+            print(f"Errore nel caricamento di {self.name}: {e}")
+            self.value = None
+        finally:
+            if phase:
+                self.timeline.end(phase)
+                if background:
+                    print(f"[avvio] {self.name} pronto dopo {phase['end']:.2f}s")
+            self.ready.set()
+
+    def start(self) -> "BackgroundResource":
+        with self.lock:
+            if not self.started:
+                self.started = True
+                threading.Thread(target=self._load, args=(True,), daemon=True, name=f"warmup-{self.name}").start()
+        return self
+
+    def get(self) -> Any:
+        with self.lock:
+            run_here = not self.started
+            self.started = True
+        if run_here:
+            self._load(background=False)
+        elif not self.ready.is_set():
+            print(f"In attesa di {self.name}...")
+            self.ready.wait()
+        return self.value
+
+    def peek(self) -> Any:
+        """Il valore se già pronto, altrimenti None (senza aspettare)."""
+        return self.value if self.ready.is_set() else None
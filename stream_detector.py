@@ -0,0 +1,133 @@
+COMMAND_MARKERS = ("TOOL_CALL:", "REFLECT:")
+
+# Caratteri che il modello a volte mette prima del comando (spazi, markdown come negli esempi del prompt)
+LEADING_NOISE = " \t\r\n`*"
+
+
+class StreamCommandDetector:
+    """
+    Classifica in modo incrementale lo stream del pensatore: testo normale, TOOL_CALL o REFLECT.
+
+    Trattiene solo i token che potrebbero ancora essere l'inizio di un comando; appena l'output
+    non può più esserlo, tutto il testo passa subito all'utente. Per un TOOL_CALL segue le
+    parentesi del JSON e segnala `tool_call_complete` alla graffa di chiusura, così la
+    generazione può essere fermata senza token sprecati.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.mode = None  # None = ancora indeciso, "text", "TOOL_CALL:" o "REFLECT:"
+        self.tool_call_complete = False
+        self._scan_pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def command(self) -> str:
+        """Il comando riconosciuto, senza il rumore iniziale (vuoto in modalità testo)."""
+        if self.mode in COMMAND_MARKERS:
+            return self.buffer.lstrip(LEADING_NOISE).rstrip("`* \t\r\n")
+        return ""
+
+    def feed(self, chunk: str) -> str:
+        """Aggiunge un chunk e restituisce il testo da mostrare subito all'utente."""
+        if self.mode == "text":
+            return chunk
+        if self.tool_call_complete:
+            return ""  # Oltre la graffa di chiusura: scartato
+        self.buffer += chunk
+
+        if self.mode is None:
+            stripped = self.buffer.lstrip(LEADING_NOISE)
+            if not stripped or any(marker.startswith(stripped) for marker in COMMAND_MARKERS):
+                return ""  # Potrebbe ancora essere un comando
+            for marker in COMMAND_MARKERS:
+                if stripped.startswith(marker):
+                    self.mode = marker
+                    self._scan_pos = self.buffer.index(marker) + len(marker)
+                    break
+            else:
+                self.mode = "text"
+                text, self.buffer = self.buffer, ""
+                return text
+
+        if self.mode == "TOOL_CALL:":
+            self._scan_tool_call()
+        return ""
+
+    def _scan_tool_call(self):
+        while self._scan_pos < len(self.buffer):
+            char = self.buffer[self._scan_pos]
+            self._scan_pos += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.buffer = self.buffer[:self._scan_pos]
+                    self.tool_call_complete = True
+                    return
+
+    def finish(self) -> str:
+        """Fine dello stream: un output rimasto indeciso (es. solo 'TOOL') è testo normale."""
+        if self.mode is None:
+            self.mode = "text"
+            text, self.buffer = self.buffer, ""
+            return text
+        return ""
+
+
+class DirectivePreambleFilter:
+    """
+    Toglie dallo stream la riga di direttiva che il pensatore scrive prima della risposta
+    (deliberazione fusa) e la conserva in `directive`. Se l'output non inizia con il marcatore,
+    tutto il testo passa invariato.
+    """
+
+    def __init__(self, marker: str):
+        self.marker = marker
+        self.buffer = ""
+        self.done = False
+        self.directive = None
+
+    def feed(self, chunk: str) -> str:
+        """Aggiunge un chunk e restituisce il testo della risposta vera e propria."""
+        if self.done:
+            return chunk
+        self.buffer += chunk
+        stripped = self.buffer.lstrip(LEADING_NOISE)
+        if not stripped or (len(stripped) < len(self.marker) and self.marker.startswith(stripped)):
+            return ""  # Potrebbe ancora essere la direttiva
+        if not stripped.startswith(self.marker):
+            self.done = True
+            text, self.buffer = self.buffer, ""
+            return text
+        if "\n" not in stripped:
+            return ""  # Riga della direttiva non ancora conclusa
+        line, rest = stripped.split("\n", 1)
+        self.directive = line[len(self.marker):].strip(" \t\r*`") or None
+        self.done = True
+        self.buffer = ""
+        return rest.lstrip(" \t\r\n")
+
+    def finish(self) -> str:
+        """Fine dello stream: una direttiva senza risposta non produce testo, il resto passa invariato."""
+        if self.done:
+            return ""
+        self.done = True
+        text, self.buffer = self.buffer, ""
+        stripped = text.lstrip(LEADING_NOISE)
+        if stripped.startswith(self.marker):
+            self.directive = stripped[len(self.marker):].strip(" \t\r*`") or None
+            return ""
+        return text
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test di chroma_dedup: ID indirizzati per contenuto, quasi duplicati e compattazione offline delle collezioni
+"""
+
+import math
+from chroma_dedup import content_id, near_duplicates_in_batch, nearest_existing, deduplicate_collection
+
+
+class FakeCollection:
+    """Collezione ChromaDB in memoria, con l'ordine di inserimento e la query per similarità coseno."""
+    def __init__(self):
+        self.records = {}  # id -> {"document", "metadata", "embedding"}
+
+    def count(self):
+        return len(self.records)
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        for doc_id, document, metadata, embedding in zip(ids, documents, metadatas, embeddings):
+            self.records[doc_id] = {"document": document, "metadata": metadata, "embedding": embedding}
+
+    add = upsert
+
+    def delete(self, ids):
+        for doc_id in ids:
+            self.records.pop(doc_id, None)
+
+    def get(self, offset=0, limit=None, include=None, ids=None):
+        selected = list(self.records.items())
+        selected = selected[offset:offset + limit] if limit else selected[offset:]
+        return {
+            "ids": [doc_id for doc_id, _ in selected],
+            "documents": [record["document"] for _, record in selected],
+            "metadatas": [record["metadata"] for _, record in selected],
+            "embeddings": [record["embedding"] for _, record in selected],
+        }
+
+    def query(self, query_embeddings, n_results=1, include=None):
+        def cosine(a, b):
+            return sum(x * y for x, y in zip(a, b)) / (math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b)))
+        ids, embeddings = [], []
+        for query in query_embeddings:
+            ranked = sorted(self.records.items(), key=lambda item: -cosine(query, item[1]["embedding"]))[:n_results]
+            ids.append([doc_id for doc_id, _ in ranked])
+            embeddings.append([record["embedding"] for _, record in ranked])
+        return {"ids": ids, "embeddings": embeddings}
+
+
+def test_content_ids_are_stable():
+    print("=== Test ID indirizzati per contenuto ===")
+    assert content_id("Ciao  mondo\n") == content_id("ciao mondo")
+    assert content_id("ciao mondo") != content_id("ciao mondi")
+    assert content_id("ciao", prefix="memory").startswith("memory_")
+    assert content_id("ciao") == "doc_" + "b133a0c0e9bee3be20163d2ad31d6248"
+    print("✓ stesso testo, stesso ID in ogni processo")
+
+
+def test_near_duplicates():
+    print("\n=== Test quasi duplicati ===")
+    assert near_duplicates_in_batch([[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]], 0.97) == [None, 0, None]
+    collection = FakeCollection()
+    assert nearest_existing(collection, [[1.0, 0.0]]) == [(None, 0.0)]
+    collection.upsert(["a"], ["testo"], [{}], [[1.0, 0.0]])
+    (nearest_id, similarity), = nearest_existing(collection, [[0.98, 0.02]])
+    assert nearest_id == "a" and similarity > 0.99
+    print("✓ quasi duplicati trovati nel lotto e nella collezione")
+
+
+def test_deduplicate_collection():
+    print("\n=== Test compattazione offline ===")
+    collection = FakeCollection()
+    collection.upsert(
+        ids=["doc_123_0", "doc_456_0", "doc_789_0", content_id("Un altro argomento")],
+        documents=["Il mentore ama la montagna", "il mentore ama la  montagna", "Il mentore ama le montagne", "Un altro argomento"],
+        metadatas=[{"vividezza": 0.4}, {"kg_processed": True, "vividezza": 0.9}, {}, {"vividezza": 1.0}],
+        embeddings=[[1.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.99, 0.02, 0.0], [0.0, 0.0, 1.0]],
+    )
+    result = deduplicate_collection(collection, similarity=0.97, batch_size=2)
+    assert result == {"before": 4, "after": 2, "exact_duplicates": 1, "near_duplicates": 1, "renamed": 1}
+    kept = collection.records[content_id("Il mentore ama la montagna")]
+    assert kept["metadata"] == {"vividezza": 0.9, "kg_processed": True}
+    assert content_id("Un altro argomento") in collection.records
+    assert deduplicate_collection(collection)["after"] == 2
+    print("✓ duplicati rimossi, metadati uniti, ID aggiornati")
+
+
+def test_deduplicate_keeps_content_id_copy():
+    print("\n=== Test copia già sotto l'ID indirizzato per contenuto ===")
+    collection = FakeCollection()
+    collection.upsert(
+        ids=["doc_123_0", content_id("Aurora ama la musica"), "other"],
+        documents=["Aurora ama la musica", "Aurora ama la musica", "Un altro argomento"],
+        metadatas=[{}, {"kg_processed": True}, {}],
+        embeddings=[[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]],
+    )
+    result = deduplicate_collection(collection, similarity=0.97)
+    assert result["after"] == 2 and result["exact_duplicates"] == 1
+    kept = collection.records[content_id("Aurora ama la musica")]
+    assert kept["document"] == "Aurora ama la musica" and kept["metadata"] == {"kg_processed": True}
+    assert "doc_123_0" not in collection.records and content_id("Un altro argomento") in collection.records
+    print("✓ il duplicato esatto sotto il nuovo ID non fa perdere il documento")
+
+
+if __name__ == "__main__":
+    test_content_ids_are_stable()
+    test_near_duplicates()
+    test_deduplicate_collection()
+    test_deduplicate_keeps_content_id_copy()
+    print("🎉 TUTTI I TEST SUPERATI!")
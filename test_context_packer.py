@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Test del ContextPacker: sezioni del prompt del pensatore entro un budget di token
+"""
+
+from context_packer import ContextPacker
+
+
+def count_words(text):
+    return len(text.split()) if text else 0
+
+
+def test_fits_budget_by_priority():
+    print("=== Test budget di token ===")
+    packer = ContextPacker({})
+    sections = [
+        ("state", "focus energia stress " * 10),
+        ("chat_history", "\n".join(f"user: messaggio {i}" for i in range(300))),
+        ("rag", "documento " * 500),
+        ("world_opinions", "opinione " * 150),
+    ]
+    texts = packer.pack(sections, count_words, budget=900)
+    usage = packer.last_usage
+    assert usage["total"] <= 900
+    assert texts["state"] == sections[0][1]  # Priorità massima, intatta
+    assert "messaggio 299" in texts["chat_history"]  # La cronologia conserva i messaggi più recenti
+    assert "messaggio 0\n" not in texts["chat_history"]
+    assert usage["sections"]["world_opinions"]["tokens"] < usage["sections"]["world_opinions"]["original"]
+    print(f"✓ {packer.format_usage()}")
+
+
+def test_untouched_when_small():
+    packer = ContextPacker({"context_section_budgets": {"rag": {"max_tokens": 5}}})
+    texts = packer.pack([("state", "tutto bene"), ("rag", "uno due tre quattro cinque sei sette")], count_words, budget=1000)
+    assert texts["state"] == "tutto bene"
+    assert count_words(texts["rag"]) <= 5
+    print("✓ sezioni piccole intatte, massimo per sezione configurabile")
+
+
+if __name__ == "__main__":
+    test_fits_budget_by_priority()
+    test_untouched_when_small()
+    print("🎉 TUTTI I TEST SUPERATI!")
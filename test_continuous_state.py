@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test di continuous_state: decadimento in forma chiusa di mood, energia e vividezza dei ricordi
+"""
+
+from datetime import datetime, timedelta
+from continuous_state import ContinuousState, DecayingDict, memory_vividness, recall_memory
+
+
+class FakeClock:
+    """Orologio controllabile a mano, in secondi epoch."""
+    def __init__(self, start=1_000_000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def test_mood_decays_towards_rest():
+    print("=== Test decadimento del mood ===")
+    clock = FakeClock()
+    mood = DecayingDict({'serenità': 0.9, 'tristezza': 0.6, 'nome': 'testo'}, rate_per_second=0.001,
+                        targets={'serenità': 0.5}, clock=clock)
+    clock.advance(100)
+    assert abs(mood['serenità'] - 0.8) < 1e-9 and abs(mood['tristezza'] - 0.5) < 1e-9
+    clock.advance(10_000)
+    assert mood['serenità'] == 0.5 and mood['tristezza'] == 0.0 and mood['nome'] == 'testo'
+
+    mood['tristezza'] = 0.4  # Scrivere riancora la chiave
+    clock.advance(100)
+    assert abs(mood.get('tristezza') - 0.3) < 1e-9
+    mood['tristezza'] += 0.2
+    assert abs(mood.copy()['tristezza'] - 0.5) < 1e-9 and type(mood.copy()) is dict
+    print("✓ ogni emozione tende al suo valore di riposo, calcolata alla lettura")
+
+
+def test_energy_decays_then_recharges():
+    print("\n=== Test energia in tempo continuo ===")
+    clock = FakeClock()
+    config = {"energy_decay_rate": 0.01, "energy_recharge_rate": 0.05, "energy_rest_after_minutes": 5}
+    state = ContinuousState({'energia': 0.8, 'mood': DecayingDict({'gioia': 0.5}, 0.0, clock=clock)}, config, clock=clock)
+    clock.advance(3 * 60)
+    assert abs(state['energia'] - 0.77) < 1e-9
+    clock.advance(2 * 60 + 4 * 60)  # 5 minuti di attività, poi 4 di riposo
+    assert abs(state['energia'] - (0.75 + 0.2)) < 1e-9
+    clock.advance(3600)
+    assert state.get('energia') == 1.0
+
+    state['energia'] = 0.5
+    state.mark_activity(datetime.fromtimestamp(clock.now))
+    clock.advance(60)
+    assert abs(state['energia'] - 0.49) < 1e-9
+    assert type(state.copy()['mood']) is dict and state.copy()['energia'] == state['energia']
+    print("✓ cala durante l'attività, si ricarica a riposo, sempre tra 0 e 1")
+
+
+def test_memory_vividness_closed_form():
+    print("\n=== Test vividezza dei ricordi ===")
+    now = datetime.now()
+    memory = {'vividezza': 0.9, 'last_consulted': (now - timedelta(hours=10)).isoformat()}
+    assert abs(memory_vividness(memory, 0.05, now) - 0.4) < 1e-9
+    assert memory_vividness(memory, 0.05, now + timedelta(hours=100)) == 0.0
+    assert memory_vividness({'vividezza': 0.7}, 0.05, now) == 0.7
+
+    recall_memory(memory, 0.1, 0.05, now)
+    assert abs(memory['vividezza'] - 0.5) < 1e-9 and memory['last_consulted'] == now.isoformat()
+    assert abs(memory_vividness(memory, 0.05, now + timedelta(hours=2)) - 0.4) < 1e-9
+    print("✓ il valore salvato vale all'ultima consultazione e decade da lì")
+
+
+if __name__ == "__main__":
+    test_mood_decays_towards_rest()
+    test_energy_decays_then_recharges()
+    test_memory_vividness_closed_form()
+    print("🎉 TUTTI I TEST SUPERATI!")
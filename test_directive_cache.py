@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test della cache delle direttive strategiche: bucket di stato, cluster delle richieste, persistenza
+"""
+
+import os
+import tempfile
+from directive_cache import DirectiveCache
+
+
+def make_state(serenity=0.5, energy=0.8, stress=0.2):
+    return {"mood": {"serenità": serenity, "entusiasmo": 0.5, "malinconia": 0.1}, "energia": energy, "stress": stress}
+
+
+def test_state_bucket():
+    print("=== Test bucket di stato ===")
+    assert DirectiveCache.state_bucket(make_state()) == "5-5-1-8-2"
+    assert DirectiveCache.state_bucket(make_state(serenity=0.54)) == DirectiveCache.state_bucket(make_state())
+    assert DirectiveCache.state_bucket(make_state(energy=1.0)) == "5-5-1-9-2"  # 1.0 nel decile più alto
+    print("✓ stato quantizzato in decili")
+
+
+def test_clusters_and_persistence():
+    print("=== Test cluster e persistenza ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = {"directive_cache_path": os.path.join(tmp_dir, "directives.json"), "directive_cache_cluster_threshold": 0.9}
+        cache = DirectiveCache(config)
+        assert cache.make_key(make_state(), None) is None and cache.get(None) is None
+
+        key = cache.make_key(make_state(), [1.0, 0.0, 0.0])
+        assert cache.get(key) is None
+        cache.put(key, "Sii giocosa.")
+        similar = cache.make_key(make_state(serenity=0.51), [0.98, 0.05, 0.0])
+        assert similar == key and cache.get(similar) == "Sii giocosa."
+        print("✓ richiesta simile nello stesso stato: stessa direttiva")
+
+        assert cache.make_key(make_state(), [0.0, 1.0, 0.0]) != key
+        assert cache.make_key(make_state(stress=0.9), [1.0, 0.0, 0.0]) != key
+        print("✓ richiesta diversa o stato diverso: nuova chiave")
+
+        reloaded = DirectiveCache(config)
+        assert reloaded.get(reloaded.make_key(make_state(), [1.0, 0.0, 0.0])) == "Sii giocosa."
+        assert reloaded.get_stats()["clusters"] == 1  # I centroidi si salvano insieme alle direttive
+        print("✓ direttive e centroidi persistenti")
+
+
+if __name__ == "__main__":
+    test_state_bucket()
+    test_clusters_and_persistence()
+    print("🎉 TUTTI I TEST SUPERATI!")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test di document_vividness: tabella laterale della vividezza dei documenti ChromaDB
+"""
+
+import os
+import time
+import tempfile
+from document_vividness import DocumentVividness
+
+
+class FakeCollection:
+    """Registra le chiamate a update (solo metadati), come farebbe ChromaDB unendo i metadati."""
+    def __init__(self):
+        self.metadatas = {}
+        self.updates = []
+
+    def update(self, ids, metadatas):
+        self.updates.append(len(ids))
+        for doc_id, metadata in zip(ids, metadatas):
+            self.metadatas.setdefault(doc_id, {}).update(metadata)
+
+
+def _table(directory, **overrides):
+    config = {"document_vividness_path": os.path.join(directory, "vividness.sqlite"), "document_decay_rate": 0.01}
+    config.update(overrides)
+    return DocumentVividness(config)
+
+
+def test_closed_form_decay_and_recall():
+    print("=== Test decadimento in forma chiusa ===")
+    with tempfile.TemporaryDirectory() as directory:
+        table = _table(directory)
+        table.register(["a", "b"])
+        now = time.time()
+        values = table.current(["a", "b", "sconosciuto"], now=now + 50 * 3600)
+        assert abs(values["a"] - 0.5) < 1e-6 and values["sconosciuto"] == 1.0
+        assert table.current(["a"], now=now + 500 * 3600)["a"] == 0.0
+
+        table.consult(["a"], now=now + 50 * 3600)
+        values = table.current(["a", "b"], now=now + 50 * 3600)
+        assert abs(values["a"] - 0.6) < 1e-6 and abs(values["b"] - 0.5) < 1e-6
+        table.register(["b"], refresh=True, pushed=1.0)  # Contenuto reimparato
+        assert table.current(["b"])["b"] > 0.99
+        table.close()
+        print("✓ vividezza calcolata al momento della lettura, consultazione e reimparare la rialzano")
+
+
+def test_batched_flush():
+    print("\n=== Test aggiornamenti a lotti dei metadati ===")
+    with tempfile.TemporaryDirectory() as directory:
+        table = _table(directory)
+        collection = FakeCollection()
+        ids = [f"doc_{i}" for i in range(25)]
+        table.sync(ids)
+        assert table.where_filter(0.2) is None  # Nessun documento ha ancora il metadato
+        assert table.flush(collection, batch_size=10) == 25 and collection.updates == [10, 10, 5]
+        assert table.where_filter(0.2) == {"vividezza": {"$gte": 0.1}}
+
+        now = time.time()
+        assert table.flush(collection, now=now + 3600) == 0  # Spostamento sotto il passo: niente da scrivere
+        assert table.flush(collection, batch_size=100, now=now + 20 * 3600) == 25
+        assert abs(collection.metadatas["doc_0"]["vividezza"] - 0.8) < 0.01
+
+        table.sync(ids[:5])  # Dopo una compattazione restano solo 5 documenti
+        assert table.size() == 5
+        table.register(["nuovo"])
+        assert table.where_filter(0.2) is None
+        print("✓ solo i documenti cambiati, in lotti grandi, e il filtro where solo quando è sicuro")
+
+
+if __name__ == "__main__":
+    test_closed_form_decay_and_recall()
+    test_batched_flush()
+    print("🎉 TUTTI I TEST SUPERATI!")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test dell'EmbeddingCache: vettori float16 su disco per (modello, sha256 del testo) e scarto LRU
+"""
+
+import os
+import tempfile
+from embedding_cache import EmbeddingCache
+
+
+class CountingModel:
+    """Modello finto: conta i testi che gli arrivano davvero."""
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return [[float(len(text)), 0.5, -0.25] for text in texts]
+
+
+def _config(tmp_dir, **overrides):
+    config = {"embedding_cache_path": os.path.join(tmp_dir, "embeddings.sqlite"), "embedding_model_name": "test-model"}
+    config.update(overrides)
+    return config
+
+
+def test_repeated_texts_are_encoded_once():
+    print("=== Test testi ripetuti ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = EmbeddingCache(_config(tmp_dir))
+        model = CountingModel()
+        vectors = cache.encode_many(model, ["ciao", "come stai?", "ciao"])
+        assert vectors[0] == vectors[2] == [4.0, 0.5, -0.25]
+        assert model.encoded == ["ciao", "come stai?"]
+        assert cache.encode(model, "come stai?") == [10.0, 0.5, -0.25]
+        assert model.encoded == ["ciao", "come stai?"]
+        stats = cache.get_stats()
+        assert stats["encode_calls"] == 1 and stats["hits"] == 1 and stats["misses"] == 2
+        print("✓ ogni testo arriva al modello una sola volta")
+
+
+def test_persistence_and_model_key():
+    print("\n=== Test persistenza su disco ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = EmbeddingCache(_config(tmp_dir))
+        cache.encode_many(CountingModel(), ["memoria"])
+        cache.close()
+
+        model = CountingModel()
+        reopened = EmbeddingCache(_config(tmp_dir))
+        assert reopened.encode(model, "memoria") == [7.0, 0.5, -0.25]
+        assert model.encoded == []
+        print("✓ vettori riletti dal disco")
+
+        other = EmbeddingCache(_config(tmp_dir, embedding_model_name="altro-modello"))
+        other.encode(model, "memoria")
+        assert model.encoded == ["memoria"]
+        print("✓ un altro modello non riusa i vettori")
+
+
+def test_lru_eviction():
+    print("\n=== Test scarto LRU ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = EmbeddingCache(_config(tmp_dir, embedding_cache_max_entries=2))
+        model = CountingModel()
+        cache.encode_many(model, ["a", "b"])
+        cache.encode(model, "a")  # "b" diventa la meno recente
+        cache.encode(model, "c")
+        assert cache.get_stats()["evictions"] == 1
+        model.encoded.clear()
+        cache.encode_many(model, ["a", "b"])
+        assert model.encoded == ["b"]
+        print("✓ scartata la voce meno usata")
+
+
+if __name__ == "__main__":
+    test_repeated_texts_are_encoded_once()
+    test_persistence_and_model_key()
+    test_lru_eviction()
+    print("🎉 TUTTI I TEST SUPERATI!")
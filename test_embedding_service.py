@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test dell'EmbeddingService: micro-lotti delle richieste concorrenti e migrazione degli embedding di ChromaDB
+"""
+
+import os
+import tempfile
+import threading
+from embedding_cache import EmbeddingCache
+from embedding_service import EmbeddingService, needs_reembedding, reembed_collection, record_embedding_model
+
+
+class CountingModel:
+    """Modello finto: registra ogni chiamata a encode."""
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FakeCollection:
+    """Collezione ChromaDB minima: get a pagine, update degli embedding, count."""
+    def __init__(self, name, documents):
+        self.name = name
+        self.ids = [f"doc_{i}" for i in range(len(documents))]
+        self.documents = list(documents)
+        self.embeddings = {}
+
+    def count(self):
+        return len(self.ids)
+
+    def get(self, offset=0, limit=10, include=None):
+        return {"ids": self.ids[offset:offset + limit], "documents": self.documents[offset:offset + limit]}
+
+    def update(self, ids, embeddings):
+        self.embeddings.update(zip(ids, embeddings))
+
+
+def _service(tmp_dir, **overrides):
+    config = {"embedding_cache_path": os.path.join(tmp_dir, "embeddings.sqlite"), "embedding_model_name": "test-model",
+              "embedding_batch_window_ms": 50}
+    config.update(overrides)
+    model = CountingModel()
+    return EmbeddingService(model, EmbeddingCache(config), config), model
+
+
+def test_concurrent_requests_share_a_batch():
+    print("=== Test micro-lotti ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service, model = _service(tmp_dir)
+        results = {}
+        barrier = threading.Barrier(4)
+
+        def request(name, texts):
+            barrier.wait()
+            results[name] = service.encode_many(texts)
+
+        threads = [threading.Thread(target=request, args=(f"r{i}", [f"testo {i}", "comune"])) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(model.calls) == 1
+        assert sorted(model.calls[0]) == sorted(["comune", "testo 0", "testo 1", "testo 2", "testo 3"])
+        assert results["r2"] == [[7.0, 1.0], [6.0, 1.0]]
+        assert service.get_stats()["batches"] == 1
+        print("✓ quattro richieste concorrenti in un solo encode")
+
+
+def test_encode_interface_and_errors():
+    print("\n=== Test interfaccia encode ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service, _ = _service(tmp_dir, embedding_batch_window_ms=0)
+        assert service.encode("ciao") == [4.0, 1.0]
+        assert service.encode(["ciao", "aurora"]) == [[4.0, 1.0], [6.0, 1.0]]
+        assert service.encode_many([]) == []
+        print("✓ stessa forma di SentenceTransformer.encode")
+
+        class BrokenModel:
+            def encode(self, texts):
+                raise RuntimeError("modello rotto")
+        service.model = BrokenModel()
+        try:
+            service.encode("nuovo testo")
+            assert False, "l'errore del modello deve arrivare al chiamante"
+        except RuntimeError:
+            pass
+        assert service.encode("ciao") == [4.0, 1.0]
+        print("✓ errore propagato, il servizio resta attivo")
+
+
+def test_reembedding_migration_runs_once():
+    print("\n=== Test migrazione embedding ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        service, _ = _service(tmp_dir, embedding_batch_window_ms=0)
+        marker_path = os.path.join(tmp_dir, "migrations.json")
+        collection = FakeCollection("knowledge_base", ["uno", "due", "", "quattro"])
+        assert needs_reembedding(collection, service.model_name, marker_path)
+        assert reembed_collection(collection, service, marker_path, batch_size=2) == 3
+        assert collection.embeddings["doc_3"] == [7.0, 1.0]
+        assert not needs_reembedding(collection, service.model_name, marker_path)
+        assert needs_reembedding(collection, "altro-modello", marker_path)
+        print("✓ documenti ricalcolati e migrazione registrata")
+
+        fresh = FakeCollection("nuova", [])
+        record_embedding_model(fresh, service.model_name, marker_path)
+        fresh.ids, fresh.documents = ["doc_0"], ["scritto dal servizio"]
+        assert not needs_reembedding(fresh, service.model_name, marker_path)
+        assert not needs_reembedding(collection, service.model_name, marker_path)
+        print("✓ una collezione nata vuota non chiede la migrazione")
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_share_a_batch()
+    test_encode_interface_and_errors()
+    test_reembedding_migration_runs_once()
+    print("🎉 TUTTI I TEST SUPERATI!")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test del FastRouter: instradamento banale/pensatore sugli embedding e calibrazione delle soglie
+"""
+
+import os
+import tempfile
+from fast_router import FastRouter
+
+
+class FakeEmbeddingModel:
+    """Embedding a sacchetto di parole: basta per verificare la logica di instradamento."""
+    def __init__(self):
+        self.vocabulary = {}
+
+    def encode(self, texts):
+        vectors = []
+        for text in texts:
+            words = text.lower().replace("?", " ").replace(",", " ").split()
+            for word in words:
+                self.vocabulary.setdefault(word, len(self.vocabulary))
+            vector = [0.0] * 512
+            for word in words:
+                vector[self.vocabulary[word] % 512] += 1.0
+            vectors.append(vector)
+        return vectors
+
+
+def make_router(tmp_dir, **overrides):
+    config = {
+        "fast_router_calibration_path": os.path.join(tmp_dir, "calibration.json"),
+        "fast_router_log_path": os.path.join(tmp_dir, "decisions.jsonl"),
+    }
+    config.update(overrides)
+    return FastRouter(config, FakeEmbeddingModel())
+
+
+def test_routes():
+    print("=== Test instradamento ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        router = make_router(tmp_dir)
+        assert router.decide("che ore sono?")["route"] == "trivial"
+        assert router.decide("cosa ne pensi di questa idea?")["route"] == "thinker"
+        assert router.decide("zebra quantistica")["route"] == "uncertain"
+        stats = router.get_stats()
+        assert stats["trivial"] == 1 and stats["thinker"] == 1 and stats["uncertain"] == 1
+        print(f"✓ decisioni corrette, latenza media {stats['avg_latency_ms']:.2f} ms")
+
+
+def test_no_embedding_model():
+    router = FastRouter({"fast_router_calibration_path": "/nonexistent/calibration.json"}, None)
+    assert router.decide("che ore sono?")["route"] == "uncertain"
+    print("✓ senza modello di embedding decide sempre il router LLM")
+
+
+def test_calibration():
+    print("=== Test calibrazione ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        router = make_router(tmp_dir)
+        labelled = [
+            ("ciao aurora", "trivial"),
+            ("che giorno è oggi?", "trivial"),
+            ("scrivimi una poesia sulla luna", "thinker"),
+            ("ti ricordi cosa ti ho detto?", "thinker"),
+            ("ciao aurora", "trivial"),  # Stessa domanda: un solo esempio
+        ]
+        for query, label in labelled:
+            router.record(query, router.decide(query), source="router_llm", label=label)
+        # Le decisioni del router veloce stesso non sono etichette indipendenti
+        router.record("cosa ne pensi di questa idea?", router.decide("cosa ne pensi di questa idea?"), source="embedding")
+        examples = router.labelled_examples()
+        assert ("ciao aurora", "trivial") in examples
+        assert ("scrivimi una poesia sulla luna", "thinker") in examples
+        assert all(query != "cosa ne pensi di questa idea?" for query, _ in examples)
+
+        result = router.calibrate(examples)
+        assert result["examples"] == 4
+        assert result["trivial_precision"] >= 0.95 and result["thinker_precision"] >= 0.95
+
+        reloaded = make_router(tmp_dir)
+        assert reloaded.thinker_threshold == router.thinker_threshold
+        print(f"✓ soglie calibrate e ricaricate: {result}")
+
+
+if __name__ == "__main__":
+    test_routes()
+    test_no_embedding_model()
+    test_calibration()
+    print("🎉 TUTTI I TEST SUPERATI!")
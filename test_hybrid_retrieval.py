@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test di hybrid_retrieval: indice BM25 incrementale, fusione RRF e recupero ibrido con provenienza
+"""
+
+import time
+import random
+from hybrid_retrieval import BM25Index, HybridRetriever, reciprocal_rank_fusion, tokenize
+
+
+def test_bm25_index():
+    print("=== Test indice BM25 incrementale ===")
+    assert tokenize("Il Mentore ama la montagna!") == ["mentore", "ama", "montagna"]
+    index = BM25Index()
+    index.add("a", "il mentore ama la montagna e la neve")
+    index.add("b", "la pizza napoletana è la migliore")
+    index.add("c", "montagna montagna montagna: gite in montagna")
+    ranked = [doc_id for doc_id, _ in index.search("montagna")]
+    assert ranked == ["c", "a"]
+    assert index.search("parola assente") == []
+
+    index.add("c", "ricetta della pizza")  # Aggiornamento: il vecchio testo sparisce dall'indice
+    assert [doc_id for doc_id, _ in index.search("montagna")] == ["a"]
+    assert [doc_id for doc_id, _ in index.search("pizza")][0] in ("b", "c")
+    index.remove("a")
+    assert index.search("montagna") == [] and "montagna" not in index.postings
+    assert index.size() == 2
+    assert [doc_id for doc_id, _ in index.search("pizza", allowed=lambda doc_id: doc_id == "b")] == ["b"]
+    print("✓ aggiunta, aggiornamento, rimozione e filtro")
+
+
+def test_reciprocal_rank_fusion():
+    print("\n=== Test fusione RRF ===")
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b"]
+    assert abs(fused[0][1] - (1 / 61 + 1 / 62)) < 1e-12
+    print("✓ i documenti in entrambe le classifiche salgono")
+
+
+def test_hybrid_search_with_provenance():
+    print("\n=== Test recupero ibrido ===")
+    retriever = HybridRetriever({"retrieval_lexical_k": 10, "retrieval_vector_k": 5})
+    memory = {"content": "il mentore ha scalato una montagna", "vividezza": 0.8}
+    retriever.upsert("memory_1", memory["content"], "memory_box", memory)
+    retriever.upsert("chat_1", "parliamo di montagna", "chat_history")
+    retriever.upsert("doc_1", "le Alpi sono una catena montuosa", "chroma")
+    # Ricerca vettoriale finta: trova il documento semantico che BM25 non vede, e un documento non indicizzato
+    retriever.add_vector_search("chroma", lambda query, k: [("doc_1", "le Alpi sono una catena montuosa", "chroma", None),
+                                                            ("doc_2", "vette oltre i 4000 metri", "chroma", None)][:k])
+
+    results = retriever.search("montagna", k=5, sources=("memory_box", "chroma"))
+    by_id = {result["id"]: result for result in results}
+    assert "chat_1" not in by_id
+    assert by_id["memory_1"]["ref"] is memory and by_id["memory_1"]["lexical_rank"] == 1 and by_id["memory_1"]["vector_rank"] is None
+    assert by_id["doc_1"]["vector_rank"] == 1 and by_id["doc_1"]["lexical_rank"] is None
+    assert by_id["doc_2"]["text"] == "vette oltre i 4000 metri"
+    assert retriever.search("montagna", k=5, sources=("chat_history",))[0]["id"] == "chat_1"
+    assert len(retriever.search("montagna", k=1)) == 1
+
+    # Una ricerca vettoriale che fallisce lascia comunque i risultati lessicali
+    retriever.vector_searches = [("rotta", lambda query, k: 1 / 0)]
+    assert [result["id"] for result in retriever.search("mentore")] == ["memory_1"]
+    print("✓ classifica unica con sorgente e posizioni lessicale/vettoriale")
+
+
+def test_vector_searches_fused_separately():
+    print("\n=== Test ricerche vettoriali fuse separatamente ===")
+    retriever = HybridRetriever({"retrieval_vector_k": 5})
+    chroma_hits = [(f"doc_{i}", f"documento {i}", "chroma", None) for i in range(3)]
+    retriever.add_vector_search("chroma", lambda query, k: chroma_hits[:k])
+    retriever.add_vector_search("memory_box", lambda query, k: [("memory_1", "ricordo", "memory_box", None)])
+    results = retriever.search("qualcosa", k=5)
+    by_id = {result["id"]: result for result in results}
+    # Il miglior ricordo vale quanto il miglior documento, non dopo tutti i documenti
+    assert by_id["memory_1"]["vector_rank"] == 1 and by_id["memory_1"]["score"] == by_id["doc_0"]["score"]
+    assert by_id["memory_1"]["score"] > by_id["doc_1"]["score"]
+    print("✓ ogni ricerca vettoriale è una classifica a sé nella fusione")
+
+
+def test_sync_source():
+    print("\n=== Test allineamento di una sorgente ===")
+    retriever = HybridRetriever({})
+    retriever.sync_source("memory_box", {"m1": ("primo ricordo del lago", 1), "m2": ("secondo ricordo del mare", 2)})
+    retriever.upsert("c1", "il lago di Como", "chroma")
+    retriever.sync_source("memory_box", {"m2": ("secondo ricordo del mare", 22), "m3": ("terzo ricordo", 3)})
+    assert [doc_id for doc_id, _ in retriever.lexical("lago")] == ["c1"]
+    assert retriever.documents["m2"]["ref"] == 22
+    assert retriever.get_stats()["by_source"] == {"memory_box": 2, "chat_history": 0, "chroma": 1}
+    print("✓ nuovi aggiunti, scomparsi rimossi, altre sorgenti intatte")
+
+
+def test_lexical_search_scales():
+    print("\n=== Test latenza della ricerca lessicale ===")
+    rng = random.Random(7)
+    vocabulary = [f"parola{i}" for i in range(20000)]
+    retriever = HybridRetriever({})
+    for i in range(100000):
+        retriever.upsert(f"doc_{i}", " ".join(rng.choice(vocabulary) for _ in range(12)), "chroma")
+    start = time.perf_counter()
+    for _ in range(100):
+        results = retriever.lexical("parola42 parola4242 parola17", k=10)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / 100
+    assert results
+    print(f"✓ 100000 documenti: {elapsed_ms:.2f} ms per ricerca")
+    assert elapsed_ms < 50
+
+
+if __name__ == "__main__":
+    test_bm25_index()
+    test_reciprocal_rank_fusion()
+    test_hybrid_search_with_provenance()
+    test_vector_searches_fused_separately()
+    test_sync_source()
+    test_lexical_search_scales()
+    print("🎉 TUTTI I TEST SUPERATI!")
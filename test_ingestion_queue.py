@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test della IngestionQueue: coda di apprendimento durevole, fusione dei quasi duplicati e backpressure
+"""
+
+import os
+import tempfile
+from ingestion_queue import IngestionQueue
+
+
+def _config(tmp_dir, **overrides):
+    config = {"ingestion_queue_path": os.path.join(tmp_dir, "queue.jsonl")}
+    config.update(overrides)
+    return config
+
+
+def test_queue_survives_restart():
+    print("=== Test durabilità ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue = IngestionQueue(_config(tmp_dir))
+        queue.put("knowledge", "Il mentore ama la montagna", source="chat")
+        queue.put("memory", "Utente: ciao\nAI: ciao!", data={"user_message": "ciao", "ai_response": "ciao!"})
+        queue.put("knowledge", "Notizie sul clima di oggi", source="world_news")
+        first = queue.take(1)
+        queue.complete([first[0]["id"]])
+
+        reopened = IngestionQueue(_config(tmp_dir))
+        items = reopened.take(10)
+        assert [item["kind"] for item in items] == ["memory", "knowledge"]
+        assert items[0]["data"]["ai_response"] == "ciao!"
+        print("✓ gli elementi non scritti sopravvivono al riavvio")
+
+
+def test_interrupted_drain_is_retried():
+    print("\n=== Test svuotamento interrotto ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue = IngestionQueue(_config(tmp_dir))
+        queue.put("knowledge", "primo", source="chat")
+        queue.put("knowledge", "secondo", source="chat")
+        taken = queue.take(10)
+        assert IngestionQueue(_config(tmp_dir)).size() == 2  # Presi ma non completati: ancora sul disco
+        queue.release([item["id"] for item in taken])
+        assert [item["text"] for item in queue.take(10)] == ["primo", "secondo"]
+        print("✓ gli elementi rilasciati tornano in testa alla coda")
+
+
+def test_near_duplicates_coalesce():
+    print("\n=== Test fusione dei quasi duplicati ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue = IngestionQueue(_config(tmp_dir, ingestion_coalesce_threshold=0.8))
+        text = "Notizie su intelligenza artificiale: nuovi modelli linguistici rilasciati oggi in Europa"
+        assert queue.put("knowledge", text, source="world_news") == "queued"
+        assert queue.put("knowledge", text + " ieri", source="world_news") == "coalesced"
+        assert queue.put("knowledge", text, source="personal_opinion") == "queued"
+        assert queue.size() == 2
+        assert queue.take(10)[0]["text"].endswith("ieri")
+        assert IngestionQueue(_config(tmp_dir)).size() == 2
+        print("✓ il più recente sostituisce il quasi duplicato con la stessa origine")
+
+
+def test_backpressure_and_compaction():
+    print("\n=== Test backpressure ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue = IngestionQueue(_config(tmp_dir, ingestion_soft_limit=2, ingestion_max_pending=3))
+        assert queue.pressure() == "ok"
+        for i in range(3):
+            queue.put("knowledge", f"documento numero {i} " + "parola " * i, source=f"fonte{i}")
+            if i == 1:
+                assert queue.pressure() == "soft"
+        assert queue.pressure() == "hard"
+        queue.complete([item["id"] for item in queue.take(10)])
+        assert queue.pressure() == "ok"
+        assert os.path.getsize(os.path.join(tmp_dir, "queue.jsonl")) == 0
+        print("✓ limiti rispettati, file compattato quando la coda si svuota")
+
+
+if __name__ == "__main__":
+    test_queue_survives_restart()
+    test_interrupted_drain_is_retried()
+    test_near_duplicates_coalesce()
+    test_backpressure_and_compaction()
+    print("🎉 TUTTI I TEST SUPERATI!")
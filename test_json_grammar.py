@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test della compilazione JSON Schema -> GBNF e delle statistiche di parsing per punto di chiamata
+"""
+
+import re
+from json_grammar import schema_to_gbnf, tool_call_gbnf, tool_call_schema, is_valid_json, GrammarRegistry
+from kg_extraction import KG_TRIPLES_SCHEMA, KG_BATCH_SCHEMA
+
+
+def _rules(gbnf):
+    """{nome regola: corpo}; verifica che ogni regola richiamata sia definita."""
+    rules = dict(line.split(" ::= ", 1) for line in gbnf.strip().splitlines())
+    for body in rules.values():
+        # Toglie letterali e classi di caratteri, restano i nomi delle regole
+        bare = re.sub(r'"(\\.|[^"\\])*"|\[(\\.|[^\]\\])*\]', " ", body)
+        for name in re.findall(r'[a-zA-Z][a-zA-Z0-9-]*', bare):
+            assert name in rules, f"regola non definita: {name}"
+    return rules
+
+
+def test_schema_to_gbnf():
+    print("=== Test compilazione schema -> GBNF ===")
+    rules = _rules(schema_to_gbnf(KG_TRIPLES_SCHEMA))
+    assert rules["root"].startswith('"["')
+    triple = next(body for name, body in rules.items() if name.endswith("item"))
+    assert triple.index('"\\"soggetto\\""') < triple.index('"\\"relazione\\""')
+    assert '( ws "," ws "\\"oggetto\\""' in triple  # Proprietà facoltativa
+    print("✓ triple KG: soggetto obbligatorio, relazione e oggetto facoltativi")
+
+    rules = _rules(schema_to_gbnf(KG_BATCH_SCHEMA))
+    assert "integer" in rules and "value" not in rules
+    print("✓ schema a lotti compilato senza regole superflue")
+
+    rules = _rules(schema_to_gbnf({"type": "string", "enum": ["sì", 'di "qui"']}))
+    assert rules["root"] == '"\\"sì\\"" | "\\"di \\\\\\"qui\\\\\\"\\""'
+    print("✓ enum come alternativa di letterali JSON escapati")
+
+
+def test_tool_call_grammar():
+    print("=== Test grammatica del TOOL_CALL del pensatore ===")
+    rules = _rules(tool_call_gbnf(tool_call_schema(["search_web", "create_tool"])))
+    assert rules["root"] == "command" and rules["command"] == '"TOOL_CALL: " tool-call'
+    assert '"\\"create_tool\\"" | "\\"search_web\\""' in rules.values()
+    assert "object" in rules and "any" not in rules  # args è un oggetto JSON qualsiasi, niente testo libero
+    print("✓ solo TOOL_CALL con nome strumento noto: il testo normale resta senza grammatica")
+
+    rules = _rules(tool_call_gbnf(tool_call_schema(["search_web"]), "DIRETTIVA:"))
+    assert rules["root"] == "preamble command" and rules["preamble"].startswith('"DIRETTIVA: "')
+    print("✓ con la deliberazione fusa la riga di direttiva precede il TOOL_CALL")
+
+
+def test_registry():
+    print("=== Test registro grammatiche ===")
+    registry = GrammarRegistry({})
+    assert registry.grammar_for(KG_TRIPLES_SCHEMA) is registry.grammar_for(dict(KG_TRIPLES_SCHEMA))
+    assert GrammarRegistry({"llm_structured_output": False}).grammar_for(KG_TRIPLES_SCHEMA) is None
+    print("✓ grammatica compilata una volta, nessuna grammatica se disattivato")
+
+    assert is_valid_json(' [{"soggetto": "Acme"}]\n') and not is_valid_json("Ecco: []")
+    registry.record("kg", constrained=False, parsed_ok=False)
+    registry.record("kg", constrained=False, parsed_ok=True)
+    registry.record("kg", constrained=True, parsed_ok=True)
+    stats = registry.get_stats()["kg"]
+    assert stats["free"]["failure_rate"] == 0.5
+    assert stats["grammar"] == {"calls": 1, "failures": 0, "failure_rate": 0.0}
+    print("✓ tasso di output non parsabile, libero vs vincolato")
+
+
+if __name__ == "__main__":
+    test_schema_to_gbnf()
+    test_tool_call_grammar()
+    test_registry()
+    print("🎉 TUTTI I TEST SUPERATI!")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Test dell'estrazione KG a lotti: prompt multi-documento, parsing della risposta e high-water mark
+"""
+
+import os
+import tempfile
+from kg_extraction import build_batch_prompt, parse_batch_response, HighWaterMark
+
+
+def test_batch_prompt_and_parsing():
+    print("=== Test estrazione a lotti ===")
+    prompt = build_batch_prompt(["Mario Rossi lavora per Acme.", "Acme si trova a Milano."])
+    assert "[Documento 0]" in prompt and "[Documento 1]" in prompt
+
+    raw = (
+        '[{"documento": 0, "triple": [{"soggetto": "Mario Rossi", "relazione": "lavora per", "oggetto": "Acme"}]},'
+        ' {"documento": 1, "triple": [{"soggetto": "Acme", "relazione": "si trova a", "oggetto": "Milano"}, {"soggetto": ""}]},'
+        ' {"documento": 7, "triple": [{"soggetto": "Fuori lotto"}]}]'
+    )
+    results = parse_batch_response(raw, 2)
+    assert results[0][0]["oggetto"] == "Acme"
+    assert len(results[1]) == 1  # Le triple senza soggetto vengono scartate
+    assert 7 not in results
+    print("✓ triple assegnate al documento giusto")
+
+    wrapped = "Ecco il risultato: " + raw + " Spero sia utile."
+    assert parse_batch_response(wrapped, 2) == results
+    assert parse_batch_response("non è JSON", 2) is None
+    print("✓ testo attorno all'array tollerato, risposte non valide rifiutate")
+
+
+def test_high_water_mark():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mark = HighWaterMark(os.path.join(tmp_dir, "hwm.json"))
+        assert mark.load() == 0
+        mark.save(15)
+        assert HighWaterMark(os.path.join(tmp_dir, "hwm.json")).load() == 15
+        print("✓ high-water mark persistente")
+
+
+if __name__ == "__main__":
+    test_batch_prompt_and_parsing()
+    test_high_water_mark()
+    print("🎉 TUTTI I TEST SUPERATI!")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test del backend LLM simulato: risposte deterministiche, comandi su richiesta, streaming e tempi simulati
+"""
+
+import json
+import time
+from llm_backends import MockLlama, MockModelFactory, get_model_factory, mock_tokenize, MOCK_TAGS
+from model_manager import _default_model_factory
+from stream_detector import StreamCommandDetector
+
+
+def chat(llm, prompt, **kwargs):
+    return llm.create_chat_completion(messages=[{"role": "user", "content": prompt}], **kwargs)
+
+
+def test_deterministic_answers_and_commands():
+    print("=== Test risposte del modello simulato ===")
+    llm = MockLlama("thinker.gguf", 4096, {"prefill_tokens_per_second": 0, "decode_tokens_per_second": 0})
+    prompt = "Contesto...\nRichiesta utente: Parlami del mare\nRisposta: "
+    first = chat(llm, prompt)["choices"][0]["message"]["content"]
+    assert first == chat(llm, prompt)["choices"][0]["message"]["content"]
+    print("✓ stessa richiesta, stessa risposta")
+
+    tool_call = chat(llm, f"Richiesta utente: Leggi il file {MOCK_TAGS['tool_call']}\nRisposta: ")["choices"][0]["message"]["content"]
+    detector = StreamCommandDetector()
+    detector.feed(tool_call)
+    assert detector.tool_call_complete and json.loads(detector.command[len("TOOL_CALL:"):])["tool_name"] == "read_file"
+    reflect = chat(llm, f"Richiesta utente: Spiegami {MOCK_TAGS['reflect']}\nRisposta: ")["choices"][0]["message"]["content"]
+    assert reflect.startswith("REFLECT: ")
+    assert chat(llm, f"... 'PASS_TO_THINKER' ...\nRichiesta utente: ciao {MOCK_TAGS['pass']}")["choices"][0]["message"]["content"] == "PASS_TO_THINKER"
+    fused = chat(llm, "Scrivi 'DIRETTIVA:' sulla prima riga.\nRichiesta utente: ciao\nRisposta: ")["choices"][0]["message"]["content"]
+    assert fused.startswith("DIRETTIVA: ") and "\n" in fused
+    print("✓ TOOL_CALL, REFLECT, PASS_TO_THINKER e direttiva su richiesta")
+
+    batch = json.loads(chat(llm, "Estrai 'soggetto'...\n[Documento 0]\na\n\n[Documento 1]\nb")["choices"][0]["message"]["content"])
+    assert [entry["documento"] for entry in batch] == [0, 1]
+    scripted = MockLlama("r.gguf", 2048, {"script": [{"contains": "meteo", "response": "Sole."}]})
+    assert chat(scripted, "che meteo fa?", max_tokens=10)["choices"][0]["message"]["content"] == "Sole."
+    print("✓ JSON per il KG e risposte scriptate")
+
+
+def test_streaming_and_timing():
+    print("=== Test streaming e tempi simulati ===")
+    llm = MockLlama("thinker.gguf", 4096, {"prefill_tokens_per_second": 1000, "decode_tokens_per_second": 200})
+    prompt = "parola " * 50 + "\nRichiesta utente: ciao\nRisposta: "
+    start = time.perf_counter()
+    chunks = [c["choices"][0]["delta"].get("content") for c in chat(llm, prompt, max_tokens=5, stream=True)]
+    elapsed = time.perf_counter() - start
+    assert len([c for c in chunks if c]) == 5
+    assert elapsed >= len(mock_tokenize(prompt)) / 1000 + 5 / 200
+    assert len(llm.tokenize(b"ciao a te")) == 3 and llm.tokenize(b"ciao", add_bos=True)[0] == 0
+    print(f"✓ prefill e decodifica simulati ({elapsed * 1000:.0f} ms), max_tokens rispettato")
+
+
+def test_prefix_state_reuse():
+    print("=== Test riuso del prefisso ===")
+    from prompt_cache import PrefixStateCache
+    llm = MockLlama("thinker.gguf", 4096, {"prefill_tokens_per_second": 0, "decode_tokens_per_second": 0})
+    prefix = "Sei Aurora. " * 30
+    prefix_tokens = len(mock_tokenize(prefix))
+    chat(llm, prefix + "Richiesta utente: ciao\nRisposta: ")
+    full = llm.prefill_tokens
+    chat(llm, prefix + "Richiesta utente: come stai?\nRisposta: ")
+    assert llm.prefill_tokens - full < full - prefix_tokens + 5  # Il prefisso ancora nel contesto non si rivaluta
+
+    # Un prompt diverso svuota il contesto: lo stato salvato dal PrefixStateCache lo ripristina
+    cache = PrefixStateCache({})
+    key = cache.before_call(llm, "thinker", prefix)
+    chat(llm, prefix + "Richiesta utente: e poi?\nRisposta: ")
+    cache.after_call(llm, "thinker", key)
+    chat(llm, "Riassumi questo testo senza prefisso.")
+    cache.invalidate("thinker")
+    before = llm.prefill_tokens
+    key = cache.before_call(llm, "thinker", prefix)
+    chat(llm, prefix + "Richiesta utente: dimmi tutto\nRisposta: ")
+    assert llm.prefill_tokens - before < 15 and cache.get_stats()["restores"] == 1
+    print("✓ il prefill salta il prefisso già valutato o ripristinato")
+
+
+def test_factory_selection():
+    assert get_model_factory({}) is _default_model_factory
+    assert isinstance(get_model_factory({"llm_model_backend": "mock"})("x.gguf", 512), MockLlama)
+    assert isinstance(MockModelFactory({}), MockModelFactory)
+    try:
+        get_model_factory({"llm_model_backend": "onnx"})
+        assert False, "backend sconosciuto accettato"
+    except ValueError:
+        pass
+    print("✓ factory scelta dal backend configurato")
+
+
+if __name__ == "__main__":
+    test_deterministic_answers_and_commands()
+    test_streaming_and_timing()
+    test_prefix_state_reuse()
+    test_factory_selection()
+    print("🎉 TUTTI I TEST SUPERATI!")
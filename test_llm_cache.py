@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test della LLMResponseCache: cache su disco delle risposte LLM deterministiche
+"""
+
+import os
+import tempfile
+from llm_cache import LLMResponseCache
+
+
+def test_hit_and_persistence():
+    print("=== Test cache risposte ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = {"llm_cache_path": os.path.join(tmp_dir, "cache.sqlite")}
+        cache = LLMResponseCache(config)
+        key = cache.make_key("thinker.gguf", "Estrai le triple da: Roma è in Italia", {"temperature": 0.1, "max_tokens": 300})
+        assert cache.get(key) is None
+        cache.put(key, "thinker", "[('Roma', 'si trova in', 'Italia')]")
+        assert cache.get(key) == "[('Roma', 'si trova in', 'Italia')]"
+
+        other = cache.make_key("thinker.gguf", "Estrai le triple da: Roma è in Italia", {"temperature": 0.1, "max_tokens": 500})
+        assert other != key
+        print("✓ parametri di campionamento diversi, chiave diversa")
+
+        reloaded = LLMResponseCache(config)
+        assert reloaded.get(key) == "[('Roma', 'si trova in', 'Italia')]"
+        stats = cache.get_stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        print(f"✓ cache persistente su disco, hit rate {stats['hit_rate']:.0%}")
+
+
+def test_lru_and_temperature():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = LLMResponseCache({"llm_cache_path": os.path.join(tmp_dir, "cache.sqlite"), "llm_cache_max_entries": 2})
+        for prompt in ("uno", "due"):
+            cache.put(cache.make_key("router", prompt, {}), "router", prompt)
+        cache.get(cache.make_key("router", "uno", {}))  # "uno" diventa il più recente
+        cache.put(cache.make_key("router", "tre", {}), "router", "tre")
+        assert cache.get(cache.make_key("router", "due", {})) is None
+        assert cache.get(cache.make_key("router", "uno", {})) == "uno"
+        assert cache.get_stats()["evictions"] == 1
+        assert cache.accepts(0.1) and not cache.accepts(0.7)
+        print("✓ scartata la voce meno usata, temperature alte escluse")
+
+
+if __name__ == "__main__":
+    test_hit_and_persistence()
+    test_lru_and_temperature()
+    print("🎉 TUTTI I TEST SUPERATI!")
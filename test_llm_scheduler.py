@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test dell'LLMDispatcher: priorità, scadenze e prelazione delle chiamate LLM
+"""
+
+import time
+import threading
+from llm_scheduler import LLMDispatcher, LLMRequestDropped
+
+
+def test_interactive_goes_first():
+    """Quando il modello si libera, il turno interattivo passa davanti al lavoro in background."""
+    print("=== Test priorità ===")
+    dispatcher = LLMDispatcher({})
+    order = []
+
+    busy = dispatcher.acquire("whimsy", "thinker")
+
+    def worker(priority_class):
+        with dispatcher.slot(priority_class, "thinker"):
+            order.append(priority_class)
+
+    threads = [threading.Thread(target=worker, args=(name,)) for name in ("whimsy", "maintenance", "interactive")]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)  # Accoda nell'ordine indicato
+
+    dispatcher.release(busy)
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert order == ["interactive", "maintenance", "whimsy"]
+    assert dispatcher.get_stats()["interactive"]["completed"] == 1
+    print(f"✓ ordine di esecuzione: {order}")
+
+
+def test_stale_background_dropped():
+    print("=== Test scadenze ===")
+    dispatcher = LLMDispatcher({"llm_class_deadline_seconds": {"whimsy": 0.1}})
+    busy = dispatcher.acquire("interactive", "thinker")
+    try:
+        dispatcher.acquire("whimsy", "thinker")
+        assert False, "La richiesta scaduta doveva essere scartata"
+    except LLMRequestDropped:
+        pass
+    dispatcher.release(busy)
+    assert dispatcher.get_stats()["whimsy"]["dropped"] == 1
+    print("✓ richiesta whimsy scaduta scartata")
+
+
+def test_preemption_signal():
+    print("=== Test prelazione ===")
+    dispatcher = LLMDispatcher({})
+    ticket = dispatcher.acquire("whimsy", "thinker")
+    assert not dispatcher.should_yield(ticket)
+
+    waiter = threading.Thread(target=lambda: dispatcher.release(dispatcher.acquire("interactive", "thinker")))
+    waiter.start()
+    time.sleep(0.05)
+    assert dispatcher.should_yield(ticket)
+    dispatcher.release(ticket)
+    waiter.join(timeout=2)
+    assert dispatcher.get_stats()["whimsy"]["preempted"] == 1
+    print("✓ la generazione whimsy cede il modello al turno interattivo")
+
+
+def test_models_are_independent():
+    dispatcher = LLMDispatcher({})
+    thinker = dispatcher.acquire("interactive", "thinker")
+    router = dispatcher.acquire("interactive", "router")
+    dispatcher.release(router)
+    dispatcher.release(thinker)
+    assert dispatcher.get_stats()["interactive"]["completed"] == 2
+    print("✓ router e pensatore non si bloccano a vicenda")
+
+
+def test_waiter_for_free_model_is_woken():
+    print("=== Test risveglio su modelli diversi ===")
+    dispatcher = LLMDispatcher({})
+    router = dispatcher.acquire("whimsy", "router")
+    acquired = []
+
+    def worker(priority_class, resource):
+        ticket = dispatcher.acquire(priority_class, resource)
+        acquired.append((priority_class, resource))
+        if resource == "router":
+            time.sleep(0.3)  # Tiene il router mentre l'altro attende il pensatore
+        dispatcher.release(ticket)
+
+    # Il sogno sul pensatore resta in coda: il limite whimsy è occupato dal router
+    thinker_waiter = threading.Thread(target=worker, args=("whimsy", "thinker"))
+    thinker_waiter.start()
+    time.sleep(0.05)
+    router_waiter = threading.Thread(target=worker, args=("interactive", "router"))
+    router_waiter.start()
+    time.sleep(0.05)
+
+    dispatcher.release(router)
+    thinker_waiter.join(timeout=0.2)
+    assert not thinker_waiter.is_alive(), "Il pensatore è libero: la richiesta non doveva restare bloccata"
+    router_waiter.join(timeout=2)
+    assert acquired[0] == ("interactive", "router") and ("whimsy", "thinker") in acquired
+    print("✓ chi attende un modello libero riparte appena il turno migliore prende il suo")
+
+
+if __name__ == "__main__":
+    test_interactive_goes_first()
+    test_stale_background_dropped()
+    test_preemption_signal()
+    test_models_are_independent()
+    test_waiter_for_free_model_is_woken()
+    print("🎉 TUTTI I TEST SUPERATI!")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test della LLMTelemetry: misure per chiamata e percentili per punto di chiamata
+"""
+
+import time
+from llm_telemetry import LLMTelemetry
+
+
+def simulate_call(telemetry, call_site, tokens, cache_hit=False):
+    measurement = telemetry.start(call_site, "thinker")
+    if cache_hit:
+        return telemetry.finish(measurement, cache_hit=True)
+    telemetry.generation_started(measurement)
+    time.sleep(0.01)  # Prefill
+    for _ in range(tokens):
+        telemetry.token(measurement)
+        time.sleep(0.001)
+    return telemetry.finish(measurement, prompt_tokens=120)
+
+
+def test_call_record():
+    print("=== Test misura singola chiamata ===")
+    telemetry = LLMTelemetry({})
+    record = simulate_call(telemetry, "process_query.thinker", 20)
+    assert record["generated_tokens"] == 20
+    assert record["prefill_ms"] >= 10
+    assert record["ttft_ms"] >= record["prefill_ms"]
+    assert record["decode_tok_s"] > 0
+    print(f"✓ prefill {record['prefill_ms']:.0f} ms, {record['decode_tok_s']:.0f} tok/s")
+
+
+def test_summary_and_ring_buffer():
+    telemetry = LLMTelemetry({"llm_telemetry_buffer_size": 5})
+    for _ in range(4):
+        simulate_call(telemetry, "dream_cycle", 3)
+    simulate_call(telemetry, "process_query.router", 0, cache_hit=True)
+    simulate_call(telemetry, "process_query.router", 2)
+    summary = telemetry.summary()
+    assert summary["dream_cycle"]["calls"] == 3  # La misura più vecchia è uscita dal buffer
+    assert summary["process_query.router"]["cache_hits"] == 1
+    assert len(telemetry.recent(10)) == 5
+    print(f"✓ percentili per punto di chiamata: {sorted(summary)}")
+
+
+if __name__ == "__main__":
+    test_call_record()
+    test_summary_and_ring_buffer()
+    print("🎉 TUTTI I TEST SUPERATI!")
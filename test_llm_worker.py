@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test dell'LLMWorkerPool: generazione in un processo separato, cancellazione e riavvio dopo un crash
+"""
+
+import os
+import time
+from llm_worker import LLMWorkerPool, LLMWorkerError
+
+
+class FakeLlama:
+    """Modello finto caricato nel processo worker: ripete le parole del prompt, una per token."""
+    def tokenize(self, text, add_bos=False):
+        return list(range(len(text.split())))
+
+    def create_chat_completion(self, messages, stream=False, **kwargs):
+        prompt = messages[-1]["content"]
+        if prompt == "CRASH":
+            os._exit(1)  # Simula un crash di llama.cpp
+        for word in prompt.split():
+            time.sleep(0.01)
+            yield {"choices": [{"delta": {"content": word + " "}}]}
+
+
+def fake_factory(model_path, n_ctx):
+    return FakeLlama()
+
+
+def make_pool():
+    return LLMWorkerPool({"llm_model_path_thinker": "fake.gguf", "llm_worker_start_timeout_seconds": 30}, model_factory=fake_factory)
+
+
+def test_generation_and_cancel():
+    print("=== Test worker LLM ===")
+    pool = make_pool()
+    try:
+        llm = pool.get("thinker")
+        response = llm.create_chat_completion(messages=[{"role": "user", "content": "ciao dal worker"}])
+        assert response["choices"][0]["message"]["content"] == "ciao dal worker "
+        assert llm.tokenize("uno due tre".encode('utf-8')) == [0, 1, 2]
+        print("✓ generazione e tokenizzazione nel processo worker")
+
+        stream = llm.create_chat_completion(messages=[{"role": "user", "content": "parola " * 200}], stream=True)
+        next(stream)
+        stream.close()  # Il worker interrompe la generazione
+        start = time.monotonic()
+        response = llm.create_chat_completion(messages=[{"role": "user", "content": "subito"}])
+        assert response["choices"][0]["message"]["content"] == "subito "
+        assert time.monotonic() - start < 1.0
+        print("✓ stream cancellato senza aspettare la fine della generazione")
+    finally:
+        pool.shutdown()
+
+
+def test_restart_after_crash():
+    pool = make_pool()
+    try:
+        llm = pool.get("thinker")
+        try:
+            llm.create_chat_completion(messages=[{"role": "user", "content": "CRASH"}])
+            assert False, "Il crash del worker doveva sollevare LLMWorkerError"
+        except LLMWorkerError:
+            pass
+        time.sleep(0.2)
+        llm = pool.get("thinker")
+        response = llm.create_chat_completion(messages=[{"role": "user", "content": "di nuovo vivo"}])
+        assert response["choices"][0]["message"]["content"] == "di nuovo vivo "
+        assert pool.get_stats()["thinker"]["restarts"] == 1
+        print("✓ worker riavviato dopo il crash, il processo principale è intatto")
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    test_generation_and_cancel()
+    test_restart_after_crash()
+    print("🎉 TUTTI I TEST SUPERATI!")
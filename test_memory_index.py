@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test di memory_index: matrice degli embedding della memory box e punteggio vettoriale
+"""
+
+from datetime import datetime, timedelta
+from memory_index import MemoryVectorIndex
+
+
+def _memory(content, days_old=0, consulted_days_ago=0, vividezza=1.0, sentiment="positivo", corruption=0.0):
+    now = datetime.now()
+    return {
+        "content": content,
+        "timestamp": (now - timedelta(days=days_old)).isoformat(),
+        "last_consulted": (now - timedelta(days=consulted_days_ago)).isoformat(),
+        "vividezza": vividezza,
+        "sentiment": sentiment,
+        "corruption_level": corruption,
+    }
+
+
+def test_scoring_matches_rules():
+    print("=== Test punteggio rilevanza x confidenza x recenza ===")
+    index = MemoryVectorIndex({"memory_recency_half_life_days": 30})
+    index.add("fresco", [1.0, 0.0, 0.0], _memory("fresco"))
+    index.add("vecchio", [1.0, 0.0, 0.0], _memory("vecchio", days_old=30, consulted_days_ago=40, vividezza=0.5))
+    index.add("lontano", [0.0, 1.0, 0.0], _memory("lontano"))
+    results = index.search([2.0, 0.0, 0.0], k=3)
+    assert [result["id"] for result in results] == ["fresco", "vecchio", "lontano"]
+    fresh, old = results[0], results[1]
+    assert abs(fresh["relevance"] - 1.0) < 1e-6 and abs(fresh["confidence"] - 0.8) < 1e-6 and fresh["recency"] > 0.99
+    assert abs(old["confidence"] - 0.3) < 1e-6 and abs(old["recency"] - 0.5) < 0.01
+    confused = MemoryVectorIndex({})
+    confused.add("m", [1.0, 0.0], _memory("m", vividezza=0.2, sentiment="confuso", corruption=0.5))
+    assert abs(confused.search([1.0, 0.0])[0]["confidence"] - 0.2) < 1e-6
+    print("✓ stesse regole di confidenza di _calculate_memory_confidence")
+
+
+def test_top_k_and_threshold():
+    print("\n=== Test top-k e soglia di rilevanza ===")
+    index = MemoryVectorIndex({})
+    for i in range(200):
+        index.add(f"m{i}", [1.0, i / 100.0], _memory(f"m{i}"))
+    results = index.search([1.0, 0.0], k=5)
+    assert [result["id"] for result in results] == ["m0", "m1", "m2", "m3", "m4"]
+    assert index.search([0.0, -1.0], k=5, min_relevance=0.3) == []
+    assert len(index.search([1.0, 0.0], k=500)) == 200
+    print("✓ argpartition restituisce i migliori, in ordine")
+
+
+def test_update_and_remove():
+    print("\n=== Test aggiornamento e rimozione ===")
+    index = MemoryVectorIndex({})
+    memories = {name: _memory(name) for name in ("a", "b", "c")}
+    for vector, name in (([1.0, 0.0], "a"), ([0.9, 0.1], "b"), ([0.0, 1.0], "c")):
+        index.add(name, vector, memories[name])
+    index.remove("a")
+    assert index.size() == 2 and "a" not in index
+    assert index.search([0.0, 1.0], k=1)[0]["ref"] is memories["c"]  # "c" ha preso la riga di "a"
+    memories["b"]["corruption_level"] = 0.9
+    index.update("b", memories["b"])
+    assert abs(index.search([1.0, 0.0], k=1)[0]["confidence"] - 0.5) < 1e-6
+    for i in range(100):
+        index.add(f"x{i}", [0.5, 0.5], _memory(f"x{i}"))
+    assert index.size() == 102 and index.capacity >= 102
+    print("✓ rimozione in O(1), array paralleli riallineati, crescita della matrice")
+
+
+if __name__ == "__main__":
+    test_scoring_matches_rules()
+    test_top_k_and_threshold()
+    test_update_and_remove()
+    print("🎉 TUTTI I TEST SUPERATI!")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test di memory_tiers: livelli caldo / tiepido / freddo della memoria di Aurora
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+from memory_index import MemoryVectorIndex
+from memory_tiers import TieredMemoryStore, memory_id
+
+
+def _memory(content, vividezza=1.0, consulted_days_ago=0):
+    now = datetime.now()
+    return {
+        "content": content,
+        "timestamp": (now - timedelta(days=consulted_days_ago)).isoformat(),
+        "last_consulted": (now - timedelta(days=consulted_days_ago)).isoformat(),
+        "vividezza": vividezza,
+        "sentiment": "positivo",
+    }
+
+
+def _store(directory, index, **overrides):
+    config = {
+        "memory_hot_size": 3,
+        "memory_warm_max": 4,
+        "memory_warm_path": os.path.join(directory, "warm.json"),
+        "memory_cold_dir": os.path.join(directory, "cold"),
+        "memory_cold_segment_size": 2,
+    }
+    config.update(overrides)
+    return TieredMemoryStore(config, index)
+
+
+def test_hot_tier_demotes_coldest():
+    print("=== Test livello caldo ===")
+    with tempfile.TemporaryDirectory() as directory:
+        store = _store(directory, MemoryVectorIndex({}))
+        hot = [_memory("vivido"), _memory("sbiadito", vividezza=0.2, consulted_days_ago=10), _memory("recente"), _memory("nuovo")]
+        hot, demoted = store.admit(hot)
+        assert [m["content"] for m in hot] == ["vivido", "recente", "nuovo"]
+        assert [m["content"] for m in demoted] == ["sbiadito"] and store.is_warm(demoted[0])
+
+        hot, demoted = store.promote(hot[:2], [store.warm_memories()[0]])
+        assert [m["content"] for m in hot] == ["vivido", "recente", "sbiadito"] and demoted == []
+        assert store.warm_memories() == [] and store.get_stats()["promoted"] == 1
+        hot, demoted = store.admit(hot + [_memory("ultimo")])
+        assert [m["content"] for m in demoted] == ["sbiadito"]
+        store.save()
+        reloaded = _store(directory, None)
+        reloaded.load()
+        assert [m["content"] for m in reloaded.warm_memories()] == [m["content"] for m in store.warm_memories()]
+        print("✓ i ricordi più freddi scendono nel tiepido, i richiamati risalgono, il tiepido è persistente")
+
+
+def test_cold_archive_round_trip():
+    print("\n=== Test archivio freddo ===")
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemoryVectorIndex({})
+        store = _store(directory, index)
+        warm = [
+            _memory("montagna", vividezza=0.1, consulted_days_ago=60),
+            _memory("mare", vividezza=0.1, consulted_days_ago=60),
+            _memory("lago", vividezza=0.9),
+        ]
+        vectors = {"montagna": [1.0, 0.0, 0.0], "mare": [0.0, 1.0, 0.0], "lago": [0.0, 0.0, 1.0]}
+        for memory in warm:
+            index.add(memory_id(memory), vectors[memory["content"]], memory)
+        store.warm.update((memory_id(memory), memory) for memory in warm)
+
+        archived = store.rebalance()
+        assert len(archived) == 2 and store.get_stats()["warm"] == 1 and store.cold.count() == 2
+        assert index.size() == 1 and len(store.cold.segments) == 1
+        assert os.path.exists(os.path.join(directory, "cold", store.cold.segments[0]["file"]))
+
+        results = store.recall_cold([0.0, 1.0, 0.0], k=1, min_relevance=0.5)
+        assert [result["ref"]["content"] for result in results] == ["mare"]
+        assert store.cold.count() == 1 and store.get_stats()["warm"] == 2 and memory_id(results[0]["ref"]) in index
+        assert store.recall_cold([0.0, 1.0, 0.0], k=1, min_relevance=0.5) == []
+
+        reopened = _store(directory, MemoryVectorIndex({}))
+        assert reopened.cold.count() == 1
+        assert reopened.recall_cold([1.0, 0.0, 0.0], k=1)[0]["ref"]["content"] == "montagna"
+        print("✓ archiviati in segmenti compressi, ripaginati su richiesta, riportati nel tiepido")
+
+
+def test_cold_recall_uses_current_vividness():
+    print("\n=== Test vividezza attuale nel richiamo dal freddo ===")
+    with tempfile.TemporaryDirectory() as directory:
+        store = _store(directory, MemoryVectorIndex({}), memory_decay_rate=0.005)
+        faded = _memory("vecchio viaggio", vividezza=0.9, consulted_days_ago=60)
+        store.cold.append([(memory_id(faded), faded, [1.0, 0.0])])
+        result, = store.recall_cold([1.0, 0.0], k=1)
+        # Dopo 60 giorni a 0.005 all'ora la vividezza attuale è 0: niente bonus di vividezza sulla confidenza
+        assert abs(result["confidence"] - 0.3) < 1e-6
+        print("✓ la confidenza usa la vividezza decaduta, come nei livelli caldo e tiepido")
+
+
+def test_cold_lookup_without_restore():
+    print("\n=== Test ricerca nel freddo senza ripristino ===")
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemoryVectorIndex({})
+        store = _store(directory, index)
+        memory = _memory("gita al lago")
+        store.cold.append([(memory_id(memory), memory, [1.0, 0.0])])
+        results = store.recall_cold([1.0, 0.0], k=1, restore=False)
+        assert results[0]["ref"]["content"] == "gita al lago"
+        assert store.get_stats()["warm"] == 0 and index.size() == 0 and store.cold.count() == 1
+        print("✓ senza ripristino i livelli restano invariati")
+
+        store.restore_cold(results)
+        store.restore_cold(results)
+        assert store.get_stats()["warm"] == 1 and memory_id(memory) in index and store.cold.count() == 0
+        print("✓ restore_cold riporta il ricordo nel tiepido una sola volta")
+
+
+def test_warm_overflow_goes_cold():
+    print("\n=== Test limite del livello tiepido ===")
+    with tempfile.TemporaryDirectory() as directory:
+        index = MemoryVectorIndex({})
+        store = _store(directory, index)
+        for i in range(6):
+            memory = _memory(f"ricordo {i}", vividezza=0.3 + i * 0.1)
+            index.add(memory_id(memory), [1.0, float(i)], memory)
+            store.warm[memory_id(memory)] = memory
+        archived = store.rebalance()
+        assert len(archived) == 2 and store.get_stats()["warm"] == 4
+        assert sorted(m["content"] for m in store.warm_memories()) == ["ricordo 2", "ricordo 3", "ricordo 4", "ricordo 5"]
+        assert len(store.cold.segments) == 1
+        print("✓ oltre memory_warm_max i ricordi più freddi vanno nell'archivio")
+
+
+if __name__ == "__main__":
+    test_hot_tier_demotes_coldest()
+    test_cold_archive_round_trip()
+    test_cold_recall_uses_current_vividness()
+    test_cold_lookup_without_restore()
+    test_warm_overflow_goes_cold()
+    print("🎉 TUTTI I TEST SUPERATI!")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Test del ModelManager: residenza condivisa dei modelli e scaricamento LRU sotto pressione
+"""
+
+import os
+import time
+import tempfile
+import threading
+from model_manager import ModelManager
+
+
+class FakeLlama:
+    """Modello finto: registra solo il percorso e il contesto richiesti."""
+    def __init__(self, model_path, n_ctx):
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _make_config(tmp_dir, budget_mb):
+    router_path = os.path.join(tmp_dir, "router.gguf")
+    thinker_path = os.path.join(tmp_dir, "thinker.gguf")
+    for path in (router_path, thinker_path):
+        with open(path, 'wb') as f:
+            f.write(b"\0" * 1024)
+    return {
+        "llm_model_path_router": router_path,
+        "llm_model_path_thinker": thinker_path,
+        "llm_ram_budget_mb": budget_mb,
+        "llm_compute_overhead_mb": 0,
+    }
+
+
+def test_co_residency():
+    """Con budget sufficiente router e pensatore restano entrambi in memoria."""
+    print("=== Test co-residenza ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = ModelManager(_make_config(tmp_dir, budget_mb=8192), model_factory=FakeLlama)
+
+        router = manager.get("router")
+        thinker = manager.get("thinker")
+        assert manager.get("router") is router
+        assert manager.get("thinker") is thinker
+
+        stats = manager.get_stats()
+        assert stats["resident"] == ["router", "thinker"]
+        assert stats["models"]["router"]["loads"] == 1
+        assert stats["models"]["router"]["hits"] == 1
+        assert stats["models"]["thinker"]["evictions"] == 0
+        print(f"✓ residenti: {stats['resident']}, usati {stats['used_mb']:.0f} MB")
+
+
+def test_lru_eviction_under_pressure():
+    """Con budget ridotto viene scaricato il modello usato meno di recente."""
+    print("=== Test scaricamento LRU ===")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Il KV cache del router (~768 MB) e del pensatore (~512 MB) non stanno insieme in 1 GB
+        manager = ModelManager(_make_config(tmp_dir, budget_mb=1024), model_factory=FakeLlama)
+
+        router = manager.get("router")
+        manager.get("thinker")
+        assert router.closed
+        assert manager.peek("router") is None
+        assert manager.get_stats()["models"]["router"]["evictions"] == 1
+        print("✓ router scaricato per far posto al pensatore")
+
+        loaded = manager.preload(["router"])
+        assert loaded == []
+        assert manager.is_resident("thinker")
+        print("✓ preload non scarica modelli già residenti")
+
+
+def test_external_usage_and_evict_hook():
+    """La RAM degli stati salvati conta nel budget; chi la tiene viene avvisato degli scaricamenti."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = ModelManager(_make_config(tmp_dir, budget_mb=8192), model_factory=FakeLlama)
+        evicted = []
+        manager.on_evict = evicted.append
+        manager.get("thinker")
+        assert manager.fits("router")
+        manager.set_external_usage("prefix_states", 7 * 1024 ** 3)
+        assert not manager.fits("router")
+        manager.get("router")
+        assert evicted == ["thinker"]
+        print("✓ stati del prefisso nel budget RAM e notifica dello scaricamento")
+
+
+def test_unknown_model():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = ModelManager(_make_config(tmp_dir, budget_mb=8192), model_factory=FakeLlama)
+        assert manager.get("vision") is None
+        print("✓ modello sconosciuto ignorato")
+
+
+def test_loading_one_model_does_not_block_the_other():
+    """Mentre il pensatore si carica (warm-up in background) il router resta disponibile."""
+    print("=== Test caricamenti indipendenti ===")
+    release = threading.Event()
+
+    def factory(model_path, n_ctx):
+        if "thinker" in model_path:
+            release.wait(5)
+        return FakeLlama(model_path, n_ctx)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = ModelManager(_make_config(tmp_dir, budget_mb=8192), model_factory=factory)
+        warmup = threading.Thread(target=manager.get, args=("thinker",))
+        warmup.start()
+        time.sleep(0.05)
+        start = time.perf_counter()
+        assert manager.get("router") is not None
+        assert time.perf_counter() - start < 1
+        assert not manager.is_resident("thinker")
+        release.set()
+        warmup.join()
+        assert manager.get_stats()["resident"] == ["router", "thinker"]
+        print("✓ router caricato mentre il pensatore era ancora in caricamento")
+
+
+
+def test_default_budget_is_bounded():
+    """Senza llm_ram_budget_mb il budget è una frazione della RAM di sistema, anche senza psutil."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config = _make_config(tmp_dir, budget_mb=None)
+        config["llm_ram_budget_fraction"] = 0.5
+        manager = ModelManager(config, model_factory=FakeLlama)
+        assert 0 < manager.budget_bytes < float("inf")
+        print(f"✓ budget predefinito: {manager.budget_bytes / 1024 ** 3:.1f} GB")
+
+
+if __name__ == "__main__":
+    test_co_residency()
+    test_lru_eviction_under_pressure()
+    test_external_usage_and_evict_hook()
+    test_unknown_model()
+    test_loading_one_model_does_not_block_the_other()
+    test_default_budget_is_bounded()
+    print("🎉 TUTTI I TEST SUPERATI!")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test della PrefixStateCache: riuso dello stato llama.cpp per il prefisso stabile del prompt
+"""
+
+from prompt_cache import PrefixStateCache
+
+
+class FakeState:
+    def __init__(self, input_ids, bytes_per_token):
+        self.input_ids = list(input_ids)
+        self.llama_state_size = len(input_ids) * bytes_per_token
+
+
+class FakeLlama:
+    """Simula il contesto di llama.cpp: token valutati, troncamento con n_tokens, save_state/load_state."""
+    def __init__(self, bytes_per_token=1000):
+        self.input_ids = []
+        self.bytes_per_token = bytes_per_token
+        self.loads = 0
+
+    @property
+    def n_tokens(self):
+        return len(self.input_ids)
+
+    @n_tokens.setter
+    def n_tokens(self, value):
+        self.input_ids = self.input_ids[:value]
+
+    def tokenize(self, text, add_bos=False):
+        return text.decode('utf-8').split()
+
+    def evaluate(self, prompt, response="risposta del modello"):
+        self.input_ids = ["<inizio>"] + prompt.split() + response.split()  # Intestazione del template di chat
+
+    def save_state(self):
+        return FakeState(self.input_ids, self.bytes_per_token)
+
+    def load_state(self, state):
+        self.input_ids = list(state.input_ids)
+        self.loads += 1
+
+
+PREFIX = "persona regole strumenti self concept di Aurora"
+
+
+def test_prefix_reuse():
+    print("=== Test riuso prefisso ===")
+    cache = PrefixStateCache({"prompt_prefix_cache_entries": 2})
+    reported = []
+    cache.report_usage = reported.append
+    llm = FakeLlama()
+
+    key = cache.before_call(llm, "thinker", PREFIX)
+    llm.evaluate(PREFIX + " domanda uno")
+    cache.after_call(llm, "thinker", key)
+    assert cache.get_stats()["misses"] == 1
+    assert llm.input_ids == ["<inizio>"] + PREFIX.split()  # Salvato solo il prefisso, senza suffisso né risposta
+    assert reported == [(len(PREFIX.split()) + 1) * 1000]
+    print("✓ primo turno: miss e stato del solo prefisso salvato")
+
+    key = cache.before_call(llm, "thinker", PREFIX)
+    llm.evaluate(PREFIX + " domanda due")
+    cache.after_call(llm, "thinker", key)
+    assert cache.get_stats()["hits"] == 1 and llm.loads == 0
+    print("✓ secondo turno: prefisso già nel contesto")
+
+    # Una chiamata senza prefisso (es. deliberazione interna) sporca il contesto
+    assert cache.before_call(llm, "thinker", "") is None
+    llm.evaluate("deliberazione")
+    cache.before_call(llm, "thinker", PREFIX)
+    assert llm.loads == 1 and llm.input_ids == ["<inizio>"] + PREFIX.split()
+
+    stats = cache.get_stats()
+    assert stats["restores"] == 1
+    assert stats["prefill_tokens_saved"] == 2 * len(PREFIX.split())
+    print(f"✓ stato ripristinato, hit rate {stats['hit_rate']:.0%}, token risparmiati {stats['prefill_tokens_saved']}")
+
+
+def test_bounds_and_unload():
+    print("=== Test limiti e scaricamento ===")
+    cache = PrefixStateCache({"prompt_prefix_cache_entries": 1})
+    llm = FakeLlama()
+    for prefix in ("prefisso uno " * 3, "prefisso due " * 3):
+        key = cache.before_call(llm, "thinker", prefix)
+        llm.evaluate(prefix)
+        cache.after_call(llm, "thinker", key)
+    assert cache.get_stats()["cached_states"] == 1
+
+    small = PrefixStateCache({"prompt_prefix_cache_entries": 4, "prompt_prefix_cache_max_mb": 0.01})  # ~10 KB
+    for prefix in ("primo " * 4, "secondo " * 4, "enorme " * 40):
+        key = small.before_call(llm, "thinker", prefix)
+        llm.evaluate(prefix)
+        small.after_call(llm, "thinker", key)
+    assert small.used_bytes() <= 0.01 * 1024 * 1024 and small.get_stats()["cached_states"] == 2
+    print("✓ stati limitati in numero e in memoria")
+
+    # Un modello ricaricato (anche se l'istanza nuova avesse lo stesso id) parte con il contesto vuoto
+    key = cache.before_call(llm, "thinker", "prefisso due " * 3)
+    assert cache.get_stats()["hits"] == 1
+    cache.forget_model("thinker")
+    reloaded = FakeLlama()
+    cache.before_call(reloaded, "thinker", "prefisso due " * 3)
+    assert reloaded.loads == 1
+    print("✓ dopo lo scaricamento lo stato viene ripristinato nella nuova istanza")
+
+
+if __name__ == "__main__":
+    test_prefix_reuse()
+    test_bounds_and_unload()
+    print("🎉 TUTTI I TEST SUPERATI!")
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Test della verifica adattiva delle bozze REFLECT: accordo con le fonti, verdetto breve, statistiche
+"""
+
+from self_verifier import SelfVerifier, build_verdict_prompt, parse_verdict
+
+
+def test_agreement():
+    print("=== Test accordo con le fonti ===")
+    verifier = SelfVerifier({"self_correction_agreement_threshold": 0.8})
+    assert verifier.agreement([1.0, 0.0], []) == 0.0
+    assert abs(verifier.agreement([2.0, 0.0], [[0.0, 1.0], [3.0, 0.1]]) - 0.9994) < 0.001
+    assert verifier.is_grounded([1.0, 0.0], [[0.9, 0.1]])
+    assert not verifier.is_grounded([1.0, 0.0], [[0.0, 1.0]])
+    print("✓ bozza vicina a una fonte considerata coerente")
+
+
+def test_verdict_and_stats():
+    print("=== Test verdetto breve e statistiche ===")
+    prompt = build_verdict_prompt("Roma è la capitale.", "Qual è la capitale d'Italia?", [])
+    assert "SI oppure NO" in prompt and "nessuna" in prompt
+    assert parse_verdict(" SI") and parse_verdict("si.")
+    assert not parse_verdict("NO") and not parse_verdict("") and not parse_verdict(None)
+    print("✓ solo un SI esplicito approva la bozza")
+
+    verifier = SelfVerifier({})
+    for path in ("grounded", "verdict_ok", "verdict_ok", "full"):
+        verifier.record(path)
+    stats = verifier.get_stats()
+    assert stats["total"] == 4 and stats["expensive_rate"] == 0.25
+    print("✓ frequenza del percorso costoso")
+
+
+if __name__ == "__main__":
+    test_agreement()
+    test_verdict_and_stats()
+    print("🎉 TUTTI I TEST SUPERATI!")
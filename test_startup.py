@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test dell'avvio lazy: risorse caricate in background e timeline di avvio
+"""
+
+import time
+import threading
+from startup import StartupTimeline, BackgroundResource
+
+
+def test_background_resource_blocks_only_its_users():
+    print("=== Test risorsa in background ===")
+    timeline = StartupTimeline()
+    release = threading.Event()
+
+    def slow_loader():
+        release.wait(5)
+        return "modello"
+
+    slow = BackgroundResource("lenta", slow_loader, timeline).start()
+    fast = BackgroundResource("veloce", lambda: "pronta", timeline).start()
+    assert fast.get() == "pronta"
+    assert slow.peek() is None
+    print("✓ la risorsa veloce non aspetta quella lenta")
+
+    release.set()
+    assert slow.get() == "modello"
+    assert slow.peek() == "modello"
+    print("✓ get() aspetta il caricamento in background")
+
+
+def test_get_without_start_loads_inline():
+    print("\n=== Test caricamento sincrono (avvio eager) ===")
+    calls = []
+    resource = BackgroundResource("chroma", lambda: calls.append(1) or ("client", "collection"))
+    assert resource.get() == ("client", "collection")
+    assert resource.get() == ("client", "collection")
+    assert calls == [1]
+    print("✓ caricata una sola volta nel thread chiamante")
+
+
+def test_failing_loader_returns_none():
+    print("\n=== Test loader che fallisce ===")
+    def broken():
+        raise RuntimeError("file mancante")
+    resource = BackgroundResource("embedding", broken).start()
+    assert resource.get() is None
+    print("✓ errore riportato, valore None")
+
+
+def test_timeline_format():
+    print("\n=== Test timeline di avvio ===")
+    timeline = StartupTimeline()
+    with timeline.phase("stato persistente"):
+        time.sleep(0.01)
+    pending = timeline.begin("modelli LLM", background=True)
+    report = timeline.format()
+    assert "stato persistente" in report and "primo piano" in report
+    assert "in corso" in report
+    timeline.end(pending)
+    assert "in corso" not in timeline.format()
+    print("✓ fasi in primo piano e in background riportate")
+
+
+if __name__ == "__main__":
+    test_background_resource_blocks_only_its_users()
+    test_get_without_start_loads_inline()
+    test_failing_loader_returns_none()
+    test_timeline_format()
+    print("🎉 TUTTI I TEST SUPERATI!")
@@ -45,7 +45,8 @@ async def test_state_modifier():
     print(f"\n⏰ Test 3: Simulazione passaggio tempo")
     if ai.state.get('altered_state'):
         ai.state['altered_state']['duration_minutes'] = 1
-        print(f"Durata ridotta a 1 minuto")
+        ai.state['altered_state']['updated_at'] = (datetime.now() - timedelta(minutes=1)).isoformat()
+        print(f"Durata ridotta a 1 minuto, ultimo aggiornamento un minuto fa")
     
     # Test 4: Test decay function
     print(f"\n🔄 Test 4: Test funzione decadimento")
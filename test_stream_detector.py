@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test dello StreamCommandDetector: riconoscimento incrementale di TOOL_CALL/REFLECT nello stream,
+e del filtro che toglie la riga di direttiva della deliberazione fusa
+"""
+
+from stream_detector import StreamCommandDetector, DirectivePreambleFilter
+
+
+def run(chunks):
+    detector = StreamCommandDetector()
+    shown = []
+    consumed = 0
+    for chunk in chunks:
+        consumed += 1
+        shown.append(detector.feed(chunk))
+        if detector.tool_call_complete:
+            break
+    shown.append(detector.finish())
+    return detector, "".join(shown), consumed
+
+
+def test_plain_text_passes_through():
+    print("=== Test testo normale ===")
+    detector = StreamCommandDetector()
+    assert detector.feed("Ciao") == "Ciao"  # Nessuna latenza: non può essere un comando
+    assert detector.feed("! Come stai?") == "! Come stai?"
+    assert detector.command == ""
+    print("✓ il testo passa subito all'utente")
+
+
+def test_tool_call_after_whitespace_stops_early():
+    print("=== Test TOOL_CALL ===")
+    chunks = ["\n", "  TOOL", "_CALL:", ' {"tool_name": "search_web", ', '"args": {"query": "graffe } nel testo"}', "}", " e poi", " altro testo"]
+    detector, shown, consumed = run(chunks)
+    assert shown == ""
+    assert detector.command == 'TOOL_CALL: {"tool_name": "search_web", "args": {"query": "graffe } nel testo"}}'
+    assert consumed == 6  # Fermato alla graffa di chiusura
+    print(f"✓ comando completo dopo {consumed} chunk: {detector.command}")
+
+
+def test_reflect_and_false_start():
+    detector, shown, _ = run(["`REFLECT:", " la mia risposta", " iniziale"])
+    assert detector.command == "REFLECT: la mia risposta iniziale"
+    detector, shown, _ = run(["TOOL"])
+    assert shown == "TOOL" and detector.command == ""
+    detector, shown, _ = run(["REF", "ERENDUM oggi"])
+    assert shown == "REFERENDUM oggi"
+    print("✓ REFLECT riconosciuto, falsi inizi restituiti come testo")
+
+
+def test_directive_preamble_filter():
+    print("=== Test preambolo direttiva ===")
+    preamble = DirectivePreambleFilter("DIRETTIVA:")
+    shown = "".join(preamble.feed(c) for c in ["DIRET", "TIVA: Sii calda", " e breve.\n", "Ciao", "! Come stai?"])
+    assert preamble.directive == "Sii calda e breve."
+    assert shown == "Ciao! Come stai?"
+    print("✓ direttiva tolta dallo stream e conservata")
+
+    preamble = DirectivePreambleFilter("DIRETTIVA:")
+    assert preamble.feed("DI") == "" and preamble.feed("ario di oggi") == "DIario di oggi"
+    assert preamble.directive is None
+    preamble = DirectivePreambleFilter("DIRETTIVA:")
+    assert preamble.feed("DIRETTIVA: solo questa") == "" and preamble.finish() == ""
+    assert preamble.directive == "solo questa"
+    print("✓ risposte senza direttiva invariate, direttiva senza risposta riconosciuta")
+
+
+if __name__ == "__main__":
+    test_plain_text_passes_through()
+    test_tool_call_after_whitespace_stops_early()
+    test_reflect_and_false_start()
+    test_directive_preamble_filter()
+    print("🎉 TUTTI I TEST SUPERATI!")